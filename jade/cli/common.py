@@ -1,5 +1,6 @@
 """Common functions for CLI scripts"""
 
+import importlib
 import logging
 import logging.config
 import os
@@ -19,6 +20,35 @@ _ENUM_MAPPING = {
 }
 
 
+class LazyGroup(click.Group):
+    """Click group that imports a subcommand's module only when the
+    subcommand is invoked or help is requested. This keeps the dependencies
+    of one subcommand from slowing down the startup of all others.
+
+    """
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        """
+        Parameters
+        ----------
+        lazy_commands : dict
+            Maps command name to "module:attribute".
+
+        """
+        super(LazyGroup, self).__init__(*args, **kwargs)
+        self._lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        commands = super(LazyGroup, self).list_commands(ctx)
+        return sorted(commands + list(self._lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self._lazy_commands:
+            module_name, attr = self._lazy_commands[cmd_name].split(":")
+            module = importlib.import_module(module_name)
+            return getattr(module, attr)
+        return super(LazyGroup, self).get_command(ctx, cmd_name)
+
+
 def handle_enum_input(_, param, value):
     """Converts inputs to enums."""
     try:
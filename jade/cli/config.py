@@ -10,9 +10,14 @@ import click
 from prettytable import PrettyTable
 
 from jade.common import CONFIG_FILE
+from jade.exceptions import InvalidConfiguration
 from jade.extensions.generic_command.generic_command_configuration import GenericCommandConfiguration
+from jade.jobs.job_configuration_factory import create_config_from_file
+from jade.jobs.ndjson_config import is_ndjson_config, load_config_records, \
+    write_config
+from jade.jobs.runtime_history import RuntimeHistory
 from jade.loggers import setup_logging
-from jade.utils.utils import dump_data, load_data
+from jade.utils.utils import dump_data
 
 
 logger = logging.getLogger(__name__)
@@ -33,6 +38,40 @@ def config():
     show_default=True,
     help="config file to generate.",
 )
+@click.option(
+    "--num-cpus-per-job",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Default number of CPUs that each job needs. Jobs only start when "
+         "enough CPUs are free on the node.",
+)
+@click.option(
+    "--memory-gb-per-job",
+    default=None,
+    type=click.FloatRange(min=0),
+    help="Default memory in GiB that each job needs. Jobs only start when "
+         "enough memory is free on the node.",
+)
+@click.option(
+    "--job-timeout",
+    default=None,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Stop jobs that run for longer than this many seconds.",
+)
+@click.option(
+    "--job-memory-limit-gb",
+    default=None,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Stop jobs whose processes use more than this much resident memory "
+         "in GiB.",
+)
+@click.option(
+    "--job-cpu-time-limit",
+    default=None,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Stop jobs whose processes use more than this many seconds of CPU "
+         "time.",
+)
 @click.option(
     "-v",
     "--verbose",
@@ -41,12 +80,28 @@ def config():
     show_default=True,
     help="Enable verbose log output.",
 )
-def create(filename, config_file, verbose):
+def create(filename, config_file, num_cpus_per_job, memory_gb_per_job,
+           job_timeout, job_memory_limit_gb, job_cpu_time_limit, verbose):
     """Create a config file from a filename with a list of executable commands."""
     level = logging.DEBUG if verbose else logging.WARNING
     setup_logging("auto_config", None, console_level=level)
 
-    config = GenericCommandConfiguration.auto_config(filename)
+    job_resource_defaults = {}
+    if num_cpus_per_job is not None:
+        job_resource_defaults["num_cpus"] = num_cpus_per_job
+    if memory_gb_per_job is not None:
+        job_resource_defaults["memory_gb"] = memory_gb_per_job
+    job_limit_defaults = {
+        "timeout_s": job_timeout,
+        "memory_gb": job_memory_limit_gb,
+        "cpu_time_s": job_cpu_time_limit,
+    }
+    job_limit_defaults = {
+        k: v for k, v in job_limit_defaults.items() if v is not None
+    }
+    config = GenericCommandConfiguration.auto_config(
+        filename, job_resource_defaults=job_resource_defaults,
+        job_limit_defaults=job_limit_defaults)
     print(f"Created configuration with {config.get_num_jobs()} jobs.")
     config.dump(config_file)
     print(f"Dumped configuration to {config_file}.\n")
@@ -66,32 +121,67 @@ def show(config_file, fields):
 
 # This is a standalone function so that it can be called from _filter.
 def _show(config_file, fields):
-    cfg = load_data(config_file)
-    jobs = cfg["jobs"]
+    cfg, jobs = load_config_records(config_file)
     print(f"Extension: {cfg['extension']}")
-    print(f"Num jobs: {len(cfg['jobs'])}")
-    if not jobs:
-        return
-
-    for field in fields:
-        if field not in jobs[0]:
-            print(f"field={field} is not a job field in {cfg['extension']}")
-            sys.exit(1)
-
+    table = None
     field_names = ["index"]
-    if "name" in jobs[0]:
-        field_names.append("name")
-    else:
-        field_names.append(list(jobs[0].keys())[0])
-    if "blocked_by" in jobs[0]:
-        field_names.append("blocked_by")
-
-    table = PrettyTable()
-    table.field_names = field_names + list(fields)
+    num_jobs = 0
     for i, job in enumerate(jobs):
-        row = [i] + [job[x] for x in field_names[1:]]
+        if table is None:
+            for field in fields:
+                if field not in job:
+                    print(f"field={field} is not a job field in {cfg['extension']}")
+                    sys.exit(1)
+
+            if "name" in job:
+                field_names.append("name")
+            else:
+                field_names.append(list(job.keys())[0])
+            if "blocked_by" in job:
+                field_names.append("blocked_by")
+
+            table = PrettyTable()
+            table.field_names = field_names + list(fields)
+
+        row = [i] + [job[x] for x in field_names[1:] + list(fields)]
         table.add_row(row)
-    print(table)
+        num_jobs += 1
+
+    print(f"Num jobs: {num_jobs}")
+    if table is not None:
+        print(table)
+
+
+@click.command()
+@click.argument("config_file", type=click.Path(exists=True))
+@click.option(
+    "--runtime-history",
+    default=None,
+    type=click.Path(exists=True, file_okay=False),
+    help="Output directory of a previous run. Find the longest path by the "
+         "jobs' previous execution times instead of by number of jobs."
+)
+def dependencies(config_file, runtime_history):
+    """Check the job dependencies for cycles and show the shape of the
+    dependency graph."""
+    if runtime_history is not None:
+        runtime_history = RuntimeHistory.from_output_directory(runtime_history)
+    cfg = create_config_from_file(config_file)
+    try:
+        summary = cfg.check_job_dependencies(runtime_history=runtime_history)
+    except InvalidConfiguration as err:
+        print(f"Invalid job dependencies: {err}")
+        sys.exit(1)
+
+    print(f"Num jobs: {summary.num_jobs}")
+    print(f"Num dependencies: {summary.num_dependencies}")
+    print(f"Depth: {summary.depth}")
+    print(f"Max parallel jobs (width): {summary.width}")
+    print(f"Longest path ({len(summary.longest_path)} jobs): "
+          f"{' -> '.join(summary.longest_path)}")
+    if summary.longest_path_runtime is not None:
+        print(f"Longest path expected runtime: "
+              f"{summary.longest_path_runtime} seconds")
 
 
 @click.command("filter")
@@ -135,11 +225,13 @@ def _filter(config_file, output_file, indices, fields, show_config=False):
        jade config filter c1.json -o c2.json 5:
     5. Select jobs with parameters param1=green and param2=3.
        jade config filter c1.json -o c2.json -f param1 green -f param2 3
+    6. Convert to the line-delimited format, which is streamed by JADE.
+       jade config filter c1.json -o c2.jsonl.gz
 
     """
-    cfg = load_data(config_file)
-    jobs = cfg["jobs"]
-    if not jobs:
+    cfg, jobs = load_config_records(config_file)
+    orig_len = sum(1 for _ in jobs)
+    if orig_len == 0:
         print("The configuration has no jobs")
         sys.exit(1)
 
@@ -151,19 +243,20 @@ def _filter(config_file, output_file, indices, fields, show_config=False):
         new_config_file = output_file
 
     try:
-        if not new_config_file.endswith(".json"):
-            print("new_config_file must have extension .json")
+        is_ndjson = is_ndjson_config(new_config_file)
+        if not new_config_file.endswith(".json") and not is_ndjson:
+            print("new_config_file must have extension .json, .jsonl, or "
+                  ".ndjson")
             sys.exit(1)
 
-        orig_len = len(jobs)
-        new_jobs = []
+        positions = []
         regex_int = re.compile(r"^(?P<index>\d+)$")
         regex_range = re.compile(r"^(?P<start>[\d-]*):(?P<end>[\d-]*)$")
         for index in indices:
             match = regex_int.search(index)
             if match:
                 i = int(match.groupdict()["index"])
-                new_jobs.append(jobs[i])
+                positions.append(range(orig_len)[i])
                 continue
             match = regex_range.search(index)
             if match:
@@ -177,30 +270,18 @@ def _filter(config_file, output_file, indices, fields, show_config=False):
                     end = None
                 else:
                     end = int(end)
-                new_jobs += jobs[start:end]
+                positions += range(orig_len)[start:end]
 
         # Note: when looking at just the JSON, there is no way to get the job name,
         # and so we can't check for duplicates.
 
-        if not new_jobs:
-            new_jobs = jobs
-
-        if fields:
-            final_jobs = []
-            for job in new_jobs:
-                matched = True
-                for field in fields:
-                    if str(job[field[0]]) != field[1]:
-                        matched = False
-                        break
-                if matched:
-                    final_jobs.append(job)
-
-            new_jobs = final_jobs
-
-        cfg["jobs"] = new_jobs
-        new_len = len(cfg["jobs"])
-        dump_data(cfg, new_config_file, indent=4)
+        new_jobs = _iter_filtered_jobs(config_file, positions, fields)
+        if is_ndjson:
+            new_len = write_config(new_config_file, cfg, new_jobs)
+        else:
+            cfg["jobs"] = list(new_jobs)
+            new_len = len(cfg["jobs"])
+            dump_data(cfg, new_config_file, indent=4)
         print(f"Filtered {config_file} ({orig_len} jobs) into ({new_len} jobs)\n")
         if output_file is not None:
             print(f"Wrote new config to {output_file}")
@@ -212,6 +293,28 @@ def _filter(config_file, output_file, indices, fields, show_config=False):
             os.remove(new_config_file)
 
 
+def _iter_filtered_jobs(config_file, positions, fields):
+    """Yield the jobs at positions, in that order, that match fields. Jobs are
+    streamed from the file when the positions are in file order.
+
+    """
+    _, jobs = load_config_records(config_file)
+    if not positions:
+        selected = jobs
+    elif positions == sorted(set(positions)):
+        wanted = set(positions)
+        selected = (job for i, job in enumerate(jobs) if i in wanted)
+    else:
+        wanted = set(positions)
+        by_position = {i: job for i, job in enumerate(jobs) if i in wanted}
+        selected = (by_position[i] for i in positions)
+
+    for job in selected:
+        if all(str(job[field[0]]) == field[1] for field in fields):
+            yield job
+
+
 config.add_command(create)
 config.add_command(show)
+config.add_command(dependencies)
 config.add_command(_filter)
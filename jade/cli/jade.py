@@ -5,29 +5,24 @@ import logging
 
 import click
 
-from jade.cli.auto_config import auto_config
-from jade.cli.config import config
-from jade.cli.show_events import show_events
-from jade.cli.extensions import extensions
-from jade.cli.pipeline import pipeline
-from jade.cli.show_results import show_results
-from jade.cli.stats import stats
-from jade.cli.submit_jobs import submit_jobs
+from jade.cli.common import LazyGroup
 
 
 logger = logging.getLogger(__name__)
 
 
-@click.group()
+@click.group(
+    cls=LazyGroup,
+    lazy_commands={
+        "auto-config": "jade.cli.auto_config:auto_config",
+        "config": "jade.cli.config:config",
+        "extensions": "jade.cli.extensions:extensions",
+        "pipeline": "jade.cli.pipeline:pipeline",
+        "show-events": "jade.cli.show_events:show_events",
+        "show-results": "jade.cli.show_results:show_results",
+        "stats": "jade.cli.stats:stats",
+        "submit-jobs": "jade.cli.submit_jobs:submit_jobs",
+    },
+)
 def cli():
     """JADE commands"""
-
-
-cli.add_command(extensions)
-cli.add_command(auto_config)
-cli.add_command(config)
-cli.add_command(pipeline)
-cli.add_command(show_events)
-cli.add_command(show_results)
-cli.add_command(stats)
-cli.add_command(submit_jobs)
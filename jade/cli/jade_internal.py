@@ -5,17 +5,18 @@ import logging
 
 import click
 
-from jade.cli.run_jobs import run_jobs
-from jade.cli.run import run
+from jade.cli.common import LazyGroup
 
 
 logger = logging.getLogger(__name__)
 
 
-@click.group()
+@click.group(
+    cls=LazyGroup,
+    lazy_commands={
+        "run": "jade.cli.run:run",
+        "run-jobs": "jade.cli.run_jobs:run_jobs",
+    },
+)
 def cli():
     """Entry point"""
-
-
-cli.add_command(run_jobs)
-cli.add_command(run)
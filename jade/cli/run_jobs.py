@@ -8,7 +8,10 @@ import sys
 import click
 
 from jade.common import OUTPUT_DIR
-from jade.jobs.job_runner import JobRunner
+from jade.jobs.job_runner import JobRunner, DEFAULT_DRAIN_GRACE_PERIOD
+from jade.jobs.retry_policy import RetryPolicy, DEFAULT_RETRY_BACKOFF
+from jade.jobs.runtime_history import RuntimeHistory
+from jade.jobs.scheduling_policy import SchedulingPolicyType
 from jade.loggers import setup_logging
 from jade.utils.utils import get_cli_string
 
@@ -33,6 +36,95 @@ logger = logging.getLogger(__name__)
     type=int,
     help="Number of processes to run in parallel; defaults to num CPUs."
 )
+@click.option(
+    "--worker-pool/--no-worker-pool",
+    default=False,
+    show_default=True,
+    help="Run jobs in long-lived worker processes that load the extension "
+         "once instead of starting a new process for each job."
+)
+@click.option(
+    "--max-jobs-per-worker",
+    default=None,
+    type=int,
+    help="Replace a pooled worker after it runs this many jobs."
+)
+@click.option(
+    "--shared-job-queue",
+    default=None,
+    type=click.Path(exists=True),
+    help="Claim jobs from this shared queue file until it is empty instead "
+         "of running all jobs in the config."
+)
+@click.option(
+    "--end-time",
+    default=None,
+    type=float,
+    help="End time of the node allocation in seconds since the epoch; "
+         "defaults to the end time reported by the HPC."
+)
+@click.option(
+    "--drain-grace-period",
+    default=DEFAULT_DRAIN_GRACE_PERIOD,
+    show_default=True,
+    type=int,
+    help="Stop starting jobs that will not complete this many seconds "
+         "before the end of the allocation and terminate running jobs then."
+)
+@click.option(
+    "--max-retries",
+    default=0,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Run failed jobs again up to this many times."
+)
+@click.option(
+    "--retry-backoff",
+    default=DEFAULT_RETRY_BACKOFF,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Seconds to wait before the first retry; doubles for each "
+         "subsequent retry."
+)
+@click.option(
+    "--retry-return-codes",
+    default=None,
+    type=str,
+    help="Comma-separated return codes to retry; defaults to all non-zero "
+         "codes."
+)
+@click.option(
+    "--speculation-threshold",
+    default=None,
+    type=click.FloatRange(min=1.0),
+    help="Start a duplicate of a job that has run this many times longer "
+         "than the median job once no other jobs are waiting; the first to "
+         "finish wins. Only applies to extensions with idempotent jobs."
+)
+@click.option(
+    "--scheduling-policy",
+    default=None,
+    type=click.Choice([x.value for x in SchedulingPolicyType]),
+    help="Order in which to start ready jobs; defaults to the order in which "
+         "they become ready."
+)
+@click.option(
+    "--runtime-estimates",
+    default=None,
+    type=click.Path(exists=True),
+    help="File of expected job runtimes used by --scheduling-policy. "
+         "Written by submit-jobs."
+)
+@click.option(
+    "--autotune-concurrency",
+    default=None,
+    nargs=2,
+    type=click.IntRange(min=1),
+    metavar="MIN MAX",
+    help="Adjust the number of parallel jobs between MIN and MAX from the "
+         "node's memory use, I/O wait, and CPU utilization. Starts at "
+         "num-processes."
+)
 @click.option(
     "--verbose",
     is_flag=True,
@@ -41,7 +133,11 @@ logger = logging.getLogger(__name__)
     help="Enable verbose log output."
 )
 @click.command()
-def run_jobs(config_file, output, num_processes, verbose):
+def run_jobs(config_file, output, num_processes, worker_pool,
+             max_jobs_per_worker, shared_job_queue, end_time,
+             drain_grace_period, max_retries, retry_backoff,
+             retry_return_codes, speculation_threshold, scheduling_policy,
+             runtime_estimates, autotune_concurrency, verbose):
     """Starts jobs on HPC."""
     match = re.search(r"batch_(\d+)\.json", config_file)
     assert match
@@ -53,6 +149,28 @@ def run_jobs(config_file, output, num_processes, verbose):
                   console_level=logging.ERROR)
     logger.info(get_cli_string())
 
+    if autotune_concurrency is not None and \
+            autotune_concurrency[0] > autotune_concurrency[1]:
+        print(f"--autotune-concurrency MIN cannot exceed MAX: "
+              f"{autotune_concurrency}")
+        sys.exit(1)
+
     mgr = JobRunner(config_file, output=output, batch_id=batch_id)
-    ret = mgr.run_jobs(verbose=verbose, num_processes=num_processes)
+    ret = mgr.run_jobs(
+        verbose=verbose,
+        num_processes=num_processes,
+        use_worker_pool=worker_pool,
+        max_jobs_per_worker=max_jobs_per_worker,
+        shared_job_queue=shared_job_queue,
+        end_time=end_time,
+        drain_grace_period=drain_grace_period,
+        retry_policy=RetryPolicy.from_cli_options(
+            max_retries, retry_backoff, retry_return_codes),
+        speculation_threshold=speculation_threshold,
+        scheduling_policy_type=None if scheduling_policy is None
+        else SchedulingPolicyType(scheduling_policy),
+        runtime_history=None if runtime_estimates is None
+        else RuntimeHistory.from_file(runtime_estimates),
+        concurrency_bounds=autotune_concurrency,
+    )
     sys.exit(ret.value)
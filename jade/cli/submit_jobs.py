@@ -6,8 +6,14 @@ import sys
 
 import click
 
-from jade.jobs.job_submitter import DEFAULTS, JobSubmitter
+from jade.jobs.job_submitter import DEFAULTS, JobSubmitter, \
+    SubmissionOptions
+from jade.hpc.batch_packer import DEFAULT_SAFETY_MARGIN
+from jade.hpc.hpc_submitter import DEFAULT_MAX_LOST_JOB_RETRIES
 from jade.jobs.job_configuration_factory import create_config_from_previous_run
+from jade.jobs.retry_policy import RetryPolicy, DEFAULT_RETRY_BACKOFF
+from jade.jobs.runtime_history import RuntimeHistory
+from jade.jobs.scheduling_policy import SchedulingPolicyType
 from jade.loggers import setup_logging
 from jade.result import ResultsSummary
 from jade.utils.utils import rotate_filenames, get_cli_string
@@ -60,6 +66,13 @@ logger = logging.getLogger(__name__)
     show_default=True,
     help="Interval in seconds on which to poll jobs for status."
 )
+@click.option(
+    "--status-ttl",
+    default=None,
+    type=click.FloatRange(min=0),
+    help="Seconds for which HPC job statuses from one scheduler command are "
+         "reused; defaults to the poll interval."
+)
 @click.option(
     "-q", "--num-processes",
     default=None,
@@ -101,6 +114,19 @@ logger = logging.getLogger(__name__)
     show_default=True,
     help="Generate reports after execution."
 )
+@click.option(
+    "--worker-pool/--no-worker-pool",
+    default=False,
+    show_default=True,
+    help="Run jobs in long-lived worker processes that load the extension "
+         "once instead of starting a new process for each job."
+)
+@click.option(
+    "--max-jobs-per-worker",
+    default=None,
+    type=int,
+    help="Replace a pooled worker after it runs this many jobs."
+)
 @click.option(
     "--try-add-blocked-jobs/--no-try-add-blocked-jobs",
     is_flag=True,
@@ -109,12 +135,154 @@ logger = logging.getLogger(__name__)
     help="Add blocked jobs to a node's batch if they are blocked by jobs "
          "already in the batch."
 )
+@click.option(
+    "--results-db/--no-results-db",
+    default=True,
+    show_default=True,
+    help="Also write results to an indexed SQLite database, "
+         "results.sqlite, for fast queries on large batches."
+)
+@click.option(
+    "--job-arrays/--no-job-arrays",
+    default=False,
+    show_default=True,
+    help="Submit batches as SLURM job arrays, running at most max-nodes "
+         "batches at once."
+)
+@click.option(
+    "--nodes-per-allocation",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Request this many nodes in each SLURM allocation and run one "
+         "batch per node. max-nodes still limits the total number of nodes."
+)
+@click.option(
+    "--shared-job-queue/--no-shared-job-queue",
+    default=False,
+    show_default=True,
+    help="Have nodes pull small chunks of jobs from a shared queue file "
+         "until it is empty instead of running fixed batches. Starts up to "
+         "max-nodes nodes, one per per-node-batch-size jobs."
+)
+@click.option(
+    "--runtime-history",
+    default=None,
+    type=click.Path(exists=True, file_okay=False),
+    help="Output directory of a previous run. Pack batches by the jobs' "
+         "previous execution times so that each fits in the walltime."
+)
+@click.option(
+    "--cpus-per-node",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Number of jobs a node runs in parallel when packing batches by "
+         "runtime; num-processes takes precedence."
+)
+@click.option(
+    "--walltime-safety-margin",
+    default=DEFAULT_SAFETY_MARGIN,
+    show_default=True,
+    type=click.FloatRange(min=0, max=0.99),
+    help="Fraction of the walltime to leave unused when packing batches by "
+         "runtime."
+)
+@click.option(
+    "--fallback-runtime",
+    default=None,
+    type=float,
+    help="Runtime in seconds to assume for jobs without history; defaults "
+         "to the median of the history."
+)
+@click.option(
+    "--adaptive-nodes/--no-adaptive-nodes",
+    default=False,
+    show_default=True,
+    help="Adjust the number of concurrent nodes and the batch size from "
+         "observed queue waits. max-nodes and per-node-batch-size are the "
+         "starting values."
+)
+@click.option(
+    "--max-nodes-limit",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Upper bound on concurrent nodes with --adaptive-nodes; defaults "
+         "to twice max-nodes."
+)
+@click.option(
+    "--max-lost-job-retries",
+    default=DEFAULT_MAX_LOST_JOB_RETRIES,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Resubmit jobs whose HPC batch completed without their results, "
+         "such as after a node failure or timeout, up to this many times."
+)
+@click.option(
+    "--max-retries",
+    default=0,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Run failed jobs again on the same node up to this many times."
+)
+@click.option(
+    "--retry-backoff",
+    default=DEFAULT_RETRY_BACKOFF,
+    show_default=True,
+    type=click.FloatRange(min=0),
+    help="Seconds to wait before the first retry; doubles for each "
+         "subsequent retry."
+)
+@click.option(
+    "--retry-return-codes",
+    default=None,
+    type=str,
+    help="Comma-separated return codes to retry; defaults to all non-zero "
+         "codes."
+)
+@click.option(
+    "--speculation-threshold",
+    default=None,
+    type=click.FloatRange(min=1.0),
+    help="Start a duplicate of a job that has run this many times longer "
+         "than the median job once no other jobs are waiting; the first to "
+         "finish wins. Only applies to extensions with idempotent jobs."
+)
+@click.option(
+    "--scheduling-policy",
+    default=SchedulingPolicyType.FIFO.value,
+    show_default=True,
+    type=click.Choice([x.value for x in SchedulingPolicyType]),
+    help="Order in which to run ready jobs. critical_path runs the heads of "
+         "the longest dependency chains first and longest_runtime_first the "
+         "longest jobs first, using runtimes from --runtime-history."
+)
+@click.option(
+    "--autotune-concurrency",
+    default=None,
+    nargs=2,
+    type=click.IntRange(min=1),
+    metavar="MIN MAX",
+    help="Adjust the number of parallel jobs between MIN and MAX from the "
+         "node's memory use, I/O wait, and CPU utilization. Starts at "
+         "num-processes."
+)
 def submit_jobs(
         config_file, per_node_batch_size, hpc_config, local, max_nodes,
-        output, poll_interval, num_processes, rotate_logs,
+        output, poll_interval, status_ttl, num_processes, rotate_logs,
         verbose, restart_failed, restart_missing, reports,
-        try_add_blocked_jobs):
+        worker_pool, max_jobs_per_worker, try_add_blocked_jobs, results_db,
+        job_arrays, nodes_per_allocation, shared_job_queue, runtime_history,
+        cpus_per_node, walltime_safety_margin, fallback_runtime,
+        adaptive_nodes, max_nodes_limit, max_lost_job_retries, max_retries,
+        retry_backoff, retry_return_codes, speculation_threshold,
+        scheduling_policy, autotune_concurrency):
     """Submits jobs for execution, locally or on HPC."""
+    if autotune_concurrency is not None and \
+            autotune_concurrency[0] > autotune_concurrency[1]:
+        print(f"--autotune-concurrency MIN cannot exceed MAX: "
+              f"{autotune_concurrency}")
+        sys.exit(1)
+
     os.makedirs(output, exist_ok=True)
 
     previous_results = []
@@ -133,6 +301,10 @@ def submit_jobs(
         missing_job_config.dump(config_file)
         previous_results = ResultsSummary(output).list_results()
 
+    if runtime_history is not None:
+        # Load it before the config in the output directory is replaced.
+        runtime_history = RuntimeHistory.from_output_directory(runtime_history)
+
     if rotate_logs:
         rotate_filenames(output, ".log")
 
@@ -146,17 +318,36 @@ def submit_jobs(
     setup_logging("event", event_file, console_level=logging.ERROR,
                   file_level=logging.INFO)
 
-    mgr = JobSubmitter(config_file, hpc_config=hpc_config, output=output)
-    ret = mgr.submit_jobs(
+    options = SubmissionOptions(
         per_node_batch_size=per_node_batch_size,
         max_nodes=max_nodes,
         force_local=local,
         verbose=verbose,
         num_processes=num_processes,
         poll_interval=poll_interval,
-        previous_results=previous_results,
+        status_ttl=status_ttl,
         reports=reports,
         try_add_blocked_jobs=try_add_blocked_jobs,
+        use_worker_pool=worker_pool,
+        max_jobs_per_worker=max_jobs_per_worker,
+        results_db=results_db,
+        use_job_arrays=job_arrays,
+        nodes_per_allocation=nodes_per_allocation,
+        use_shared_queue=shared_job_queue,
+        runtime_history=runtime_history,
+        cpus_per_node=cpus_per_node,
+        walltime_safety_margin=walltime_safety_margin,
+        fallback_runtime_s=fallback_runtime,
+        adaptive_nodes=adaptive_nodes,
+        max_nodes_limit=max_nodes_limit,
+        max_lost_job_retries=max_lost_job_retries,
+        retry_policy=RetryPolicy.from_cli_options(
+            max_retries, retry_backoff, retry_return_codes),
+        speculation_threshold=speculation_threshold,
+        scheduling_policy_type=SchedulingPolicyType(scheduling_policy),
+        concurrency_bounds=autotune_concurrency,
     )
+    mgr = JobSubmitter(config_file, hpc_config=hpc_config, output=output)
+    ret = mgr.submit_jobs(options, previous_results=previous_results)
 
     sys.exit(ret.value)
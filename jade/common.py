@@ -5,13 +5,19 @@ import os
 
 OUTPUT_DIR = "output"
 JOBS_OUTPUT_DIR = "job-outputs"
+JOB_STORE_DIR = "job-store"
+SHARED_JOB_QUEUE_FILE = "shared_job_queue.json"
+RUNTIME_ESTIMATES_FILE = "runtime_estimates.json"
 SCRIPTS_DIR = "scripts"
 CONFIG_FILE = "config.json"
 RESULTS_DIR = "temp-results"
 RESULTS_FILE = "results.json"
+RESULTS_DB_FILE = "results.sqlite"
 ANALYSIS_DIR = "analysis"
 POST_PROCESSING_CONFIG_FILE = "post-config.json"
 
+ONE_GB = 1024 * 1024 * 1024
+
 
 def get_results_temp_filename(output_dir, batch_id):
     """Get the results temp filename for a batch of jobs.
@@ -28,9 +34,28 @@ def get_results_temp_filename(output_dir, batch_id):
     str
 
     """
-    # This uses CSV files because it allows for cheap appends by jobs.
-    # For JSON and TOML each job would have to parse all existing jobs before
-    # appending.
+    # This uses CSV files because it allows for cheap appends of batches of
+    # results. For JSON and TOML each flush would have to parse all existing
+    # results before appending.
     return os.path.join(
         output_dir, RESULTS_DIR, f"results_batch_{batch_id}.csv"
     )
+
+
+def get_drained_jobs_filename(output_dir, batch_id):
+    """Get the file in which a batch records the jobs that it did not run
+    because its allocation was about to end.
+
+    Parameters
+    ----------
+    output_dir : str
+        output directory for all jobs
+    batch_id : int
+        batch ID of jobs running on a node
+
+    Returns
+    -------
+    str
+
+    """
+    return os.path.join(output_dir, f"drained_jobs_batch_{batch_id}.json")
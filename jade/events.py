@@ -10,8 +10,6 @@ import re
 import sys
 from datetime import datetime
 
-from prettytable import PrettyTable
-
 from jade.common import JOBS_OUTPUT_DIR
 from jade.exceptions import InvalidConfiguration
 from jade.utils.utils import dump_data, load_data
@@ -28,11 +26,23 @@ EVENT_CATEGORY_RESOURCE_UTIL = "ResourceUtilization"
 EVENT_NAME_HPC_SUBMIT = "hpc_submit"
 EVENT_NAME_HPC_JOB_ASSIGNED = "hpc_job_assigned"
 EVENT_NAME_HPC_JOB_STATE_CHANGE = "hpc_job_state_change"
+EVENT_NAME_HPC_BATCH_DURATION = "hpc_batch_duration"
+EVENT_NAME_HPC_ADAPTIVE_DECISION = "hpc_adaptive_decision"
+EVENT_NAME_HPC_ALLOCATION_DRAIN = "hpc_allocation_drain"
+EVENT_NAME_HPC_REQUEUE_DRAINED_JOBS = "hpc_requeue_drained_jobs"
+EVENT_NAME_HPC_JOBS_LOST = "hpc_jobs_lost"
 EVENT_NAME_CPU_STATS = "cpu_stats"
 EVENT_NAME_DISK_STATS = "disk_stats"
 EVENT_NAME_MEMORY_STATS = "mem_stats"
 EVENT_NAME_NETWORK_STATS = "net_stats"
 EVENT_NAME_BYTES_CONSUMED = "bytes_consumed"
+EVENT_NAME_JOB_RETRY = "job_retry"
+EVENT_NAME_JOB_TIMEOUT = "job_timeout"
+EVENT_NAME_JOB_MEMORY_LIMIT_EXCEEDED = "job_memory_limit_exceeded"
+EVENT_NAME_JOB_CPU_TIME_LIMIT_EXCEEDED = "job_cpu_time_limit_exceeded"
+EVENT_NAME_SPECULATIVE_JOB_STARTED = "speculative_job_started"
+EVENT_NAME_SPECULATIVE_JOB_RESOLVED = "speculative_job_resolved"
+EVENT_NAME_CONCURRENCY_ADJUSTED = "concurrency_adjusted"
 EVENT_NAME_UNHANDLED_ERROR = "unhandled_error"
 EVENT_NAME_ERROR_LOG = "log_error"
 EVENT_NAME_CONFIG_EXEC_SUMMARY = "config_exec_summary"
@@ -388,6 +398,7 @@ class EventsSummary:
 
     def show_events(self, name):
         """Print tabular events in terminal"""
+        from prettytable import PrettyTable
         table = PrettyTable()
 
         field_names = None
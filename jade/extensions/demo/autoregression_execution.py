@@ -95,6 +95,11 @@ class AutoRegressionExecution(JobExecutionInterface):
         """Create instance of :obj:`AutoRegressionExecution`"""
         return cls(job, output)
 
+    @staticmethod
+    def is_idempotent():
+        # Each job only reads its inputs and writes its own output directory.
+        return True
+
     @staticmethod
     def generate_command(job, output, config_file, verbose=False):
         """
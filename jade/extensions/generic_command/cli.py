@@ -3,6 +3,8 @@
 import os
 
 from jade.extensions.generic_command.generic_command_configuration import GenericCommandConfiguration
+from jade.extensions.generic_command.generic_command_execution import GenericCommandExecution
+from jade.jobs.job_configuration_factory import create_config_from_file
 
 
 def auto_config(inputs, **kwargs):
@@ -21,5 +23,11 @@ def auto_config(inputs, **kwargs):
 
 
 def run(config_file, name, output, output_format, verbose):
-    """Run auto regression analysis through command line"""
-    assert False
+    """Run a generic command through command line"""
+    config = create_config_from_file(config_file)
+    job = config.get_job(name)
+
+    execution = GenericCommandExecution.create(
+        config.get_job_inputs(), job, output
+    )
+    return execution.run()
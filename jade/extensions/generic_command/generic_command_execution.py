@@ -3,6 +3,7 @@
 import logging
 
 from jade.jobs.job_execution_interface import JobExecutionInterface
+from jade.utils.subprocess_manager import run_command
 
 
 logger = logging.getLogger(__name__)
@@ -44,4 +45,4 @@ class GenericCommandExecution(JobExecutionInterface):
         pass
 
     def run(self):
-        assert False
+        return run_command(self._job.command)
@@ -1,7 +1,9 @@
 """Implements the JobParametersInterface for generic_command."""
 
 from collections import namedtuple
+from jade.jobs.job_limits import JobLimits
 from jade.jobs.job_parameters_interface import JobParametersInterface
+from jade.jobs.resource_admission import JobResources
 
 
 class GenericCommandParameters(JobParametersInterface):
@@ -9,7 +11,8 @@ class GenericCommandParameters(JobParametersInterface):
 
     parameters_type = namedtuple("GenericCommand", "command")
 
-    def __init__(self, command, job_id=None,  blocked_by=None):
+    def __init__(self, command, job_id=None,  blocked_by=None, num_cpus=None,
+                 memory_gb=None, limits=None):
         self.command = command
         self.job_id = job_id  # Gets set when job is added to config.
                               # Uniquely identifies the job.
@@ -17,6 +20,11 @@ class GenericCommandParameters(JobParametersInterface):
         if blocked_by is not None:
             for job_id in blocked_by:
                 self.blocked_by.add(str(job_id))
+        # Optional; None means that the configuration's default applies.
+        self.num_cpus = num_cpus
+        self.memory_gb = memory_gb
+        # Optional dict of JobLimits fields
+        self.limits = limits
 
     def __str__(self):
         return "<GenericCommandParameters: {}>".format(self.name)
@@ -30,11 +38,18 @@ class GenericCommandParameters(JobParametersInterface):
 
     def serialize(self):
         assert self.job_id is not None
-        return {
+        data = {
             "command": self.command,
             "job_id": self.job_id,
             "blocked_by": list(self.blocked_by),
         }
+        if self.num_cpus is not None:
+            data["num_cpus"] = self.num_cpus
+        if self.memory_gb is not None:
+            data["memory_gb"] = self.memory_gb
+        if self.limits:
+            data["limits"] = self.limits
+        return data
 
     @classmethod
     def deserialize(cls, data):
@@ -42,6 +57,9 @@ class GenericCommandParameters(JobParametersInterface):
             data["command"],
             job_id=data["job_id"],
             blocked_by={str(x) for x in data["blocked_by"]},
+            num_cpus=data.get("num_cpus"),
+            memory_gb=data.get("memory_gb"),
+            limits=data.get("limits"),
         )
 
     def get_blocking_jobs(self):
@@ -49,3 +67,14 @@ class GenericCommandParameters(JobParametersInterface):
 
     def remove_blocking_job(self, name):
         self.blocked_by.remove(name)
+
+    def get_resource_requirements(self):
+        if self.num_cpus is None and self.memory_gb is None:
+            return None
+        return JobResources.from_dict(
+            {"num_cpus": self.num_cpus, "memory_gb": self.memory_gb})
+
+    def get_limits(self):
+        if not self.limits:
+            return None
+        return JobLimits.from_dict(self.limits)
@@ -49,8 +49,16 @@ logger = logging.getLogger(__name__)
 
 
 class Registry:
-    """Manages extensions registered with JADE."""
+    """Manages extensions registered with JADE.
+
+    The contents of each registry file are cached for the life of the process
+    and re-read only when the file's modification time changes. An
+    extension's modules are imported the first time one of its classes is
+    requested.
+
+    """
     _REGISTRY_FILENAME = ".jade-registry.json"
+    _cache = {}  # filename: (mtime_ns, size, data)
 
     def __init__(self, registry_filename=None):
         if registry_filename is None:
@@ -66,29 +74,49 @@ class Registry:
         if not os.path.exists(self._registry_filename):
             self.reset_defaults()
         else:
-            data = self._check_registry_config(self._registry_filename)
+            data = self._read_registry(self._registry_filename)
             for extension in data["extensions"]:
                 self._add_extension(extension)
             for package_name in data["logging"]:
                 self._loggers.add(package_name)
 
+    @classmethod
+    def clear_cache(cls):
+        """Clear the process-wide cache of registry files."""
+        cls._cache.clear()
+
+    def _read_registry(self, filename):
+        stat = os.stat(filename)
+        key = os.path.abspath(filename)
+        cached = self._cache.get(key)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        data = self._check_registry_config(filename)
+        # Re-stat in case the file was reformatted.
+        stat = os.stat(filename)
+        self._cache[key] = (stat.st_mtime_ns, stat.st_size, data)
+        logger.debug("Loaded registry from %s", filename)
+        return data
+
     def _add_extension(self, extension):
         for field in DEFAULT_REGISTRY["extensions"][0]:
             if field not in extension:
                 raise InvalidParameter(f"required field {field} not present")
 
-        cmod = importlib.import_module(extension["job_configuration_module"])
-        emod = importlib.import_module(extension["job_execution_module"])
-        cli_mod = importlib.import_module(extension["cli_module"])
-
-        ext = copy.copy(extension)
-        ext[ExtensionClassType.CONFIGURATION] = getattr(
-            cmod, extension["job_configuration_class"])
-        ext[ExtensionClassType.EXECUTION] = getattr(
-            emod, extension["job_execution_class"])
-        ext[ExtensionClassType.CLI] = cli_mod
+        self._extensions[extension["name"]] = copy.copy(extension)
 
-        self._extensions[extension["name"]] = ext
+    @staticmethod
+    def _load_extension_class(extension, class_type):
+        if class_type == ExtensionClassType.CONFIGURATION:
+            module = importlib.import_module(
+                extension["job_configuration_module"])
+            return getattr(module, extension["job_configuration_class"])
+        if class_type == ExtensionClassType.EXECUTION:
+            module = importlib.import_module(extension["job_execution_module"])
+            return getattr(module, extension["job_execution_class"])
+        assert class_type == ExtensionClassType.CLI, class_type
+        return importlib.import_module(extension["cli_module"])
 
     def _check_registry_config(self, filename):
         data = load_data(filename)
@@ -117,6 +145,12 @@ class Registry:
 
         filename = self.registry_filename
         dump_data(data, filename, indent=4)
+        # Writes can happen faster than the filesystem's timestamp
+        # granularity, so update the cache instead of relying on the mtime.
+        stat = os.stat(filename)
+        self._cache[os.path.abspath(filename)] = (
+            stat.st_mtime_ns, stat.st_size, data
+        )
         logger.debug("Serialized data to %s", filename)
 
     def add_logger(self, package_name):
@@ -173,6 +207,9 @@ class Registry:
         if extension is None:
             raise InvalidParameter(f"{extension_name} is not registered")
 
+        if class_type not in extension:
+            extension[class_type] = self._load_extension_class(
+                extension, class_type)
         return extension[class_type]
 
     def is_registered(self, extension_name):
@@ -202,8 +239,11 @@ class Registry:
             Raised if the extension is invalid.
 
         """
-
         self._add_extension(extension)
+        # Import the modules now so that errors are reported at registration
+        # time rather than when a job runs.
+        for class_type in ExtensionClassType:
+            self.get_extension_class(extension["name"], class_type)
         self._serialize_registry()
         logger.debug("Registered extension %s", extension["name"])
 
@@ -217,9 +257,9 @@ class Registry:
         self._extensions.clear()
         self._loggers.clear()
         for extension in DEFAULT_REGISTRY["extensions"]:
-            self.register_extension(extension)
+            self._add_extension(extension)
         for package_name in DEFAULT_REGISTRY["logging"]:
-            self.add_logger(package_name)
+            self._loggers.add(package_name)
         self._serialize_registry()
 
         logger.debug("Initialized registry to its defaults.")
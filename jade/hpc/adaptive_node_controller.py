@@ -0,0 +1,189 @@
+"""Adjusts the number of HPC nodes and batch sizes from observed queue waits."""
+
+from collections import deque
+import logging
+import statistics
+
+from jade.events import StructuredLogEvent, EVENT_CATEGORY_HPC, \
+    EVENT_NAME_HPC_ADAPTIVE_DECISION
+from jade.exceptions import InvalidParameter
+from jade.loggers import log_event
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOW_WAIT_RATIO = 0.1
+DEFAULT_HIGH_WAIT_RATIO = 0.5
+DEFAULT_MAX_BATCH_SIZE_FACTOR = 4
+DEFAULT_WINDOW_SIZE = 5
+
+
+class AdaptiveNodeController:
+    """Decides how many batches to keep submitted and how large to make them.
+
+    The controller compares the median time that recent batches waited in
+    the scheduler's queue with the median time that batches ran. Batch run
+    times default to the walltime until one completes.
+
+    - If batches start quickly, it allows one more concurrent batch, up to
+      max_nodes_limit.
+    - If the queue backs up, it allows one fewer concurrent batch and
+      doubles the batch size, up to max_batch_size, so that the same work
+      runs in fewer, larger batches.
+
+    Each decision requires a new observation since the last one so that
+    adjustments do not compound before their effect is visible. Every
+    decision is recorded as an event.
+
+    """
+    def __init__(self, source, max_nodes, per_node_batch_size, walltime_s,
+                 max_nodes_limit=None, max_batch_size=None,
+                 low_wait_ratio=DEFAULT_LOW_WAIT_RATIO,
+                 high_wait_ratio=DEFAULT_HIGH_WAIT_RATIO,
+                 window_size=DEFAULT_WINDOW_SIZE):
+        """
+        Parameters
+        ----------
+        source : str
+            Source of the events.
+        max_nodes : int
+            Initial number of concurrent batches.
+        per_node_batch_size : int
+            Initial batch size. Batches never get smaller than this.
+        walltime_s : float
+            Run duration to assume until a batch completes.
+        max_nodes_limit : int | None
+            Upper bound on concurrent batches; defaults to twice max_nodes.
+        max_batch_size : int | None
+            Upper bound on the batch size; defaults to four times
+            per_node_batch_size.
+        low_wait_ratio : float
+            Add a node if the queue wait is below this fraction of the run
+            duration.
+        high_wait_ratio : float
+            Consolidate batches if the queue wait is above this fraction of
+            the run duration.
+        window_size : int
+            Number of recent observations to consider.
+
+        """
+        if max_nodes_limit is None:
+            max_nodes_limit = max_nodes * 2
+        if max_batch_size is None:
+            max_batch_size = per_node_batch_size * DEFAULT_MAX_BATCH_SIZE_FACTOR
+        if max_nodes_limit < max_nodes:
+            raise InvalidParameter(
+                f"max_nodes_limit={max_nodes_limit} is less than "
+                f"max_nodes={max_nodes}")
+        if not 0 <= low_wait_ratio < high_wait_ratio:
+            raise InvalidParameter(
+                f"invalid wait ratios: low={low_wait_ratio} "
+                f"high={high_wait_ratio}")
+
+        self._source = source
+        self._max_nodes = max_nodes
+        self._per_node_batch_size = per_node_batch_size
+        self._walltime_s = walltime_s
+        self._max_nodes_limit = max_nodes_limit
+        self._min_batch_size = per_node_batch_size
+        self._max_batch_size = max_batch_size
+        self._low_wait_ratio = low_wait_ratio
+        self._high_wait_ratio = high_wait_ratio
+        self._queue_waits = deque(maxlen=window_size)
+        self._run_durations = deque(maxlen=window_size)
+        self._has_new_observation = False
+        self._num_decisions = 0
+
+    @property
+    def max_nodes(self):
+        """Return the number of batches to keep submitted."""
+        return self._max_nodes
+
+    @property
+    def num_decisions(self):
+        """Return the number of adjustments made."""
+        return self._num_decisions
+
+    @property
+    def per_node_batch_size(self):
+        """Return the number of jobs to put in each batch."""
+        return self._per_node_batch_size
+
+    def record_queue_wait(self, queue_wait_s):
+        """Record the time that a batch waited before it started running."""
+        self._queue_waits.append(queue_wait_s)
+        self._has_new_observation = True
+
+    def record_run_duration(self, run_duration_s):
+        """Record the time that a batch ran."""
+        self._run_durations.append(run_duration_s)
+        self._has_new_observation = True
+
+    def update(self, has_waiting_jobs):
+        """Adjust the node count and batch size from recent observations.
+
+        Parameters
+        ----------
+        has_waiting_jobs : bool
+            True if jobs are ready but cannot be submitted because all
+            allowed batches are outstanding. Concurrency is only raised in
+            that case.
+
+        Returns
+        -------
+        bool
+            True if anything changed.
+
+        """
+        if not self._has_new_observation or not self._queue_waits:
+            return False
+        self._has_new_observation = False
+
+        queue_wait_s = statistics.median(self._queue_waits)
+        if self._run_durations:
+            run_duration_s = statistics.median(self._run_durations)
+        else:
+            run_duration_s = self._walltime_s
+        ratio = queue_wait_s / run_duration_s if run_duration_s > 0 else 0
+
+        max_nodes = self._max_nodes
+        batch_size = self._per_node_batch_size
+        if ratio >= self._high_wait_ratio:
+            reason = "queue is backed up"
+            max_nodes = max(1, max_nodes - 1)
+            batch_size = min(batch_size * 2, self._max_batch_size)
+        elif ratio <= self._low_wait_ratio and has_waiting_jobs:
+            reason = "batches start quickly"
+            if batch_size > self._min_batch_size:
+                # Undo consolidation before adding nodes.
+                batch_size = max(batch_size // 2, self._min_batch_size)
+            max_nodes = min(max_nodes + 1, self._max_nodes_limit)
+        else:
+            return False
+
+        if max_nodes == self._max_nodes and \
+                batch_size == self._per_node_batch_size:
+            return False
+
+        logger.info("Adjust max_nodes from %s to %s and per_node_batch_size "
+                    "from %s to %s because the %s: queue_wait=%s s "
+                    "run_duration=%s s", self._max_nodes, max_nodes,
+                    self._per_node_batch_size, batch_size, reason,
+                    queue_wait_s, run_duration_s)
+        event = StructuredLogEvent(
+            source=self._source,
+            category=EVENT_CATEGORY_HPC,
+            name=EVENT_NAME_HPC_ADAPTIVE_DECISION,
+            message=f"Adjusted HPC concurrency because the {reason}",
+            old_max_nodes=self._max_nodes,
+            new_max_nodes=max_nodes,
+            old_per_node_batch_size=self._per_node_batch_size,
+            new_per_node_batch_size=batch_size,
+            median_queue_wait_s=queue_wait_s,
+            median_run_duration_s=run_duration_s,
+        )
+        log_event(event)
+        self._max_nodes = max_nodes
+        self._per_node_batch_size = batch_size
+        self._num_decisions += 1
+        return True
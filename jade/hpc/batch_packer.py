@@ -0,0 +1,181 @@
+"""Packs jobs into HPC batches by their expected runtimes."""
+
+import heapq
+import logging
+
+from jade.exceptions import InvalidParameter
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAFETY_MARGIN = 0.1
+
+
+class WalltimeBatchPacker:
+    """Packs jobs into batches that are predicted to finish within the
+    walltime.
+
+    Runtimes come from a RuntimeHistory. Jobs are assigned in order of
+    decreasing runtime (longest-processing-time first). Each job goes to the
+    first batch whose predicted duration stays within the usable walltime,
+    where a batch's predicted duration is the longest load of its workers
+    when each job runs on the least-loaded worker.
+
+    """
+    def __init__(self, history, walltime_s, num_workers,
+                 safety_margin=DEFAULT_SAFETY_MARGIN, fallback_runtime_s=None,
+                 max_jobs_per_batch=None):
+        """
+        Parameters
+        ----------
+        history : RuntimeHistory
+        walltime_s : float
+            Walltime of one node allocation.
+        num_workers : int
+            Number of jobs that a node runs in parallel.
+        safety_margin : float
+            Fraction of the walltime to leave unused.
+        fallback_runtime_s : float | None
+            Runtime to assume for jobs that are not in the history. Defaults
+            to the median runtime in the history.
+        max_jobs_per_batch : int | None
+            Limit the number of jobs in each batch.
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if there is no fallback runtime or if a parameter is out
+            of range.
+
+        """
+        if not 0 <= safety_margin < 1:
+            raise InvalidParameter(
+                f"safety_margin must be in [0, 1): {safety_margin}")
+        if num_workers < 1:
+            raise InvalidParameter(
+                f"num_workers must be at least 1: {num_workers}")
+        if fallback_runtime_s is None:
+            fallback_runtime_s = history.median_runtime
+            if fallback_runtime_s is None:
+                raise InvalidParameter(
+                    "fallback_runtime_s is required if the history is empty")
+
+        self._history = history
+        self._capacity_s = walltime_s * (1 - safety_margin)
+        self._num_workers = num_workers
+        self._fallback_runtime_s = fallback_runtime_s
+        self._max_jobs_per_batch = max_jobs_per_batch
+
+    @property
+    def max_jobs_per_batch(self):
+        """Return the maximum number of jobs in each batch."""
+        return self._max_jobs_per_batch
+
+    @max_jobs_per_batch.setter
+    def max_jobs_per_batch(self, max_jobs_per_batch):
+        self._max_jobs_per_batch = max_jobs_per_batch
+
+    @property
+    def capacity_s(self):
+        """Return the usable walltime of one batch in seconds."""
+        return self._capacity_s
+
+    def estimate_runtime(self, job):
+        """Return the expected runtime of the job.
+
+        Parameters
+        ----------
+        job : JobParametersInterface
+
+        Returns
+        -------
+        float
+
+        """
+        exec_time_s = self._history.get_runtime(job)
+        if exec_time_s is None:
+            return self._fallback_runtime_s
+        return exec_time_s
+
+    def pack(self, jobs):
+        """Pack jobs into batches.
+
+        Parameters
+        ----------
+        jobs : list
+            JobParametersInterface objects
+
+        Returns
+        -------
+        list
+            list of PackedBatch in the order in which they should be
+            submitted
+
+        """
+        estimates = sorted(
+            ((self.estimate_runtime(x), i, x) for i, x in enumerate(jobs)),
+            key=lambda x: (-x[0], x[1]),
+        )
+        batches = []
+        for runtime, _, job in estimates:
+            for batch in batches:
+                if batch.can_add(runtime, self._capacity_s,
+                                 self._max_jobs_per_batch):
+                    batch.add(job, runtime)
+                    break
+            else:
+                if runtime > self._capacity_s:
+                    logger.warning(
+                        "Job %s is expected to run for %s seconds, longer "
+                        "than the usable walltime of %s seconds",
+                        job.name, runtime, self._capacity_s)
+                batch = PackedBatch(self._num_workers)
+                batch.add(job, runtime)
+                batches.append(batch)
+
+        logger.debug("Packed %s jobs into %s batches", len(jobs),
+                     len(batches))
+        return batches
+
+
+class PackedBatch:
+    """Jobs packed into one batch with the predicted load of each worker."""
+    def __init__(self, num_workers):
+        self._jobs = []
+        self._worker_loads = [0.0] * num_workers
+
+    def add(self, job, runtime):
+        """Add a job to the least-loaded worker."""
+        heapq.heapreplace(self._worker_loads, self._worker_loads[0] + runtime)
+        self._jobs.append(job)
+
+    def can_add(self, runtime, capacity_s, max_jobs=None):
+        """Return True if the job fits in the batch.
+
+        Returns
+        -------
+        bool
+
+        """
+        if max_jobs is not None and len(self._jobs) >= max_jobs:
+            return False
+        if self.predicted_duration_s > capacity_s:
+            # Do not add jobs to a batch that is expected to time out.
+            return False
+        return self._worker_loads[0] + runtime <= capacity_s
+
+    @property
+    def jobs(self):
+        """Return the jobs in the batch.
+
+        Returns
+        -------
+        list
+
+        """
+        return self._jobs
+
+    @property
+    def predicted_duration_s(self):
+        """Return the predicted duration of the batch in seconds."""
+        return max(self._worker_loads)
@@ -3,6 +3,11 @@
 from collections import namedtuple
 import enum
 
+import psutil
+
+from jade.common import ONE_GB
+from jade.exceptions import InvalidParameter
+
 
 class HpcJobStatus(enum.Enum):
     """Represents the status of an HPC job."""
@@ -28,3 +33,61 @@ class HpcType(enum.Enum):
     PBS = "PBS"
     SLURM = "SLURM"
     FAKE = "Fake"
+
+
+def get_system_memory_gb():
+    """Return the total memory of the system in GiB.
+
+    Returns
+    -------
+    float
+
+    """
+    return psutil.virtual_memory().total / ONE_GB
+
+
+def get_walltime_seconds(walltime):
+    """Convert an HPC walltime to seconds.
+
+    Parameters
+    ----------
+    walltime : int | str
+        Integers are minutes. Strings can be in any SLURM time format:
+        "minutes", "minutes:seconds", "hours:minutes:seconds", "days-hours",
+        "days-hours:minutes", or "days-hours:minutes:seconds".
+
+    Returns
+    -------
+    int
+
+    Raises
+    ------
+    InvalidParameter
+        Raised if the walltime is not in a supported format.
+
+    """
+    if isinstance(walltime, (int, float)):
+        return int(walltime * 60)
+
+    try:
+        days = 0
+        text = walltime.strip()
+        if "-" in text:
+            day_text, text = text.split("-", 1)
+            days = int(day_text)
+            fields = [int(x) for x in text.split(":")]
+            # After days the first field is hours.
+            fields += [0] * (3 - len(fields))
+            hours, minutes, seconds = fields
+        else:
+            fields = [int(x) for x in text.split(":")]
+            if len(fields) == 1:
+                hours, minutes, seconds = 0, fields[0], 0
+            elif len(fields) == 2:
+                hours, minutes, seconds = 0, fields[0], fields[1]
+            else:
+                hours, minutes, seconds = fields
+    except ValueError:
+        raise InvalidParameter(f"invalid walltime: {walltime}")
+
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
@@ -6,7 +6,7 @@ import os
 import tempfile
 
 from jade.enums import Status
-from jade.hpc.common import HpcJobStatus, HpcJobInfo
+from jade.hpc.common import HpcJobStatus, HpcJobInfo, get_system_memory_gb
 from jade.hpc.hpc_manager_interface import HpcManagerInterface
 from jade.utils.subprocess_manager import SubprocessManager
 from jade.utils.utils import create_script
@@ -30,22 +30,31 @@ class FakeManager(HpcManagerInterface):
     _REQUIRED_CONFIG_PARAMS = ()
 
     def __init__(self, _):
-        self._subprocess_mgr = None
+        # job ID: SubprocessManager for each submitted job
+        self._subprocess_mgrs = {}
+        self._last_job_id = None
 
     def cancel_job(self, job_id):
         return 0
 
     def check_status(self, name=None, job_id=None):
-        if self._subprocess_mgr is None:
-            status = HpcJobInfo("", "", HpcJobStatus.NONE)
-        elif self._subprocess_mgr.in_progress():
-            status = HpcJobInfo("", "", HpcJobStatus.RUNNING)
-        else:
-            status = HpcJobInfo("", "", HpcJobStatus.COMPLETE)
-
+        if job_id is None:
+            job_id = self._last_job_id
+        status = HpcJobInfo("", "", self._get_status(job_id))
         logger.debug("status=%s", status)
         return status
 
+    def check_statuses(self):
+        return {x: self._get_status(x) for x in self._subprocess_mgrs}
+
+    def _get_status(self, job_id):
+        subprocess_mgr = self._subprocess_mgrs.get(job_id)
+        if subprocess_mgr is None:
+            return HpcJobStatus.NONE
+        if subprocess_mgr.in_progress():
+            return HpcJobStatus.RUNNING
+        return HpcJobStatus.COMPLETE
+
     def check_storage_configuration(self):
         pass
 
@@ -65,6 +74,9 @@ class FakeManager(HpcManagerInterface):
     def get_config(self):
         return {"hpc": {}}
 
+    def get_allocation_end_time(self):
+        return None
+
     def get_local_scratch(self):
         for envvar in ("TMP", "TEMP"):
             tmpdir = os.environ.get(envvar)
@@ -72,6 +84,10 @@ class FakeManager(HpcManagerInterface):
                 return tmpdir
         return "."
 
+    @staticmethod
+    def get_memory_gb():
+        return get_system_memory_gb()
+
     @staticmethod
     def get_num_cpus():
         return multiprocessing.cpu_count()
@@ -86,7 +102,9 @@ class FakeManager(HpcManagerInterface):
         pass
 
     def submit(self, filename):
-        self._subprocess_mgr = SubprocessManager()
-        self._subprocess_mgr.run(filename)
-        job_id = "1234"
+        subprocess_mgr = SubprocessManager()
+        subprocess_mgr.run(filename)
+        job_id = str(1234 + len(self._subprocess_mgrs))
+        self._subprocess_mgrs[job_id] = subprocess_mgr
+        self._last_job_id = job_id
         return Status.GOOD, job_id, None
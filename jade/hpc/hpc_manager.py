@@ -15,13 +15,39 @@ from jade.hpc.slurm_manager import SlurmManager
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_STATUS_TTL = 30
+
 
 class HpcManager:
-    """Manages HPC job submission and monitoring."""
-    def __init__(self, config_file, output):
+    """Manages HPC job submission and monitoring.
+
+    Status checks by job ID are served from a cache of all of the user's
+    jobs. The cache is refreshed with one scheduler command when it is older
+    than status_ttl seconds, so one HpcManager can track many jobs without
+    issuing one command per job.
+
+    """
+    def __init__(self, config_file, output, status_ttl=DEFAULT_STATUS_TTL):
+        """
+        Parameters
+        ----------
+        config_file : str | dict
+            HPC config
+        output : str
+            Output directory
+        status_ttl : float
+            Seconds for which cached job statuses are valid.
+
+        """
         self._intf, self._hpc_type = self._create_hpc_manager(config_file)
         self._output = output
         self._num_in_progress = 0
+        self._status_ttl = status_ttl
+        self._statuses = {}
+        self._statuses_time = None
+        # job ID: submission time for jobs submitted by this instance
+        self._submit_times = {}
+        self._num_scheduler_commands = 0
 
         logger.debug("Constructed HpcManager with output=%s", output)
 
@@ -39,6 +65,7 @@ class HpcManager:
 
         """
         ret = self._intf.cancel_job(job_id)
+        self._num_scheduler_commands += 1
         if ret == 0:
             logger.info("Successfully cancelled job ID %s", job_id)
         else:
@@ -66,10 +93,53 @@ class HpcManager:
            (name is not None and job_id is not None):
             raise InvalidParameter("exactly one of name / job_id must be set")
 
+        if job_id is not None:
+            return self._get_cached_status(job_id)
+
         info = self._intf.check_status(name=name, job_id=job_id)
+        self._num_scheduler_commands += 1
         logger.debug("info=%s", info)
         return info.status
 
+    def _get_cached_status(self, job_id):
+        now = time.time()
+        if self._statuses_time is None or \
+                now - self._statuses_time >= self._status_ttl:
+            self.refresh_statuses()
+
+        status = self._statuses.get(job_id)
+        if status is not None:
+            return status
+
+        # The ID of a job array task is <array job ID>_<task index>.
+        submit_time = self._submit_times.get(str(job_id).split("_")[0])
+        if submit_time is not None and submit_time >= self._statuses_time:
+            # The job was submitted after the last refresh.
+            return HpcJobStatus.QUEUED
+
+        return HpcJobStatus.NONE
+
+    def refresh_statuses(self):
+        """Refresh the statuses of all of the user's jobs with one scheduler
+        command.
+
+        """
+        self._statuses = self._intf.check_statuses()
+        self._statuses_time = time.time()
+        self._num_scheduler_commands += 1
+        logger.debug("Refreshed statuses of %s jobs", len(self._statuses))
+
+    @property
+    def num_scheduler_commands(self):
+        """Return the number of commands sent to the scheduler.
+
+        Returns
+        -------
+        int
+
+        """
+        return self._num_scheduler_commands
+
     def get_hpc_config(self):
         """Returns the HPC config parameters.
 
@@ -93,7 +163,7 @@ class HpcManager:
         return self._hpc_type
 
     def submit(self, directory, name, script, wait=False,
-               keep_submission_script=True):
+               keep_submission_script=True, array=None, num_nodes=1):
         """Submits scripts to the queue for execution.
 
         Parameters
@@ -108,6 +178,12 @@ class HpcManager:
             Wait for execution to complete.
         keep_submission_script : bool
             Do not delete the submission script.
+        array : str | None
+            If set, submit a job array with this index specification, such
+            as 1-100%10. Only supported on SLURM.
+        num_nodes : int
+            Number of nodes to allocate. The script runs once per node.
+            Values greater than 1 are only supported on SLURM.
 
         Returns
         -------
@@ -115,6 +191,17 @@ class HpcManager:
             (job_id, submission status)
 
         """
+        kwargs = {}
+        if array is not None:
+            kwargs["array"] = array
+        if num_nodes != 1:
+            kwargs["num_nodes"] = num_nodes
+        if kwargs and self._hpc_type != HpcType.SLURM:
+            raise InvalidParameter(
+                "job arrays and multi-node allocations are not supported on "
+                f"{self._hpc_type.value}"
+            )
+
         self._intf.check_storage_configuration()
 
         # TODO: enable this logic if batches have unique names.
@@ -127,11 +214,13 @@ class HpcManager:
 
         filename = os.path.join(directory, name + ".sh")
         self._intf.create_submission_script(name, script, filename,
-                                            self._output)
+                                            self._output, **kwargs)
         logger.info("Created submission script %s", filename)
         result, job_id, err = self._intf.submit(filename)
+        self._num_scheduler_commands += 1
 
         if result == Status.GOOD:
+            self._submit_times[job_id] = time.time()
             logger.info("job '%s' with ID=%s submitted successfully", name,
                         job_id)
             if not keep_submission_script:
@@ -177,6 +266,7 @@ class HpcManager:
         while status not in (HpcJobStatus.COMPLETE, HpcJobStatus.NONE):
             time.sleep(5)
             job_info = self._intf.check_status(job_id=job_id)
+            self._num_scheduler_commands += 1
             logger.debug("job_info=%s", job_info)
             if job_info.status != status:
                 logger.info("Status of job ID %s changed to %s",
@@ -77,6 +77,18 @@ class HpcManagerInterface(abc.ABC):
 
         """
 
+    @abc.abstractmethod
+    def check_statuses(self):
+        """Check the statuses of all of the user's jobs with one command.
+
+        Returns
+        -------
+        dict
+            Maps job ID to HpcJobStatus. Jobs that the scheduler no longer
+            reports are not included.
+
+        """
+
     @abc.abstractmethod
     def check_storage_configuration(self):
         """Checks if the storage configuration is appropriate for execution.
@@ -126,6 +138,18 @@ class HpcManagerInterface(abc.ABC):
 
         """
 
+    @abc.abstractmethod
+    def get_allocation_end_time(self):
+        """Return the time at which the current node allocation ends.
+
+        Returns
+        -------
+        float | None
+            Seconds since the epoch, or None if the allocation has no end
+            time or it cannot be determined.
+
+        """
+
     @abc.abstractmethod
     def get_config(self):
         """Get HPC configuration parameters.
@@ -146,6 +170,16 @@ class HpcManagerInterface(abc.ABC):
 
         """
 
+    @abc.abstractmethod
+    def get_memory_gb(self):
+        """Return the memory in GiB available to jobs on the node.
+
+        Returns
+        -------
+        float
+
+        """
+
     @abc.abstractmethod
     def get_num_cpus(self):
         """Return the number of CPUs in the system.
@@ -1,27 +1,52 @@
 """Controls submission of jobs to HPC nodes."""
 
+from collections import defaultdict, deque
 import copy
+import glob
 import logging
+import math
 import os
 import shutil
 import time
 
+from jade.common import JOB_STORE_DIR, RUNTIME_ESTIMATES_FILE, \
+    SHARED_JOB_QUEUE_FILE, get_drained_jobs_filename
 from jade.enums import Status
 from jade.events import StructuredLogEvent, EVENT_CATEGORY_HPC, \
     EVENT_NAME_HPC_SUBMIT, EVENT_NAME_HPC_JOB_ASSIGNED, \
-    EVENT_NAME_HPC_JOB_STATE_CHANGE
-from jade.exceptions import ExecutionError
-from jade.hpc.common import HpcJobStatus
+    EVENT_NAME_HPC_JOB_STATE_CHANGE, EVENT_NAME_HPC_BATCH_DURATION, \
+    EVENT_NAME_HPC_REQUEUE_DRAINED_JOBS, EVENT_NAME_HPC_JOBS_LOST
+from jade.exceptions import ExecutionError, InvalidParameter
+from jade.hpc.adaptive_node_controller import AdaptiveNodeController
+from jade.hpc.batch_packer import WalltimeBatchPacker, DEFAULT_SAFETY_MARGIN
+from jade.hpc.common import HpcJobStatus, HpcType, get_walltime_seconds
 from jade.hpc.hpc_manager import HpcManager
 from jade.jobs.async_job_interface import AsyncJobInterface
+from jade.jobs.job_configuration import ConfigSerializeOptions
+from jade.jobs.job_dependency_graph import JobDependencyGraph
+from jade.jobs.runtime_history import RuntimeHistory, \
+    create_runtime_estimator
+from jade.jobs.scheduling_policy import SchedulingPolicyType, \
+    create_scheduling_policy
 from jade.jobs.job_queue import JobQueue
+from jade.jobs.job_store import JobStore
 from jade.jobs.results_aggregator import ResultsAggregatorSummary
+from jade.jobs.shared_job_queue import SharedJobQueue
 from jade.loggers import log_event
 from jade.utils.timing_utils import timed_debug
-from jade.utils.utils import dump_data, create_script, ExtendedJSONEncoder
+from jade.utils.utils import dump_data, create_script, load_data, \
+    ExtendedJSONEncoder
 
 logger = logging.getLogger(__name__)
 
+# Slurm's default MaxArraySize is 1001.
+DEFAULT_MAX_ARRAY_SIZE = 1000
+DEFAULT_MAX_LOST_JOB_RETRIES = 2
+# A scheduling policy requires all jobs to be held in memory.
+MAX_SCHEDULED_JOBS = 100000
+# Number of batches' worth of ready jobs that are packed by runtime at once
+PACKING_WINDOW_BATCHES = 10
+
 
 class HpcSubmitter:
     """Submits batches of jobs to HPC. Manages job ordering."""
@@ -29,122 +54,884 @@ class HpcSubmitter:
         self._config = config
         self._config_file = config_file
         self._hpc_config_file = hpc_config_file
-        self._base_config = config.serialize()
+        self._base_config = config.serialize(
+            ConfigSerializeOptions.NO_JOB_INFO)
         self._name = name
         self._batch_index = 1
+        self._output = None
+        self._options = None
+        self._job_store_dir = None
+        self._hpc_mgr = None
+        self._batch_packer = None
+        self._controller = None
+        self._runtime_estimates_file = None
+        # Batches packed from ready jobs that have not been submitted.
+        self._packed_batches = deque()
+        # Jobs of the last batch of a pack, held back to be packed with the
+        # next ready jobs.
+        self._held_jobs = []
+        # Submitters whose queue waits and run durations have not been
+        # reported to the adaptive controller.
+        self._waiting_submitters = []
+        self._running_submitters = []
+        # Submitter name: (submitter, job names) for outstanding submitters
+        self._submitted_jobs = {}
+        # Job name: name of the last submitter that was given the job
+        self._job_submitters = {}
+        self._completed_submitters = []
+        # Job name: number of times that it was lost
+        self._num_lost = defaultdict(int)
         self._results_summary = ResultsAggregatorSummary(results_dir)
 
     @staticmethod
-    def _create_run_script(config_file, filename, num_processes, output, verbose):
+    def _create_run_script(config_file, filename, output, options,
+                           batch_index_offset=None,
+                           batch_index_var="SLURM_ARRAY_TASK_ID",
+                           shared_job_queue=None,
+                           runtime_estimates_file=None):
         text = ["#!/bin/bash"]
         if shutil.which("module") is not None:
             # Required for HPC systems.
             text.append("module load conda")
             text.append("conda activate jade")
+        if batch_index_offset is not None:
+            # Each array task or node runs the batch at its index.
+            text.append(
+                f"BATCH_INDEX=$(({batch_index_var} + {batch_index_offset}))"
+            )
 
         command = f"jade-internal run-jobs {config_file} " \
                   f"--output={output}"
-        if num_processes is not None:
-            command += f" --num-processes={num_processes}"
-        if verbose:
+        if options.num_processes is not None:
+            command += f" --num-processes={options.num_processes}"
+        if options.use_worker_pool:
+            command += " --worker-pool"
+            if options.max_jobs_per_worker is not None:
+                command += \
+                    f" --max-jobs-per-worker={options.max_jobs_per_worker}"
+        if shared_job_queue is not None:
+            command += f" --shared-job-queue={shared_job_queue}"
+        if options.retry_policy is not None:
+            command += " " + options.retry_policy.get_cli_options()
+        if options.speculation_threshold is not None:
+            command += \
+                f" --speculation-threshold={options.speculation_threshold}"
+        if options.scheduling_policy_type is not None:
+            command += " --scheduling-policy=" + \
+                options.scheduling_policy_type.value
+        if runtime_estimates_file is not None:
+            command += f" --runtime-estimates={runtime_estimates_file}"
+        if options.concurrency_bounds is not None:
+            command += " --autotune-concurrency {} {}".format(
+                *options.concurrency_bounds)
+        if options.verbose:
             command += " --verbose"
 
         text.append(command)
         create_script(filename, "\n".join(text))
 
-    def _make_async_submitter(self, jobs, num_processes, output, verbose):
+    def _write_batch_config(self, job_names):
+        # The batch config references the job store instead of embedding the
+        # jobs.
         config = copy.copy(self._base_config)
-        config["jobs"] = jobs
-        suffix = f"_batch_{self._batch_index}"
+        config["jobs_directory"] = self._job_store_dir
+        config["job_names"] = job_names
+        batch_index = self._batch_index
         self._batch_index += 1
-        new_config_file = self._config_file.replace(".json", f"{suffix}.json")
+        new_config_file = self._get_batch_config_filename(batch_index)
         dump_data(config, new_config_file, cls=ExtendedJSONEncoder)
         logger.info("Created split config file %s with %s jobs",
-                    new_config_file, len(config["jobs"]))
+                    new_config_file, len(config["job_names"]))
+        return batch_index
 
-        run_script = os.path.join(output, f"run{suffix}.sh")
+    def _get_batch_config_filename(self, batch_index):
+        base = self._config_file
+        if base.endswith(".gz"):
+            base = base[:-len(".gz")]
+        return os.path.splitext(base)[0] + f"_batch_{batch_index}.json"
+
+    def _create_batch_run_script(self, config_file, suffix, **kwargs):
+        run_script = os.path.join(self._output, f"run{suffix}.sh")
         self._create_run_script(
-            new_config_file, run_script, num_processes, output, verbose
+            config_file, run_script, self._output, self._options,
+            runtime_estimates_file=self._runtime_estimates_file, **kwargs
+        )
+        return run_script
+
+    def _make_async_submitter(self, job_names, shared_job_queue=None,
+                              predicted_duration_s=None):
+        batch_index = self._write_batch_config(job_names)
+        suffix = f"_batch_{batch_index}"
+        run_script = self._create_batch_run_script(
+            self._get_batch_config_filename(batch_index), suffix,
+            shared_job_queue=shared_job_queue,
+        )
+
+        name = self._name + suffix
+        async_submitter = AsyncHpcSubmitter(
+            self._hpc_mgr, run_script, name, self._output,
+            predicted_duration_s=predicted_duration_s,
+        )
+        if shared_job_queue is None:
+            self._record_submitted_jobs(async_submitter, job_names)
+        return async_submitter
+
+    def _make_async_array_submitter(self, batches):
+        indexes = [self._write_batch_config(x.list_job_names())
+                   for x in batches]
+        first, last = indexes[0], indexes[-1]
+        suffix = f"_batches_{first}_{last}"
+        run_script = self._create_batch_run_script(
+            self._get_batch_config_filename("${BATCH_INDEX}"), suffix,
+            batch_index_offset=first - 1,
+        )
+
+        name = self._name + suffix
+        # The array's task limit controls the number of nodes.
+        async_submitter = AsyncHpcArraySubmitter(
+            self._hpc_mgr, run_script, name, self._output, len(batches),
+            self._options.max_nodes,
+            predicted_duration_s=_get_predicted_duration(batches),
+        )
+        self._record_submitted_jobs(async_submitter, _list_job_names(batches))
+        return async_submitter
+
+    def _make_async_allocation_submitter(self, batches):
+        indexes = [self._write_batch_config(x.list_job_names())
+                   for x in batches]
+        first, last = indexes[0], indexes[-1]
+        suffix = f"_batches_{first}_{last}"
+        run_script = self._create_batch_run_script(
+            self._get_batch_config_filename("${BATCH_INDEX}"), suffix,
+            batch_index_offset=first,
+            batch_index_var="SLURM_PROCID",
         )
 
-        hpc_mgr = HpcManager(self._hpc_config_file, output)
         name = self._name + suffix
-        return AsyncHpcSubmitter(hpc_mgr, run_script, name, output)
+        async_submitter = AsyncHpcSubmitter(
+            self._hpc_mgr, run_script, name, self._output,
+            num_nodes=len(batches),
+            predicted_duration_s=_get_predicted_duration(batches),
+        )
+        self._record_submitted_jobs(async_submitter, _list_job_names(batches))
+        return async_submitter
 
     @timed_debug
-    def run(self, output, queue_depth, per_node_batch_size, num_processes,
-            poll_interval=60, try_add_blocked_jobs=False, verbose=False):
-        """Run all jobs defined in the configuration on the HPC."""
-        queue = JobQueue(queue_depth, poll_interval=poll_interval)
-        jobs = list(self._config.iter_jobs())
-        while jobs:
-            self._update_completed_jobs(jobs)
-            batch = _BatchJobs()
-            jobs_to_pop = []
-            num_blocked = 0
-            for i, job in enumerate(jobs):
-                if batch.is_job_blocked(job, try_add_blocked_jobs):
-                    num_blocked += 1
-                else:
-                    batch.append(job)
-                    jobs_to_pop.append(i)
-                    if batch.num_jobs >= per_node_batch_size:
-                        break
-
-            if batch.num_jobs > 0:
-                async_submitter = self._make_async_submitter(
-                    batch.serialize(),
-                    num_processes,
-                    output,
-                    verbose,
-                )
-                queue.submit(async_submitter)
-
-                # It might be better to delay submission for a limited number
-                # of rounds if there are blocked jobs and the batch isn't full.
-                # We can look at these events on our runs to see how this
-                # logic is working with our jobs.
-                event = StructuredLogEvent(
-                    source=self._name,
-                    category=EVENT_CATEGORY_HPC,
-                    name=EVENT_NAME_HPC_SUBMIT,
-                    message="Submitted HPC batch",
-                    batch_size=batch.num_jobs,
-                    num_blocked=num_blocked,
-                    per_node_batch_size=per_node_batch_size,
+    def run(self, output, options):
+        """Run all jobs defined in the configuration on the HPC.
+
+        All batches share one HpcManager, which checks their statuses with
+        one scheduler command per options.status_ttl seconds.
+
+        Jobs are submitted in one of these modes:
+
+        - use_job_arrays: All batches that are ready are submitted together
+          as one job array of up to max_array_size tasks, of which at most
+          max_nodes run at once. The next array is submitted when the
+          current one completes.
+        - nodes_per_allocation greater than 1: Up to that many batches are
+          submitted together in one multi-node allocation that runs one
+          batch per node. max_nodes still limits the total number of nodes.
+        - use_shared_queue: Jobs are not partitioned into batches. Up to
+          max_nodes nodes, one per per_node_batch_size jobs, pull small
+          chunks of jobs from a shared queue file until it is empty.
+        - Otherwise, each batch is submitted to its own node.
+
+        If runtime_history is set, batches are packed by the jobs' previous
+        execution times so that each is predicted to finish within the
+        walltime minus walltime_safety_margin, with at most
+        per_node_batch_size jobs. Nodes are assumed to run num_processes,
+        or else cpus_per_node, jobs in parallel. Jobs without history are
+        assumed to run for fallback_runtime_s, which defaults to the median
+        of the history. Blocked jobs are not added to packed batches.
+
+        If adaptive_nodes is True, max_nodes and per_node_batch_size are
+        starting values. They are adjusted from the observed queue waits and
+        run durations of submitted batches; see AdaptiveNodeController.
+        max_nodes never exceeds max_nodes_limit.
+
+        Jobs that a batch did not run because its allocation was about to end
+        are submitted again in new batches.
+
+        Jobs that did not produce a result when their batch completed, such as
+        because the node failed or the batch hit its walltime, are lost. They
+        are submitted again in new batches up to max_lost_job_retries times.
+        Beyond that they are reported as lost and jobs that they block are
+        allowed to run.
+
+        If scheduling_policy_type is set, batches are formed from ready jobs
+        in the policy's order and nodes run their jobs in the same order.
+        Expected runtimes come from runtime_history. They are written to
+        RUNTIME_ESTIMATES_FILE in output for the nodes. Unlike FIFO
+        submission, which reads jobs from the config as batches need them,
+        all jobs are added to the dependency graph up front so that the
+        policy can order them. Configs with more than MAX_SCHEDULED_JOBS jobs
+        are rejected.
+
+        The options that apply to nodes, such as retry_policy and
+        concurrency_bounds, are passed to each node's run-jobs command.
+
+        Parameters
+        ----------
+        output : str
+            Output directory
+        options : SubmissionOptions
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if the options cannot be combined or do not apply to the
+            HPC.
+
+        """
+        if options.scheduling_policy_type == SchedulingPolicyType.FIFO:
+            options = options._replace(scheduling_policy_type=None)
+        if options.status_ttl is None:
+            options = options._replace(status_ttl=options.poll_interval)
+        self._output = output
+        self._options = options
+        self._hpc_mgr = HpcManager(self._hpc_config_file, output,
+                                   status_ttl=options.status_ttl)
+        self._check_options()
+        if options.runtime_history is not None:
+            self._batch_packer = self._create_batch_packer()
+        if options.adaptive_nodes:
+            self._controller = self._create_adaptive_controller()
+        self._job_store_dir = os.path.abspath(
+            os.path.join(output, JOB_STORE_DIR))
+        JobStore.create(self._job_store_dir, self._config.iter_jobs()).close()
+
+        if options.use_shared_queue:
+            self._run_shared_queue()
+        else:
+            self._run_batches()
+
+        logger.info("Sent %s commands to the HPC scheduler",
+                    self._hpc_mgr.num_scheduler_commands)
+        if self._controller is not None:
+            logger.info("Made %s adaptive adjustments; final max_nodes=%s "
+                        "per_node_batch_size=%s",
+                        self._controller.num_decisions,
+                        self._controller.max_nodes,
+                        self._controller.per_node_batch_size)
+
+    def _check_options(self):
+        options = self._options
+        hpc_type = self._hpc_mgr.hpc_type
+        if options.use_job_arrays and hpc_type != HpcType.SLURM:
+            raise InvalidParameter(
+                f"job arrays are only supported on SLURM: {hpc_type.value}")
+        if options.nodes_per_allocation < 1:
+            raise InvalidParameter(
+                "nodes_per_allocation must be at least 1: "
+                f"{options.nodes_per_allocation}"
+            )
+        if options.use_job_arrays and options.nodes_per_allocation > 1:
+            raise InvalidParameter(
+                "job arrays and multi-node allocations are mutually exclusive")
+        if options.nodes_per_allocation > 1 and hpc_type != HpcType.SLURM:
+            raise InvalidParameter(
+                "multi-node allocations are only supported on SLURM: "
+                f"{hpc_type.value}"
+            )
+        if options.use_shared_queue and \
+                (options.use_job_arrays or options.nodes_per_allocation > 1):
+            raise InvalidParameter(
+                "a shared job queue cannot be combined with job arrays or "
+                "multi-node allocations"
+            )
+        if options.scheduling_policy_type is not None:
+            if options.use_shared_queue:
+                raise InvalidParameter(
+                    "scheduling policies do not apply to a shared job queue")
+            num_jobs = self._config.get_num_jobs()
+            if num_jobs > MAX_SCHEDULED_JOBS:
+                raise InvalidParameter(
+                    "scheduling policy "
+                    f"{options.scheduling_policy_type.value} requires all "
+                    f"{num_jobs} jobs in memory; the limit is "
+                    f"{MAX_SCHEDULED_JOBS}. Use the fifo policy."
                 )
-                log_event(event)
-                for i in reversed(jobs_to_pop):
-                    jobs.pop(i)
-            else:
-                logger.debug("No jobs are ready for submission")
+        if options.runtime_history is not None and options.use_shared_queue:
+            raise InvalidParameter(
+                "runtime history does not apply to a shared job queue")
+        if options.adaptive_nodes and (
+                options.use_job_arrays or options.nodes_per_allocation > 1 or
+                options.use_shared_queue):
+            raise InvalidParameter(
+                "adaptive nodes cannot be combined with job arrays, "
+                "multi-node allocations, or a shared job queue"
+            )
 
-            logger.debug("num_submitted=%s num_blocked=%s",
-                         batch.num_jobs, num_blocked)
+    def _run_shared_queue(self):
+        """Submit nodes that pull jobs from a shared queue file until every
+        job has completed or been abandoned."""
+        options = self._options
+        queue = JobQueue(options.max_nodes,
+                         poll_interval=options.poll_interval,
+                         completion_func=self._completed_submitters.extend)
+        filename = os.path.abspath(
+            os.path.join(self._output, SHARED_JOB_QUEUE_FILE))
+        shared_queue = SharedJobQueue.create(
+            filename, self._config.iter_jobs())
+        num_jobs = self._config.get_num_jobs()
+        while num_jobs > 0:
+            self._submit_shared_queue_nodes(queue, filename, num_jobs)
+            queue.wait()
+            # Drained jobs were released back to the shared queue. Other
+            # nodes may have run them already.
+            num_jobs = 0
+            drained_jobs = self._requeue_drained_jobs(self._output)
+            lost_jobs = self._release_lost_shared_jobs(
+                shared_queue, options.max_lost_job_retries)
+            if drained_jobs or lost_jobs:
+                num_jobs = shared_queue.get_summary()["num_pending"]
 
-            if batch.num_jobs > 0 and not queue.is_full():
+    def _run_batches(self):
+        """Submit batches of ready jobs until every job has completed or been
+        abandoned."""
+        options = self._options
+        queue_depth = options.max_nodes
+        if options.use_job_arrays:
+            # The array's task limit controls the number of nodes.
+            queue_depth = 1
+            submit_func = self._submit_array
+        elif options.nodes_per_allocation > 1:
+            queue_depth = max(1, queue_depth // options.nodes_per_allocation)
+            submit_func = self._submit_allocation
+        else:
+            submit_func = self._submit_batch
+        queue = JobQueue(queue_depth, poll_interval=options.poll_interval,
+                         completion_func=self._completed_submitters.extend)
+
+        graph, jobs, has_more_jobs = self._create_graph()
+        per_node_batch_size = options.per_node_batch_size
+        while True:
+            if has_more_jobs:
+                has_more_jobs = self._fill_graph(
+                    graph, jobs, per_node_batch_size)
+            self._requeue_drained_jobs(self._output, graph=graph)
+            self._update_completed_jobs(graph)
+            self._requeue_lost_jobs(graph, options.max_lost_job_retries)
+            if graph.num_unscheduled == 0 and not has_more_jobs and \
+                    not self._packed_batches and not self._held_jobs and \
+                    queue.num_outstanding_jobs == 0:
+                # Batches that are still running could drain or lose jobs.
+                break
+            if self._controller is not None:
+                per_node_batch_size = self._update_controller(queue, graph)
+            is_submitted, has_more_jobs = submit_func(
+                queue, graph, jobs, has_more_jobs, per_node_batch_size)
+            if is_submitted and not queue.is_full():
                 # Keep submitting.
                 continue
 
-            # TODO: this will cause up to <queue_depth> slurm status commands
-            # every poll.  We could send one command, get all statuses, and
-            # share it among the submitters.
+            # The submitters share one cached status query.
             queue.process_queue()
-            time.sleep(poll_interval)
+            time.sleep(options.poll_interval)
 
         queue.wait()
 
-    def _is_job_complete(self, job_name):
-        return job_name in self._results_summary.completed_jobs
+    def _create_graph(self):
+        """Create the dependency graph that batches are formed from.
+
+        Returns
+        -------
+        tuple
+            (JobDependencyGraph, iterator, bool) The iterator yields the jobs
+            that are not in the graph yet; the bool is False if there are
+            none.
 
-    def _update_completed_jobs(self, jobs):
-        self._results_summary.update_completed_jobs()
+        """
+        jobs = self._config.iter_jobs()
+        policy_type = self._options.scheduling_policy_type
+        if policy_type is None:
+            # Jobs are added to the graph as batches need them so that large
+            # configs do not have to be held in memory.
+            return JobDependencyGraph(), jobs, True
+
+        estimates = self._write_runtime_estimates(
+            self._options.runtime_history)
+        policy = create_scheduling_policy(
+            policy_type, self._config.iter_jobs(), runtime_history=estimates,
+        )
+        graph = JobDependencyGraph(priority_func=policy.get_priority)
+        # Priorities only order the jobs in the graph.
         for job in jobs:
-            done_jobs = [
-                x for x in job.get_blocking_jobs() if self._is_job_complete(x)
+            graph.add_job(job)
+        return graph, jobs, False
+
+    def _create_adaptive_controller(self):
+        options = self._options
+        walltime = self._hpc_mgr.get_hpc_config()["hpc"]["walltime"]
+        return AdaptiveNodeController(
+            self._name, options.max_nodes, options.per_node_batch_size,
+            get_walltime_seconds(walltime),
+            max_nodes_limit=options.max_nodes_limit,
+        )
+
+    def _update_controller(self, queue, graph):
+        """Report batch starts and completions to the controller and apply
+        its decisions.
+
+        Returns
+        -------
+        int
+            per_node_batch_size to use for new batches
+
+        """
+        controller = self._controller
+        for submitter in list(self._waiting_submitters):
+            if submitter.queue_wait_s is not None:
+                controller.record_queue_wait(submitter.queue_wait_s)
+                self._waiting_submitters.remove(submitter)
+                self._running_submitters.append(submitter)
+            elif submitter.is_finished:
+                # It started and finished between two status checks.
+                self._waiting_submitters.remove(submitter)
+        for submitter in list(self._running_submitters):
+            if submitter.is_finished:
+                controller.record_run_duration(submitter.run_duration_s)
+                self._running_submitters.remove(submitter)
+
+        has_waiting_jobs = queue.is_full() and \
+            (graph.has_ready_jobs() or bool(self._packed_batches) or
+             bool(self._held_jobs))
+        if controller.update(has_waiting_jobs):
+            queue.max_queue_depth = controller.max_nodes
+            if self._batch_packer is not None:
+                self._batch_packer.max_jobs_per_batch = \
+                    controller.per_node_batch_size
+        return controller.per_node_batch_size
+
+    def _submit_shared_queue_nodes(self, queue, filename, num_jobs):
+        """Submit the nodes that pull num_jobs jobs from the shared job
+        queue."""
+        # Nodes read the jobs that they claim from the shared queue, so the
+        # batch configs do not list jobs.
+        per_node_batch_size = self._options.per_node_batch_size
+        num_nodes = min(self._options.max_nodes,
+                        math.ceil(num_jobs / per_node_batch_size))
+        for _ in range(num_nodes):
+            async_submitter = self._make_async_submitter(
+                [], shared_job_queue=filename)
+            queue.submit(async_submitter)
+
+        event = StructuredLogEvent(
+            source=self._name,
+            category=EVENT_CATEGORY_HPC,
+            name=EVENT_NAME_HPC_SUBMIT,
+            message="Submitted HPC nodes for shared job queue",
+            batch_size=num_jobs,
+            num_blocked=0,
+            per_node_batch_size=per_node_batch_size,
+            num_nodes=num_nodes,
+        )
+        log_event(event)
+
+    def _create_batches(self, graph, jobs, has_more_jobs, max_batches,
+                        per_node_batch_size):
+        """Create up to max_batches batches from the ready jobs.
+
+        Returns
+        -------
+        tuple
+            (list of _BatchJobs, bool) The bool is False if there are no
+            more jobs to add to the graph.
+
+        """
+        batches = []
+        while len(batches) < max_batches:
+            if has_more_jobs:
+                has_more_jobs = self._fill_graph(
+                    graph, jobs, per_node_batch_size)
+            batch = self._next_batch(graph, per_node_batch_size,
+                                     self._options.try_add_blocked_jobs,
+                                     has_more_jobs=has_more_jobs)
+            if batch.num_jobs == 0:
+                break
+            batches.append(batch)
+
+        return batches, has_more_jobs
+
+    def _submit_batch(self, queue, graph, jobs, has_more_jobs,
+                      per_node_batch_size):
+        """Submit the next batch of ready jobs to one node.
+
+        Returns
+        -------
+        tuple
+            (bool, bool) True if a batch was submitted and False if there
+            are no more jobs to add to the graph.
+
+        """
+        batch = self._next_batch(graph, per_node_batch_size,
+                                 self._options.try_add_blocked_jobs,
+                                 has_more_jobs=has_more_jobs)
+        num_blocked = graph.num_blocked
+        if batch.num_jobs > 0:
+            async_submitter = self._make_async_submitter(
+                batch.list_job_names(),
+                predicted_duration_s=batch.predicted_duration_s,
+            )
+            queue.submit(async_submitter)
+            if self._controller is not None:
+                self._waiting_submitters.append(async_submitter)
+
+            # It might be better to delay submission for a limited number
+            # of rounds if there are blocked jobs and the batch isn't full.
+            # We can look at these events on our runs to see how this
+            # logic is working with our jobs.
+            event = StructuredLogEvent(
+                source=self._name,
+                category=EVENT_CATEGORY_HPC,
+                name=EVENT_NAME_HPC_SUBMIT,
+                message="Submitted HPC batch",
+                batch_size=batch.num_jobs,
+                num_blocked=num_blocked,
+                per_node_batch_size=per_node_batch_size,
+                predicted_duration_s=batch.predicted_duration_s,
+            )
+            log_event(event)
+        else:
+            logger.debug("No jobs are ready for submission")
+
+        logger.debug("num_submitted=%s num_blocked=%s",
+                     batch.num_jobs, num_blocked)
+        return batch.num_jobs > 0, has_more_jobs
+
+    def _submit_array(self, queue, graph, jobs, has_more_jobs,
+                      per_node_batch_size):
+        """Submit all ready batches as one job array.
+
+        Returns
+        -------
+        tuple
+            (bool, bool) True if an array was submitted and False if there
+            are no more jobs to add to the graph.
+
+        """
+        if queue.is_full():
+            return False, has_more_jobs
+        batches, has_more_jobs = self._create_batches(
+            graph, jobs, has_more_jobs, self._options.max_array_size,
+            per_node_batch_size)
+        if not batches:
+            logger.debug("No jobs are ready for submission")
+            return False, has_more_jobs
+
+        async_submitter = self._make_async_array_submitter(batches)
+        queue.submit(async_submitter)
+        event = StructuredLogEvent(
+            source=self._name,
+            category=EVENT_CATEGORY_HPC,
+            name=EVENT_NAME_HPC_SUBMIT,
+            message="Submitted HPC job array",
+            batch_size=sum(x.num_jobs for x in batches),
+            num_blocked=graph.num_blocked,
+            per_node_batch_size=per_node_batch_size,
+            num_array_tasks=len(batches),
+        )
+        log_event(event)
+        return True, has_more_jobs
+
+    def _submit_allocation(self, queue, graph, jobs, has_more_jobs,
+                           per_node_batch_size):
+        """Submit up to nodes_per_allocation ready batches in one multi-node
+        allocation.
+
+        Returns
+        -------
+        tuple
+            (bool, bool) True if an allocation was submitted and False if
+            there are no more jobs to add to the graph.
+
+        """
+        if queue.is_full():
+            return False, has_more_jobs
+        batches, has_more_jobs = self._create_batches(
+            graph, jobs, has_more_jobs, self._options.nodes_per_allocation,
+            per_node_batch_size)
+        if not batches:
+            logger.debug("No jobs are ready for submission")
+            return False, has_more_jobs
+
+        async_submitter = self._make_async_allocation_submitter(batches)
+        queue.submit(async_submitter)
+        event = StructuredLogEvent(
+            source=self._name,
+            category=EVENT_CATEGORY_HPC,
+            name=EVENT_NAME_HPC_SUBMIT,
+            message="Submitted HPC multi-node allocation",
+            batch_size=sum(x.num_jobs for x in batches),
+            num_blocked=graph.num_blocked,
+            per_node_batch_size=per_node_batch_size,
+            num_nodes=len(batches),
+        )
+        log_event(event)
+        return True, has_more_jobs
+
+    def _write_runtime_estimates(self, runtime_history):
+        """Estimate the runtime of every job and write the estimates for the
+        nodes, which do not have the history.
+
+        Returns
+        -------
+        RuntimeHistory
+            Contains every job in the config.
+
+        """
+        get_runtime = create_runtime_estimator(runtime_history)
+        estimates = RuntimeHistory(times_by_name={
+            x.name: get_runtime(x) for x in self._config.iter_jobs()
+        })
+        self._runtime_estimates_file = os.path.join(
+            self._output, RUNTIME_ESTIMATES_FILE)
+        estimates.to_file(self._runtime_estimates_file)
+        logger.info("Wrote runtime estimates of %s jobs to %s",
+                    len(estimates), self._runtime_estimates_file)
+        return estimates
+
+    def _create_batch_packer(self):
+        options = self._options
+        num_workers = options.num_processes or options.cpus_per_node
+        if num_workers is None:
+            raise InvalidParameter(
+                "packing batches by runtime requires num_processes or "
+                "cpus_per_node")
+        walltime = self._hpc_mgr.get_hpc_config()["hpc"]["walltime"]
+        packer = WalltimeBatchPacker(
+            options.runtime_history,
+            get_walltime_seconds(walltime),
+            num_workers,
+            safety_margin=options.walltime_safety_margin,
+            fallback_runtime_s=options.fallback_runtime_s,
+            max_jobs_per_batch=options.per_node_batch_size,
+        )
+        logger.info("Pack batches into %s seconds per node with %s workers",
+                    packer.capacity_s, num_workers)
+        return packer
+
+    def _next_batch(self, graph, per_node_batch_size, try_add_blocked_jobs,
+                    has_more_jobs=False):
+        if self._batch_packer is None:
+            return self._create_batch(graph, per_node_batch_size,
+                                      try_add_blocked_jobs)
+
+        if not self._packed_batches:
+            jobs = self._held_jobs
+            self._held_jobs = []
+            while graph.has_ready_jobs():
+                jobs.append(graph.pop_ready())
+            batches = self._batch_packer.pack(jobs)
+            if has_more_jobs and len(batches) > 1:
+                # The last batch is the least full. Pack its jobs again
+                # once more jobs are ready.
+                self._held_jobs = batches.pop().jobs
+            self._packed_batches.extend(batches)
+
+        batch = _BatchJobs()
+        if self._packed_batches:
+            packed_batch = self._packed_batches.popleft()
+            for job in packed_batch.jobs:
+                batch.append(job)
+            batch.predicted_duration_s = packed_batch.predicted_duration_s
+        return batch
+
+    @staticmethod
+    def _create_batch(graph, per_node_batch_size, try_add_blocked_jobs):
+        batch = _BatchJobs()
+        # Blocked jobs whose blocking jobs are all in this batch.
+        unblocked_in_batch = deque()
+        while batch.num_jobs < per_node_batch_size:
+            if unblocked_in_batch:
+                job = unblocked_in_batch.popleft()
+                graph.schedule(job)
+            elif graph.has_ready_jobs():
+                job = graph.pop_ready()
+            else:
+                break
+
+            batch.append(job)
+            if try_add_blocked_jobs:
+                # JobRunner will manage the execution ordering on the compute
+                # node.
+                unblocked_in_batch.extend(
+                    batch.find_unblocked_dependents(job, graph)
+                )
+
+        return batch
+
+    def _fill_graph(self, graph, jobs, per_node_batch_size):
+        """Add jobs until enough are ready to form the next batches.
+
+        Returns
+        -------
+        bool
+            False if there are no more jobs to add.
+
+        """
+        num_ready = per_node_batch_size
+        if self._batch_packer is not None:
+            # Each pack leaves one under-filled batch, so pack several
+            # batches' worth of jobs at once.
+            num_ready *= PACKING_WINDOW_BATCHES
+        return self._add_jobs_to_graph(graph, jobs, num_ready)
+
+    @staticmethod
+    def _add_jobs_to_graph(graph, jobs, per_node_batch_size):
+        """Add jobs until a full batch is ready to run.
+
+        Returns
+        -------
+        bool
+            False if there are no more jobs to add.
+
+        """
+        while graph.num_ready < per_node_batch_size:
+            job = next(jobs, None)
+            if job is None:
+                return False
+            graph.add_job(job)
+
+        return True
+
+    def _requeue_drained_jobs(self, output, graph=None):
+        """Find the jobs that batches did not run because their allocations
+        were about to end and return them to the graph so that they are
+        submitted in new batches.
+
+        Returns
+        -------
+        list
+            names of the drained jobs
+
+        """
+        names = []
+        pattern = get_drained_jobs_filename(output, "*")
+        for filename in sorted(glob.glob(pattern)):
+            data = load_data(filename)
+            os.remove(filename)
+            batch_names = data["unstarted"] + data["terminated"]
+            if graph is not None:
+                for name in batch_names:
+                    graph.unschedule(name)
+            event = StructuredLogEvent(
+                source=self._name,
+                category=EVENT_CATEGORY_HPC,
+                name=EVENT_NAME_HPC_REQUEUE_DRAINED_JOBS,
+                message="Requeued jobs drained from an ending allocation",
+                filename=os.path.basename(filename),
+                num_unstarted=len(data["unstarted"]),
+                num_terminated=len(data["terminated"]),
+            )
+            log_event(event)
+            names += batch_names
+
+        if names:
+            logger.info("Requeued %s drained jobs", len(names))
+        return names
+
+    def _record_submitted_jobs(self, async_submitter, job_names):
+        self._submitted_jobs[async_submitter.name] = (async_submitter,
+                                                      job_names)
+        for job_name in job_names:
+            self._job_submitters[job_name] = async_submitter.name
+
+    def _requeue_lost_jobs(self, graph, max_retries):
+        """Find the jobs of completed submitters that did not produce results
+        and return them to the graph so that they are submitted in new
+        batches. Must be called after completed jobs and drained jobs are
+        recorded in the graph.
+
+        """
+        for name in self._completed_submitters:
+            async_submitter, job_names = self._submitted_jobs.pop(name)
+            # Drained jobs may already be in a new batch, which may also
+            # have completed and been processed.
+            job_names = [
+                x for x in job_names if self._job_submitters.get(x) == name
             ]
-            for name in done_jobs:
-                job.remove_blocking_job(name)
+            for job_name in job_names:
+                self._job_submitters.pop(job_name)
+            lost_jobs = [x for x in job_names if graph.is_scheduled(x)]
+            if lost_jobs:
+                self._handle_lost_jobs(
+                    lost_jobs, max_retries, name, graph=graph,
+                    hpc_job_id=async_submitter.job_id,
+                )
+        self._completed_submitters.clear()
+
+    def _release_lost_shared_jobs(self, shared_queue, max_retries):
+        """Release the jobs that nodes claimed from the shared queue but did
+        not complete. Must be called after all nodes have completed.
+
+        Returns
+        -------
+        list
+            names of the lost jobs
+
+        """
+        jobs_by_owner = defaultdict(list)
+        for job_name, owner in shared_queue.list_claimed_jobs().items():
+            jobs_by_owner[owner].append(job_name)
+
+        lost_jobs = []
+        for owner, job_names in jobs_by_owner.items():
+            retry_jobs, abandoned_jobs = self._handle_lost_jobs(
+                job_names, max_retries, owner)
+            shared_queue.release(retry_jobs)
+            # Let the jobs that they block run.
+            shared_queue.complete(abandoned_jobs, f"{self._name}_submitter")
+            lost_jobs += job_names
+        return lost_jobs
+
+    def _handle_lost_jobs(self, job_names, max_retries, node, graph=None,
+                          hpc_job_id=None):
+        """Split lost jobs into those to retry and those that exceeded
+        max_retries. If graph is set, return the retry jobs to it and mark
+        the others complete.
+
+        Returns
+        -------
+        tuple
+            (list, list) names of jobs to retry and jobs to abandon
+
+        """
+        retry_jobs = []
+        abandoned_jobs = []
+        for job_name in job_names:
+            self._num_lost[job_name] += 1
+            if self._num_lost[job_name] > max_retries:
+                abandoned_jobs.append(job_name)
+                if graph is not None:
+                    graph.mark_complete(job_name)
+            else:
+                retry_jobs.append(job_name)
+                if graph is not None:
+                    graph.unschedule(job_name)
+
+        logger.warning("%s lost %s jobs without results; retry %s",
+                       node, len(job_names), len(retry_jobs))
+        if abandoned_jobs:
+            logger.error("Jobs were lost more than %s times and will not be "
+                         "retried: %s", max_retries, abandoned_jobs)
+        event = StructuredLogEvent(
+            source=self._name,
+            category=EVENT_CATEGORY_HPC,
+            name=EVENT_NAME_HPC_JOBS_LOST,
+            message="Jobs completed without results",
+            node=node,
+            hpc_job_id=hpc_job_id,
+            retried_jobs=retry_jobs,
+            abandoned_jobs=abandoned_jobs,
+        )
+        log_event(event)
+        return retry_jobs, abandoned_jobs
+
+    def _update_completed_jobs(self, graph):
+        for name in self._results_summary.update_completed_jobs():
+            graph.mark_complete(name)
 
 
 class _BatchJobs:
@@ -152,64 +939,94 @@ class _BatchJobs:
     def __init__(self):
         self._jobs = []
         self._job_names = set()
+        # name: number of jobs in the batch that block the job
+        self._num_blocking_in_batch = defaultdict(int)
+        # Set if the batch was packed by expected runtime.
+        self.predicted_duration_s = None
 
     def append(self, job):
         """Append a job."""
         self._jobs.append(job)
         self._job_names.add(job.name)
 
-    def are_blocking_jobs_present(self, blocking_jobs):
-        """Return True if all blocking jobs are already in the batch.
+    def find_unblocked_dependents(self, job, graph):
+        """Return jobs blocked by job that are only blocked by jobs in the
+        batch.
+
+        Parameters
+        ----------
+        job : JobParametersInterface
+            job that was just appended to the batch
+        graph : JobDependencyGraph
 
         Returns
         -------
-        bool
+        list
 
         """
-        return blocking_jobs.issubset(self._job_names)
-
-    def is_job_blocked(self, job, try_add_blocked_jobs):
-        """Return True if the job is blocked."""
-        blocking_jobs = job.get_blocking_jobs()
-        if not blocking_jobs:
-            return False
-        if try_add_blocked_jobs and self.are_blocking_jobs_present(blocking_jobs):
-            # JobRunner will manage the execution ordering on the compute node.
-            return False
-        return True
+        unblocked = []
+        for name in graph.iter_dependents(job.name):
+            if graph.is_scheduled(name):
+                continue
+            self._num_blocking_in_batch[name] += 1
+            if self._num_blocking_in_batch[name] == \
+                    graph.get_num_blocking_jobs(name):
+                unblocked.append(graph.get_job(name))
+
+        return unblocked
 
     @property
     def num_jobs(self):
         """Return the number of jobs in the batch."""
         return len(self._jobs)
 
-    def serialize(self):
-        """Serialize all jobs in the batch.
+    def list_job_names(self):
+        """Return the names of the jobs in the batch.
 
         Returns
         -------
         list
-            list of dict
 
         """
-        return [x.serialize() for x in self._jobs]
+        return [x.name for x in self._jobs]
+
+
+def _list_job_names(batches):
+    return [name for batch in batches for name in batch.list_job_names()]
+
+
+def _get_predicted_duration(batches):
+    durations = [x.predicted_duration_s for x in batches
+                 if x.predicted_duration_s is not None]
+    return max(durations) if durations else None
 
 
 class AsyncHpcSubmitter(AsyncJobInterface):
     """Used to submit batches of jobs to multiple nodes, one at a time."""
-    def __init__(self, hpc_manager, run_script, name, output):
+    def __init__(self, hpc_manager, run_script, name, output, num_nodes=1,
+                 predicted_duration_s=None):
         self._mgr = hpc_manager
         self._run_script = run_script
+        self._num_nodes = num_nodes
         self._job_id = None
         self._output = output
         self._name = name
         self._last_status = HpcJobStatus.NONE
         self._is_pending = False
+        self._predicted_duration_s = predicted_duration_s
+        self._submit_time = None
+        self._run_start_time = None
+        self._end_time = None
 
     def __del__(self):
         if self._is_pending:
             logger.warning("job %s destructed while pending", self._name)
 
+    @property
+    def job_id(self):
+        """Return the HPC job ID, or None if it has not been submitted."""
+        return self._job_id
+
     @property
     def hpc_manager(self):
         """Return the HpcManager object.
@@ -223,35 +1040,89 @@ class AsyncHpcSubmitter(AsyncJobInterface):
 
     def is_complete(self):
         status = self._mgr.check_status(job_id=self._job_id)
-
-        if status != self._last_status:
-            logger.info("Submission %s %s changed status from %s to %s",
-                        self._name, self._job_id, self._last_status, status)
-            event = StructuredLogEvent(
-                source=self._name,
-                category=EVENT_CATEGORY_HPC,
-                name=EVENT_NAME_HPC_JOB_STATE_CHANGE,
-                message="HPC job state change",
-                job_id=self._job_id,
-                old_state=self._last_status.value,
-                new_state=status.value,
-            )
-            log_event(event)
-            self._last_status = status
+        self._log_status_change(self._job_id, self._last_status, status)
+        self._last_status = status
 
         if status in (HpcJobStatus.COMPLETE, HpcJobStatus.NONE):
             self._is_pending = False
+            self._end_time = time.time()
+            self._log_batch_duration()
 
         return not self._is_pending
 
+    @property
+    def is_finished(self):
+        """Return True if the submission has completed."""
+        return self._end_time is not None
+
+    @property
+    def queue_wait_s(self):
+        """Return the time between submission and the first RUNNING
+        status, or None if it has not been observed. Durations are only as
+        precise as the status poll interval.
+
+        """
+        if self._run_start_time is None:
+            return None
+        return self._run_start_time - self._submit_time
+
+    @property
+    def run_duration_s(self):
+        """Return the time between the first RUNNING status and
+        completion, or None if either has not been observed.
+
+        """
+        if self._run_start_time is None or self._end_time is None:
+            return None
+        return self._end_time - self._run_start_time
+
+    def _log_batch_duration(self):
+        if self._predicted_duration_s is None:
+            return
+
+        # The duration is only as precise as the status poll interval.
+        start_time = self._run_start_time or self._submit_time
+        actual_duration_s = self._end_time - start_time
+        logger.info("Submission %s ran for %s seconds; predicted %s seconds",
+                    self._name, actual_duration_s, self._predicted_duration_s)
+        event = StructuredLogEvent(
+            source=self._name,
+            category=EVENT_CATEGORY_HPC,
+            name=EVENT_NAME_HPC_BATCH_DURATION,
+            message="HPC batch duration",
+            job_id=self._job_id,
+            predicted_duration_s=self._predicted_duration_s,
+            actual_duration_s=actual_duration_s,
+        )
+        log_event(event)
+
+    def _log_status_change(self, job_id, old_status, new_status):
+        if new_status == old_status:
+            return
+
+        if new_status == HpcJobStatus.RUNNING and self._run_start_time is None:
+            self._run_start_time = time.time()
+
+        logger.info("Submission %s %s changed status from %s to %s",
+                    self._name, job_id, old_status, new_status)
+        event = StructuredLogEvent(
+            source=self._name,
+            category=EVENT_CATEGORY_HPC,
+            name=EVENT_NAME_HPC_JOB_STATE_CHANGE,
+            message="HPC job state change",
+            job_id=job_id,
+            old_state=old_status.value,
+            new_state=new_status.value,
+        )
+        log_event(event)
+
     @property
     def name(self):
         return self._name
 
     def run(self):
-        job_id, result = self._mgr.submit(self._output,
-                                          self._name,
-                                          self._run_script)
+        job_id, result = self._submit()
+        self._submit_time = time.time()
         self._is_pending = True
         if result != Status.GOOD:
             raise ExecutionError("Failed to submit name={self._name}")
@@ -267,8 +1138,61 @@ class AsyncHpcSubmitter(AsyncJobInterface):
         log_event(event)
         logger.info("Assigned job_ID=%s name=%s", self._job_id, self._name)
 
+    def _submit(self):
+        return self._mgr.submit(self._output, self._name, self._run_script,
+                                num_nodes=self._num_nodes)
+
     def get_blocking_jobs(self):
         return set()
 
     def remove_blocking_job(self, name):
         assert False
+
+
+class AsyncHpcArraySubmitter(AsyncHpcSubmitter):
+    """Submits batches as one job array and tracks the status of each
+    task."""
+    def __init__(self, hpc_manager, run_script, name, output, num_tasks,
+                 max_concurrent_tasks, predicted_duration_s=None):
+        super(AsyncHpcArraySubmitter, self).__init__(
+            hpc_manager, run_script, name, output,
+            predicted_duration_s=predicted_duration_s,
+        )
+        self._array = f"1-{num_tasks}%{max_concurrent_tasks}"
+        # task index: last status
+        self._task_statuses = {
+            i: HpcJobStatus.NONE for i in range(1, num_tasks + 1)
+        }
+
+    def is_complete(self):
+        for index in list(self._task_statuses):
+            task_id = f"{self._job_id}_{index}"
+            status = self._mgr.check_status(job_id=task_id)
+            self._log_status_change(task_id, self._task_statuses[index],
+                                    status)
+            if status in (HpcJobStatus.COMPLETE, HpcJobStatus.NONE):
+                self._task_statuses.pop(index)
+            else:
+                self._task_statuses[index] = status
+
+        if not self._task_statuses:
+            self._is_pending = False
+            self._end_time = time.time()
+            self._log_batch_duration()
+
+        return not self._is_pending
+
+    @property
+    def num_pending_tasks(self):
+        """Return the number of tasks that have not completed.
+
+        Returns
+        -------
+        int
+
+        """
+        return len(self._task_statuses)
+
+    def _submit(self):
+        return self._mgr.submit(self._output, self._name, self._run_script,
+                                array=self._array)
@@ -4,7 +4,7 @@ import logging
 import multiprocessing
 import tempfile
 
-from jade.hpc.common import HpcJobStatus, HpcJobInfo
+from jade.hpc.common import HpcJobStatus, HpcJobInfo, get_system_memory_gb
 from jade.hpc.hpc_manager_interface import HpcManagerInterface
 
 
@@ -39,6 +39,9 @@ class LocalManager(HpcManagerInterface):
     def check_status(self, name=None, job_id=None):
         return HpcJobInfo("", "", HpcJobStatus.NONE)
 
+    def check_statuses(self):
+        return {}
+
     def check_storage_configuration(self):
         pass
 
@@ -54,9 +57,16 @@ class LocalManager(HpcManagerInterface):
     def get_config(self):
         return {"hpc": {}}
 
+    def get_allocation_end_time(self):
+        return None
+
     def get_local_scratch(self):
         return tempfile.gettempdir()
 
+    @staticmethod
+    def get_memory_gb():
+        return get_system_memory_gb()
+
     @staticmethod
     def get_num_cpus():
         return multiprocessing.cpu_count()
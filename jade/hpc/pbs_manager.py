@@ -3,7 +3,7 @@
 import logging
 
 from jade.enums import Status
-from jade.hpc.common import HpcJobStatus
+from jade.hpc.common import HpcJobStatus, get_system_memory_gb
 from jade.hpc.hpc_manager_interface import HpcManagerInterface
 from jade.utils.subprocess_manager import run_command
 from jade.utils import utils
@@ -61,6 +61,29 @@ class PbsManager(HpcManagerInterface):
 
         return self._get_status_from_output(qstat_rows, name)
 
+    def check_statuses(self):
+        qstat_rows = self._qstat()
+        if qstat_rows is None:
+            return {}
+
+        statuses = {}
+        for row in qstat_rows:
+            row = row.split()
+            # make sure the row is long enough to be a job status listing
+            if len(row) > 10:
+                job_id = self._normalize_job_id(row[0])
+                statuses[job_id] = self._STATUSES.get(row[-2],
+                                                      HpcJobStatus.UNKNOWN)
+        return statuses
+
+    @staticmethod
+    def _normalize_job_id(job_id):
+        """Return the sequence number of a job ID. qsub reports the full ID,
+        such as 123.server.domain, while qstat may truncate the server name.
+
+        """
+        return job_id.split(".")[0]
+
     def check_storage_configuration(self):
         pass
 
@@ -73,9 +96,16 @@ class PbsManager(HpcManagerInterface):
     def get_config(self):
         return self._config
 
+    def get_allocation_end_time(self):
+        return None
+
     def get_local_scratch(self):
         return "."
 
+    @staticmethod
+    def get_memory_gb():
+        return get_system_memory_gb()
+
     @staticmethod
     def get_num_cpus():
         return 18
@@ -157,7 +187,7 @@ class PbsManager(HpcManagerInterface):
         ret = run_command("qsub {}".format(filename), output)
         if ret == 0:
             result = Status.GOOD
-            job_id = output["stdout"]
+            job_id = self._normalize_job_id(output["stdout"].strip())
         else:
             result = Status.ERROR
             job_id = None
@@ -1,12 +1,13 @@
 """SLURM management functionality"""
 
+from datetime import datetime
 import logging
 import os
 import re
 
 from jade.enums import Status
 from jade.exceptions import ExecutionError  #, InvalidConfiguration
-from jade.hpc.common import HpcJobStatus, HpcJobInfo
+from jade.hpc.common import HpcJobStatus, HpcJobInfo, get_system_memory_gb
 from jade.hpc.hpc_manager_interface import HpcManagerInterface
 from jade.utils.subprocess_manager import run_command
 from jade.utils import utils
@@ -71,6 +72,30 @@ class SlurmManager(HpcManagerInterface):
                                                  HpcJobStatus.UNKNOWN))
         return job_info
 
+    def check_statuses(self):
+        field_names = ("jobid", "state")
+        # -r reports each job array task on its own line.
+        cmd = f"squeue -u {self.USER} --Format \"{','.join(field_names)}\" -h -r"
+        output = {}
+        ret = run_command(cmd, output)
+        if ret != 0:
+            logger.error("Failed to run squeue command=[%s] ret=%s err=%s",
+                         cmd, ret, output["stderr"])
+            raise ExecutionError(f"squeue command failed: {ret}")
+
+        stdout = output["stdout"]
+        logger.debug("squeue output:  [%s]", stdout)
+        statuses = {}
+        for line in stdout.splitlines():
+            fields = line.split()
+            if not fields:
+                continue
+            assert len(fields) == len(field_names), line
+            statuses[fields[0]] = self._STATUSES.get(fields[1],
+                                                     HpcJobStatus.UNKNOWN)
+
+        return statuses
+
     @staticmethod
     def check_storage_configuration():
         pass
@@ -136,20 +161,49 @@ class SlurmManager(HpcManagerInterface):
         #logger.debug("Created local cluster.")
         #return cluster
 
-    def create_submission_script(self, name, script, filename, path):
-        text = self._create_submission_script_text(name, script, path)
+    def create_submission_script(self, name, script, filename, path,
+                                 array=None, num_nodes=1):
+        """Create the script to queue the jobs to the HPC.
+
+        Parameters
+        ----------
+        name : str
+            job name
+        script : str
+            script to execute on HPC
+        filename : str
+            submission script filename
+        path : str
+            path for stdout and stderr files
+        array : str | None
+            If set, submit a job array with this index specification, such
+            as 1-100%10. Each task sees its index in SLURM_ARRAY_TASK_ID.
+        num_nodes : int
+            Number of nodes to allocate. The script runs once per node and
+            each instance sees its node index in SLURM_PROCID.
+
+        """
+        text = self._create_submission_script_text(name, script, path,
+                                                   array=array,
+                                                   num_nodes=num_nodes)
         utils.create_script(filename, "\n".join(text))
 
-    def _create_submission_script_text(self, name, script, path):
+    def _create_submission_script_text(self, name, script, path, array=None,
+                                       num_nodes=1):
+        # Tasks of a job array share the job ID, %j, so name their output
+        # files by array ID and task index.
+        output_id = "%j" if array is None else "%A_%a"
         lines = [
             "#!/bin/bash",
             f"#SBATCH --account={self._config['hpc']['allocation']}",
             f"#SBATCH --job-name={name}",
             f"#SBATCH --time={self._config['hpc']['walltime']}",
-            f"#SBATCH --output={path}/job_output_%j.o",
-            f"#SBATCH --error={path}/job_output_%j.e",
-            "#SBATCH --nodes=1",
+            f"#SBATCH --output={path}/job_output_{output_id}.o",
+            f"#SBATCH --error={path}/job_output_{output_id}.e",
+            f"#SBATCH --nodes={num_nodes}",
         ]
+        if array is not None:
+            lines.append(f"#SBATCH --array={array}")
 
         for param in ("memory", "partition", "ntasks", "ntasks_per_node",
                       "qos"):
@@ -158,12 +212,53 @@ class SlurmManager(HpcManagerInterface):
                 lines.append(f"#SBATCH --{param}={value}")
 
         lines.append("")
-        lines.append(f"srun {script}")
+        if num_nodes == 1:
+            lines.append(f"srun {script}")
+        else:
+            lines.append(f"srun --nodes={num_nodes} --ntasks={num_nodes} "
+                         f"--ntasks-per-node=1 {script}")
         return lines
 
+    def get_allocation_end_time(self):
+        end_time = os.environ.get("SLURM_JOB_END_TIME")
+        if end_time is not None:
+            try:
+                return float(end_time)
+            except ValueError:
+                logger.warning("Invalid SLURM_JOB_END_TIME=%s", end_time)
+                return None
+
+        job_id = os.environ.get("SLURM_JOB_ID")
+        if job_id is None:
+            return None
+
+        cmd = f"squeue -h -j {job_id} -o %e"
+        output = {}
+        ret = run_command(cmd, output)
+        if ret != 0:
+            logger.warning("Failed to run squeue command=[%s] ret=%s err=%s",
+                           cmd, ret, output["stderr"])
+            return None
+
+        text = output["stdout"].strip()
+        try:
+            return datetime.strptime(text, "%Y-%m-%dT%H:%M:%S").timestamp()
+        except ValueError:
+            logger.warning("Unable to parse the end time of job %s: [%s]",
+                           job_id, text)
+            return None
+
     def get_local_scratch(self):
         return os.environ["LOCAL_SCRATCH"]
 
+    @staticmethod
+    def get_memory_gb():
+        # Set in MB if the allocation requested memory per node.
+        memory_mb = os.environ.get("SLURM_MEM_PER_NODE")
+        if memory_mb is not None:
+            return int(memory_mb) / 1024
+        return get_system_memory_gb()
+
     @staticmethod
     def get_num_cpus():
         return int(os.environ["SLURM_CPUS_ON_NODE"])
@@ -18,6 +18,98 @@ class AsyncJobInterface(abc.ABC):
 
         """
 
+    def get_pid(self):
+        """Return the ID of the local child process running the job.
+
+        Returns
+        -------
+        int | None
+            None means that the job does not run in a local child process and
+            its completion can only be detected by polling.
+
+        """
+        return None
+
+    def get_pids(self):
+        """Return the IDs of the local child processes whose exit the job is
+        waiting for. The set can change while the job runs, such as when it
+        starts a duplicate.
+
+        Returns
+        -------
+        list
+            Empty means that completion can only be detected by polling or
+            through :meth:`get_completion_fd`.
+
+        """
+        pid = self.get_pid()
+        return [] if pid is None else [pid]
+
+    def get_completion_fd(self):
+        """Return a file descriptor that becomes readable when the job
+        completes. Used for jobs that do not run in their own child process.
+
+        Returns
+        -------
+        int | None
+            None means that the job does not provide a file descriptor.
+
+        """
+        return None
+
+    def get_retry_delay(self):
+        """Return the seconds to wait before running the job again after it
+        reports completion.
+
+        Returns
+        -------
+        float | None
+            None means that the job is complete and must not run again.
+
+        """
+        return None
+
+    def terminate(self):
+        """Ask the job to stop before it completes. The job still reports
+        completion through :meth:`is_complete`. Jobs that cannot be stopped
+        ignore the request.
+
+        """
+
+    def can_speculate(self):
+        """Return True if a duplicate of the running job can be started with
+        :meth:`speculate`.
+
+        Returns
+        -------
+        bool
+
+        """
+        return False
+
+    def is_speculating(self):
+        """Return True if a duplicate of the job is running.
+
+        Returns
+        -------
+        bool
+
+        """
+        return False
+
+    def speculate(self):
+        """Start a duplicate of the running job. The first attempt to
+        succeed completes the job and the other is stopped. Callers should
+        check :meth:`can_speculate` first.
+
+        Returns
+        -------
+        bool
+            True if a duplicate was started.
+
+        """
+        return False
+
     @abc.abstractproperty
     def name(self):
         """Return the job name.
@@ -0,0 +1,216 @@
+"""Provides notifications when child processes exit."""
+
+import enum
+import logging
+import os
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationMode(enum.Enum):
+    """Mechanisms used to detect child process exits."""
+    PIDFD = "pidfd"
+    SIGCHLD = "sigchld"
+    NONE = "none"
+
+
+class CompletionNotifier:
+    """Wakes up a waiting caller as soon as a child process exits.
+
+    On Linux kernels that support pidfds each registered process gets its own
+    file descriptor that becomes readable when the process exits. Otherwise,
+    if running in the main thread, a SIGCHLD handler writes to a wakeup
+    socket. If neither mechanism is available then :meth:`wait` sleeps for
+    the full timeout.
+
+    The notifier does not reap processes. The owner of the process must still
+    call wait or poll on it.
+
+    """
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._pidfds = {}  # pid: fd
+        self._wakeup_sockets = None
+        self._orig_sigchld_handler = None
+        self._orig_wakeup_fd = None
+        self._mode = self._select_mode()
+
+        if self._mode == NotificationMode.SIGCHLD:
+            self._install_sigchld_handler()
+
+        logger.debug("CompletionNotifier mode=%s", self._mode.value)
+
+    def __del__(self):
+        if self._mode != NotificationMode.NONE:
+            self.close()
+
+    @staticmethod
+    def _select_mode():
+        if sys.platform.startswith("linux") and hasattr(os, "pidfd_open"):
+            try:
+                os.close(os.pidfd_open(os.getpid()))
+                return NotificationMode.PIDFD
+            except OSError:
+                # The kernel is older than 5.3.
+                logger.debug("pidfd_open is not supported by the kernel")
+
+        if hasattr(signal, "SIGCHLD") and \
+                threading.current_thread() is threading.main_thread():
+            return NotificationMode.SIGCHLD
+
+        return NotificationMode.NONE
+
+    def _install_sigchld_handler(self):
+        reader, writer = socket.socketpair()
+        reader.setblocking(False)
+        writer.setblocking(False)
+        self._wakeup_sockets = (reader, writer)
+        self._selector.register(reader, selectors.EVENT_READ)
+        self._orig_wakeup_fd = signal.set_wakeup_fd(
+            writer.fileno(), warn_on_full_buffer=False)
+        # A Python-level handler is required for the wakeup fd to receive the
+        # signal. The handler itself doesn't need to do anything.
+        self._orig_sigchld_handler = signal.signal(
+            signal.SIGCHLD, lambda signum, frame: None)
+
+    @property
+    def mode(self):
+        """Return the notification mechanism in use.
+
+        Returns
+        -------
+        NotificationMode
+
+        """
+        return self._mode
+
+    @property
+    def is_supported(self):
+        """Return True if the notifier can detect process exits.
+
+        Returns
+        -------
+        bool
+
+        """
+        return self._mode != NotificationMode.NONE
+
+    def register(self, pid):
+        """Start watching a child process.
+
+        Parameters
+        ----------
+        pid : int
+
+        """
+        if self._mode != NotificationMode.PIDFD or pid in self._pidfds:
+            return
+
+        try:
+            fd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            # The process has already been reaped. The owner will detect the
+            # completion on its next poll.
+            logger.debug("process %s no longer exists", pid)
+            return
+
+        self._pidfds[pid] = fd
+        self._selector.register(fd, selectors.EVENT_READ, pid)
+
+    def unregister(self, pid):
+        """Stop watching a child process. Must be called after the process has
+        been reaped.
+
+        Parameters
+        ----------
+        pid : int
+
+        """
+        fd = self._pidfds.pop(pid, None)
+        if fd is not None:
+            self._selector.unregister(fd)
+            os.close(fd)
+
+    def register_fd(self, fd):
+        """Start watching a file descriptor that becomes readable when a job
+        completes, such as one end of a pipe to a worker process.
+
+        Parameters
+        ----------
+        fd : int
+
+        """
+        if self._mode != NotificationMode.NONE:
+            self._selector.register(fd, selectors.EVENT_READ)
+
+    def unregister_fd(self, fd):
+        """Stop watching a file descriptor.
+
+        Parameters
+        ----------
+        fd : int
+
+        """
+        if self._mode != NotificationMode.NONE:
+            self._selector.unregister(fd)
+
+    def wait(self, timeout):
+        """Block until a watched process exits, a watched file descriptor
+        becomes readable, or the timeout expires.
+
+        Parameters
+        ----------
+        timeout : float
+            Max number of seconds to wait.
+
+        Returns
+        -------
+        bool
+            True if a process exit or job completion was detected.
+
+        """
+        if self._mode == NotificationMode.NONE or \
+                not self._selector.get_map():
+            time.sleep(timeout)
+            return False
+
+        events = self._selector.select(timeout)
+        if self._wakeup_sockets is not None and \
+                any(x[0].fileobj is self._wakeup_sockets[0] for x in events):
+            self._drain_wakeup_socket()
+
+        return bool(events)
+
+    def _drain_wakeup_socket(self):
+        try:
+            while self._wakeup_sockets[0].recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        """Release all resources and restore signal handlers."""
+        for pid in list(self._pidfds):
+            self.unregister(pid)
+        for key in list(self._selector.get_map().values()):
+            if self._wakeup_sockets is None or \
+                    key.fileobj is not self._wakeup_sockets[0]:
+                self._selector.unregister(key.fileobj)
+
+        if self._wakeup_sockets is not None:
+            signal.set_wakeup_fd(self._orig_wakeup_fd)
+            signal.signal(signal.SIGCHLD, self._orig_sigchld_handler)
+            self._selector.unregister(self._wakeup_sockets[0])
+            for sock in self._wakeup_sockets:
+                sock.close()
+            self._wakeup_sockets = None
+
+        self._selector.close()
+        self._mode = NotificationMode.NONE
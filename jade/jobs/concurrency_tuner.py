@@ -0,0 +1,139 @@
+"""Adjusts the number of jobs that a node runs from its resource usage."""
+
+import logging
+
+from jade.events import StructuredLogEvent, EVENT_CATEGORY_RESOURCE_UTIL, \
+    EVENT_NAME_CONCURRENCY_ADJUSTED
+from jade.exceptions import InvalidParameter
+from jade.loggers import log_event
+
+
+logger = logging.getLogger(__name__)
+
+# Percent of memory in use above which the queue depth is lowered
+DEFAULT_MEMORY_THRESHOLD = 90.0
+# Percent of CPU time spent waiting for I/O above which the queue depth is
+# lowered
+DEFAULT_IOWAIT_THRESHOLD = 20.0
+# Percent CPU utilization below which the queue depth is raised
+DEFAULT_IDLE_CPU_THRESHOLD = 70.0
+# Fraction of the queue depth that is kept when it is lowered
+DECREASE_FACTOR = 0.75
+# Fraction of the queue depth that is added when it is raised
+INCREASE_FACTOR = 0.25
+# The depth is only raised if memory use is this many percentage points
+# below the threshold, so that it does not oscillate around the threshold.
+MEMORY_HEADROOM = 10.0
+
+
+class ConcurrencyTuner:
+    """Adjusts a JobQueue's depth within bounds from node resource stats.
+
+    The depth is lowered when memory use or I/O wait exceed their thresholds
+    and raised when the CPUs are underused while ready jobs wait for room in
+    the queue. Lowering the depth does not stop running jobs; new jobs start
+    once enough complete. Every adjustment is logged as an event.
+
+    """
+    def __init__(self, name, min_depth, max_depth,
+                 memory_threshold=DEFAULT_MEMORY_THRESHOLD,
+                 iowait_threshold=DEFAULT_IOWAIT_THRESHOLD,
+                 idle_cpu_threshold=DEFAULT_IDLE_CPU_THRESHOLD):
+        """
+        Parameters
+        ----------
+        name : str
+            Source of the events
+        min_depth : int
+        max_depth : int
+        memory_threshold : float
+            Percent of memory in use
+        iowait_threshold : float
+            Percent of CPU time spent waiting for I/O
+        idle_cpu_threshold : float
+            Percent CPU utilization
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if the bounds are invalid.
+
+        """
+        if min_depth < 1 or max_depth < min_depth:
+            raise InvalidParameter(
+                f"invalid concurrency bounds: min={min_depth} max={max_depth}")
+        self._name = name
+        self._min_depth = min_depth
+        self._max_depth = max_depth
+        self._memory_threshold = memory_threshold
+        self._iowait_threshold = iowait_threshold
+        self._idle_cpu_threshold = idle_cpu_threshold
+        self._has_baseline = False
+
+    def clamp(self, depth):
+        """Return the depth limited to the bounds."""
+        return min(self._max_depth, max(self._min_depth, depth))
+
+    def update(self, queue, stats):
+        """Adjust the queue's depth from one sample of resource stats.
+
+        Parameters
+        ----------
+        queue : JobQueue
+        stats : dict
+            As returned by ResourceMonitor.log_resource_stats
+
+        Returns
+        -------
+        int
+            The new depth
+
+        """
+        depth = queue.max_queue_depth
+        if not self._has_baseline:
+            # CPU percentages are measured since the previous sample, so the
+            # first sample is meaningless.
+            self._has_baseline = True
+            return depth
+
+        memory_percent = stats["memory"]["percent"]
+        # I/O wait is only reported on Linux.
+        iowait_percent = stats["cpu"].get("iowait", 0.0)
+        cpu_percent = stats["cpu"]["cpu_percent"]
+
+        new_depth = depth
+        reason = None
+        if memory_percent >= self._memory_threshold:
+            reason = "memory_pressure"
+        elif iowait_percent >= self._iowait_threshold:
+            reason = "io_wait"
+        if reason is not None:
+            new_depth = self.clamp(min(depth - 1, int(depth * DECREASE_FACTOR)))
+        elif cpu_percent < self._idle_cpu_threshold and \
+                memory_percent < self._memory_threshold - MEMORY_HEADROOM and \
+                queue.num_outstanding_jobs >= depth and \
+                queue.num_ready_jobs > 0:
+            reason = "cpu_idle"
+            new_depth = self.clamp(
+                depth + max(1, int(depth * INCREASE_FACTOR)))
+
+        if new_depth == depth:
+            return depth
+
+        event = StructuredLogEvent(
+            source=self._name,
+            category=EVENT_CATEGORY_RESOURCE_UTIL,
+            name=EVENT_NAME_CONCURRENCY_ADJUSTED,
+            message="adjusted the number of parallel jobs",
+            reason=reason,
+            previous_depth=depth,
+            new_depth=new_depth,
+            memory_percent=memory_percent,
+            iowait_percent=iowait_percent,
+            cpu_percent=cpu_percent,
+        )
+        log_event(event)
+        logger.info("Change the number of parallel jobs from %s to %s: %s",
+                    depth, new_depth, reason)
+        queue.max_queue_depth = new_depth
+        return new_depth
@@ -3,15 +3,22 @@
 import logging
 import os
 import shlex
+import shutil
+import signal
 import subprocess
 import sys
 import time
 
 from jade.common import JOBS_OUTPUT_DIR
 from jade.events import StructuredLogEvent, EVENT_NAME_BYTES_CONSUMED, \
-    EVENT_CATEGORY_RESOURCE_UTIL
+    EVENT_CATEGORY_RESOURCE_UTIL, EVENT_CATEGORY_ERROR, \
+    EVENT_NAME_JOB_RETRY, EVENT_NAME_SPECULATIVE_JOB_RESOLVED, \
+    EVENT_NAME_JOB_TIMEOUT, EVENT_NAME_JOB_MEMORY_LIMIT_EXCEEDED, \
+    EVENT_NAME_JOB_CPU_TIME_LIMIT_EXCEEDED
 from jade.jobs.dispatchable_job_interface import DispatchableJobInterface
-from jade.jobs.results_aggregator import ResultsAggregator
+from jade.jobs.job_limits import JobLimitType
+from jade.jobs.process_tree import get_process_tree, get_process_tree_usage, \
+    signal_process_tree
 from jade.loggers import log_event
 from jade.result import Result
 from jade.utils.utils import get_directory_size_bytes
@@ -19,25 +26,124 @@ from jade.utils.utils import get_directory_size_bytes
 
 logger = logging.getLogger(__name__)
 
+# Seconds to wait for a process to exit after SIGTERM before killing it
+TERMINATE_TIMEOUT = 10
+# Max age in seconds of the scan of all processes used to find the processes
+# of an attempt when checking memory and CPU time limits. Jobs checked in the
+# same poll share one scan.
+PROCESS_SCAN_MAX_AGE = 1.0
+
+_LIMIT_EVENT_NAMES = {
+    JobLimitType.TIMEOUT: EVENT_NAME_JOB_TIMEOUT,
+    JobLimitType.MEMORY: EVENT_NAME_JOB_MEMORY_LIMIT_EXCEEDED,
+    JobLimitType.CPU_TIME: EVENT_NAME_JOB_CPU_TIME_LIMIT_EXCEEDED,
+}
+
+_ORIGINAL = "original"
+_DUPLICATE = "duplicate"
+
 
 class DispatchableJob(DispatchableJobInterface):
     """Defines a dispatchable job."""
-    def __init__(self, job, cmd, output, results_filename):
+    def __init__(self, job, cmd, output, results_aggregator,
+                 retry_policy=None, speculative_cmd=None,
+                 speculative_output=None, limits=None):
+        """
+        Parameters
+        ----------
+        job : JobParametersInterface
+        cmd : str
+            Command that runs the job
+        output : str
+            Output directory
+        results_aggregator : ResultsAggregator
+            Receives the result when the job completes. The owner of the
+            aggregator is responsible for flushing it.
+        retry_policy : RetryPolicy | None
+            If set, failed attempts that match the policy report a retry
+            delay instead of a result.
+        speculative_cmd : str | None
+            Command that runs a duplicate of the job, writing its job output
+            directory in speculative_output. Required by :meth:`speculate`.
+            The first attempt to succeed completes the job. The other is
+            sent SIGTERM, and SIGKILL TERMINATE_TIMEOUT seconds later, and
+            the job stays pending until it exits. The job fails only if both
+            attempts fail.
+        speculative_output : str | None
+            Job output directory of the duplicate.
+        limits : JobLimits | None
+            If set, each attempt is checked against the limits whenever
+            completion is checked. A duplicate is checked on its own, from
+            its own start time. An attempt that exceeds one is sent SIGTERM,
+            along with all of its processes, and SIGKILL TERMINATE_TIMEOUT
+            seconds later; a speculated job continues with its other
+            attempt. The result of an attempt that exceeded a limit has the
+            limit's status and it is not retried.
+
+        """
         self._job = job
         self._cli_cmd = cmd
         self._output = output
         self._pipe = None
-        self._results_filename = results_filename
+        self._results_aggregator = results_aggregator
         self._is_pending = False
+        self._is_terminated = False
         self._start_time = None
+        self._exec_time_s = None
+        self._retry_policy = retry_policy
+        self._num_attempts = 0
+        self._retry_delay = None
+        self._speculative_cmd = speculative_cmd
+        self._speculative_output = speculative_output
+        self._speculative_pipe = None
+        self._speculative_start_time = None
+        self._has_speculated = False
+        self._speculation_winner = None
+        self._speculation_ret = None
+        self._loser_stop_time = None
+        self._is_loser_killed = False
+        self._limits = limits
+        # Attempt: JobLimitType that it exceeded
+        self._exceeded_limits = {}
+        # Attempt: (time, processes) for attempts that were sent SIGTERM
+        # for exceeding a limit and have not been killed
+        self._limit_stops = {}
 
     def __del__(self):
         if self._is_pending:
             logger.warning("job %s destructed while pending", self._cli_cmd)
 
-    def _complete(self):
-        ret = self._pipe.returncode
+    def _complete(self, ret):
         exec_time_s = time.time() - self._start_time
+        self._exec_time_s = exec_time_s
+        if self._is_terminated:
+            # The caller decides whether to run the job again, so it gets no
+            # result.
+            logger.info("Job %s was terminated return_code=%s exec_time_s=%s",
+                        self._job.name, ret, exec_time_s)
+            return
+
+        exceeded_limit = self._exceeded_limits.get(_ORIGINAL)
+        if exceeded_limit is None and self._retry_policy is not None \
+                and self._retry_policy.should_retry(ret, self._num_attempts):
+            self._retry_delay = self._retry_policy.get_backoff(
+                self._num_attempts)
+            event = StructuredLogEvent(
+                source=self._job.name,
+                category=EVENT_CATEGORY_ERROR,
+                name=EVENT_NAME_JOB_RETRY,
+                message="job attempt failed; retry",
+                attempt=self._num_attempts,
+                return_code=ret,
+                exec_time_s=exec_time_s,
+                retry_delay_s=self._retry_delay,
+            )
+            log_event(event)
+            logger.info("Job %s attempt %s failed return_code=%s "
+                        "exec_time_s=%s; retry in %s seconds",
+                        self._job.name, self._num_attempts, ret, exec_time_s,
+                        self._retry_delay)
+            return
 
         job_filename = self._job.name
         illegal_chars = ("/", "\\", ":")
@@ -45,6 +151,8 @@ class DispatchableJob(DispatchableJobInterface):
             job_filename = job_filename.replace(char, "-")
 
         status = "finished"
+        if exceeded_limit is not None:
+            status = exceeded_limit.value
         output_dir = os.path.join(self._output, JOBS_OUTPUT_DIR, self._job.name)
         bytes_consumed = get_directory_size_bytes(output_dir)
         event = StructuredLogEvent(
@@ -55,8 +163,9 @@ class DispatchableJob(DispatchableJobInterface):
             bytes_consumed=bytes_consumed,
         )
         log_event(event)
-        result = Result(self._job.name, ret, status, exec_time_s)
-        ResultsAggregator.append(self._results_filename, result)
+        result = Result(self._job.name, ret, status, exec_time_s,
+                        num_attempts=self._num_attempts)
+        self._results_aggregator.add_result(result)
 
         logger.info("Job %s completed return_code=%s exec_time_s=%s",
                     self._job.name, ret, exec_time_s)
@@ -67,12 +176,271 @@ class DispatchableJob(DispatchableJobInterface):
             assert ret is None, f"{ret}"
             return True
 
-        if self._pipe.poll() is not None:
+        if self._speculative_pipe is None:
+            ret = self._pipe.poll()
+        else:
+            ret = self._poll_speculation()
+        if ret is None and self._limits is not None and \
+                self._speculation_winner is None:
+            self._enforce_limits()
+
+        if ret is not None:
             self._is_pending = False
-            self._complete()
+            self._complete(ret)
 
         return not self._is_pending
 
+    def _iter_running_attempts(self):
+        """Yield the name, process, and start time of each attempt that is
+        running."""
+        if self._pipe.returncode is None:
+            yield _ORIGINAL, self._pipe, self._start_time
+        if self._speculative_pipe is not None and \
+                self._speculative_pipe.returncode is None:
+            yield _DUPLICATE, self._speculative_pipe, \
+                self._speculative_start_time
+
+    def _enforce_limits(self):
+        """Stop each running attempt that exceeded a limit."""
+        now = time.time()
+        for attempt, pipe, start_time in self._iter_running_attempts():
+            if attempt in self._exceeded_limits:
+                stop = self._limit_stops.get(attempt)
+                if stop is not None and now - stop[0] > TERMINATE_TIMEOUT:
+                    logger.warning("The %s attempt of job %s did not exit "
+                                   "after SIGTERM; kill it", attempt,
+                                   self._job.name)
+                    signal_process_tree(stop[1], kill=True)
+                    self._limit_stops.pop(attempt)
+                continue
+
+            exceeded = self._check_limits(pipe.pid, now - start_time)
+            if exceeded is None:
+                continue
+
+            limit_type, usage, limit, processes = exceeded
+            event = StructuredLogEvent(
+                source=self._job.name,
+                category=EVENT_CATEGORY_ERROR,
+                name=_LIMIT_EVENT_NAMES[limit_type],
+                message=f"job exceeded a limit: {limit_type.value}",
+                attempt=self._num_attempts,
+                speculative=attempt == _DUPLICATE,
+                limit=limit,
+                usage=usage,
+            )
+            log_event(event)
+            logger.warning("The %s attempt of job %s exceeded a limit: %s "
+                           "usage=%s limit=%s; stop it", attempt,
+                           self._job.name, limit_type.value, usage, limit)
+            self._exceeded_limits[attempt] = limit_type
+            self._limit_stops[attempt] = (now, processes)
+            signal_process_tree(processes)
+
+    def _check_limits(self, pid, elapsed_s):
+        """Return the limit that an attempt exceeded. Its processes are only
+        inspected if a limit requires it.
+
+        Parameters
+        ----------
+        pid : int
+            Process ID of the attempt
+        elapsed_s : float
+            Seconds since the attempt started
+
+        Returns
+        -------
+        tuple | None
+            JobLimitType, usage, limit, and the attempt's processes; None if
+            no limit is exceeded.
+
+        """
+        limits = self._limits
+        if limits.timeout_s is not None and elapsed_s > limits.timeout_s:
+            return JobLimitType.TIMEOUT, elapsed_s, limits.timeout_s, \
+                get_process_tree(pid)
+        if limits.memory_gb is None and limits.cpu_time_s is None:
+            return None
+
+        processes = get_process_tree(pid, max_age_s=PROCESS_SCAN_MAX_AGE)
+        memory_gb, cpu_time_s = get_process_tree_usage(processes)
+        if limits.memory_gb is not None and memory_gb > limits.memory_gb:
+            return JobLimitType.MEMORY, memory_gb, limits.memory_gb, \
+                processes
+        if limits.cpu_time_s is not None and cpu_time_s > limits.cpu_time_s:
+            return JobLimitType.CPU_TIME, cpu_time_s, limits.cpu_time_s, \
+                processes
+        return None
+
+    def _poll_speculation(self):
+        """Check both attempts of a speculated job. Never waits for a
+        process; a loser that is still stopping is checked on the next call.
+
+        Returns
+        -------
+        int | None
+            Return code of the job; None if it is still pending.
+
+        """
+        if self._speculation_winner is None:
+            original_ret = self._pipe.poll()
+            duplicate_ret = self._speculative_pipe.poll()
+            if original_ret == 0:
+                self._stop_loser(_ORIGINAL, original_ret)
+            elif duplicate_ret == 0:
+                self._stop_loser(_DUPLICATE, duplicate_ret)
+            elif original_ret is not None and duplicate_ret is not None:
+                # Both failed. Report the original.
+                self._stop_loser(_ORIGINAL, original_ret)
+            elif duplicate_ret is not None:
+                # The duplicate failed. The original continues alone.
+                self._resolve_speculation(_ORIGINAL)
+                return None
+            else:
+                return None
+
+        loser = self._pipe if self._speculation_winner == _DUPLICATE \
+            else self._speculative_pipe
+        if loser.poll() is None:
+            if not self._is_loser_killed and \
+                    time.time() - self._loser_stop_time > TERMINATE_TIMEOUT:
+                logger.warning("The losing attempt of job %s did not exit "
+                               "after SIGTERM; kill it", self._job.name)
+                loser.kill()
+                self._is_loser_killed = True
+            return None
+
+        ret = self._speculation_ret
+        self._resolve_speculation(self._speculation_winner)
+        return ret
+
+    def _stop_loser(self, winner, ret):
+        """Record the winning attempt and send SIGTERM to the other one."""
+        self._speculation_winner = winner
+        self._speculation_ret = ret
+        self._loser_stop_time = time.time()
+        self._is_loser_killed = False
+        loser = self._pipe if winner == _DUPLICATE else self._speculative_pipe
+        if loser.returncode is None:
+            loser.send_signal(signal.SIGTERM)
+
+    def _resolve_speculation(self, winner):
+        """Remove the output of the attempt that lost. If the duplicate won,
+        its output replaces the original's.
+
+        """
+        if winner == _DUPLICATE:
+            self._start_time = self._speculative_start_time
+        # The winner's state is now the job's state.
+        for attempts in (self._exceeded_limits, self._limit_stops):
+            value = attempts.pop(_DUPLICATE, None)
+            if winner == _DUPLICATE:
+                attempts.pop(_ORIGINAL, None)
+                if value is not None:
+                    attempts[_ORIGINAL] = value
+        self._speculative_pipe = None
+        self._speculation_winner = None
+        self._speculation_ret = None
+
+        job_dir = os.path.join(self._output, JOBS_OUTPUT_DIR, self._job.name)
+        duplicate_dir = os.path.join(self._speculative_output, self._job.name)
+        if winner == _DUPLICATE:
+            if os.path.exists(job_dir):
+                shutil.rmtree(job_dir)
+            if os.path.exists(duplicate_dir):
+                shutil.move(duplicate_dir, job_dir)
+        elif os.path.exists(duplicate_dir):
+            shutil.rmtree(duplicate_dir)
+
+        event = StructuredLogEvent(
+            source=self._job.name,
+            category=EVENT_CATEGORY_RESOURCE_UTIL,
+            name=EVENT_NAME_SPECULATIVE_JOB_RESOLVED,
+            message="resolved the attempts of a speculated job",
+            winner=winner,
+        )
+        log_event(event)
+        logger.info("Use the %s attempt of job %s", winner, self._job.name)
+
+    def get_pid(self):
+        if self._pipe is None:
+            return None
+        return self._pipe.pid
+
+    def get_pids(self):
+        # Exited processes have been reaped and must not be waited on.
+        return [x.pid for x in (self._pipe, self._speculative_pipe)
+                if x is not None and x.returncode is None]
+
+    def get_retry_delay(self):
+        return self._retry_delay
+
+    @property
+    def num_attempts(self):
+        """Return the number of times the job has started."""
+        return self._num_attempts
+
+    @property
+    def exec_time_s(self):
+        """Return the execution time of the completed job.
+
+        Returns
+        -------
+        float | None
+            None if the job has not completed.
+
+        """
+        return self._exec_time_s
+
+    @property
+    def is_terminated(self):
+        """Return True if the job was asked to stop."""
+        return self._is_terminated
+
+    @property
+    def elapsed_s(self):
+        """Return the seconds since the running attempt started.
+
+        Returns
+        -------
+        float | None
+            None if the job is not running.
+
+        """
+        if not self._is_pending:
+            return None
+        return time.time() - self._start_time
+
+    def terminate(self):
+        """Send SIGTERM to the job's process. The job does not report a
+        result."""
+        if not self._is_pending:
+            return
+        logger.info("Terminate job %s", self._job.name)
+        self._pipe.send_signal(signal.SIGTERM)
+        if self._speculative_pipe is not None:
+            self._speculative_pipe.send_signal(signal.SIGTERM)
+        self._is_terminated = True
+
+    def can_speculate(self):
+        return self._speculative_cmd is not None and self._is_pending and \
+            not self._has_speculated and not self._is_terminated and \
+            not self._exceeded_limits
+
+    def is_speculating(self):
+        return self._speculative_pipe is not None
+
+    def speculate(self):
+        if not self.can_speculate():
+            return False
+        cmd = shlex.split(self._speculative_cmd,
+                          posix="win" not in sys.platform)
+        self._speculative_start_time = time.time()
+        self._speculative_pipe = subprocess.Popen(cmd)
+        self._has_speculated = True
+        logger.info("Started a duplicate of job %s", self._job.name)
+        return True
+
     @property
     def job(self):
         return self._job
@@ -88,9 +456,14 @@ class DispatchableJob(DispatchableJobInterface):
         self._job.remove_blocking_job(name)
 
     def run(self):
-        """Run the job. Writes results to file when complete."""
-        assert self._pipe is None
+        """Run the job. Sends the result to the aggregator when complete."""
+        assert self._pipe is None or self._retry_delay is not None
         self._start_time = time.time()
+        self._num_attempts += 1
+        self._retry_delay = None
+        self._has_speculated = False
+        self._exceeded_limits = {}
+        self._limit_stops = {}
 
         # Disable posix if on Windows.
         cmd = shlex.split(self._cli_cmd, posix="win" not in sys.platform)
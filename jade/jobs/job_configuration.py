@@ -2,16 +2,23 @@
 
 import abc
 import enum
+import itertools
 import json
 import logging
 import os
 import sys
 
-import toml
-
 from jade.common import CONFIG_FILE
 from jade.exceptions import InvalidConfiguration, InvalidParameter
 from jade.extensions.registry import Registry, ExtensionClassType
+from jade.jobs.job_dependency_graph import analyze_job_dependencies
+from jade.jobs.job_limits import JobLimits
+from jade.jobs.job_store import JobStore
+from jade.jobs.resource_admission import JobResources
+from jade.jobs.runtime_history import create_runtime_estimator
+from jade.jobs.ndjson_config import is_ndjson_config, count_job_records, \
+    iter_job_records, iter_job_record_offsets, read_job_record, \
+    append_job_records, read_header, write_config
 from jade.utils.utils import dump_data, load_data, ExtendedJSONEncoder
 from jade.utils.timing_utils import timed_debug
 
@@ -40,6 +47,8 @@ class JobConfiguration(abc.ABC):
             job_global_config=None,
             job_post_process_config=None,
             batch_post_process_config=None,
+            job_resource_defaults=None,
+            job_limit_defaults=None,
             **kwargs
         ):
         """
@@ -49,6 +58,12 @@ class JobConfiguration(abc.ABC):
         ----------
         inputs : JobInputsInterface
         container : JobContainerInterface
+        job_resource_defaults : dict | None
+            CPUs and memory needed by jobs that do not declare them, with
+            optional keys num_cpus and memory_gb
+        job_limit_defaults : dict | None
+            Limits on jobs that do not set them, with optional keys
+            timeout_s, memory_gb, and cpu_time_s
 
         """
         self._extension_name = extension_name
@@ -57,12 +72,27 @@ class JobConfiguration(abc.ABC):
         self._job_parameters_class = job_parameters_class
         self._job_names = None
         self._jobs_directory = kwargs.get("jobs_directory")
+        self._job_store = None
+        # Jobs in this file are read on demand instead of being stored in
+        # the container.
+        self._jobs_file = kwargs.get("jobs_file")
+        self._num_jobs_in_file = None
+        # Maps job name to its offset in the jobs file. Built on first lookup.
+        self._jobs_file_index = None
         self._registry = Registry()
         self._job_global_config = job_global_config
         self._job_post_process_config = job_post_process_config
         self._batch_post_process_config = batch_post_process_config
-
-        if kwargs.get("do_not_deserialize_jobs", False):
+        self._job_resource_defaults = None
+        if job_resource_defaults:
+            self._job_resource_defaults = \
+                JobResources.from_dict(job_resource_defaults)
+        self._job_limit_defaults = None
+        if job_limit_defaults:
+            self._job_limit_defaults = JobLimits.from_dict(job_limit_defaults)
+
+        if kwargs.get("do_not_deserialize_jobs", False) and \
+                self._jobs_file is None:
             assert "job_names" in kwargs, str(kwargs)
             self._job_names = kwargs["job_names"]
             return
@@ -75,8 +105,9 @@ class JobConfiguration(abc.ABC):
             self._deserialize_jobs_from_names(names)
 
     def __repr__(self):
-        """Concisely display all instance information."""
-        return self.dumps()
+        """Concisely display instance information."""
+        return f"{self.__class__.__name__}(extension={self.extension_name}, " \
+               f"num_jobs={self.get_num_jobs()})"
 
     def _deserialize_jobs(self, jobs):
         for job_ in jobs:
@@ -84,8 +115,14 @@ class JobConfiguration(abc.ABC):
             self.add_job(job)
 
     def _deserialize_jobs_from_names(self, job_names):
+        names = set(job_names)
         for name in job_names:
             job = self._get_job_by_name(name)
+            # A config that references a subset of a job store, such as one
+            # HPC batch, only omits blocking jobs that have already completed.
+            for blocking_job in list(job.get_blocking_jobs()):
+                if blocking_job not in names:
+                    job.remove_blocking_job(blocking_job)
             self.add_job(job)
 
     def _dump(self, stream=sys.stdout, fmt=".json", indent=2):
@@ -95,22 +132,67 @@ class JobConfiguration(abc.ABC):
         if fmt == ".json":
             json.dump(data, stream, indent=indent, cls=ExtendedJSONEncoder)
         elif fmt == ".toml":
+            import toml
             toml.dump(data, stream)
         else:
             assert False, fmt
 
+    def _iter_jobs_from_file(self):
+        for record in iter_job_records(self._jobs_file):
+            yield self._job_parameters_class.deserialize(record)
+
+    def _load_jobs_from_file(self):
+        """Move the jobs from the jobs file into the container."""
+        if self._jobs_file is None:
+            return
+        jobs = list(self._jobs.iter_jobs())
+        self._jobs.clear()
+        for job in self._iter_jobs_from_file():
+            self._jobs.add_job(job)
+        for job in jobs:
+            self._jobs.add_job(job)
+        self._jobs_file = None
+        self._num_jobs_in_file = None
+        self._jobs_file_index = None
+
+    def _get_job_from_file(self, name):
+        if self._jobs_file_index is None:
+            self._jobs_file_index = {
+                self._job_parameters_class.deserialize(record).name: offset
+                for offset, record in iter_job_record_offsets(self._jobs_file)
+            }
+        offset = self._jobs_file_index.get(name)
+        if offset is None:
+            return None
+        return self._job_parameters_class.deserialize(
+            read_job_record(self._jobs_file, offset)
+        )
+
     def _get_job_by_name(self, name):
         assert self._jobs_directory is not None
-        filename = os.path.join(self._jobs_directory, name) + ".json"
-        assert os.path.exists(filename), filename
-        return self._job_parameters_class.deserialize(load_data(filename))
+        if self._job_store is None:
+            self._job_store = JobStore(self._jobs_directory)
+        return self._job_parameters_class.deserialize(
+            self._job_store.get_record(name)
+        )
 
     @abc.abstractmethod
     def _serialize(self, data):
         """Create implementation-specific data for serialization."""
 
-    def check_job_dependencies(self):
-        """Check for impossible conditions with job dependencies.
+    def check_job_dependencies(self, runtime_history=None):
+        """Check for impossible conditions with job dependencies: blocking
+        jobs that do not exist and dependency cycles.
+
+        Parameters
+        ----------
+        runtime_history : RuntimeHistory | None
+            Provides expected runtimes for the longest path. Without history
+            the longest path is the one with the most jobs.
+
+        Returns
+        -------
+        DependencySummary
 
         Raises
         ------
@@ -118,9 +200,6 @@ class JobConfiguration(abc.ABC):
             Raised if job dependencies have an impossible condition.
 
         """
-        # This currently only checks that all jobs defined as blocking exist.
-        # It does not look for deadlocks.
-
         job_names = set()
         blocking_jobs = set()
         for job in self.iter_jobs():
@@ -133,6 +212,24 @@ class JobConfiguration(abc.ABC):
                 logger.error("%s is blocking a job but does not exist", job)
             raise InvalidConfiguration("job ordering definitions are invalid")
 
+        runtime_func = None
+        if runtime_history is not None:
+            runtime_func = create_runtime_estimator(runtime_history)
+        summary = analyze_job_dependencies(self.iter_jobs(),
+                                           runtime_func=runtime_func)
+        if summary.num_dependencies > 0:
+            logger.info(
+                "Job dependencies: jobs=%s dependencies=%s depth=%s width=%s "
+                "longest_path=%s jobs (%s -> %s)", summary.num_jobs,
+                summary.num_dependencies, summary.depth, summary.width,
+                len(summary.longest_path), summary.longest_path[0],
+                summary.longest_path[-1],
+            )
+            if summary.longest_path_runtime is not None:
+                logger.info("Expected runtime of the longest path is %s "
+                            "seconds", summary.longest_path_runtime)
+        return summary
+
     @abc.abstractmethod
     def create_from_result(self, job, output_dir):
         """Create an instance from a result file.
@@ -170,6 +267,9 @@ class JobConfiguration(abc.ABC):
     def clear(self):
         """Clear all configured jobs."""
         self._jobs.clear()
+        self._jobs_file = None
+        self._num_jobs_in_file = None
+        self._jobs_file_index = None
 
     @timed_debug
     def dump(self, filename=None, stream=sys.stdout, indent=2):
@@ -178,9 +278,10 @@ class JobConfiguration(abc.ABC):
         Parameters
         ----------
         filename : str | None
-            Write configuration to this file (must be .json or .toml).
+            Write configuration to this file (must be .json, .toml, or a
+            line-delimited format: .jsonl or .ndjson, optionally with .gz).
             If None, write the text to stream.
-            Recommend using .json for large files. .toml is much slower.
+            Recommend using .jsonl for large files. .toml is much slower.
         stream : file
             File-like interface that supports write().
         indent : int
@@ -195,10 +296,17 @@ class JobConfiguration(abc.ABC):
         if filename is None and stream is None:
             raise InvalidParameter("must set either filename or stream")
 
-        if filename is not None:
+        if filename is not None and is_ndjson_config(filename):
+            write_config(
+                filename,
+                self.serialize(ConfigSerializeOptions.NO_JOB_INFO),
+                (x.serialize() for x in self.iter_jobs()),
+            )
+        elif filename is not None:
             ext = os.path.splitext(filename)[1]
             if ext not in (".json", ".toml"):
-                raise InvalidParameter("Only .json and .toml are supported")
+                raise InvalidParameter(
+                    "Only .json, .toml, .jsonl, and .ndjson are supported")
 
             with open(filename, "w") as f_out:
                 self._dump(f_out, fmt=ext, indent=indent)
@@ -207,8 +315,36 @@ class JobConfiguration(abc.ABC):
 
         logger.info("Dumped configuration to %s", filename)
 
-    def dumps(self, fmt_module=toml, **kwargs):
-        """Dump the configuration to a formatted string."""
+    def append_jobs(self, filename, jobs):
+        """Append jobs to a line-delimited config file without rewriting it.
+
+        Parameters
+        ----------
+        filename : str
+        jobs : iterable
+            JobParametersInterface objects with names that are unique in the
+            file
+
+        Returns
+        -------
+        int
+            Number of jobs appended
+
+        """
+        if not is_ndjson_config(filename):
+            raise InvalidParameter(
+                f"jobs can only be appended to .jsonl or .ndjson files: {filename}")
+        count = append_job_records(filename, (x.serialize() for x in jobs))
+        if filename == self._jobs_file:
+            self._num_jobs_in_file = None
+            self._jobs_file_index = None
+        return count
+
+    def dumps(self, fmt_module=None, **kwargs):
+        """Dump the configuration to a formatted string. Defaults to toml."""
+        if fmt_module is None:
+            import toml
+            fmt_module = toml
         return fmt_module.dumps(self.serialize(), **kwargs)
 
     @classmethod
@@ -221,7 +357,8 @@ class JobConfiguration(abc.ABC):
             path to configuration file or that file loaded as a dict
         do_not_deserialize_jobs : bool
             Set to True to avoid the overhead of loading all jobs from disk.
-            Job_names will be stored instead of jobs.
+            Job_names will be stored instead of jobs. Jobs in line-delimited
+            files are always read on demand.
 
         Returns
         -------
@@ -233,7 +370,12 @@ class JobConfiguration(abc.ABC):
             Raised if the config file has invalid parameters.
 
         """
-        if isinstance(filename_or_data, str):
+        if isinstance(filename_or_data, str) and \
+                is_ndjson_config(filename_or_data):
+            data = read_header(filename_or_data)
+            data["jobs_file"] = filename_or_data
+            do_not_deserialize_jobs = False
+        elif isinstance(filename_or_data, str):
             data = load_data(filename_or_data)
         else:
             data = filename_or_data
@@ -254,10 +396,15 @@ class JobConfiguration(abc.ABC):
         namedtuple
 
         """
-        if self.get_num_jobs() == 0 and self._job_names is not None:
+        if self._jobs.get_num_jobs() == 0 and self._job_names is not None:
             # We loaded from a config file with names only.
             return self._get_job_by_name(name)
 
+        if self._jobs_file is not None:
+            job = self._get_job_from_file(name)
+            if job is not None:
+                return job
+
         return self._jobs.get_job(name)
 
     def get_parameters_class(self):
@@ -272,7 +419,12 @@ class JobConfiguration(abc.ABC):
         int
 
         """
-        return self._jobs.get_num_jobs()
+        num_jobs = self._jobs.get_num_jobs()
+        if self._jobs_file is not None:
+            if self._num_jobs_in_file is None:
+                self._num_jobs_in_file = count_job_records(self._jobs_file)
+            num_jobs += self._num_jobs_in_file
+        return num_jobs
 
     @property
     def job_global_config(self):
@@ -293,6 +445,29 @@ class JobConfiguration(abc.ABC):
     def batch_post_process_config(self, data):
         self._batch_post_process_config = data
 
+    @property
+    def job_resource_defaults(self):
+        """Return the CPUs and memory needed by jobs that do not declare
+        them.
+
+        Returns
+        -------
+        JobResources | None
+
+        """
+        return self._job_resource_defaults
+
+    @property
+    def job_limit_defaults(self):
+        """Return the limits on jobs that do not set them.
+
+        Returns
+        -------
+        JobLimits | None
+
+        """
+        return self._job_limit_defaults
+
     @property
     def inputs(self):
         """Return the instance of JobInputsInterface for the job."""
@@ -306,6 +481,10 @@ class JobConfiguration(abc.ABC):
         iterator over JobParametersInterface
 
         """
+        if self._jobs_file is not None:
+            return itertools.chain(
+                self._iter_jobs_from_file(), self._jobs.iter_jobs()
+            )
         return self._jobs.iter_jobs()
 
     @timed_debug
@@ -344,6 +523,7 @@ class JobConfiguration(abc.ABC):
         job : JobParametersInterface
 
         """
+        self._load_jobs_from_file()
         return self._jobs.remove_job(job)
 
     def run_job(self, job, output, **kwargs):
@@ -381,6 +561,18 @@ class JobConfiguration(abc.ABC):
         if self._batch_post_process_config:
             data["batch_post_process_config"] = self._batch_post_process_config
 
+        if self._job_resource_defaults:
+            data["job_resource_defaults"] = {
+                k: v for k, v in self._job_resource_defaults._asdict().items()
+                if v is not None
+            }
+
+        if self._job_limit_defaults:
+            data["job_limit_defaults"] = {
+                k: v for k, v in self._job_limit_defaults._asdict().items()
+                if v is not None
+            }
+
         if include == ConfigSerializeOptions.JOBS:
             data["jobs"] = [x.serialize() for x in self.iter_jobs()]
         elif include == ConfigSerializeOptions.JOB_NAMES:
@@ -391,21 +583,25 @@ class JobConfiguration(abc.ABC):
         return data
 
     def serialize_jobs(self, directory):
-        """Serializes main job data to job-specific files.
+        """Serializes main job data to a job store in directory.
 
         Parameters
         ----------
-        output_dir : str
+        directory : str
+
+        Returns
+        -------
+        JobStore
 
         """
-        for job in self.iter_jobs():
-            basename = job.name + ".json"
-            job_filename = os.path.join(directory, basename)
-            dump_data(job.serialize(), job_filename, cls=ExtendedJSONEncoder)
+        if self._job_store is not None:
+            self._job_store.close()
+        self._job_store = JobStore.create(directory, self.iter_jobs())
 
         # We will need this to deserialize from a filename that includes only
         # job names.
         self._jobs_directory = directory
+        return self._job_store
 
     def serialize_for_execution(self, scratch_dir, are_inputs_local=True):
         """Serialize config data for efficient execution.
@@ -429,7 +625,7 @@ class JobConfiguration(abc.ABC):
         """
         self._transform_for_local_execution(scratch_dir, are_inputs_local)
 
-        # Split up the jobs to individual files so that each worker can just
+        # Pack the jobs into one indexed store so that each worker can just
         # read its own info.
         self.serialize_jobs(scratch_dir)
         data = self.serialize(ConfigSerializeOptions.JOB_NAMES)
@@ -439,6 +635,31 @@ class JobConfiguration(abc.ABC):
 
         return config_file
 
+    def serialize_jobs_for_execution(self, directory, jobs):
+        """Serialize a config file and job store that contain only jobs,
+        such as a chunk of jobs claimed from a shared queue, so that each
+        worker reads a small store. Call after serialize_for_execution.
+
+        Parameters
+        ----------
+        directory : str
+        jobs : list
+            JobParametersInterface objects
+
+        Returns
+        -------
+        str
+            Name of serialized config file in directory.
+
+        """
+        JobStore.create(directory, jobs).close()
+        data = self.serialize(ConfigSerializeOptions.NO_JOB_INFO)
+        data["jobs_directory"] = directory
+        data["job_names"] = [x.name for x in jobs]
+        config_file = os.path.join(directory, CONFIG_FILE)
+        dump_data(data, config_file)
+        return config_file
+
     def _transform_for_local_execution(self, scratch_dir, are_inputs_local):
         """Transform data for efficient execution in a local environment.
         Default implementation is a no-op. Derived classes can overridde.
@@ -2,6 +2,7 @@
 
 from jade.exceptions import InvalidParameter
 from jade.extensions.registry import Registry, ExtensionClassType
+from jade.jobs.ndjson_config import is_ndjson_config, read_header
 from jade.result import ResultsSummary
 from jade.utils.utils import load_data
 from jade.utils.timing_utils import timed_debug
@@ -9,14 +10,19 @@ from jade.utils.timing_utils import timed_debug
 
 @timed_debug
 def create_config_from_file(filename, **kwargs):
-    """Create instance of a JobConfiguration from a config file.
+    """Create instance of a JobConfiguration from a config file. Jobs in
+    line-delimited (.jsonl or .ndjson) files are read on demand.
 
     Returns
     -------
     JobConfiguration
 
     """
-    data = load_data(filename)
+    if is_ndjson_config(filename):
+        data = read_header(filename)
+        data["jobs_file"] = filename
+    else:
+        data = load_data(filename)
     return deserialize_config(data, **kwargs)
 
 @timed_debug
@@ -47,21 +53,18 @@ def create_config_from_previous_run(config_file, output, result_type="successful
     if result_type not in allowed_types:
         raise InvalidParameter(f"given result type invalid: {result_type}")
 
-    config = deserialize_config(load_data(config_file))
+    config = create_config_from_file(config_file)
     summary = ResultsSummary(output)
-    results_of_type = []
-
-    if result_type == "successful":
-        results_of_type = summary.get_successful_results()
-    elif result_type == "failed":
-        results_of_type = summary.get_failed_results()
-    elif result_type == "missing":
-        results_of_type = summary.get_missing_results(config.iter_jobs())
-
-    parameters = []
-    for result in results_of_type:
-        job_parameters = config.get_job(result.name)
-        parameters.append(job_parameters)
+
+    if result_type == "missing":
+        parameters = summary.get_missing_results(config.iter_jobs())
+    else:
+        if result_type == "successful":
+            results_of_type = summary.get_successful_results()
+        else:
+            results_of_type = summary.get_failed_results()
+        names = {x.name for x in results_of_type}
+        parameters = [x for x in config.iter_jobs() if x.name in names]
 
     config.reconfigure_jobs(parameters)
     return deserialize_config(config.serialize(), **kwargs)
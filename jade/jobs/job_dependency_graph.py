@@ -0,0 +1,483 @@
+"""Defines a graph of job dependencies."""
+
+from collections import Counter, defaultdict, deque, namedtuple
+import heapq
+import itertools
+import logging
+
+from jade.exceptions import InvalidConfiguration
+
+
+logger = logging.getLogger(__name__)
+
+
+class DependencySummary(namedtuple(
+        "DependencySummary",
+        "num_jobs, num_dependencies, depth, width, longest_path, "
+        "longest_path_runtime")):
+    """Describes the shape of a job dependency graph.
+
+    depth is the number of jobs in the longest chain of blocking jobs. width
+    is the largest number of jobs at the same depth: how many jobs can run at
+    once if all jobs take the same time. longest_path lists the names of the
+    jobs in the chain with the longest expected runtime, or in the longest
+    chain if runtimes are unknown, in which case longest_path_runtime is None.
+
+    """
+
+
+class JobDependencyGraph:
+    """Tracks the blocking relationships between jobs so that completions and
+    lookups of runnable jobs do not require scans of all jobs.
+
+    Each job is in one of these states:
+
+    - blocked: at least one blocking job has not completed
+    - ready: no incomplete blocking jobs; waiting to be scheduled
+    - scheduled: handed to the caller through :meth:`pop_ready` or
+      :meth:`schedule`
+    - complete: reported through :meth:`mark_complete`
+
+    Ready jobs are kept in a heap ordered by priority_func. Jobs with equal
+    priorities, and all jobs if there is no priority_func, are returned in
+    the order in which they became ready.
+
+    Completing a job costs O(number of jobs it blocks * log(number of ready
+    jobs)). Retrieving the next runnable job costs O(log(number of ready
+    jobs)).
+
+    """
+    def __init__(self, jobs=None, priority_func=None):
+        """
+        Parameters
+        ----------
+        jobs : iterable | None
+            Jobs to add to the graph. Objects must implement
+            get_blocking_jobs(), remove_blocking_job(), and name.
+        priority_func : callable | None
+            Optionally a function that returns a job's priority. Jobs with
+            lower priorities are returned first. See SchedulingPolicyInterface.
+
+        """
+        self._jobs = {}  # name: job for all jobs that are not complete
+        self._dependents = defaultdict(set)  # name: names of jobs it blocks
+        self._num_blocking = {}  # name: number of incomplete blocking jobs
+        self._priority_func = priority_func
+        # Heap of (priority, sequence, name). Entries of jobs that are no
+        # longer ready are discarded when they reach the top.
+        self._ready = []
+        self._ready_keys = {}  # name: heap key of each ready job
+        self._keys = {}  # name: heap key assigned when the job became ready
+        self._sequence = itertools.count()
+        self._scheduled = set()
+        self._completed = set()
+        self._num_unscheduled = 0
+
+        if jobs is not None:
+            for job in jobs:
+                self.add_job(job)
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def add_job(self, job):
+        """Add a job to the graph.
+
+        Blocking jobs that have already completed are removed from the job.
+        Blocking jobs that have not been added yet are tracked and resolved
+        when they complete.
+
+        Parameters
+        ----------
+        job : AsyncJobInterface | JobParametersInterface
+
+        """
+        name = job.name
+        assert name not in self._jobs, name
+        self._jobs[name] = job
+        self._num_unscheduled += 1
+
+        num_blocking = 0
+        for blocking_job in list(job.get_blocking_jobs()):
+            if blocking_job in self._completed:
+                job.remove_blocking_job(blocking_job)
+            else:
+                self._dependents[blocking_job].add(name)
+                num_blocking += 1
+
+        if num_blocking == 0:
+            self._push_ready(job)
+        else:
+            self._num_blocking[name] = num_blocking
+
+    def _push_ready(self, job):
+        name = job.name
+        key = self._keys.get(name)
+        if key is None:
+            priority = 0 if self._priority_func is None else \
+                self._priority_func(job)
+            key = (priority, next(self._sequence))
+            self._keys[name] = key
+        self._ready_keys[name] = key
+        heapq.heappush(self._ready, (key, name))
+
+    def _discard_stale_ready_entries(self):
+        while self._ready:
+            key, name = self._ready[0]
+            if self._ready_keys.get(name) == key:
+                break
+            heapq.heappop(self._ready)
+
+    def get_job(self, name):
+        """Return the job with name.
+
+        Returns
+        -------
+        object | None
+            None if the job is not stored or is complete.
+
+        """
+        return self._jobs.get(name)
+
+    def get_num_blocking_jobs(self, name):
+        """Return the number of incomplete jobs blocking the job.
+
+        Returns
+        -------
+        int
+
+        """
+        return self._num_blocking.get(name, 0)
+
+    def has_ready_jobs(self):
+        """Return True if a job is ready to run.
+
+        Returns
+        -------
+        bool
+
+        """
+        return bool(self._ready_keys)
+
+    def is_complete(self, name):
+        """Return True if the job has been marked complete.
+
+        Returns
+        -------
+        bool
+
+        """
+        return name in self._completed
+
+    def is_scheduled(self, name):
+        """Return True if the job has been scheduled but not completed.
+
+        Returns
+        -------
+        bool
+
+        """
+        return name in self._scheduled
+
+    def iter_dependents(self, name):
+        """Yield the names of incomplete jobs blocked by name.
+
+        Yields
+        ------
+        str
+
+        """
+        for dependent in self._dependents.get(name, ()):
+            yield dependent
+
+    def mark_complete(self, name):
+        """Mark a job as complete and unblock the jobs that depend on it.
+
+        Parameters
+        ----------
+        name : str
+
+        Returns
+        -------
+        list
+            jobs that became ready to run
+
+        """
+        if name in self._completed:
+            return []
+
+        self._completed.add(name)
+        job = self._jobs.pop(name, None)
+        if job is not None and name not in self._scheduled:
+            # The caller has taken responsibility for this job outside of the
+            # graph.
+            self._num_unscheduled -= 1
+            if name not in self._num_blocking:
+                self._ready_keys.pop(name)
+        self._scheduled.discard(name)
+        self._num_blocking.pop(name, None)
+        self._keys.pop(name, None)
+
+        newly_ready = []
+        for dependent in self._dependents.pop(name, ()):
+            dependent_job = self._jobs.get(dependent)
+            if dependent_job is None:
+                continue
+            logger.debug("Remove %s from job=%s blocked list", name,
+                         dependent)
+            dependent_job.remove_blocking_job(name)
+            self._num_blocking[dependent] -= 1
+            if self._num_blocking[dependent] == 0:
+                self._num_blocking.pop(dependent)
+                if dependent not in self._scheduled:
+                    self._push_ready(dependent_job)
+                    newly_ready.append(dependent_job)
+
+        return newly_ready
+
+    @property
+    def num_blocked(self):
+        """Return the number of unscheduled jobs that are blocked.
+
+        Returns
+        -------
+        int
+
+        """
+        return self._num_unscheduled - len(self._ready_keys)
+
+    @property
+    def num_ready(self):
+        """Return the number of jobs that are ready to run.
+
+        Returns
+        -------
+        int
+
+        """
+        return len(self._ready_keys)
+
+    @property
+    def num_unscheduled(self):
+        """Return the number of jobs that have not been scheduled.
+
+        Returns
+        -------
+        int
+
+        """
+        return self._num_unscheduled
+
+    def pop_ready(self):
+        """Return the next job that is ready to run and mark it as scheduled.
+
+        Returns
+        -------
+        object
+
+        Raises
+        ------
+        IndexError
+            Raised if no jobs are ready.
+
+        """
+        self._discard_stale_ready_entries()
+        if not self._ready:
+            raise IndexError("no jobs are ready")
+        _, name = heapq.heappop(self._ready)
+        self._ready_keys.pop(name)
+        self._scheduled.add(name)
+        self._num_unscheduled -= 1
+        return self._jobs[name]
+
+    def schedule(self, job):
+        """Mark a blocked job as scheduled. The caller is responsible for
+        running it after its blocking jobs complete.
+
+        Parameters
+        ----------
+        job : object
+
+        """
+        name = job.name
+        assert name in self._num_blocking, name
+        assert name not in self._scheduled, name
+        self._scheduled.add(name)
+        self._num_unscheduled -= 1
+
+    def unschedule(self, name):
+        """Return a scheduled job that did not run to the graph so that it
+        can be scheduled again.
+
+        Parameters
+        ----------
+        name : str
+
+        """
+        assert name in self._scheduled, name
+        self._scheduled.remove(name)
+        self._num_unscheduled += 1
+        if name not in self._num_blocking:
+            # It keeps its place in line.
+            self._push_ready(self._jobs[name])
+
+    def iter_unscheduled_jobs(self):
+        """Yield the jobs that have not been scheduled or completed.
+
+        Yields
+        ------
+        object
+
+        """
+        for name, job in self._jobs.items():
+            if name not in self._scheduled:
+                yield job
+
+
+def compute_longest_paths(weights, successors):
+    """Find the heaviest path that ends at each job of a dependency graph.
+    Visits jobs after all of their predecessors (Kahn's algorithm), so it
+    runs in time linear in the number of jobs and edges.
+
+    Parameters
+    ----------
+    weights : dict
+        Maps job name to its weight, such as its expected runtime.
+    successors : dict
+        Maps job name to the names of the jobs that follow it. All names
+        must be in weights.
+
+    Returns
+    -------
+    tuple
+        (dict, dict) The first maps job name to the total weight of the
+        heaviest path that ends at the job, including the job. The second
+        maps job name to the job before it on that path. Jobs in or after a
+        cycle are omitted.
+
+    """
+    num_predecessors = dict.fromkeys(weights, 0)
+    for names in successors.values():
+        for name in names:
+            num_predecessors[name] += 1
+
+    lengths = {}
+    predecessors = {}
+    queue = deque(x for x, count in num_predecessors.items() if count == 0)
+    for name in queue:
+        lengths[name] = weights[name]
+    while queue:
+        name = queue.popleft()
+        for successor in successors.get(name, []):
+            length = lengths[name] + weights[successor]
+            if successor not in lengths or length > lengths[successor]:
+                lengths[successor] = length
+                predecessors[successor] = name
+            num_predecessors[successor] -= 1
+            if num_predecessors[successor] == 0:
+                queue.append(successor)
+
+    if len(lengths) < len(weights):
+        # Drop partial paths into jobs that were never fully visited.
+        lengths = {x: y for x, y in lengths.items()
+                   if num_predecessors[x] == 0}
+        predecessors = {x: y for x, y in predecessors.items() if x in lengths}
+    return lengths, predecessors
+
+
+def analyze_job_dependencies(jobs, runtime_func=None):
+    """Check the job dependencies for cycles and summarize the shape of the
+    graph. Runs in time linear in the number of jobs and dependencies.
+    Blocking jobs outside of the given jobs are ignored.
+
+    Parameters
+    ----------
+    jobs : iterable
+        Objects that implement get_blocking_jobs() and name.
+    runtime_func : callable | None
+        Returns the expected runtime of a job. If None, the longest path is
+        the one with the most jobs.
+
+    Returns
+    -------
+    DependencySummary
+
+    Raises
+    ------
+    InvalidConfiguration
+        Raised if the dependencies contain a cycle.
+
+    """
+    runtimes = {}
+    blocking = {}
+    for job in jobs:
+        blocking[job.name] = list(job.get_blocking_jobs())
+        if runtime_func is not None:
+            runtimes[job.name] = runtime_func(job)
+
+    blocked = defaultdict(list)
+    num_dependencies = 0
+    for name, blocking_jobs in blocking.items():
+        blocking_jobs = [x for x in blocking_jobs if x in blocking]
+        blocking[name] = blocking_jobs
+        num_dependencies += len(blocking_jobs)
+        for blocking_job in blocking_jobs:
+            blocked[blocking_job].append(name)
+
+    # A job's level is the number of jobs in the longest chain ending at it.
+    levels, predecessors = compute_longest_paths(
+        dict.fromkeys(blocking, 1), blocked)
+    if len(levels) < len(blocking):
+        remaining = set(blocking).difference(levels)
+        cycle = _find_cycle(remaining, blocking)
+        raise InvalidConfiguration(
+            f"{len(remaining)} jobs cannot run because of a dependency "
+            f"cycle (each job blocks the next): {' -> '.join(cycle)}"
+        )
+
+    if runtime_func is None:
+        path_lengths = levels
+    else:
+        path_lengths, predecessors = compute_longest_paths(runtimes, blocked)
+
+    longest_path = []
+    if path_lengths:
+        name = max(path_lengths, key=path_lengths.get)
+        longest_path_runtime = path_lengths[name]
+        while name is not None:
+            longest_path.append(name)
+            name = predecessors.get(name)
+        longest_path.reverse()
+    else:
+        longest_path_runtime = 0
+
+    return DependencySummary(
+        num_jobs=len(blocking),
+        num_dependencies=num_dependencies,
+        depth=max(levels.values(), default=0),
+        width=max(Counter(levels.values()).values(), default=0),
+        longest_path=longest_path,
+        longest_path_runtime=None if runtime_func is None
+        else longest_path_runtime,
+    )
+
+
+def _find_cycle(remaining, blocking):
+    """Return the names of the jobs in one cycle, in execution order, with
+    the first job repeated at the end.
+
+    Every job in remaining is blocked by at least one other job in remaining,
+    so following blocking jobs from any of them must reach a cycle.
+
+    """
+    positions = {}
+    path = []
+    name = next(iter(remaining))
+    while name not in positions:
+        positions[name] = len(path)
+        path.append(name)
+        name = next(x for x in blocking[name] if x in remaining)
+
+    cycle = path[positions[name]:] + [name]
+    cycle.reverse()
+    return cycle
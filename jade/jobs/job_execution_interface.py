@@ -28,6 +28,20 @@ class JobExecutionInterface(abc.ABC):
         # subclasses can override.
         return []
 
+    @staticmethod
+    def is_idempotent():
+        """Return True if running a job more than once, including
+        concurrently with separate output directories, produces the same
+        result. Enables speculative execution of straggler jobs.
+
+        Returns
+        -------
+        bool
+
+        """
+        # subclasses can override.
+        return False
+
     @classmethod
     @abc.abstractmethod
     def create(cls, job_inputs, job, output):
@@ -0,0 +1,85 @@
+"""Limits on the time and memory that a job may use."""
+
+from collections import namedtuple
+import enum
+import logging
+
+from jade.exceptions import InvalidParameter
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobLimitType(enum.Enum):
+    """Limits that a job can exceed. Values are the statuses of the jobs'
+    results."""
+    TIMEOUT = "timeout"
+    MEMORY = "memory_limit_exceeded"
+    CPU_TIME = "cpu_time_limit_exceeded"
+
+
+class JobLimits(namedtuple("JobLimits", "timeout_s, memory_gb, cpu_time_s")):
+    """Limits on a job's wall-clock time in seconds, resident memory in GiB,
+    and CPU time in seconds. Memory and CPU time include all processes that
+    the job starts. None means no limit."""
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create an instance from a dict with optional keys timeout_s,
+        memory_gb, and cpu_time_s.
+
+        Parameters
+        ----------
+        data : dict | None
+
+        Returns
+        -------
+        JobLimits
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if a key is unknown or a value is not positive.
+
+        """
+        data = data or {}
+        unknown = set(data).difference(cls._fields)
+        if unknown:
+            raise InvalidParameter(f"unknown job limits: {unknown}")
+        limits = cls(*(data.get(x) for x in cls._fields))
+        for name, value in limits._asdict().items():
+            if value is not None and value <= 0:
+                raise InvalidParameter(f"{name} must be positive: {value}")
+        return limits
+
+    def is_empty(self):
+        """Return True if no limit is set."""
+        return all(x is None for x in self)
+
+
+def get_job_limits(job, defaults=None):
+    """Return the limits that apply to a job.
+
+    Parameters
+    ----------
+    job : JobParametersInterface
+    defaults : JobLimits | None
+        Configuration-level limits for the fields that the job does not set
+
+    Returns
+    -------
+    JobLimits | None
+        None if no limit applies.
+
+    """
+    limits = job.get_limits()
+    if limits is None:
+        limits = defaults
+    elif defaults is not None:
+        limits = JobLimits(*(
+            default if value is None else value
+            for value, default in zip(limits, defaults)
+        ))
+    if limits is None or limits.is_empty():
+        return None
+    return limits
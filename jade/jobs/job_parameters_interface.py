@@ -68,3 +68,30 @@ class JobParametersInterface:
             name of job that is now finished
 
         """
+
+    def get_resource_requirements(self):
+        """Return the CPUs and memory that the job needs while it runs.
+        Derived classes can override this method if jobs need more than one
+        CPU or a known amount of memory.
+
+        Returns
+        -------
+        JobResources | None
+            None, or None fields, mean that the configuration's default
+            applies.
+
+        """
+        return None
+
+    def get_limits(self):
+        """Return the limits on the job's time and memory. Derived classes
+        can override this method to set limits for individual jobs.
+
+        Returns
+        -------
+        JobLimits | None
+            None, or None fields, mean that the configuration's default
+            applies.
+
+        """
+        return None
@@ -3,8 +3,6 @@
 import os
 import logging
 
-from prettytable import PrettyTable
-
 from jade.common import JOBS_OUTPUT_DIR, OUTPUT_DIR
 from jade.utils.utils import load_data, output_to_file
 
@@ -137,6 +135,7 @@ class JobPostProcess:
         input_file : str
             optional input file name
         """
+        from prettytable import PrettyTable
 
         if input_file is None:
             input_file = cls._results_file
@@ -1,9 +1,14 @@
 """Defines class for managing a job queue."""
 
 from collections import OrderedDict
+import heapq
+import itertools
 import logging
 import time
 
+from jade.jobs.completion_notifier import CompletionNotifier
+from jade.jobs.job_dependency_graph import JobDependencyGraph
+
 
 logger = logging.getLogger(__name__)
 
@@ -26,10 +31,22 @@ class JobQueue:
        completions pull new jobs off the queue. JobQueue does not start a
        background thread to do this automatically.
 
+    A job that reports a retry delay when it completes is not marked
+    complete. It runs again once the delay elapses, ahead of other ready
+    jobs, while the other jobs continue to run.
+
+    If completion_notification is enabled then :meth:`JobQueue.wait` wakes up
+    as soon as a job running in a local child process exits instead of
+    sleeping for the full poll interval. Jobs that report neither a process ID
+    nor a completion file descriptor are still polled every poll_interval.
+
     """
 
     def __init__(self, max_queue_depth, poll_interval=DEFAULT_POLL_INTERVAL,
-                 monitor_func=None, monitor_interval=DEFAULT_MONITOR_INTERVAL):
+                 monitor_func=None, monitor_interval=DEFAULT_MONITOR_INTERVAL,
+                 completion_notification=False, flush_func=None,
+                 completion_func=None, can_start_func=None,
+                 scheduling_policy=None, resource_admission=None):
         """
         Parameters
         ----------
@@ -37,20 +54,61 @@ class JobQueue:
             Maximum number of sub-processes to maintain
         poll_interval : int
             Seconds to sleep in between completion checks.
+        completion_notification : bool
+            If True, wake up as soon as a child process exits.
+        flush_func : callable
+            Optionally a function to call after each completion check, such
+            as to write buffered results.
+        completion_func : callable
+            Optionally a function to call with the names of the jobs found to
+            be complete in each completion check.
+        can_start_func : callable
+            Optionally a function that returns False if a ready job must not
+            start, such as because it would not finish before a deadline.
+            Once it returns False the queue drains; see :meth:`drain`.
+        scheduling_policy : SchedulingPolicyInterface | None
+            Orders the jobs that are ready to run. Defaults to the order in
+            which jobs become ready.
+        resource_admission : ResourceAdmission | None
+            If set, a ready job only starts if the CPUs and memory that it
+            needs are free; jobs that fit may start ahead of ones that do
+            not. The queue depth still limits the number of running jobs.
 
         """
         self._queue_depth = max_queue_depth
         self._poll_interval = poll_interval
         self._outstanding_jobs = OrderedDict()
-        self._queued_jobs = []
+        self._queued_jobs = JobDependencyGraph(
+            priority_func=None if scheduling_policy is None
+            else scheduling_policy.get_priority
+        )
         self._num_jobs = 0
         self._num_completed = 0
         self._monitor_func = monitor_func
         self._monitor_interval = monitor_interval
         self._last_monitor_time = None
-
-        logger.debug("queue_depth=%s poll_interval=%s", self._queue_depth,
-                     self._poll_interval)
+        self._flush_func = flush_func
+        self._completion_func = completion_func
+        self._can_start_func = can_start_func
+        self._resource_admission = resource_admission
+        self._is_draining = False
+        # Heap of (time, sequence, job) for jobs waiting to retry
+        self._delayed_jobs = []
+        self._delayed_job_counter = itertools.count()
+        self._notifier = None
+        # Job name to the pids registered with the notifier
+        self._registered_pids = {}
+        if completion_notification:
+            notifier = CompletionNotifier()
+            if notifier.is_supported:
+                self._notifier = notifier
+            else:
+                logger.warning("Completion notification is not supported on "
+                               "this system. Fall back to polling.")
+
+        logger.debug("queue_depth=%s poll_interval=%s notifier=%s",
+                     self._queue_depth, self._poll_interval,
+                     self._notifier.mode.value if self._notifier else None)
 
     def _check_completions(self):
         logger.debug("check for completions")
@@ -58,24 +116,97 @@ class JobQueue:
         for name, job in self._outstanding_jobs.items():
             if job.is_complete():
                 completed_jobs.append(name)
+            elif self._notifier is not None:
+                # A job's processes can change while it runs, such as when
+                # one attempt of a speculated job exits.
+                self._update_notification_pids(job)
 
         self._num_completed += len(completed_jobs)
         logger.debug("found num_completed=%s", len(completed_jobs))
+        retry_jobs = set()
         for name in completed_jobs:
-            self._outstanding_jobs.pop(name)
-            logger.debug("Completed a job %s", name)
-
-            for _job in self._queued_jobs:
-                if name in _job.get_blocking_jobs():
-                    logger.debug("Remove %s from job=%s blocked list",
-                                 name, _job.name)
-                    _job.remove_blocking_job(name)
+            job = self._outstanding_jobs.pop(name)
+            self._unregister_for_notification(job)
+            if self._resource_admission is not None:
+                self._resource_admission.release(job)
+            delay = job.get_retry_delay()
+            if delay is None:
+                logger.debug("Completed a job %s", name)
+                self._queued_jobs.mark_complete(name)
+            else:
+                logger.debug("Retry job %s in %s seconds", name, delay)
+                heapq.heappush(
+                    self._delayed_jobs,
+                    (time.time() + delay, next(self._delayed_job_counter), job),
+                )
+                retry_jobs.add(name)
+
+        completed_jobs = [x for x in completed_jobs if x not in retry_jobs]
+        if completed_jobs and self._completion_func is not None:
+            self._completion_func(completed_jobs)
+
+    def _release_delayed_jobs(self, force=False):
+        """Return jobs whose retry delay has elapsed to the ready queue."""
+        now = time.time()
+        while self._delayed_jobs and \
+                (force or self._delayed_jobs[0][0] <= now):
+            job = heapq.heappop(self._delayed_jobs)[2]
+            self._queued_jobs.unschedule(job.name)
 
     def _run_job(self, job):
         logger.debug("Run job %s", job.name)
         job.run()
         self._num_jobs += 1
         self._outstanding_jobs[job.name] = job
+        self._register_for_notification(job)
+
+    def _register_for_notification(self, job):
+        if self._notifier is None:
+            return
+        self._update_notification_pids(job)
+        if not self._registered_pids[job.name] and \
+                job.get_completion_fd() is not None:
+            self._notifier.register_fd(job.get_completion_fd())
+
+    def _unregister_for_notification(self, job):
+        if self._notifier is None:
+            return
+        pids = self._registered_pids.pop(job.name, set())
+        for pid in pids:
+            self._notifier.unregister(pid)
+        if not pids and job.get_completion_fd() is not None:
+            self._notifier.unregister_fd(job.get_completion_fd())
+
+    def _update_notification_pids(self, job):
+        """Register the job's current processes and unregister those that
+        exited."""
+        pids = set(job.get_pids())
+        registered = self._registered_pids.get(job.name, set())
+        for pid in registered - pids:
+            self._notifier.unregister(pid)
+        for pid in pids - registered:
+            self._notifier.register(pid)
+        self._registered_pids[job.name] = pids
+
+    def speculate(self, job):
+        """Start a duplicate of an outstanding job and wake up
+        :meth:`wait_for_completions` when either attempt exits.
+
+        Parameters
+        ----------
+        job : AsyncJobInterface
+
+        Returns
+        -------
+        bool
+            True if a duplicate was started.
+
+        """
+        if not job.can_speculate() or not job.speculate():
+            return False
+        if self._notifier is not None:
+            self._update_notification_pids(job)
+        return True
 
     def is_full(self):
         """Return True if the max number of jobs is outstanding.
@@ -87,6 +218,119 @@ class JobQueue:
         """
         return len(self._outstanding_jobs) >= self._queue_depth
 
+    @property
+    def max_queue_depth(self):
+        """Return the maximum number of outstanding jobs.
+
+        Returns
+        -------
+        int
+
+        """
+        return self._queue_depth
+
+    @max_queue_depth.setter
+    def max_queue_depth(self, max_queue_depth):
+        """Change the maximum number of outstanding jobs. Lowering it does
+        not stop outstanding jobs; new jobs start once enough complete.
+
+        """
+        logger.debug("Change queue_depth from %s to %s", self._queue_depth,
+                     max_queue_depth)
+        self._queue_depth = max_queue_depth
+
+    @property
+    def resource_admission(self):
+        """Return the ResourceAdmission that starts jobs, if any.
+
+        Returns
+        -------
+        ResourceAdmission | None
+
+        """
+        return self._resource_admission
+
+    @resource_admission.setter
+    def resource_admission(self, resource_admission):
+        """Start admitting jobs by resources, such as once a node claims
+        jobs that declare them. Outstanding jobs are not counted against the
+        admission's capacity.
+
+        """
+        self._resource_admission = resource_admission
+
+    @property
+    def num_available_slots(self):
+        """Return the number of jobs that could be submitted without being
+        queued.
+
+        Returns
+        -------
+        int
+
+        """
+        num_used = len(self._outstanding_jobs) + \
+            self._queued_jobs.num_unscheduled + len(self._delayed_jobs)
+        return max(0, self._queue_depth - num_used)
+
+    @property
+    def num_outstanding_jobs(self):
+        """Return the number of jobs that are running.
+
+        Returns
+        -------
+        int
+
+        """
+        return len(self._outstanding_jobs)
+
+    @property
+    def num_unstarted_jobs(self):
+        """Return the number of submitted jobs that have not started,
+        including blocked jobs.
+
+        Returns
+        -------
+        int
+
+        """
+        return self._queued_jobs.num_unscheduled
+
+    @property
+    def num_ready_jobs(self):
+        """Return the number of submitted jobs that could start if the queue
+        had room.
+
+        Returns
+        -------
+        int
+
+        """
+        return self._queued_jobs.num_ready
+
+    def iter_outstanding_jobs(self):
+        """Yield the jobs that are running.
+
+        Yields
+        ------
+        AsyncJobInterface
+
+        """
+        for job in self._outstanding_jobs.values():
+            yield job
+
+    @property
+    def num_retrying_jobs(self):
+        """Return the number of jobs waiting to run again after a failed
+        attempt.
+
+        Returns
+        -------
+        int
+
+        """
+        return len(self._delayed_jobs)
+
     def _handle_monitor_func(self, force=False):
         if self._monitor_func is None:
             return
@@ -105,38 +349,110 @@ class JobQueue:
             self._monitor_func()
             self._last_monitor_time = cur_time
 
+    def wait_for_completions(self):
+        """Sleep until a job completes or the poll interval elapses."""
+        if self._notifier is None:
+            time.sleep(self._poll_interval)
+            return
+
+        timeout = self._poll_interval
+        if self._monitor_func is not None and \
+                self._last_monitor_time is not None:
+            next_monitor_time = self._last_monitor_time + self._monitor_interval
+            timeout = min(timeout, max(0, next_monitor_time - time.time()))
+        if self._delayed_jobs:
+            timeout = min(timeout,
+                          max(0, self._delayed_jobs[0][0] - time.time()))
+
+        self._notifier.wait(timeout)
+
     def process_queue(self):
         """Process completions and submit new jobs if the queue is not full."""
         self._handle_monitor_func()
         self._check_completions()
-        if not self._queued_jobs:
+        if self._flush_func is not None:
+            self._flush_func()
+        if not self._is_draining:
+            self._release_delayed_jobs()
+        if self._queued_jobs.num_unscheduled == 0:
             logger.debug("queue is empty; nothing to do")
             return
 
-        jobs_to_pop = []
-        available_jobs = self._queue_depth - len(self._outstanding_jobs)
-        if available_jobs == 0:
+        if self._is_draining:
+            logger.debug("queue is draining")
+            return
+
+        if self.is_full():
             logger.debug("queue is full")
             return
 
-        num_blocked = 0
-        for i, job in enumerate(self._queued_jobs):
-            blocking = job.get_blocking_jobs()
-            if blocking:
-                logger.debug("job %s is blocked by %s", job.name, blocking)
-                num_blocked += 1
+        num_started = self._run_ready_jobs()
+        logger.debug("Started %s jobs in process_queue; num_blocked=%s",
+                     num_started, self._queued_jobs.num_blocked)
+
+    def _run_ready_jobs(self):
+        num_started = 0
+        # Ready jobs that do not fit in the free resources
+        waiting_jobs = []
+        while not self._is_draining and not self.is_full() and \
+                self._queued_jobs.has_ready_jobs():
+            admission = self._resource_admission
+            if admission is not None and admission.is_full():
+                break
+            job = self._queued_jobs.pop_ready()
+            if self._can_start_func is not None and \
+                    not self._can_start_func(job):
+                self._queued_jobs.unschedule(job.name)
+                self.drain()
+                break
+            if admission is not None and \
+                    not admission.try_start(job, not waiting_jobs):
+                waiting_jobs.append(job)
+                if not admission.can_backfill():
+                    break
                 continue
-
             self._run_job(job)
-            jobs_to_pop.append(i)
-            if len(jobs_to_pop) >= available_jobs:
-                break
+            num_started += 1
 
-        for index in reversed(jobs_to_pop):
-            self._queued_jobs.pop(index)
+        # They keep their places in line.
+        for job in waiting_jobs:
+            self._queued_jobs.unschedule(job.name)
+        return num_started
 
-        logger.debug("Started %s jobs in process_queue; num_blocked=%s",
-                     len(jobs_to_pop), num_blocked)
+    def drain(self):
+        """Stop starting jobs. :meth:`wait` returns once the outstanding jobs
+        complete. Jobs that did not start are available through
+        :meth:`list_unstarted_jobs`.
+
+        """
+        if not self._is_draining:
+            # Jobs waiting to retry will not start either.
+            self._release_delayed_jobs(force=True)
+            logger.info("Drain the queue; %s jobs are outstanding and %s "
+                        "will not start", len(self._outstanding_jobs),
+                        self._queued_jobs.num_unscheduled)
+            self._is_draining = True
+
+    @property
+    def is_draining(self):
+        """Return True if the queue has stopped starting jobs."""
+        return self._is_draining
+
+    def list_unstarted_jobs(self):
+        """Return the submitted jobs that have not started.
+
+        Returns
+        -------
+        list
+
+        """
+        return list(self._queued_jobs.iter_unscheduled_jobs())
+
+    def terminate_outstanding_jobs(self):
+        """Ask all outstanding jobs to stop. They are still reported as
+        complete when they exit."""
+        for job in self._outstanding_jobs.values():
+            job.terminate()
 
     def run(self, jobs):
         """
@@ -148,8 +464,12 @@ class JobQueue:
             List of AsyncJobInterface objects to run.
 
         """
+        # Add all jobs before starting any so that the first jobs to start
+        # are chosen by priority rather than by position in the list.
         for job in jobs:
-            self.submit(job)
+            self._queued_jobs.add_job(job)
+        num_started = self._run_ready_jobs()
+        logger.debug("Started %s jobs in run", num_started)
 
         self.wait()
 
@@ -164,31 +484,46 @@ class JobQueue:
         job : AsyncJobInterface
 
         """
-        if self.is_full():
+        self._queued_jobs.add_job(job)
+        if self._is_draining:
+            logger.debug("queue is draining, queue job %s", job.name)
+        elif self.is_full():
             logger.debug("queue depth exceeded, queue job %s", job.name)
-            self._queued_jobs.append(job)
         elif job.get_blocking_jobs():
             logger.debug("Job is blocked by %s", job.get_blocking_jobs())
-            self._queued_jobs.append(job)
         else:
-            self._run_job(job)
-            logger.debug("Started job %s in submit", job.name)
+            num_started = self._run_ready_jobs()
+            logger.debug("Started %s jobs in submit", num_started)
 
     def wait(self):
         """Return once all jobs have completed."""
-        while self._outstanding_jobs or self._queued_jobs:
+        while self._has_pending_work():
             self.process_queue()
-            time.sleep(self._poll_interval)
+            if self._has_pending_work():
+                self.wait_for_completions()
 
         assert self._num_completed == self._num_jobs, \
             f"{self._num_completed} {self._num_jobs}"
 
         self._handle_monitor_func(force=True)
+        if self._notifier is not None:
+            self._notifier.close()
+            self._notifier = None
+
+    def _has_pending_work(self):
+        if self._outstanding_jobs:
+            return True
+        if self._is_draining:
+            return False
+        return self._queued_jobs.num_unscheduled > 0 or \
+            bool(self._delayed_jobs)
 
     @classmethod
     def run_jobs(cls, jobs, max_queue_depth,
                  poll_interval=DEFAULT_POLL_INTERVAL,
-                 monitor_func=None, monitor_interval=DEFAULT_MONITOR_INTERVAL):
+                 monitor_func=None, monitor_interval=DEFAULT_MONITOR_INTERVAL,
+                 completion_notification=False, flush_func=None,
+                 scheduling_policy=None, resource_admission=None):
         """
         Run job queue synchronously. Blocks until all jobs are complete.
 
@@ -205,11 +540,25 @@ class JobQueue:
             resource monitoring.
         monitor_interval : int
             Interval in seconds on which to run monitor_func.
+        completion_notification : bool
+            If True, start queued jobs as soon as a child process exits
+            instead of waiting for the next poll.
+        flush_func : callable
+            Optionally a function to call after each completion check.
+        scheduling_policy : SchedulingPolicyInterface | None
+            Orders the jobs that are ready to run.
+        resource_admission : ResourceAdmission | None
+            Limits the running jobs to the CPUs and memory of the node.
 
         """
         queue = cls(
             max_queue_depth,
             poll_interval=poll_interval,
             monitor_func=monitor_func,
+            monitor_interval=monitor_interval,
+            completion_notification=completion_notification,
+            flush_func=flush_func,
+            scheduling_policy=scheduling_policy,
+            resource_admission=resource_admission,
         )
         queue.run(jobs)
@@ -3,25 +3,49 @@
 import logging
 import os
 import shutil
+import socket
+import time
 import uuid
 
-from jade.common import JOBS_OUTPUT_DIR, OUTPUT_DIR, get_results_temp_filename
+from jade.common import JOBS_OUTPUT_DIR, OUTPUT_DIR, \
+    get_drained_jobs_filename, get_results_temp_filename
 from jade.enums import Status
+from jade.events import StructuredLogEvent, EVENT_CATEGORY_HPC, \
+    EVENT_NAME_HPC_ALLOCATION_DRAIN
 from jade.hpc.common import HpcType
 from jade.hpc.local_manager import LocalManager
 from jade.hpc.pbs_manager import PbsManager
 from jade.hpc.slurm_manager import SlurmManager
+from jade.jobs.concurrency_tuner import ConcurrencyTuner
 from jade.jobs.dispatchable_job import DispatchableJob
+from jade.jobs.job_limits import get_job_limits
 from jade.jobs.job_manager_base import JobManagerBase
 from jade.jobs.job_queue import JobQueue
-from jade.loggers import setup_logging
+from jade.jobs.job_worker_pool import JobWorkerPool
+from jade.jobs.pooled_dispatchable_job import PooledDispatchableJob
+from jade.jobs.resource_admission import create_resource_admission, \
+    get_resource_requirements
+from jade.jobs.runtime_history import RecentRuntimes
+from jade.jobs.scheduling_policy import create_scheduling_policy
+from jade.jobs.shared_job_queue import SharedJobQueue
+from jade.jobs.straggler_speculator import StragglerSpeculator
+from jade.loggers import log_event, setup_logging
 from jade.resource_monitor import ResourceMonitor
 from jade.jobs.results_aggregator import ResultsAggregator
 from jade.utils.timing_utils import timed_info
+from jade.utils.utils import dump_data
 
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_DRAIN_GRACE_PERIOD = 120
+# Seconds between shared queue claims while all pending jobs are blocked by
+# jobs running on other nodes
+SHARED_QUEUE_CLAIM_RETRY_INTERVAL = 2
+# Max seconds that a node holds completions before recording them in the
+# shared queue
+SHARED_QUEUE_COMPLETION_INTERVAL = 5
+
 
 class JobRunner(JobManagerBase):
     """Manages execution of jobs on a node."""
@@ -34,6 +58,7 @@ class JobRunner(JobManagerBase):
 
         self._intf, self._intf_type = self._create_node_interface()
         self._batch_id = batch_id
+        self._results_aggregator = None
         self._event_file = os.path.join(
             output,
             f"run_jobs_batch_{batch_id}_events.log",
@@ -47,15 +72,71 @@ class JobRunner(JobManagerBase):
                      batch_id)
 
     @timed_info
-    def run_jobs(self, verbose=False, num_processes=None):
+    def run_jobs(self, verbose=False, num_processes=None,
+                 use_worker_pool=False, max_jobs_per_worker=None,
+                 shared_job_queue=None, end_time=None,
+                 drain_grace_period=DEFAULT_DRAIN_GRACE_PERIOD,
+                 retry_policy=None, speculation_threshold=None,
+                 scheduling_policy_type=None, runtime_history=None,
+                 concurrency_bounds=None):
         """Run the jobs.
 
+        If the node allocation has an end time, jobs stop starting once they
+        are not expected to finish drain_grace_period seconds before it.
+        Jobs are expected to run for the median execution time of the jobs
+        that most recently completed on this node. Jobs still running at that time are
+        sent SIGTERM. The names of the jobs that did not start and that were
+        terminated are written to the file returned by
+        get_drained_jobs_filename so that the submitter can run them in a
+        new batch.
+
+        If the jobs or the config declare CPU and memory requirements, jobs
+        only start when they fit in the node's free CPUs and memory; see
+        ResourceAdmission. Jobs that exceed the limits declared by the jobs
+        or the config are stopped; see DispatchableJob. Limits are not
+        supported with a worker pool.
+
         Parameters
         ----------
         verbose : bool
             If True, enable debug logging.
         num_processes : int
             Number of processes to run in parallel; defaults to num CPUs
+        use_worker_pool : bool
+            If True, run jobs in long-lived worker processes that load the
+            extension once instead of starting a new process for each job.
+        max_jobs_per_worker : int | None
+            Replace a pooled worker after it runs this many jobs. None means
+            no limit.
+        shared_job_queue : str | None
+            If set, claim jobs from this SharedJobQueue file instead of
+            running the jobs in the config. Each chunk of claimed jobs is
+            serialized to its own job store in scratch. Other nodes may claim
+            jobs from the same file. Drained jobs are released back to the
+            queue.
+        end_time : float | None
+            End time of the node allocation in seconds since the epoch.
+            Defaults to the end time reported by the HPC.
+        drain_grace_period : int
+            Seconds before end_time by which jobs must complete.
+        retry_policy : RetryPolicy | None
+            If set, run failed jobs again on this node after a backoff.
+            Other jobs keep running in the meantime.
+        speculation_threshold : float | None
+            If set and the extension's jobs are idempotent, start a duplicate
+            of a job that has run for this many times the median execution
+            time once no other jobs are waiting to start. The first to
+            finish wins; see StragglerSpeculator.
+        scheduling_policy_type : SchedulingPolicyType | None
+            Order in which to start ready jobs. Defaults to the order in
+            which they become ready.
+        runtime_history : RuntimeHistory | None
+            Expected runtimes for the scheduling policy. Without it all jobs
+            are expected to run for the same time.
+        concurrency_bounds : tuple | None
+            If set, (min, max) number of parallel jobs. The number starts at
+            num_processes and is adjusted from the node's resource stats on
+            each monitor interval; see ConcurrencyTuner.
 
         Returns
         -------
@@ -66,14 +147,77 @@ class JobRunner(JobManagerBase):
         scratch_dir = self._create_local_scratch()
         are_inputs_local = self._intf_type == HpcType.LOCAL
 
+        pool = None
+
         try:
             config_file = self._config.serialize_for_execution(
                 scratch_dir, are_inputs_local)
 
-            jobs = self._generate_jobs(config_file, verbose)
-            result = self._run_jobs(jobs, num_processes=num_processes)
-            logger.info("Completed %s jobs", len(jobs))
+            if use_worker_pool:
+                pool = JobWorkerPool(
+                    config_file,
+                    self._jobs_output,
+                    max_jobs_per_worker=max_jobs_per_worker,
+                    verbose=verbose,
+                )
+            resource_admission = None
+            if shared_job_queue is None:
+                # Nodes that pull from a shared queue add the requirements of
+                # the jobs that they claim.
+                resource_admission = create_resource_admission(
+                    self._config.iter_jobs(),
+                    self._intf.get_num_cpus(),
+                    self._intf.get_memory_gb(),
+                    defaults=self._config.job_resource_defaults,
+                )
+            speculator = self._create_speculator(
+                speculation_threshold, scratch_dir, use_worker_pool,
+                resource_admission)
+            create_job = self._create_job_factory(
+                config_file, verbose, pool=pool, retry_policy=retry_policy,
+                speculative_output=None if speculator is None
+                else os.path.join(scratch_dir, JOBS_OUTPUT_DIR),
+            )
+            if end_time is None:
+                end_time = self._intf.get_allocation_end_time()
+            deadline = None
+            if end_time is not None:
+                deadline = _AllocationDeadline(end_time, drain_grace_period)
+                logger.info("Stop starting jobs that will not complete by %s",
+                            deadline.stop_time)
+            scheduling_policy = None
+            if scheduling_policy_type is not None:
+                scheduling_policy = create_scheduling_policy(
+                    scheduling_policy_type, self._config.iter_jobs(),
+                    runtime_history=runtime_history,
+                )
+            tuner = None
+            if concurrency_bounds is not None:
+                tuner = ConcurrencyTuner(
+                    f"concurrency_tuner_batch_{self._batch_id}",
+                    *concurrency_bounds)
+            if shared_job_queue is None:
+                jobs = [create_job(x) for x in self._config.iter_jobs()]
+                result = self._run_jobs(jobs, num_processes=num_processes,
+                                        deadline=deadline,
+                                        speculator=speculator,
+                                        scheduling_policy=scheduling_policy,
+                                        resource_admission=resource_admission,
+                                        tuner=tuner)
+                logger.info("Completed %s jobs", len(jobs))
+            else:
+                result = self._run_shared_jobs(
+                    create_job, SharedJobQueue(shared_job_queue), scratch_dir,
+                    num_processes=num_processes, deadline=deadline,
+                    speculator=speculator,
+                    scheduling_policy=scheduling_policy,
+                    tuner=tuner,
+                )
         finally:
+            if pool is not None:
+                pool.shutdown()
+                logger.info("Worker pool started %s workers",
+                            pool.num_workers_started)
             shutil.rmtree(scratch_dir)
 
         return result
@@ -110,25 +254,117 @@ class JobRunner(JobManagerBase):
         logger.debug("node manager type=%s", intf_type)
         return intf, intf_type
 
-    def _generate_jobs(self, config_file, verbose):
+    def _create_speculator(self, threshold, scratch_dir, use_worker_pool,
+                           resource_admission):
+        if threshold is None:
+            return None
+        if not self._config.job_execution_class().is_idempotent():
+            logger.info("Disable speculative execution; extension %s does "
+                        "not declare its jobs idempotent",
+                        self._config.extension_name)
+            return None
+        if use_worker_pool:
+            logger.info("Disable speculative execution; it is not supported "
+                        "with a worker pool")
+            return None
+        if resource_admission is not None:
+            logger.info("Disable speculative execution; duplicates would "
+                        "exceed the resources that jobs declare")
+            return None
+        logger.info("Start duplicates of jobs that run %s times longer than "
+                    "the median", threshold)
+        return StragglerSpeculator(threshold)
+
+    def _create_job_factory(self, config_file, verbose, pool=None,
+                            retry_policy=None, speculative_output=None):
+        """Return a function that creates the AsyncJobInterface object that
+        runs a JobParametersInterface object. The function accepts the config
+        file that contains the job if it is not config_file."""
         job_exec_class = self._config.job_execution_class()
         results_filename = get_results_temp_filename(
             self._output, self._batch_id
         )
-        results_aggregator = ResultsAggregator(results_filename)
-        results_aggregator.create_file()
+        # Jobs report results to this process, which writes them in batches.
+        self._results_aggregator = ResultsAggregator(results_filename)
+        self._results_aggregator.create_file()
+
+        limit_defaults = self._config.job_limit_defaults
+        if pool is not None:
+            warned = []
 
-        return [
-            DispatchableJob(
+            def create_pooled_job(job, job_config_file=None):
+                if not warned and (limit_defaults is not None or
+                                   job.get_limits() is not None):
+                    logger.warning("Job limits are not enforced with a "
+                                   "worker pool")
+                    warned.append(True)
+                return PooledDispatchableJob(job, pool, self._output,
+                                             self._results_aggregator,
+                                             retry_policy=retry_policy,
+                                             config_file=job_config_file)
+            return create_pooled_job
+
+        def create_job(job, job_config_file=None):
+            job_config_file = job_config_file or config_file
+            return DispatchableJob(
                 job,
                 job_exec_class.generate_command(
-                    job, self._jobs_output, config_file, verbose=verbose),
+                    job, self._jobs_output, job_config_file, verbose=verbose),
                 self._output,
-                results_filename
-            ) for job in self._config.iter_jobs()
-        ]
+                self._results_aggregator,
+                retry_policy=retry_policy,
+                speculative_cmd=None if speculative_output is None else
+                job_exec_class.generate_command(
+                    job, speculative_output, job_config_file,
+                    verbose=verbose),
+                speculative_output=speculative_output,
+                limits=get_job_limits(job, defaults=limit_defaults),
+            )
+        return create_job
+
+    def _create_queue(self, jobs_by_name, num_workers, monitor_func,
+                      deadline, speculator=None, completion_func=None,
+                      scheduling_policy=None, resource_admission=None,
+                      tuner=None):
+        def monitor():
+            stats = monitor_func()
+            if tuner is not None:
+                tuner.update(queue, stats)
+
+        def flush():
+            self._results_aggregator.flush_if_due()
+            if deadline is not None:
+                deadline.check(queue)
+            if speculator is not None:
+                speculator.check(queue)
+
+        def on_completion(names):
+            if deadline is not None:
+                deadline.record_completed_jobs(
+                    jobs_by_name[x] for x in names)
+            if speculator is not None:
+                speculator.record_completed_jobs(
+                    jobs_by_name[x] for x in names)
+            if completion_func is not None:
+                completion_func(names)
 
-    def _run_jobs(self, jobs, num_processes=None):
+        if tuner is not None:
+            num_workers = tuner.clamp(num_workers)
+        queue = JobQueue(
+            num_workers,
+            monitor_func=monitor,
+            completion_notification=True,
+            flush_func=flush,
+            completion_func=on_completion,
+            can_start_func=None if deadline is None else deadline.can_start,
+            scheduling_policy=scheduling_policy,
+            resource_admission=resource_admission,
+        )
+        return queue
+
+    def _run_jobs(self, jobs, num_processes=None, deadline=None,
+                  speculator=None, scheduling_policy=None,
+                  resource_admission=None, tuner=None):
         num_jobs = len(jobs)
         if num_processes is None:
             max_num_workers = self._intf.get_num_cpus()
@@ -142,26 +378,191 @@ class JobRunner(JobManagerBase):
         name = f"resource_monitor_batch_{self._batch_id}"
         resource_monitor = ResourceMonitor(name)
         # TODO: make this non-blocking so that we can report status.
-        JobQueue.run_jobs(
-            jobs,
-            max_queue_depth=num_workers,
-            monitor_func=resource_monitor.log_resource_stats,
-        )
+        queue = self._create_queue(
+            {x.name: x for x in jobs}, num_workers,
+            resource_monitor.log_resource_stats, deadline,
+            speculator=speculator, scheduling_policy=scheduling_policy,
+            resource_admission=resource_admission, tuner=tuner)
+        try:
+            queue.run(jobs)
+        finally:
+            self._results_aggregator.flush()
 
         logger.info("Jobs are complete. count=%s", num_jobs)
-        self._aggregate_events()
+        if queue.is_draining:
+            self._record_drained_jobs(queue, jobs, deadline)
+        self._aggregate_events(x.name for x in jobs)
         return Status.GOOD  # TODO
 
+    def _run_shared_jobs(self, create_job, shared_queue, scratch_dir,
+                         num_processes=None, deadline=None, speculator=None,
+                         scheduling_policy=None, tuner=None):
+        """Claim jobs from the shared queue until it is empty.
+
+        Jobs are claimed in chunks of num_workers once the jobs claimed
+        before have all started, so the node takes the lock about once per
+        num_workers jobs. Each chunk is serialized to its own job store and
+        config file, so a job process does not load the full job store, and
+        the resource requirements of its jobs are added to the queue's
+        admission. Completions are recorded when num_workers have
+        accumulated, before each claim, and at least every
+        SHARED_QUEUE_COMPLETION_INTERVAL seconds so that jobs that they
+        block can run on other nodes.
+
+        """
+        if num_processes is None:
+            num_workers = self._intf.get_num_cpus()
+        else:
+            num_workers = num_processes
+        owner = f"{socket.gethostname()}_batch_{self._batch_id}"
+        logger.info("Pull jobs from %s on %s workers as %s.",
+                    shared_queue.filename, num_workers, owner)
+        self._intf.log_environment_variables()
+
+        chunk_size = num_workers
+        jobs_by_name = {}
+        completed_jobs = []
+        run_jobs = []
+        name = f"resource_monitor_batch_{self._batch_id}"
+        resource_monitor = ResourceMonitor(name)
+        queue = self._create_queue(
+            jobs_by_name, num_workers, resource_monitor.log_resource_stats,
+            deadline, speculator=speculator,
+            completion_func=completed_jobs.extend,
+            scheduling_policy=scheduling_policy,
+            tuner=tuner,
+        )
+
+        def record_completions():
+            # Terminated jobs did not complete; they are released below.
+            shared_queue.complete(
+                [x for x in completed_jobs
+                 if not jobs_by_name[x].is_terminated],
+                owner,
+            )
+            completed_jobs.clear()
+
+        try:
+            num_pending = None
+            num_chunks = 0
+            next_claim_time = 0
+            last_record_time = time.time()
+            while True:
+                now = time.time()
+                if queue.is_draining:
+                    num_pending = 0
+                can_claim = num_pending != 0 and now >= next_claim_time and \
+                    queue.num_available_slots > 0
+                if completed_jobs and (
+                        can_claim or len(completed_jobs) >= chunk_size or
+                        now - last_record_time >=
+                        SHARED_QUEUE_COMPLETION_INTERVAL):
+                    record_completions()
+                    last_record_time = now
+                if can_claim:
+                    names, num_pending = shared_queue.claim(
+                        max(queue.num_available_slots, chunk_size), owner)
+                    if not names:
+                        # Pending jobs are blocked by jobs on other nodes.
+                        next_claim_time = \
+                            now + SHARED_QUEUE_CLAIM_RETRY_INTERVAL
+                    else:
+                        jobs = self._load_claimed_jobs(shared_queue, names)
+                        config_file = \
+                            self._config.serialize_jobs_for_execution(
+                                os.path.join(scratch_dir,
+                                             f"claimed_{num_chunks}"),
+                                jobs)
+                        num_chunks += 1
+                        self._add_resource_requirements(queue, jobs)
+                        for job in jobs:
+                            async_job = create_job(job, config_file)
+                            jobs_by_name[job.name] = async_job
+                            queue.submit(async_job)
+                            run_jobs.append(async_job)
+                if num_pending == 0 and queue.num_outstanding_jobs == 0 and \
+                        queue.num_retrying_jobs == 0:
+                    break
+                queue.wait_for_completions()
+                queue.process_queue()
+            queue.wait()
+        finally:
+            record_completions()
+            self._results_aggregator.flush()
+
+        logger.info("Shared queue is empty. Ran %s jobs.", len(run_jobs))
+        if queue.is_draining:
+            names = self._record_drained_jobs(queue, run_jobs, deadline)
+            shared_queue.release(names)
+        self._aggregate_events(x.name for x in run_jobs)
+        return Status.GOOD
+
+    def _load_claimed_jobs(self, shared_queue, names):
+        parameters_class = self._config.get_parameters_class()
+        jobs = []
+        for record in shared_queue.get_job_records(names):
+            job = parameters_class.deserialize(record)
+            # The shared queue only hands out jobs whose blocking jobs have
+            # completed, possibly on other nodes.
+            for blocking_job in list(job.get_blocking_jobs()):
+                job.remove_blocking_job(blocking_job)
+            jobs.append(job)
+        return jobs
+
+    def _add_resource_requirements(self, queue, jobs):
+        defaults = self._config.job_resource_defaults
+        if queue.resource_admission is None:
+            queue.resource_admission = create_resource_admission(
+                jobs,
+                self._intf.get_num_cpus(),
+                self._intf.get_memory_gb(),
+                defaults=defaults,
+            )
+        else:
+            queue.resource_admission.add_requirements(
+                get_resource_requirements(jobs, defaults=defaults))
+
+    def _record_drained_jobs(self, queue, jobs, deadline):
+        """Record the jobs that did not run because the allocation is ending.
+
+        Returns
+        -------
+        list
+            names of the jobs
+
+        """
+        unstarted = [x.name for x in queue.list_unstarted_jobs()]
+        terminated = [x.name for x in jobs if x.is_terminated]
+        filename = get_drained_jobs_filename(self._output, self._batch_id)
+        dump_data({"unstarted": unstarted, "terminated": terminated},
+                  filename)
+        logger.info("Allocation is ending; %s jobs did not start and %s "
+                    "were terminated. Recorded them in %s", len(unstarted),
+                    len(terminated), filename)
+        event = StructuredLogEvent(
+            source=f"batch_{self._batch_id}",
+            category=EVENT_CATEGORY_HPC,
+            name=EVENT_NAME_HPC_ALLOCATION_DRAIN,
+            message="Drained jobs before the end of the allocation",
+            end_time=deadline.end_time if deadline else None,
+            estimated_runtime_s=deadline.estimate_runtime() if deadline
+            else None,
+            num_unstarted=len(unstarted),
+            num_terminated=len(terminated),
+        )
+        log_event(event)
+        return unstarted + terminated
+
     @timed_info
-    def _aggregate_events(self):
+    def _aggregate_events(self, job_names):
         # Aggregate all job events.log files into this node's log file so
         # that the master can more quickly make events.json later.
         for handler in self._event_logger.handlers:
             handler.close()
         with open(self._event_file, "a") as f_out:
-            for job in self._config.iter_jobs():
+            for name in job_names:
                 job_file = os.path.join(
-                    self._output, JOBS_OUTPUT_DIR, job.name, "events.log"
+                    self._output, JOBS_OUTPUT_DIR, name, "events.log"
                 )
                 if not os.path.exists(job_file):
                     # Extensions aren't required to create these.
@@ -172,3 +573,58 @@ class JobRunner(JobManagerBase):
                 os.remove(job_file)
                 logger.debug("Moved contents of %s to %s", job_file,
                              self._event_file)
+
+
+class _AllocationDeadline:
+    """Decides when a node must stop starting jobs and terminate running
+    jobs because its allocation is about to end."""
+    def __init__(self, end_time, grace_period_s):
+        self._end_time = end_time
+        self._grace_period_s = grace_period_s
+        self._runtimes = RecentRuntimes()
+        self._has_terminated = False
+
+    @property
+    def end_time(self):
+        """Return the end time of the allocation."""
+        return self._end_time
+
+    @property
+    def stop_time(self):
+        """Return the time by which jobs must complete."""
+        return self._end_time - self._grace_period_s
+
+    def record_completed_jobs(self, jobs):
+        """Record the execution times of completed jobs."""
+        self._runtimes.record_completed_jobs(jobs)
+
+    def estimate_runtime(self):
+        """Return the expected runtime of the next job. Jobs are assumed to
+        be fast until one completes.
+
+        Returns
+        -------
+        float
+
+        """
+        median = self._runtimes.median
+        return 0.0 if median is None else median
+
+    def can_start(self, job):
+        """Return True if the job is expected to complete in time."""
+        can_start = time.time() + self.estimate_runtime() <= self.stop_time
+        if not can_start:
+            logger.info("Job %s is not expected to complete before %s",
+                        job.name, self.stop_time)
+        return can_start
+
+    def check(self, queue):
+        """Drain the queue and terminate its jobs if the stop time has
+        passed."""
+        if self._has_terminated or time.time() < self.stop_time:
+            return
+        logger.info("Terminate outstanding jobs; the allocation ends at %s",
+                    self._end_time)
+        queue.drain()
+        queue.terminate_outstanding_jobs()
+        self._has_terminated = True
@@ -0,0 +1,157 @@
+"""Stores serialized jobs in one packed file."""
+
+import json
+import logging
+import mmap
+import os
+
+from jade.exceptions import InvalidParameter
+from jade.utils.utils import ExtendedJSONEncoder
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """Packs serialized jobs into one data file with an offset index.
+
+    The data file contains one JSON record per line. The index maps each job
+    name to the offset and length of its record. Readers memory-map the data
+    file and read a record by slicing, so looking up a job costs no metadata
+    operations beyond opening the store once.
+
+    """
+    DATA_FILENAME = "jobs.dat"
+    INDEX_FILENAME = "jobs_index.json"
+
+    def __init__(self, directory):
+        """Open an existing store.
+
+        Parameters
+        ----------
+        directory : str
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if the directory does not contain a store.
+
+        """
+        self._directory = directory
+        index_file = os.path.join(directory, self.INDEX_FILENAME)
+        if not os.path.exists(index_file):
+            raise InvalidParameter(f"{directory} does not contain a job store")
+
+        with open(index_file) as f_in:
+            self._index = json.load(f_in)
+
+        self._file = open(os.path.join(directory, self.DATA_FILENAME), "rb")
+        if self._index:
+            self._data = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        else:
+            # mmap does not allow empty files.
+            self._data = b""
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __del__(self):
+        self.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    @classmethod
+    def create(cls, directory, jobs):
+        """Create a store from jobs.
+
+        Parameters
+        ----------
+        directory : str
+        jobs : iterable
+            JobParametersInterface objects
+
+        Returns
+        -------
+        JobStore
+
+        """
+        os.makedirs(directory, exist_ok=True)
+        index = {}
+        offset = 0
+        data_file = os.path.join(directory, cls.DATA_FILENAME)
+        with open(data_file, "wb") as f_out:
+            for job in jobs:
+                record = json.dumps(
+                    job.serialize(), cls=ExtendedJSONEncoder
+                ).encode("utf-8") + b"\n"
+                f_out.write(record)
+                index[job.name] = [offset, len(record)]
+                offset += len(record)
+
+        with open(os.path.join(directory, cls.INDEX_FILENAME), "w") as f_out:
+            json.dump(index, f_out)
+
+        logger.debug("Created job store in %s with %s jobs", directory,
+                     len(index))
+        return cls(directory)
+
+    @staticmethod
+    def exists(directory):
+        """Return True if the directory contains a store.
+
+        Returns
+        -------
+        bool
+
+        """
+        return os.path.exists(os.path.join(directory, JobStore.INDEX_FILENAME))
+
+    def close(self):
+        """Release the file handles."""
+        if getattr(self, "_file", None) is None:
+            return
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+        self._file = None
+
+    @property
+    def directory(self):
+        """Return the directory containing the store."""
+        return self._directory
+
+    def get_record(self, name):
+        """Return the serialized data for a job.
+
+        Parameters
+        ----------
+        name : str
+
+        Returns
+        -------
+        dict
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if the job is not stored.
+
+        """
+        entry = self._index.get(name)
+        if entry is None:
+            raise InvalidParameter(f"job {name} is not stored in {self._directory}")
+
+        offset, length = entry
+        return json.loads(self._data[offset:offset + length])
+
+    def iter_names(self):
+        """Yield the names of the stored jobs in storage order.
+
+        Yields
+        ------
+        str
+
+        """
+        return iter(self._index)
@@ -1,6 +1,6 @@
 """Provides ability to run jobs locally or on HPC."""
 
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 import datetime
 import fileinput
 import importlib
@@ -11,21 +11,25 @@ import time
 
 import jade
 from jade.common import CONFIG_FILE, JOBS_OUTPUT_DIR, OUTPUT_DIR, \
-    RESULTS_FILE
+    RESULTS_FILE, RESULTS_DB_FILE
 from jade.enums import Status
 from jade.events import EVENTS_FILENAME, EVENT_NAME_ERROR_LOG, \
     StructuredLogEvent, EVENT_CATEGORY_ERROR, EVENT_CATEGORY_RESOURCE_UTIL, \
     EVENT_NAME_BYTES_CONSUMED, EVENT_NAME_CONFIG_EXEC_SUMMARY
 from jade.exceptions import InvalidParameter
-from jade.extensions.registry import Registry, ExtensionClassType
+from jade.extensions.registry import Registry
+from jade.hpc.batch_packer import DEFAULT_SAFETY_MARGIN
 from jade.hpc.common import HpcType
 from jade.hpc.hpc_manager import HpcManager
-from jade.hpc.hpc_submitter import HpcSubmitter
+from jade.hpc.hpc_submitter import HpcSubmitter, DEFAULT_MAX_ARRAY_SIZE, \
+    DEFAULT_MAX_LOST_JOB_RETRIES
 from jade.jobs.job_manager_base import JobManagerBase
 from jade.jobs.job_runner import JobRunner
+from jade.jobs.ndjson_config import is_ndjson_config, get_ndjson_suffix
 from jade.jobs.results_aggregator import ResultsAggregatorSummary
 from jade.loggers import log_event
 from jade.result import serialize_results
+from jade.results_database import ResultsDatabase
 from jade.utils.repository_info import RepositoryInfo
 from jade.utils.subprocess_manager import run_command
 from jade.utils.utils import dump_data, get_directory_size_bytes
@@ -44,6 +48,117 @@ DEFAULTS = {
     "bpp_per_node_batch_size": 500,
 }
 
+_SUBMISSION_OPTIONS = (
+    ("name", "job"),
+    ("per_node_batch_size", DEFAULTS["per_node_batch_size"]),
+    ("max_nodes", DEFAULTS["max_nodes"]),
+    ("force_local", False),
+    ("verbose", False),
+    ("poll_interval", DEFAULTS["poll_interval"]),
+    ("status_ttl", None),
+    ("num_processes", None),
+    ("reports", True),
+    ("try_add_blocked_jobs", False),
+    ("use_worker_pool", False),
+    ("max_jobs_per_worker", None),
+    ("results_db", True),
+    ("use_job_arrays", False),
+    ("max_array_size", DEFAULT_MAX_ARRAY_SIZE),
+    ("nodes_per_allocation", 1),
+    ("use_shared_queue", False),
+    ("runtime_history", None),
+    ("cpus_per_node", None),
+    ("walltime_safety_margin", DEFAULT_SAFETY_MARGIN),
+    ("fallback_runtime_s", None),
+    ("adaptive_nodes", False),
+    ("max_nodes_limit", None),
+    ("max_lost_job_retries", DEFAULT_MAX_LOST_JOB_RETRIES),
+    ("retry_policy", None),
+    ("speculation_threshold", None),
+    ("scheduling_policy_type", None),
+    ("concurrency_bounds", None),
+)
+
+
+class SubmissionOptions(namedtuple(
+        "SubmissionOptions", [x[0] for x in _SUBMISSION_OPTIONS],
+        defaults=[x[1] for x in _SUBMISSION_OPTIONS])):
+    """Options that control how jobs are submitted and run. Build it once,
+    such as from CLI options, and pass it to
+    :meth:`JobSubmitter.submit_jobs`. Omitted fields take their defaults.
+
+    Attributes
+    ----------
+    name : str
+        batch name, applies to HPC job submission only
+    per_node_batch_size : int
+        Number of jobs to run on one node in one batch.
+    max_nodes : int
+        Max number of node submission requests to make in parallel.
+    force_local : bool
+        If on HPC, run jobs through subprocess as if local.
+    verbose : bool
+        Enable debug logging.
+    poll_interval : float
+        Inteval in seconds on which to poll jobs.
+    status_ttl : float | None
+        Seconds for which HPC job statuses are cached; defaults to
+        poll_interval.
+    num_processes : int | None
+        Number of processes to run in parallel; defaults to num CPUs
+    reports : bool
+        If True, generate reports after execution.
+    try_add_blocked_jobs : bool
+        If True, add blocked jobs to a node's batch if they are blocked by
+        jobs already in the batch.
+    use_worker_pool : bool
+        If True, run jobs in long-lived worker processes.
+    max_jobs_per_worker : int | None
+        Replace a pooled worker after it runs this many jobs.
+    results_db : bool
+        If True, also write the results to an indexed SQLite database.
+    use_job_arrays : bool
+        If True, submit batches to SLURM as job arrays.
+    max_array_size : int
+        Max number of tasks in one job array.
+    nodes_per_allocation : int
+        Number of nodes to request in each SLURM allocation. Each node
+        runs its own batch.
+    use_shared_queue : bool
+        If True, nodes pull jobs from a shared queue file instead of
+        running fixed batches.
+    runtime_history : RuntimeHistory | None
+        If set, pack HPC batches by the jobs' previous execution times
+        so that each is predicted to finish within the walltime.
+    cpus_per_node : int | None
+        Number of jobs a node runs in parallel when packing batches.
+        num_processes takes precedence.
+    walltime_safety_margin : float
+        Fraction of the walltime to leave unused when packing batches.
+    fallback_runtime_s : float | None
+        Runtime to assume for jobs without history.
+    adaptive_nodes : bool
+        If True, adjust max_nodes and per_node_batch_size on HPC from
+        observed queue waits.
+    max_nodes_limit : int | None
+        Upper bound on concurrent nodes with adaptive_nodes.
+    max_lost_job_retries : int
+        Number of times to resubmit a job whose HPC batch completed
+        without its result.
+    retry_policy : RetryPolicy | None
+        If set, run failed jobs again on the same node after a backoff.
+    speculation_threshold : float | None
+        If set, duplicate jobs of idempotent extensions that run this
+        many times longer than the median job.
+    scheduling_policy_type : SchedulingPolicyType | None
+        Order in which to run ready jobs. Expected runtimes come from
+        runtime_history.
+    concurrency_bounds : tuple | None
+        If set, (min, max) number of parallel jobs on each node, adjusted
+        from the node's resource stats.
+
+    """
+
 
 class JobSubmitter(JobManagerBase):
     """Submits jobs for execution locally or on an HPC."""
@@ -68,6 +183,10 @@ class JobSubmitter(JobManagerBase):
         super(JobSubmitter, self).__init__(config_file, output)
         self._hpc = None
         master_file = os.path.join(output, CONFIG_FILE)
+        if is_ndjson_config(config_file):
+            # Keep the format so that jobs are still streamed from the copy.
+            master_file = os.path.splitext(master_file)[0] + \
+                get_ndjson_suffix(config_file)
         shutil.copyfile(config_file, master_file)
         self._config_file = master_file
         logger.debug("Copied %s to %s", config_file, master_file)
@@ -89,44 +208,24 @@ results_summary={self.get_results_summmary_report()}"""
         """Cancel running and pending jobs."""
         # TODO
 
-    def submit_jobs(self,
-                    name="job",
-                    per_node_batch_size=DEFAULTS["per_node_batch_size"],
-                    max_nodes=DEFAULTS["max_nodes"],
-                    force_local=False,
-                    verbose=False,
-                    poll_interval=DEFAULTS["poll_interval"],
-                    num_processes=None,
-                    previous_results=None,
-                    reports=True,
-                    try_add_blocked_jobs=False):
+    def submit_jobs(self, options=None, previous_results=None):
         """Submit simulations. Auto-detect whether the current system is an HPC
         and submit to its queue. Otherwise, run locally.
 
         Parameters
         ----------
-        name : str
-            batch name, applies to HPC job submission only
-        per_node_batch_size : int
-            Number of jobs to run on one node in one batch.
-        max_nodes : int
-            Max number of node submission requests to make in parallel.
-        force_local : bool
-            If on HPC, run jobs through subprocess as if local.
-        wait : bool
-            Don't return until HPC jobs have finished.
-        verbose : bool
-            Enable debug logging.
-        poll_interval : int
-            Inteval in seconds on which to poll jobs.
-        num_processes : int
-            Number of processes to run in parallel; defaults to num CPUs
+        options : SubmissionOptions | None
+            Defaults to SubmissionOptions().
+        previous_results : list | None
+            Results of a previous run to add to the results of this one.
 
         Returns
         -------
         Status
 
         """
+        if options is None:
+            options = SubmissionOptions()
         logger.info("Submit %s jobs for execution.",
                     self._config.get_num_jobs())
         logger.info("JADE version %s", jade.version.__version__)
@@ -135,7 +234,8 @@ results_summary={self.get_results_summmary_report()}"""
         logger.info("Registered modules for logging: %s", ", ".join(loggers))
         self._save_repository_info(registry)
 
-        self._config.check_job_dependencies()
+        self._config.check_job_dependencies(
+            runtime_history=options.runtime_history)
 
         self._hpc = HpcManager(self._hpc_config_file, self._output)
         result = Status.GOOD
@@ -146,14 +246,20 @@ results_summary={self.get_results_summmary_report()}"""
             os.remove(events_file)
 
         start_time = time.time()
-        if self._hpc.hpc_type == HpcType.LOCAL or force_local:
+        if self._hpc.hpc_type == HpcType.LOCAL or options.force_local:
             runner = JobRunner(self._config_file, output=self._output)
             result = runner.run_jobs(
-                verbose=verbose, num_processes=num_processes)
+                verbose=options.verbose,
+                num_processes=options.num_processes,
+                use_worker_pool=options.use_worker_pool,
+                max_jobs_per_worker=options.max_jobs_per_worker,
+                retry_policy=options.retry_policy,
+                speculation_threshold=options.speculation_threshold,
+                scheduling_policy_type=options.scheduling_policy_type,
+                runtime_history=options.runtime_history,
+                concurrency_bounds=options.concurrency_bounds)
         else:
-            self._submit_to_hpc(name, max_nodes, per_node_batch_size, verbose,
-                                poll_interval, num_processes,
-                                try_add_blocked_jobs)
+            self._submit_to_hpc(options)
 
         results_summary = ResultsAggregatorSummary(self._results_dir)
         self._results = results_summary.get_results()
@@ -167,7 +273,10 @@ results_summary={self.get_results_summmary_report()}"""
         if previous_results:
             self._results += previous_results
 
-        self.write_results(RESULTS_FILE)
+        self.write_results(
+            RESULTS_FILE,
+            db_filename=RESULTS_DB_FILE if options.results_db else None,
+        )
         results_summary.delete_files()
         shutil.rmtree(self._results_dir)
 
@@ -193,13 +302,22 @@ results_summary={self.get_results_summmary_report()}"""
         )
         log_event(event)
 
-        if reports:
+        if options.reports:
             self.generate_reports(self._output)
 
         return result
 
-    def write_results(self, filename):
-        """Write the results to filename in the output directory."""
+    def write_results(self, filename, db_filename=None):
+        """Write the results to filename in the output directory.
+
+        Parameters
+        ----------
+        filename : str
+        db_filename : str | None
+            If set, also write the results to this SQLite database in the
+            output directory. Readers prefer the database when it exists.
+
+        """
         data = OrderedDict()
         data["jade_version"] = jade.version.__version__
         now = datetime.datetime.now()
@@ -214,8 +332,17 @@ results_summary={self.get_results_summmary_report()}"""
 
         output_file = os.path.join(self._output, filename)
         dump_data(data, output_file)
-
         logger.info("Wrote results to %s.", output_file)
+
+        db_file = os.path.join(self._output, db_filename or RESULTS_DB_FILE)
+        if db_filename is not None:
+            metadata = {k: v for k, v in data.items() if k != "results"}
+            ResultsDatabase.create(db_file, self._results, metadata).close()
+            logger.info("Wrote results to %s.", db_file)
+        elif os.path.exists(db_file):
+            # A database from a previous run would shadow the new results.
+            os.remove(db_file)
+
         num_failed = results["summary"]["num_failed"]
         log_func = logger.info if num_failed == 0 else logger.warning
         log_func("Successful=%s Failed=%s Total=%s",
@@ -247,8 +374,7 @@ results_summary={self.get_results_summmary_report()}"""
         extensions = registry.list_extensions()
         extension_packages = set(["jade"])
         for ext in extensions:
-            exec_module = ext[ExtensionClassType.EXECUTION].__module__
-            name = exec_module.split(".")[0]
+            name = ext["job_execution_module"].split(".")[0]
             extension_packages.add(name)
 
         for name in extension_packages:
@@ -341,25 +467,15 @@ results_summary={self.get_results_summmary_report()}"""
         logger.info("Generated reports %s.", " ".join(reports))
         return 0
 
-    def _submit_to_hpc(self, name, max_nodes, per_node_batch_size, verbose,
-                       poll_interval, num_processes, try_add_blocked_jobs):
-        queue_depth = max_nodes
+    def _submit_to_hpc(self, options):
         hpc_submitter = HpcSubmitter(
-            name,
+            options.name,
             self._config,
             self._config_file,
             self._hpc_config_file,
             self._results_dir,
         )
 
-        hpc_submitter.run(
-            self._output,
-            queue_depth,
-            per_node_batch_size,
-            num_processes,
-            poll_interval=poll_interval,
-            try_add_blocked_jobs=try_add_blocked_jobs,
-            verbose=verbose,
-        )
+        hpc_submitter.run(self._output, options)
 
         logger.info("All submitters have completed.")
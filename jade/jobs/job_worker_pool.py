@@ -0,0 +1,373 @@
+"""Defines a pool of long-lived worker processes that run jobs in-process."""
+
+from collections import deque
+import logging
+import multiprocessing
+import os
+
+from jade.events import StructuredErrorLogEvent, EVENT_CATEGORY_ERROR, \
+    EVENT_NAME_UNHANDLED_ERROR
+from jade.jobs.job_configuration_factory import create_config_from_file
+from jade.jobs.process_tree import get_process_tree, signal_process_tree
+from jade.jobs.job_post_process import JobPostProcess
+from jade.loggers import log_event, setup_logging
+
+
+logger = logging.getLogger(__name__)
+
+# Return code reported for a job whose worker exited without reporting a
+# result and without an exit code.
+WORKER_CRASH_RETURN_CODE = 1
+
+
+class JobWorkerPool:
+    """Manages worker processes that each load the configuration and extension
+    once and then run many jobs.
+
+    Workers are started on demand and returned to the pool after each job.
+    A worker is retired after it runs max_jobs_per_worker jobs or if it exits
+    unexpectedly; a new worker replaces it on the next request.
+
+    """
+    def __init__(self, config_file, output, max_jobs_per_worker=None,
+                 verbose=False):
+        """
+        Parameters
+        ----------
+        config_file : str
+            Configuration file serialized for execution.
+        output : str
+            Job output directory.
+        max_jobs_per_worker : int | None
+            Recycle a worker after it has run this many jobs. None means no
+            limit.
+        verbose : bool
+            Enable debug logging in the jobs.
+
+        """
+        if max_jobs_per_worker is not None and max_jobs_per_worker < 1:
+            raise ValueError(
+                f"max_jobs_per_worker must be at least 1: {max_jobs_per_worker}"
+            )
+        self._config_file = config_file
+        self._output = output
+        self._max_jobs_per_worker = max_jobs_per_worker
+        self._verbose = verbose
+        self._idle_workers = deque()
+        self._busy_workers = set()
+        self._num_workers_started = 0
+        self._num_workers_recycled = 0
+
+    def acquire(self):
+        """Return an idle worker, starting a new one if necessary.
+
+        Returns
+        -------
+        JobWorker
+
+        """
+        while self._idle_workers:
+            worker = self._idle_workers.popleft()
+            if worker.is_alive():
+                self._busy_workers.add(worker)
+                return worker
+            logger.warning("Idle worker pid=%s exited unexpectedly",
+                           worker.pid)
+            self._retire(worker)
+
+        worker = JobWorker(self._config_file, self._output,
+                           self._max_jobs_per_worker, self._verbose)
+        self._num_workers_started += 1
+        self._busy_workers.add(worker)
+        logger.debug("Started worker pid=%s", worker.pid)
+        return worker
+
+    def release(self, worker):
+        """Return a worker to the pool after its job has completed.
+
+        Parameters
+        ----------
+        worker : JobWorker
+
+        """
+        self._busy_workers.remove(worker)
+        if worker.is_exhausted or not worker.is_alive():
+            self._retire(worker)
+        else:
+            self._idle_workers.append(worker)
+
+    def _retire(self, worker):
+        worker.stop()
+        self._num_workers_recycled += 1
+        logger.debug("Retired worker pid=%s num_jobs=%s exitcode=%s",
+                     worker.pid, worker.num_jobs, worker.exitcode)
+
+    @property
+    def num_workers_started(self):
+        """Return the number of worker processes started by the pool.
+
+        Returns
+        -------
+        int
+
+        """
+        return self._num_workers_started
+
+    @property
+    def num_workers_recycled(self):
+        """Return the number of worker processes retired by the pool.
+
+        Returns
+        -------
+        int
+
+        """
+        return self._num_workers_recycled
+
+    def shutdown(self):
+        """Stop all workers."""
+        for worker in list(self._idle_workers) + list(self._busy_workers):
+            worker.stop()
+        self._idle_workers.clear()
+        self._busy_workers.clear()
+
+
+class JobWorker:
+    """Parent-side handle for one worker process."""
+    def __init__(self, config_file, output, max_jobs, verbose):
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._max_jobs = max_jobs
+        self._num_jobs = 0
+        self._process = multiprocessing.Process(
+            target=_run_worker,
+            args=(child_conn, config_file, output, max_jobs, verbose),
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+
+    def fileno(self):
+        """Return the file descriptor that becomes readable when a job
+        completes or the worker exits.
+
+        Returns
+        -------
+        int
+
+        """
+        return self._conn.fileno()
+
+    def is_alive(self):
+        """Return True if the worker process is running.
+
+        Returns
+        -------
+        bool
+
+        """
+        return self._process.is_alive()
+
+    @property
+    def exitcode(self):
+        """Return the exit code of the worker process."""
+        return self._process.exitcode
+
+    @property
+    def is_exhausted(self):
+        """Return True if the worker has run its maximum number of jobs.
+
+        Returns
+        -------
+        bool
+
+        """
+        return self._max_jobs is not None and self._num_jobs >= self._max_jobs
+
+    @property
+    def num_jobs(self):
+        """Return the number of jobs started on this worker.
+
+        Returns
+        -------
+        int
+
+        """
+        return self._num_jobs
+
+    @property
+    def pid(self):
+        """Return the process ID of the worker."""
+        return self._process.pid
+
+    def start_job(self, name, config_file=None):
+        """Start a job in the worker.
+
+        Parameters
+        ----------
+        name : str
+        config_file : str | None
+            Config file that contains the job. Defaults to the pool's config
+            file.
+
+        """
+        assert not self.is_exhausted
+        self._conn.send((name, config_file))
+        self._num_jobs += 1
+
+    def poll(self):
+        """Check whether the current job has completed.
+
+        Returns
+        -------
+        int | None
+            Return code of the job or None if it is still running.
+
+        """
+        is_alive = self._process.is_alive()
+        try:
+            # Check the pipe after the process state so that a result sent
+            # just before a normal exit is not mistaken for a crash.
+            if self._conn.poll():
+                return self._conn.recv()
+        except (EOFError, OSError):
+            # The worker exited before it sent a result.
+            is_alive = False
+
+        if is_alive:
+            return None
+
+        self._process.join()
+        logger.error("Worker pid=%s exited while running a job; exitcode=%s",
+                     self._process.pid, self._process.exitcode)
+        ret = self._process.exitcode
+        if not ret:
+            ret = WORKER_CRASH_RETURN_CODE
+        return ret
+
+    def terminate(self):
+        """Send SIGTERM to the worker process and its descendants, which
+        stops the current job. :meth:`poll` then reports the job's return
+        code, and the pool retires the worker when it is released.
+
+        """
+        signal_process_tree(get_process_tree(self._process.pid))
+
+    def stop(self):
+        """Stop the worker process."""
+        if self._process.is_alive():
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._process.join()
+        self._conn.close()
+
+
+def _run_worker(conn, config_file, output, max_jobs, verbose):
+    pool_config_file = config_file
+    config = create_config_from_file(config_file)
+    num_jobs = 0
+    while max_jobs is None or num_jobs < max_jobs:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        name, job_config_file = request
+        job_config_file = job_config_file or pool_config_file
+        if job_config_file != config_file:
+            # Nodes that pull jobs from a shared queue serialize each chunk
+            # of claimed jobs to its own config file.
+            config_file = job_config_file
+            config = create_config_from_file(config_file)
+        ret = run_job_in_process(config, config_file, name, output, verbose)
+        conn.send(ret)
+        num_jobs += 1
+
+    conn.close()
+
+
+def run_job_in_process(config, config_file, name, output, verbose):
+    """Run one job in the current process with the same log and event files
+    that `jade-internal run` would create.
+
+    Parameters
+    ----------
+    config : JobConfiguration
+    config_file : str
+    name : str
+        job name
+    output : str
+        job output directory
+    verbose : bool
+
+    Returns
+    -------
+    int
+        return code
+
+    """
+    level = logging.DEBUG if verbose else logging.INFO
+    job_dir = os.path.join(output, name)
+    os.makedirs(job_dir, exist_ok=True)
+    log_file = os.path.join(job_dir, "run.log")
+    general_logger = setup_logging(
+        config.extension_name, log_file, console_level=logging.ERROR,
+        file_level=level,
+    )
+    event_file = os.path.join(job_dir, "events.log")
+    setup_logging("event", event_file, console_level=level, file_level=level)
+
+    try:
+        job = config.get_job(name)
+        execution = config.job_execution_class().create(
+            config.get_job_inputs(), job, output
+        )
+        ret = execution.run()
+        if ret is None:
+            ret = 0
+    except Exception as err:
+        msg = f"unexpected exception in run '{config.extension_name}' " \
+              f"job={name} - {err}"
+        general_logger.exception(msg)
+        _log_unhandled_error(name, msg)
+        ret = 1
+
+    if ret == 0 and config.job_post_process_config is not None:
+        try:
+            post_process_config = config.job_post_process_config
+            post_process = JobPostProcess(
+                module_name=post_process_config["module"],
+                class_name=post_process_config["class"],
+                data=post_process_config["data"],
+                job_name=name,
+                output=output,
+            )
+            post_process.run(config_file=config_file, output=output)
+        except Exception as err:
+            msg = f"unexpected exception in post-process " \
+                  f"'{config.extension_name}' job={name} - {err}"
+            general_logger.exception(msg)
+            _log_unhandled_error(name, msg)
+            ret = 1
+
+    # Close the per-job files so that the runner can aggregate them.
+    for name_ in (config.extension_name, "event"):
+        for handler in logging.getLogger(name_).handlers:
+            handler.close()
+
+    return ret
+
+
+def _log_unhandled_error(name, msg):
+    event = StructuredErrorLogEvent(
+        source=name,
+        category=EVENT_CATEGORY_ERROR,
+        name=EVENT_NAME_UNHANDLED_ERROR,
+        message=msg,
+    )
+    log_event(event)
@@ -0,0 +1,259 @@
+"""Reads and writes configurations in a line-delimited JSON format.
+
+The first line of the file is a header record with the configuration fields
+other than jobs. Each following line is one serialized job. Files may be
+gzip-compressed. Jobs can be appended without rewriting the file.
+
+"""
+
+import gzip
+import json
+import logging
+import os
+
+from jade.exceptions import InvalidConfiguration
+from jade.utils.utils import ExtendedJSONEncoder, load_data
+
+
+logger = logging.getLogger(__name__)
+
+NDJSON_EXTENSIONS = (".jsonl", ".ndjson")
+
+
+def is_ndjson_config(filename):
+    """Return True if the filename has a line-delimited JSON extension,
+    optionally followed by .gz.
+
+    Parameters
+    ----------
+    filename : str
+
+    Returns
+    -------
+    bool
+
+    """
+    base, ext = os.path.splitext(filename)
+    if ext == ".gz":
+        ext = os.path.splitext(base)[1]
+    return ext in NDJSON_EXTENSIONS
+
+
+def get_ndjson_suffix(filename):
+    """Return the line-delimited suffix of a filename, such as .jsonl.gz.
+
+    Parameters
+    ----------
+    filename : str
+
+    Returns
+    -------
+    str
+
+    """
+    assert is_ndjson_config(filename), filename
+    base, ext = os.path.splitext(filename)
+    if ext == ".gz":
+        return os.path.splitext(base)[1] + ext
+    return ext
+
+
+def _open(filename, mode, compress=None):
+    if compress is None:
+        compress = filename.endswith(".gz")
+    if compress:
+        return gzip.open(filename, mode if "b" in mode else mode + "t")
+    return open(filename, mode)
+
+
+def _dumps(record):
+    return json.dumps(record, cls=ExtendedJSONEncoder) + "\n"
+
+
+def read_header(filename):
+    """Return the header record of a config file.
+
+    Parameters
+    ----------
+    filename : str
+
+    Returns
+    -------
+    dict
+
+    Raises
+    ------
+    InvalidConfiguration
+        Raised if the file is empty.
+
+    """
+    with _open(filename, "r") as f_in:
+        line = f_in.readline()
+
+    if not line.strip():
+        raise InvalidConfiguration(f"{filename} does not have a header")
+    return json.loads(line)
+
+
+def iter_job_records(filename):
+    """Yield the serialized jobs in a config file one at a time.
+
+    Parameters
+    ----------
+    filename : str
+
+    Yields
+    ------
+    dict
+
+    """
+    with _open(filename, "r") as f_in:
+        f_in.readline()
+        for line in f_in:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_job_record_offsets(filename):
+    """Yield the serialized jobs in a config file along with their offsets.
+
+    Parameters
+    ----------
+    filename : str
+
+    Yields
+    ------
+    tuple
+        (int, dict) Offset to pass to read_job_record and the job
+
+    """
+    with _open(filename, "rb") as f_in:
+        f_in.readline()
+        while True:
+            offset = f_in.tell()
+            line = f_in.readline()
+            if not line:
+                break
+            if line.strip():
+                yield offset, json.loads(line)
+
+
+def read_job_record(filename, offset):
+    """Return the serialized job at an offset in a config file.
+
+    Parameters
+    ----------
+    filename : str
+    offset : int
+        Offset from iter_job_record_offsets
+
+    Returns
+    -------
+    dict
+
+    """
+    with _open(filename, "rb") as f_in:
+        f_in.seek(offset)
+        return json.loads(f_in.readline())
+
+
+def count_job_records(filename):
+    """Return the number of jobs in a config file without parsing them.
+
+    Parameters
+    ----------
+    filename : str
+
+    Returns
+    -------
+    int
+
+    """
+    count = 0
+    with _open(filename, "r") as f_in:
+        f_in.readline()
+        for line in f_in:
+            if line.strip():
+                count += 1
+    return count
+
+
+def write_config(filename, header, job_records):
+    """Write a config file. The file is written to a temporary name and then
+    renamed so that the jobs can be streamed from an existing version of the
+    same file.
+
+    Parameters
+    ----------
+    filename : str
+    header : dict
+        Configuration fields other than jobs.
+    job_records : iterable
+        Serialized jobs
+
+    Returns
+    -------
+    int
+        Number of jobs written
+
+    """
+    assert "jobs" not in header
+    tmp_filename = filename + ".tmp"
+    count = 0
+    with _open(tmp_filename, "w", compress=filename.endswith(".gz")) as f_out:
+        f_out.write(_dumps(header))
+        for record in job_records:
+            f_out.write(_dumps(record))
+            count += 1
+
+    os.replace(tmp_filename, filename)
+    logger.debug("Wrote %s jobs to %s", count, filename)
+    return count
+
+
+def append_job_records(filename, job_records):
+    """Append jobs to an existing config file.
+
+    Parameters
+    ----------
+    filename : str
+    job_records : iterable
+        Serialized jobs. Names must not conflict with existing jobs.
+
+    Returns
+    -------
+    int
+        Number of jobs appended
+
+    """
+    count = 0
+    # gzip supports appending new members to an existing file.
+    with _open(filename, "a") as f_out:
+        for record in job_records:
+            f_out.write(_dumps(record))
+            count += 1
+
+    logger.debug("Appended %s jobs to %s", count, filename)
+    return count
+
+
+def load_config_records(filename):
+    """Return the header and an iterator over the serialized jobs of a
+    config file in either format.
+
+    Parameters
+    ----------
+    filename : str
+
+    Returns
+    -------
+    tuple
+        (dict, iterator of dict)
+
+    """
+    if is_ndjson_config(filename):
+        return read_header(filename), iter_job_records(filename)
+
+    data = load_data(filename)
+    jobs = data.pop("jobs", [])
+    return data, iter(jobs)
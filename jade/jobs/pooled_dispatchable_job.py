@@ -0,0 +1,82 @@
+"""Defines a dispatchable job that runs in a pooled worker process."""
+
+import logging
+import time
+
+from jade.jobs.dispatchable_job import DispatchableJob
+
+
+logger = logging.getLogger(__name__)
+
+
+class PooledDispatchableJob(DispatchableJob):
+    """Runs a job in a worker from a JobWorkerPool instead of a new
+    process."""
+    def __init__(self, job, pool, output, results_aggregator,
+                 retry_policy=None, config_file=None):
+        """
+        Parameters
+        ----------
+        pool : JobWorkerPool
+        config_file : str | None
+            Config file that contains the job if it is not the pool's config
+            file.
+
+        The other parameters are the same as for DispatchableJob.
+
+        """
+        super(PooledDispatchableJob, self).__init__(
+            job, None, output, results_aggregator, retry_policy=retry_policy
+        )
+        self._pool = pool
+        self._config_file = config_file
+        self._worker = None
+        self._fd = None
+
+    def __del__(self):
+        if self._is_pending:
+            logger.warning("job %s destructed while pending", self._job.name)
+
+    def is_complete(self):
+        if not self._is_pending:
+            return True
+
+        ret = self._worker.poll()
+        if ret is not None:
+            self._pool.release(self._worker)
+            self._worker = None
+            self._is_pending = False
+            self._complete(ret)
+
+        return not self._is_pending
+
+    def get_pid(self):
+        # The worker process outlives the job, so its exit cannot signal
+        # completion.
+        return None
+
+    def get_completion_fd(self):
+        return self._fd
+
+    def terminate(self):
+        """Stop the worker process that runs the job. The job does not report
+        a result; the pool starts a new worker for later jobs."""
+        if not self._is_pending:
+            return
+        logger.info("Terminate job %s in worker pid=%s", self._job.name,
+                    self._worker.pid)
+        self._worker.terminate()
+        self._is_terminated = True
+
+    def run(self):
+        """Run the job. Sends the result to the aggregator when complete."""
+        assert self._worker is None
+        self._start_time = time.time()
+        self._num_attempts += 1
+        self._retry_delay = None
+        self._worker = self._pool.acquire()
+        self._fd = self._worker.fileno()
+        self._worker.start_job(self._job.name, config_file=self._config_file)
+        self._is_pending = True
+        logger.debug("Submitted %s to worker pid=%s", self._job.name,
+                     self._worker.pid)
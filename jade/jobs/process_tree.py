@@ -0,0 +1,119 @@
+"""Functions to inspect and signal a process and its descendants."""
+
+from collections import defaultdict
+import time
+
+import psutil
+
+from jade.common import ONE_GB
+
+
+# Children of each process as of the last scan of all processes
+_snapshot = {"time": None, "children": None}
+
+
+def _get_children_by_parent(max_age_s):
+    """Return the child pids of every process. Finding descendants requires
+    scanning every process on the system, so the scan is reused by calls
+    within max_age_s seconds of it.
+
+    """
+    now = time.time()
+    if _snapshot["time"] is None or now - _snapshot["time"] > max_age_s:
+        children = defaultdict(list)
+        for process in psutil.process_iter(["ppid"]):
+            children[process.info["ppid"]].append(process.pid)
+        _snapshot["time"] = now
+        _snapshot["children"] = children
+    return _snapshot["children"]
+
+
+def get_process_tree(pid, max_age_s=None):
+    """Return a process and all of its descendants.
+
+    Parameters
+    ----------
+    pid : int
+    max_age_s : float | None
+        If set, descendants may come from a scan of all processes made up
+        to this many seconds ago. Use it to check many processes at once.
+        Descendants started since the scan are missed.
+
+    Returns
+    -------
+    list
+        psutil.Process objects; empty if the process does not exist.
+
+    """
+    try:
+        process = psutil.Process(pid)
+        if max_age_s is None:
+            return [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+
+    children = _get_children_by_parent(max_age_s)
+    processes = [process]
+    stack = [(pid, x) for x in children.get(pid, [])]
+    while stack:
+        parent_pid, child_pid = stack.pop()
+        try:
+            child = psutil.Process(child_pid)
+            # The pid may have been reused since the scan.
+            if child.ppid() != parent_pid:
+                continue
+        except psutil.NoSuchProcess:
+            continue
+        processes.append(child)
+        stack += [(child_pid, x) for x in children.get(child_pid, [])]
+    return processes
+
+
+def get_process_tree_usage(processes):
+    """Return the resident memory and CPU time used by processes, including
+    the CPU time of descendants that have exited.
+
+    Parameters
+    ----------
+    processes : list
+        psutil.Process objects, as returned by get_process_tree
+
+    Returns
+    -------
+    tuple
+        memory in GiB, CPU time in seconds
+
+    """
+    rss = 0
+    cpu_time_s = 0.0
+    for process in processes:
+        try:
+            rss += process.memory_info().rss
+            times = process.cpu_times()
+        except psutil.NoSuchProcess:
+            continue
+        cpu_time_s += times.user + times.system + times.children_user + \
+            times.children_system
+    return rss / ONE_GB, cpu_time_s
+
+
+def signal_process_tree(processes, kill=False):
+    """Send SIGTERM or SIGKILL to processes that are still running.
+
+    Parameters
+    ----------
+    processes : list
+        psutil.Process objects
+    kill : bool
+        If True, send SIGKILL.
+
+    """
+    # Children first so that a parent cannot restart them.
+    for process in reversed(processes):
+        try:
+            if kill:
+                process.kill()
+            else:
+                process.terminate()
+        except psutil.NoSuchProcess:
+            pass
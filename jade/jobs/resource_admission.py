@@ -0,0 +1,284 @@
+"""Admits jobs to a node according to the CPUs and memory that they need."""
+
+from collections import namedtuple
+import logging
+import time
+
+from jade.exceptions import InvalidParameter
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds that the highest-priority job that does not fit can wait while
+# smaller jobs start ahead of it
+DEFAULT_MAX_BACKFILL_WAIT = 300
+
+# Absorbs rounding errors in sums of fractional memory requirements
+_MEMORY_TOLERANCE_GB = 1e-9
+
+
+class JobResources(namedtuple("JobResources", "num_cpus, memory_gb")):
+    """CPUs and memory in GiB that a job needs while it runs. None means
+    unspecified."""
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create an instance from a dict with optional keys num_cpus and
+        memory_gb.
+
+        Parameters
+        ----------
+        data : dict | None
+
+        Returns
+        -------
+        JobResources
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if a key is unknown or a value is out of range.
+
+        """
+        data = data or {}
+        unknown = set(data).difference(cls._fields)
+        if unknown:
+            raise InvalidParameter(f"unknown job resources: {unknown}")
+        resources = cls(data.get("num_cpus"), data.get("memory_gb"))
+        if resources.num_cpus is not None and resources.num_cpus < 1:
+            raise InvalidParameter(
+                f"num_cpus must be at least 1: {resources.num_cpus}")
+        if resources.memory_gb is not None and resources.memory_gb < 0:
+            raise InvalidParameter(
+                f"memory_gb cannot be negative: {resources.memory_gb}")
+        return resources
+
+
+# Assumed for jobs that declare nothing if the configuration has no default
+DEFAULT_JOB_RESOURCES = JobResources(num_cpus=1, memory_gb=0)
+
+
+class ResourceAdmission:
+    """Bin-packs running jobs against the CPUs and memory of a node.
+
+    JobQueue offers ready jobs in priority order. A job starts if its
+    requirements fit in the free capacity. If the highest-priority job does
+    not fit, lower-priority jobs that fit start in its place (backfill) until
+    it has waited max_backfill_wait seconds; after that no job starts ahead
+    of it, so that it is not starved by a stream of small jobs.
+
+    Requirements are looked up by job name, so requirements read from a
+    config's JobParametersInterface objects apply to the AsyncJobInterface
+    objects that run them. A job that needs more than the node has is
+    limited to the node's capacity and runs alone.
+
+    """
+    def __init__(self, num_cpus, memory_gb, requirements,
+                 max_backfill_wait=DEFAULT_MAX_BACKFILL_WAIT):
+        """
+        Parameters
+        ----------
+        num_cpus : int
+            CPUs on the node
+        memory_gb : float
+            Memory on the node in GiB
+        requirements : dict
+            Maps job name to JobResources. Jobs not in the dict need
+            DEFAULT_JOB_RESOURCES.
+        max_backfill_wait : float
+            Seconds that a job that does not fit can be passed by jobs that
+            do.
+
+        """
+        self._num_cpus = num_cpus
+        self._memory_gb = memory_gb
+        self._requirements = {}
+        self.add_requirements(requirements)
+        self._max_backfill_wait = max_backfill_wait
+        self._used_cpus = 0
+        self._used_memory_gb = 0.0
+        self._running = {}
+        self._reserved_job = None
+        self._reserved_since = None
+
+    def add_requirements(self, requirements):
+        """Add the requirements of jobs that were not known when the
+        instance was created, such as jobs claimed from a shared queue.
+
+        Parameters
+        ----------
+        requirements : dict
+            Maps job name to JobResources.
+
+        """
+        num_cpus = self._num_cpus
+        memory_gb = self._memory_gb
+        for name, resources in requirements.items():
+            if resources.num_cpus > num_cpus or resources.memory_gb > memory_gb:
+                logger.warning("Job %s needs %s but the node has %s CPUs and "
+                               "%.1f GiB; it will run alone", name, resources,
+                               num_cpus, memory_gb)
+                resources = JobResources(min(resources.num_cpus, num_cpus),
+                                         min(resources.memory_gb, memory_gb))
+            self._requirements[name] = resources
+
+    @property
+    def free_cpus(self):
+        """Return the number of CPUs not claimed by running jobs."""
+        return self._num_cpus - self._used_cpus
+
+    @property
+    def free_memory_gb(self):
+        """Return the memory in GiB not claimed by running jobs."""
+        return self._memory_gb - self._used_memory_gb
+
+    def get_requirements(self, job):
+        """Return the resources that the job claims while it runs, limited
+        to the node's capacity.
+
+        Parameters
+        ----------
+        job : object
+            Any object with a name
+
+        Returns
+        -------
+        JobResources
+
+        """
+        return self._requirements.get(job.name, DEFAULT_JOB_RESOURCES)
+
+    def is_full(self):
+        """Return True if no job can start until a running job completes."""
+        return self.free_cpus < 1
+
+    def try_start(self, job, is_first):
+        """Claim the job's resources if they are free.
+
+        Parameters
+        ----------
+        job : AsyncJobInterface
+        is_first : bool
+            True if no higher-priority job is waiting for resources.
+
+        Returns
+        -------
+        bool
+            True if the job can start.
+
+        """
+        resources = self.get_requirements(job)
+        fits = resources.num_cpus <= self.free_cpus and \
+            resources.memory_gb <= self.free_memory_gb + _MEMORY_TOLERANCE_GB
+        if is_first:
+            if fits:
+                self._reserved_job = None
+            elif self._reserved_job != job.name:
+                logger.debug("Job %s waits for %s; backfill smaller jobs",
+                             job.name, resources)
+                self._reserved_job = job.name
+                self._reserved_since = time.time()
+        if not fits:
+            return False
+
+        self._used_cpus += resources.num_cpus
+        self._used_memory_gb += resources.memory_gb
+        self._running[job.name] = resources
+        return True
+
+    def can_backfill(self):
+        """Return True if lower-priority jobs may start ahead of the
+        highest-priority job that does not fit."""
+        if self._reserved_job is None:
+            return True
+        can_backfill = \
+            time.time() - self._reserved_since < self._max_backfill_wait
+        if not can_backfill:
+            logger.debug("Stop backfilling ahead of job %s",
+                         self._reserved_job)
+        return can_backfill
+
+    def release(self, job):
+        """Return the resources of a job that stopped running.
+
+        Parameters
+        ----------
+        job : AsyncJobInterface
+
+        """
+        resources = self._running.pop(job.name, None)
+        if resources is None:
+            # The job started before the queue admitted jobs by resources.
+            return
+        self._used_cpus -= resources.num_cpus
+        self._used_memory_gb -= resources.memory_gb
+
+
+def get_resource_requirements(jobs, defaults=None):
+    """Return the resources that jobs need if they differ from
+    DEFAULT_JOB_RESOURCES.
+
+    Parameters
+    ----------
+    jobs : iterable
+        JobParametersInterface objects
+    defaults : JobResources | None
+        Configuration-level requirements for jobs that do not declare them
+
+    Returns
+    -------
+    dict
+        Maps job name to JobResources.
+
+    """
+    defaults = defaults or JobResources(None, None)
+    default_cpus = defaults.num_cpus or DEFAULT_JOB_RESOURCES.num_cpus
+    default_memory_gb = defaults.memory_gb or DEFAULT_JOB_RESOURCES.memory_gb
+    requirements = {}
+    for job in jobs:
+        resources = job.get_resource_requirements()
+        if resources is None:
+            resources = JobResources(None, None)
+        resources = JobResources(
+            default_cpus if resources.num_cpus is None
+            else resources.num_cpus,
+            default_memory_gb if resources.memory_gb is None
+            else resources.memory_gb,
+        )
+        if resources != DEFAULT_JOB_RESOURCES:
+            requirements[job.name] = resources
+    return requirements
+
+
+def create_resource_admission(jobs, num_cpus, memory_gb, defaults=None,
+                              max_backfill_wait=DEFAULT_MAX_BACKFILL_WAIT):
+    """Create a ResourceAdmission if any job or the configuration declares
+    resource requirements.
+
+    Parameters
+    ----------
+    jobs : iterable
+        JobParametersInterface objects
+    num_cpus : int
+        CPUs on the node
+    memory_gb : float
+        Memory on the node in GiB
+    defaults : JobResources | None
+        Configuration-level requirements for jobs that do not declare them
+    max_backfill_wait : float
+
+    Returns
+    -------
+    ResourceAdmission | None
+        None if all jobs need one CPU and any amount of memory, in which case
+        the queue depth alone limits the jobs that run.
+
+    """
+    requirements = get_resource_requirements(jobs, defaults=defaults)
+    if not requirements:
+        return None
+
+    logger.info("Admit jobs by their resource requirements; node has %s "
+                "CPUs and %.1f GiB of memory", num_cpus, memory_gb)
+    return ResourceAdmission(num_cpus, memory_gb, requirements,
+                             max_backfill_wait=max_backfill_wait)
@@ -3,6 +3,7 @@
 import csv
 import logging
 import os
+import time
 
 from filelock import FileLock, Timeout
 
@@ -11,14 +12,24 @@ from jade.result import Result, deserialize_result
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_FLUSH_INTERVAL = 1
+
 
 class ResultsAggregator:
     """Synchronizes updates to the results file across jobs on one system.
     To use on different systems then the code must use SoftFileLock instead
     of FileLock.
 
+    The process that owns the file can buffer results with
+    :meth:`add_result` and write them with :meth:`flush`. Each flush appends
+    all buffered results to the CSV file in one write and appends the job
+    names to a completion log in one write.
+
     """
-    def __init__(self, filename, timeout=30, delimiter=","):
+    COMPLETION_LOG_EXT = ".completions"
+
+    def __init__(self, filename, timeout=30, delimiter=",",
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
         """
         Constructs ResultsAggregator.
 
@@ -30,12 +41,33 @@ class ResultsAggregator:
             Lock acquistion timeout in seconds.
         delimiter : str
             Delimiter to use for CSV formatting.
+        flush_interval : float
+            Minimum seconds between flushes in :meth:`flush_if_due`.
 
         """
         self._filename = filename
         self._lock_file = self._filename + ".lock"
+        self._completion_log = self.get_completion_log_filename(filename)
         self._timeout = timeout
         self._delimiter = delimiter
+        self._flush_interval = flush_interval
+        self._buffered_results = []
+        self._last_flush_time = time.time()
+
+    @classmethod
+    def get_completion_log_filename(cls, filename):
+        """Return the completion log that accompanies a results file.
+
+        Parameters
+        ----------
+        filename : str
+
+        Returns
+        -------
+        str
+
+        """
+        return os.path.splitext(filename)[0] + cls.COMPLETION_LOG_EXT
 
     @staticmethod
     def _get_fields():
@@ -69,13 +101,16 @@ class ResultsAggregator:
     def _create_file(self):
         with open(self._filename, "w") as f_out:
             f_out.write(self._delimiter.join(self._get_fields()) + "\n")
+        with open(self._completion_log, "w") as _:
+            pass
 
     def delete_file(self):
-        """Delete the results file and lock file."""
+        """Delete the results file, completion log, and lock file."""
         assert os.path.exists(self._filename)
         os.remove(self._filename)
-        if os.path.exists(self._lock_file):
-            os.remove(self._lock_file)
+        for filename in (self._completion_log, self._lock_file):
+            if os.path.exists(filename):
+                os.remove(filename)
         logger.debug("Deleted results file %s", self._filename)
 
     @classmethod
@@ -94,24 +129,68 @@ class ResultsAggregator:
         result : Result
 
         """
-        self._do_action_under_lock(self._append_result, result)
-        self._add_completion(result)
+        self._write_results([result])
 
-    def _add_completion(self, result):
-        completion_filename = os.path.join(
-            os.path.dirname(self._filename),
-            result.name,
-        )
-        with open(completion_filename, "w") as _:
-            pass
+    def add_result(self, result):
+        """Buffer a result. It is written on the next flush.
+
+        result : Result
+
+        """
+        self._buffered_results.append(result)
+
+    @property
+    def num_buffered_results(self):
+        """Return the number of results that have not been flushed.
+
+        Returns
+        -------
+        int
+
+        """
+        return len(self._buffered_results)
+
+    def flush(self):
+        """Write all buffered results."""
+        self._last_flush_time = time.time()
+        if not self._buffered_results:
+            return
+
+        results = self._buffered_results
+        self._buffered_results = []
+        self._write_results(results)
+        logger.debug("Flushed %s results to %s", len(results), self._filename)
 
-    def _append_result(self, result):
-        text = self._delimiter.join(
-            [str(getattr(result, x)) for x in self._get_fields()]
+    def flush_if_due(self):
+        """Write all buffered results if flush_interval has elapsed since the
+        last flush.
+
+        """
+        if self._buffered_results and \
+                time.time() - self._last_flush_time >= self._flush_interval:
+            self.flush()
+
+    def _write_results(self, results):
+        # Write the results before the completions so that a reader never
+        # sees a completed job without its result.
+        self._do_action_under_lock(self._append_results, results)
+        self._append_completions(results)
+
+    def _append_completions(self, results):
+        text = "".join(x.name + "\n" for x in results)
+        with open(self._completion_log, "a") as f_out:
+            f_out.write(text)
+
+    def _append_results(self, results):
+        text = "".join(
+            self._delimiter.join(
+                [str(getattr(result, x)) for x in self._get_fields()]
+            ) + "\n"
+            for result in results
         )
 
         with open(self._filename, "a") as f_out:
-            f_out.write(text + "\n")
+            f_out.write(text)
 
     def get_results(self):
         """Return the current results.
@@ -132,6 +211,8 @@ class ResultsAggregator:
                 row["return_code"] = int(row["return_code"])
                 row["exec_time_s"] = float(row["exec_time_s"])
                 row["completion_time"] = float(row["completion_time"])
+                if "num_attempts" in row:
+                    row["num_attempts"] = int(row["num_attempts"])
                 result = deserialize_result(row)
                 results.append(result)
 
@@ -144,6 +225,8 @@ class ResultsAggregatorSummary:
         self._path = path
         self._aggregators = []
         self._completed_jobs = set()
+        # Byte offset of the unread portion of each completion log
+        self._completion_log_offsets = {}
 
     @property
     def completed_jobs(self):
@@ -180,9 +263,48 @@ class ResultsAggregatorSummary:
         return results
 
     def update_completed_jobs(self):
-        """Check for completed jobs."""
+        """Check for completed jobs.
+
+        Returns
+        -------
+        list
+            names of jobs that completed since the last call
+
+        """
+        newly_completed = []
         for filename in os.listdir(self._path):
-            if not filename.endswith(".csv"):
-                logger.debug("Detected completion of job=%s", filename)
-                self._completed_jobs.add(filename)
-                os.remove(os.path.join(self._path, filename))
+            path = os.path.join(self._path, filename)
+            if filename.endswith(ResultsAggregator.COMPLETION_LOG_EXT):
+                names = self._read_new_completions(path)
+            elif filename.endswith((".csv", ".lock")):
+                continue
+            else:
+                # Per-job marker file from an older version.
+                names = [filename]
+                os.remove(path)
+
+            for name in names:
+                logger.debug("Detected completion of job=%s", name)
+                self._completed_jobs.add(name)
+                newly_completed.append(name)
+
+        return newly_completed
+
+    def _read_new_completions(self, filename):
+        """Return the job names appended to a completion log since the last
+        read.
+
+        """
+        offset = self._completion_log_offsets.get(filename, 0)
+        with open(filename, "rb") as f_in:
+            f_in.seek(offset)
+            data = f_in.read()
+
+        # Leave a partial line from a write that is still in progress for
+        # the next read.
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return []
+
+        self._completion_log_offsets[filename] = offset + end
+        return data[:end].decode("utf-8").splitlines()
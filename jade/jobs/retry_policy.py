@@ -0,0 +1,142 @@
+"""Decides whether failed jobs run again."""
+
+from jade.exceptions import InvalidParameter
+
+
+DEFAULT_RETRY_BACKOFF = 1.0
+DEFAULT_RETRY_BACKOFF_FACTOR = 2.0
+
+
+class RetryPolicy:
+    """Retries failed jobs with exponential backoff.
+
+    A job that fails with a matching return code runs again after
+    backoff_s * backoff_factor ** (attempt - 1) seconds, up to max_retries
+    times. Attempts run on the same node as the original.
+
+    """
+    def __init__(self, max_retries, backoff_s=DEFAULT_RETRY_BACKOFF,
+                 backoff_factor=DEFAULT_RETRY_BACKOFF_FACTOR,
+                 return_codes=None):
+        """
+        Parameters
+        ----------
+        max_retries : int
+            Maximum number of times to run a job again.
+        backoff_s : float
+            Seconds to wait before the first retry.
+        backoff_factor : float
+            Multiplier of the wait for each subsequent retry.
+        return_codes : iterable | None
+            Retry only these return codes. Defaults to all non-zero codes.
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if a parameter is out of range.
+
+        """
+        if max_retries < 0:
+            raise InvalidParameter(
+                f"max_retries cannot be negative: {max_retries}")
+        if backoff_s < 0 or backoff_factor < 1:
+            raise InvalidParameter(
+                f"invalid backoff: backoff_s={backoff_s} "
+                f"backoff_factor={backoff_factor}")
+        if return_codes is not None:
+            return_codes = set(return_codes)
+            if 0 in return_codes:
+                raise InvalidParameter("return code 0 cannot be retried")
+
+        self._max_retries = max_retries
+        self._backoff_s = backoff_s
+        self._backoff_factor = backoff_factor
+        self._return_codes = return_codes
+
+    @classmethod
+    def from_cli_options(cls, max_retries, backoff_s, return_codes):
+        """Create a policy from CLI option values.
+
+        Parameters
+        ----------
+        max_retries : int
+        backoff_s : float
+        return_codes : str | None
+            Comma-separated return codes
+
+        Returns
+        -------
+        RetryPolicy | None
+            None if max_retries is 0.
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if return_codes is invalid.
+
+        """
+        if max_retries == 0:
+            return None
+        if return_codes is not None:
+            try:
+                return_codes = [int(x) for x in return_codes.split(",")]
+            except ValueError:
+                raise InvalidParameter(
+                    f"invalid retry return codes: {return_codes}")
+        return cls(max_retries, backoff_s=backoff_s,
+                   return_codes=return_codes)
+
+    def get_cli_options(self):
+        """Return the options to pass the policy to jade-internal run-jobs.
+
+        Returns
+        -------
+        str
+
+        """
+        options = f"--max-retries={self._max_retries} " \
+                  f"--retry-backoff={self._backoff_s}"
+        if self._return_codes is not None:
+            codes = ",".join(str(x) for x in sorted(self._return_codes))
+            options += f" --retry-return-codes={codes}"
+        return options
+
+    @property
+    def max_retries(self):
+        """Return the maximum number of retries of one job."""
+        return self._max_retries
+
+    def get_backoff(self, num_attempts):
+        """Return the seconds to wait before the next attempt.
+
+        Parameters
+        ----------
+        num_attempts : int
+            Number of attempts that have run.
+
+        Returns
+        -------
+        float
+
+        """
+        return self._backoff_s * self._backoff_factor ** (num_attempts - 1)
+
+    def should_retry(self, return_code, num_attempts):
+        """Return True if a job that failed should run again.
+
+        Parameters
+        ----------
+        return_code : int
+        num_attempts : int
+            Number of attempts that have run, including this one.
+
+        Returns
+        -------
+        bool
+
+        """
+        if return_code == 0 or num_attempts > self._max_retries:
+            return False
+        if self._return_codes is None:
+            return True
+        return return_code in self._return_codes
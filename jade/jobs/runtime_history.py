@@ -0,0 +1,263 @@
+"""Estimates job runtimes from the results of a previous run."""
+
+from collections import deque
+import hashlib
+import json
+import logging
+import os
+import statistics
+
+from jade.common import CONFIG_FILE
+from jade.exceptions import InvalidParameter
+from jade.jobs.ndjson_config import NDJSON_EXTENSIONS
+from jade.result import ResultsSummary
+from jade.utils.utils import ExtendedJSONEncoder, dump_data, load_data
+
+
+logger = logging.getLogger(__name__)
+
+# Runtime assumed for every job if there is no history
+DEFAULT_RUNTIME = 1.0
+# Number of recently completed jobs used to estimate runtimes on a node
+DEFAULT_RECENT_RUNTIMES_WINDOW = 100
+
+
+class RuntimeHistory:
+    """Looks up the execution times that jobs recorded in a previous run.
+
+    Jobs are matched by name first. If the name is not found, they are
+    matched by a hash of their parameters, so that the history still applies
+    to a config whose jobs were renamed or renumbered.
+
+    """
+
+    # Keys that identify a job or its dependencies rather than its work.
+    _IGNORED_PARAMETERS = ("job_id", "blocked_by")
+
+    def __init__(self, times_by_name=None, times_by_hash=None):
+        """
+        Parameters
+        ----------
+        times_by_name : dict | None
+            Maps job name to execution time in seconds.
+        times_by_hash : dict | None
+            Maps parameter hash to execution time in seconds.
+
+        """
+        self._times_by_name = times_by_name or {}
+        self._times_by_hash = times_by_hash or {}
+
+    def __len__(self):
+        return len(self._times_by_name)
+
+    @classmethod
+    def from_output_directory(cls, output_dir):
+        """Load the history from the output directory of a previous run.
+        Only successful results are used. Parameter hashes are only available
+        if the directory still contains the run's config.
+
+        Parameters
+        ----------
+        output_dir : str
+
+        Returns
+        -------
+        RuntimeHistory
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if the directory does not contain results.
+
+        """
+        try:
+            summary = ResultsSummary(output_dir)
+        except FileNotFoundError:
+            raise InvalidParameter(f"{output_dir} does not contain results")
+
+        times_by_name = {
+            x.name: x.exec_time_s for x in summary.get_successful_results()
+        }
+        times_by_hash = {}
+        config_file = cls._find_config_file(output_dir)
+        if config_file is None:
+            logger.warning("%s has no config; jobs are only matched by name",
+                           output_dir)
+        else:
+            # This is deferred because it loads the extension registry.
+            from jade.jobs.job_configuration_factory import \
+                create_config_from_file
+            config = create_config_from_file(config_file)
+            for job in config.iter_jobs():
+                if job.name in times_by_name:
+                    times_by_hash[cls.get_parameter_hash(job)] = \
+                        times_by_name[job.name]
+
+        logger.info("Loaded runtime history of %s jobs from %s",
+                    len(times_by_name), output_dir)
+        return cls(times_by_name=times_by_name, times_by_hash=times_by_hash)
+
+    @classmethod
+    def from_file(cls, filename):
+        """Load a history written by :meth:`to_file`.
+
+        Parameters
+        ----------
+        filename : str
+
+        Returns
+        -------
+        RuntimeHistory
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if the file does not exist.
+
+        """
+        if not os.path.exists(filename):
+            raise InvalidParameter(f"runtime history {filename} does not exist")
+        data = load_data(filename)
+        return cls(times_by_name=data["times_by_name"],
+                   times_by_hash=data["times_by_hash"])
+
+    def to_file(self, filename):
+        """Write the history to a JSON file.
+
+        Parameters
+        ----------
+        filename : str
+
+        """
+        data = {
+            "times_by_name": self._times_by_name,
+            "times_by_hash": self._times_by_hash,
+        }
+        dump_data(data, filename)
+
+    @staticmethod
+    def _find_config_file(output_dir):
+        base = os.path.splitext(CONFIG_FILE)[0]
+        for ext in (".json",) + NDJSON_EXTENSIONS:
+            for suffix in (ext, ext + ".gz"):
+                filename = os.path.join(output_dir, base + suffix)
+                if os.path.exists(filename):
+                    return filename
+        return None
+
+    @classmethod
+    def get_parameter_hash(cls, job):
+        """Return a hash of the job's parameters, excluding its name and
+        blocking jobs.
+
+        Parameters
+        ----------
+        job : JobParametersInterface
+
+        Returns
+        -------
+        str
+
+        """
+        data = {
+            k: v for k, v in job.serialize().items()
+            if k not in cls._IGNORED_PARAMETERS
+        }
+        text = json.dumps(data, sort_keys=True, cls=ExtendedJSONEncoder)
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get_runtime(self, job):
+        """Return the job's previous execution time.
+
+        Parameters
+        ----------
+        job : JobParametersInterface
+
+        Returns
+        -------
+        float | None
+            None if the job is not in the history.
+
+        """
+        exec_time_s = self._times_by_name.get(job.name)
+        if exec_time_s is None and self._times_by_hash:
+            exec_time_s = self._times_by_hash.get(self.get_parameter_hash(job))
+        return exec_time_s
+
+    @property
+    def median_runtime(self):
+        """Return the median execution time of all jobs in the history.
+
+        Returns
+        -------
+        float | None
+            None if the history is empty.
+
+        """
+        if not self._times_by_name:
+            return None
+        return statistics.median(self._times_by_name.values())
+
+
+class RecentRuntimes:
+    """Tracks the median execution time of the jobs that most recently
+    completed in a queue. Only the last window_size jobs are kept, so the
+    cost of the median does not grow with the number of completed jobs.
+
+    """
+    def __init__(self, window_size=DEFAULT_RECENT_RUNTIMES_WINDOW):
+        self._runtimes = deque(maxlen=window_size)
+        self._median = None
+
+    def __len__(self):
+        return len(self._runtimes)
+
+    def record_completed_jobs(self, jobs):
+        """Record the execution times of completed jobs. Terminated jobs
+        are ignored."""
+        for job in jobs:
+            if not job.is_terminated and job.exec_time_s is not None:
+                self._runtimes.append(job.exec_time_s)
+                self._median = None
+
+    @property
+    def median(self):
+        """Return the median execution time of the recent jobs.
+
+        Returns
+        -------
+        float | None
+            None if no jobs have completed.
+
+        """
+        if self._median is None and self._runtimes:
+            self._median = statistics.median(self._runtimes)
+        return self._median
+
+
+def create_runtime_estimator(runtime_history):
+    """Create a function that returns the expected runtime of a job.
+
+    Parameters
+    ----------
+    runtime_history : RuntimeHistory | None
+        Jobs without history are expected to run for the median of the
+        history. Without history all jobs are expected to run for
+        DEFAULT_RUNTIME.
+
+    Returns
+    -------
+    callable
+
+    """
+    fallback_runtime = DEFAULT_RUNTIME
+    if runtime_history is not None and runtime_history.median_runtime:
+        fallback_runtime = runtime_history.median_runtime
+
+    def get_runtime(job):
+        runtime = None
+        if runtime_history is not None:
+            runtime = runtime_history.get_runtime(job)
+        return fallback_runtime if runtime is None else runtime
+
+    return get_runtime
@@ -0,0 +1,164 @@
+"""Policies that order the jobs that are ready to run."""
+
+import abc
+import enum
+import logging
+
+from jade.jobs.job_dependency_graph import compute_longest_paths
+from jade.jobs.runtime_history import create_runtime_estimator
+
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulingPolicyType(enum.Enum):
+    """Orders in which ready jobs run"""
+    FIFO = "fifo"
+    CRITICAL_PATH = "critical_path"
+    LONGEST_RUNTIME_FIRST = "longest_runtime_first"
+
+
+class SchedulingPolicyInterface(abc.ABC):
+    """Assigns priorities to jobs. Jobs with lower priorities run first; jobs
+    with equal priorities run in the order in which they became ready.
+
+    Priorities are looked up by job name, so a policy created from a config's
+    JobParametersInterface objects also orders the AsyncJobInterface objects
+    that run them.
+
+    """
+
+    @abc.abstractmethod
+    def get_priority(self, job):
+        """Return the job's priority.
+
+        Parameters
+        ----------
+        job : object
+            Any object with a name
+
+        Returns
+        -------
+        float
+
+        """
+
+
+class FifoPolicy(SchedulingPolicyInterface):
+    """Runs jobs in the order in which they become ready."""
+
+    def get_priority(self, job):
+        return 0
+
+
+class LongestRuntimeFirstPolicy(SchedulingPolicyInterface):
+    """Runs the jobs with the longest expected runtimes first."""
+
+    def __init__(self, jobs, runtime_func):
+        """
+        Parameters
+        ----------
+        jobs : iterable
+            JobParametersInterface objects
+        runtime_func : callable
+            Returns the expected runtime of a job.
+
+        """
+        self._runtimes = {x.name: runtime_func(x) for x in jobs}
+
+    def get_priority(self, job):
+        return -self._runtimes.get(job.name, 0)
+
+
+class CriticalPathPolicy(SchedulingPolicyInterface):
+    """Runs the jobs at the head of the longest remaining chain of blocked
+    jobs first.
+
+    A job's priority is the negated expected runtime of the longest path from
+    the job through the jobs that it blocks, including its own runtime.
+    Blocking jobs outside of the given jobs are treated as complete. Jobs in
+    a dependency cycle are weighted by their own runtimes.
+
+    """
+
+    def __init__(self, jobs, runtime_func):
+        """
+        Parameters
+        ----------
+        jobs : iterable
+            JobParametersInterface objects
+        runtime_func : callable
+            Returns the expected runtime of a job.
+
+        """
+        self._path_lengths = self._compute_path_lengths(jobs, runtime_func)
+
+    @staticmethod
+    def _compute_path_lengths(jobs, runtime_func):
+        runtimes = {}
+        blocking = {}
+        for job in jobs:
+            runtimes[job.name] = runtime_func(job)
+            blocking[job.name] = list(job.get_blocking_jobs())
+        for name, blocking_jobs in blocking.items():
+            blocking[name] = [x for x in blocking_jobs if x in runtimes]
+
+        # Walk from the jobs that block nothing back through the jobs that
+        # they wait on, so that each path ends at the job that heads it.
+        lengths, _ = compute_longest_paths(runtimes, blocking)
+        if len(lengths) < len(runtimes):
+            logger.warning("%s jobs are in dependency cycles",
+                           len(runtimes) - len(lengths))
+            lengths = {x: lengths.get(x, y) for x, y in runtimes.items()}
+        return lengths
+
+    @property
+    def critical_path_length(self):
+        """Return the expected runtime of the longest chain of jobs.
+
+        Returns
+        -------
+        float
+
+        """
+        return max(self._path_lengths.values(), default=0.0)
+
+    def get_priority(self, job):
+        return -self._path_lengths.get(job.name, 0)
+
+
+def create_scheduling_policy(policy_type, jobs, runtime_history=None):
+    """Create a scheduling policy.
+
+    Parameters
+    ----------
+    policy_type : SchedulingPolicyType
+    jobs : iterable
+        JobParametersInterface objects that will be scheduled, including
+        blocked jobs
+    runtime_history : RuntimeHistory | None
+        Provides expected runtimes. Jobs without history are expected to run
+        for the median of the history. Without history all jobs are expected
+        to run for the same time.
+
+    Returns
+    -------
+    SchedulingPolicyInterface
+
+    """
+    if policy_type == SchedulingPolicyType.FIFO:
+        return FifoPolicy()
+
+    get_runtime = create_runtime_estimator(runtime_history)
+    if policy_type == SchedulingPolicyType.CRITICAL_PATH:
+        policy = CriticalPathPolicy(jobs, get_runtime)
+        logger.info("Scheduling by critical path; expected length is %s "
+                    "seconds", policy.critical_path_length)
+        return policy
+
+    assert policy_type == SchedulingPolicyType.LONGEST_RUNTIME_FIRST, \
+        policy_type
+    if runtime_history is None:
+        logger.warning("Longest-runtime-first scheduling without a runtime "
+                       "history runs jobs in FIFO order")
+    return LongestRuntimeFirstPolicy(jobs, get_runtime)
@@ -0,0 +1,509 @@
+"""Shares a queue of jobs among nodes through files on a shared filesystem."""
+
+from array import array
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from filelock import SoftFileLock, Timeout
+
+from jade.exceptions import InvalidParameter
+from jade.utils.utils import ExtendedJSONEncoder
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds after which a lock file is considered abandoned by a process that
+# died while holding it. Holders refresh the lock file well within this time.
+DEFAULT_STALE_LOCK_TIMEOUT = 60
+DEFAULT_LOCK_TIMEOUT = 300
+# Seconds between attempts to acquire the lock
+_LOCK_POLL_INTERVAL = 0.1
+# Fraction of stale_lock_timeout between refreshes of a held lock file
+_LOCK_REFRESH_FRACTION = 0.25
+
+# Values of the status file other than the number of incomplete blocking jobs
+_CLAIMED = -1
+_COMPLETED = -2
+
+
+class SharedJobQueue:
+    """Lets the nodes of one submission pull jobs from a common queue.
+
+    Nodes claim chunks of jobs as they have free workers, so a node that
+    draws fast jobs claims more of them. A job can only be claimed once all
+    of its blocking jobs have completed on any node.
+
+    The queue is kept in these files next to the queue file so that an
+    operation only reads and writes the jobs that it hands out or completes:
+
+    - Job records with the serialized job and the IDs of the jobs that it
+      blocks, in claim order, and an index of their offsets. Neither
+      changes. Nodes read the jobs that they claim from these records.
+    - A status file with the number of incomplete blocking jobs of each job,
+      or whether it is claimed or completed, updated in place.
+    - A log of the IDs of jobs that can be claimed, in the order in which
+      they became ready. The queue file holds a cursor to the next one, the
+      released jobs that are claimed before it, and counters.
+    - A log of the owner of each claim.
+
+    Nodes do not take the lock when jobs complete. Each owner appends its
+    completed jobs to its own file in the completions directory. Operations
+    that take the lock first apply the records added since the last one.
+
+    The queue is updated under a SoftFileLock because the nodes are on
+    different systems. The holder refreshes the lock file while it holds it.
+    A lock file older than stale_lock_timeout was left by a process that died
+    while holding it and is removed.
+
+    """
+    def __init__(self, filename, timeout=DEFAULT_LOCK_TIMEOUT,
+                 stale_lock_timeout=DEFAULT_STALE_LOCK_TIMEOUT):
+        """Open an existing queue.
+
+        Parameters
+        ----------
+        filename : str
+            Queue file. Must be accessible by all nodes.
+        timeout : int
+            Lock acquisition timeout in seconds.
+        stale_lock_timeout : int
+            Age in seconds at which a lock file is considered abandoned.
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if the file does not exist.
+
+        """
+        if not os.path.exists(filename):
+            raise InvalidParameter(f"shared job queue {filename} does not exist")
+        self._filename = filename
+        self._lock_file = filename + ".lock"
+        self._completions_dir = self.get_completions_directory(filename)
+        self._timeout = timeout
+        self._stale_lock_timeout = stale_lock_timeout
+        # Maps the name of each job read by this instance to its ID.
+        self._job_ids = {}
+
+    @classmethod
+    def create(cls, filename, jobs, **kwargs):
+        """Create a queue, replacing any existing queue.
+
+        Parameters
+        ----------
+        filename : str
+        jobs : iterable
+            JobParametersInterface objects in the order in which they should
+            be claimed.
+        kwargs : dict
+            Passed to the constructor.
+
+        Returns
+        -------
+        SharedJobQueue
+
+        """
+        jobs = [(x.name, x.get_blocking_jobs(), x.serialize()) for x in jobs]
+        job_ids = {x[0]: i for i, x in enumerate(jobs)}
+        blocked_jobs = [[] for _ in jobs]
+        statuses = array("i")
+        for job_id, (_, blocking_jobs, _) in enumerate(jobs):
+            # As with batch configs, blocking jobs that are not in the queue
+            # have already completed.
+            blocking_ids = {job_ids[x] for x in blocking_jobs if x in job_ids}
+            for blocking_id in blocking_ids:
+                blocked_jobs[blocking_id].append(job_id)
+            statuses.append(len(blocking_ids))
+
+        offsets = array("q", [0])
+        with open(filename + ".jobs", "wb") as f_out:
+            for job_id, (name, _, data) in enumerate(jobs):
+                record = json.dumps(
+                    {"name": name, "blocks": sorted(blocked_jobs[job_id]),
+                     "job": data},
+                    cls=ExtendedJSONEncoder,
+                ).encode("utf-8") + b"\n"
+                f_out.write(record)
+                offsets.append(offsets[-1] + len(record))
+        _write_array(filename + ".index", offsets)
+        _write_array(filename + ".status", statuses)
+        _write_array(filename + ".ready",
+                     array("q", (i for i, x in enumerate(statuses) if x == 0)))
+        with open(filename + ".claims", "w"):
+            pass
+
+        completions_dir = cls.get_completions_directory(filename)
+        if os.path.exists(completions_dir):
+            shutil.rmtree(completions_dir)
+        os.makedirs(completions_dir)
+        if os.path.exists(filename + ".lock"):
+            os.remove(filename + ".lock")
+        state = {
+            "num_jobs": len(jobs),
+            # Number of IDs in the ready log that have been claimed
+            "ready_cursor": 0,
+            # IDs of released jobs, claimed before the ready log
+            "released": [],
+            "num_claimed": 0,
+            "num_completed": 0,
+            # Bytes of each completions file that have been applied
+            "completion_offsets": {},
+        }
+        _write_state(filename, state)
+        logger.info("Created shared job queue %s with %s jobs", filename,
+                    len(jobs))
+        return cls(filename, **kwargs)
+
+    @staticmethod
+    def get_completions_directory(filename):
+        """Return the directory that holds the completion records of a queue
+        file."""
+        return filename + ".completions"
+
+    @property
+    def filename(self):
+        """Return the queue filename."""
+        return self._filename
+
+    def _read_records(self, job_ids):
+        records = []
+        with open(self._filename + ".index", "rb") as f_index, \
+                open(self._filename + ".jobs", "rb") as f_jobs:
+            for job_id in job_ids:
+                start, end = _read_array(f_index, "q", job_id, 2)
+                f_jobs.seek(start)
+                record = json.loads(f_jobs.read(end - start))
+                self._job_ids[record["name"]] = job_id
+                records.append(record)
+        return records
+
+    def _get_job_ids(self, names):
+        missing = set(names).difference(self._job_ids)
+        if missing:
+            # The names were not claimed through this instance.
+            with open(self._filename + ".jobs", "rb") as f_in:
+                for job_id, line in enumerate(f_in):
+                    name = json.loads(line)["name"]
+                    if name in missing:
+                        self._job_ids[name] = job_id
+        return [self._job_ids[x] for x in names]
+
+    def _apply_completions(self, state, f_status):
+        """Apply the completion records added since the last operation and
+        append the jobs that they unblock to the ready log.
+
+        Returns
+        -------
+        bool
+            True if state changed.
+
+        """
+        completed = []
+        offsets = state["completion_offsets"]
+        for filename in os.listdir(self._completions_dir):
+            path = os.path.join(self._completions_dir, filename)
+            offset = offsets.get(filename, 0)
+            with open(path, "rb") as f_in:
+                f_in.seek(offset)
+                data = f_in.read()
+            # Ignore a record that is still being written.
+            end = data.rfind(b"\n") + 1
+            if end == 0:
+                continue
+            completed += [int(x.split(b"\t", 1)[0])
+                          for x in data[:end].splitlines()]
+            offsets[filename] = offset + end
+
+        if not completed:
+            return False
+
+        newly_completed = []
+        for job_id in completed:
+            status = _read_array(f_status, "i", job_id)[0]
+            if status == _COMPLETED:
+                continue
+            if status == _CLAIMED:
+                state["num_claimed"] -= 1
+            state["num_completed"] += 1
+            _write_array_items(f_status, job_id, array("i", [_COMPLETED]))
+            newly_completed.append(job_id)
+
+        ready = array("q")
+        for record in self._read_records(newly_completed):
+            for blocked_id in record["blocks"]:
+                status = _read_array(f_status, "i", blocked_id)[0]
+                if status <= 0:
+                    continue
+                status -= 1
+                _write_array_items(f_status, blocked_id, array("i", [status]))
+                if status == 0:
+                    ready.append(blocked_id)
+        if ready:
+            with open(self._filename + ".ready", "ab") as f_out:
+                ready.tofile(f_out)
+        return True
+
+    def _acquire_lock(self):
+        lock = SoftFileLock(self._lock_file)
+        start = time.time()
+        while True:
+            try:
+                lock.acquire(timeout=_LOCK_POLL_INTERVAL)
+                return lock
+            except Timeout:
+                pass
+            self._break_stale_lock()
+            if time.time() - start > self._timeout:
+                logger.error(
+                    "Failed to acquire file lock %s within %s seconds",
+                    self._lock_file, self._timeout
+                )
+                raise Timeout(self._lock_file)
+
+    def _break_stale_lock(self):
+        try:
+            age = time.time() - os.path.getmtime(self._lock_file)
+        except FileNotFoundError:
+            return
+        if age < self._stale_lock_timeout:
+            return
+        try:
+            os.remove(self._lock_file)
+            logger.warning("Removed lock file %s that was abandoned %.0f "
+                           "seconds ago", self._lock_file, age)
+        except FileNotFoundError:
+            # Another process removed it first.
+            pass
+
+    def _refresh_lock(self, done):
+        # A slow operation, such as one on a congested filesystem, must not
+        # look abandoned to other nodes.
+        interval = self._stale_lock_timeout * _LOCK_REFRESH_FRACTION
+        while not done.wait(interval):
+            try:
+                os.utime(self._lock_file)
+            except FileNotFoundError:
+                return
+
+    def _do_action_under_lock(self, func, *args, **kwargs):
+        lock = self._acquire_lock()
+        done = threading.Event()
+        refresher = threading.Thread(target=self._refresh_lock, args=(done,),
+                                     daemon=True)
+        refresher.start()
+        try:
+            with open(self._filename) as f_in:
+                state = json.load(f_in)
+            with open(self._filename + ".status", "r+b") as f_status:
+                changed = self._apply_completions(state, f_status)
+                ret, modified = func(state, f_status, *args, **kwargs)
+            if changed or modified:
+                _write_state(self._filename, state)
+            return ret
+        finally:
+            done.set()
+            refresher.join()
+            lock.release()
+
+    def claim(self, max_jobs, owner):
+        """Claim up to max_jobs jobs whose blocking jobs have completed.
+
+        Parameters
+        ----------
+        max_jobs : int
+        owner : str
+            Identifies the node that will run the jobs.
+
+        Returns
+        -------
+        tuple
+            (list, int) Names of the claimed jobs and the number of jobs that
+            are still pending. Pending jobs can be blocked by jobs running on
+            other nodes.
+
+        """
+        return self._do_action_under_lock(self._claim, max_jobs, owner)
+
+    def _claim(self, state, f_status, max_jobs, owner):
+        released = state["released"]
+        job_ids = released[:max_jobs]
+        del released[:max_jobs]
+        ready = []
+        if len(job_ids) < max_jobs:
+            cursor = state["ready_cursor"]
+            with open(self._filename + ".ready", "rb") as f_in:
+                ready = _read_array(f_in, "q", cursor,
+                                    max_jobs - len(job_ids))
+            state["ready_cursor"] = cursor + len(ready)
+            # Skip jobs that were completed without being claimed.
+            job_ids += [x for x in ready
+                        if _read_array(f_status, "i", x)[0] == 0]
+
+        for job_id in job_ids:
+            _write_array_items(f_status, job_id, array("i", [_CLAIMED]))
+        names = [x["name"] for x in self._read_records(job_ids)]
+        if job_ids:
+            with open(self._filename + ".claims", "a") as f_out:
+                f_out.write("".join(f"{x}\t{owner}\n" for x in job_ids))
+        state["num_claimed"] += len(names)
+        if names:
+            logger.debug("%s claimed %s jobs", owner, len(names))
+        num_pending = state["num_jobs"] - state["num_claimed"] - \
+            state["num_completed"]
+        return (names, num_pending), bool(job_ids) or bool(ready)
+
+    def get_job_records(self, names):
+        """Return the serialized jobs. Does not take the lock.
+
+        Parameters
+        ----------
+        names : list
+
+        Returns
+        -------
+        list
+            dict for each job
+
+        """
+        return [x["job"] for x in
+                self._read_records(self._get_job_ids(names))]
+
+    def complete(self, names, owner):
+        """Record that jobs have completed so that jobs they block can be
+        claimed. Does not take the lock. Only one process may record
+        completions for an owner.
+
+        Parameters
+        ----------
+        names : list
+        owner : str
+
+        """
+        if not names:
+            return
+        filename = os.path.join(self._completions_dir, f"{owner}.txt")
+        records = "".join(f"{job_id}\t{name}\n" for job_id, name in
+                          zip(self._get_job_ids(names), names))
+        # One write per call so that a reader never sees part of a record
+        # followed by a newline.
+        with open(filename, "a") as f_out:
+            f_out.write(records)
+
+    def release(self, names):
+        """Return claimed jobs that did not run to the front of the queue so
+        that any node can claim them.
+
+        Parameters
+        ----------
+        names : list
+
+        """
+        if names:
+            self._do_action_under_lock(self._release, self._get_job_ids(names))
+
+    @staticmethod
+    def _release(state, f_status, job_ids):
+        # Claimed jobs were not blocked.
+        released = [x for x in job_ids
+                    if _read_array(f_status, "i", x)[0] == _CLAIMED]
+        for job_id in released:
+            _write_array_items(f_status, job_id, array("i", [0]))
+        state["released"] = released + state["released"]
+        state["num_claimed"] -= len(released)
+        logger.info("Released %s jobs", len(released))
+        return None, bool(released)
+
+    def get_summary(self):
+        """Return the number of jobs in each state.
+
+        Returns
+        -------
+        dict
+
+        """
+        return self._do_action_under_lock(self._get_summary)
+
+    @staticmethod
+    def _get_summary(state, _):
+        summary = {
+            "num_pending": state["num_jobs"] - state["num_claimed"] -
+            state["num_completed"],
+            "num_claimed": state["num_claimed"],
+            "num_completed": state["num_completed"],
+        }
+        return summary, False
+
+    def list_claimed_jobs(self):
+        """Return the jobs that have been claimed but have not completed.
+        Reads all claim records.
+
+        Returns
+        -------
+        dict
+            Maps job name to owner.
+
+        """
+        return self._do_action_under_lock(self._list_claimed_jobs)
+
+    def _list_claimed_jobs(self, state, f_status):
+        f_status.seek(0)
+        statuses = array("i")
+        statuses.frombytes(f_status.read())
+        owners = {}
+        with open(self._filename + ".claims") as f_in:
+            for line in f_in:
+                job_id, owner = line.rstrip("\n").split("\t", 1)
+                owners[int(job_id)] = owner
+        job_ids = [x for x in owners if statuses[x] == _CLAIMED]
+        claimed = {x["name"]: owners[job_id] for job_id, x in
+                   zip(job_ids, self._read_records(job_ids))}
+        return claimed, False
+
+    def list_completed_jobs(self):
+        """Return the names of the completed jobs in the order in which each
+        owner completed them. Reads all completion records.
+
+        Returns
+        -------
+        dict
+            Maps owner to a list of job names.
+
+        """
+        completed = {}
+        for filename in sorted(os.listdir(self._completions_dir)):
+            with open(os.path.join(self._completions_dir, filename)) as f_in:
+                completed[os.path.splitext(filename)[0]] = [
+                    x.split("\t", 1)[1] for x in f_in.read().splitlines()
+                ]
+        return completed
+
+
+def _read_array(f_in, typecode, index, count=1):
+    """Read up to count items of an array file starting at index."""
+    items = array(typecode)
+    f_in.seek(index * items.itemsize)
+    data = f_in.read(count * items.itemsize)
+    items.frombytes(data[:len(data) - len(data) % items.itemsize])
+    return items
+
+
+def _write_array_items(f_out, index, items):
+    f_out.seek(index * items.itemsize)
+    items.tofile(f_out)
+
+
+def _write_array(filename, items):
+    with open(filename, "wb") as f_out:
+        items.tofile(f_out)
+
+
+def _write_state(filename, state):
+    # Readers never see a partial file.
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "w") as f_out:
+        json.dump(state, f_out)
+    os.replace(tmp_filename, filename)
@@ -0,0 +1,103 @@
+"""Starts duplicates of jobs that run much longer than their peers."""
+
+import logging
+
+from jade.events import StructuredLogEvent, EVENT_CATEGORY_RESOURCE_UTIL, \
+    EVENT_NAME_SPECULATIVE_JOB_STARTED
+from jade.exceptions import InvalidParameter
+from jade.jobs.runtime_history import RecentRuntimes
+from jade.loggers import log_event
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPECULATION_MIN_COMPLETED = 3
+
+
+class StragglerSpeculator:
+    """Starts duplicates of straggler jobs once a queue has nothing else to
+    run.
+
+    A job is a straggler if it has been running for longer than threshold
+    times the median execution time of the jobs that most recently completed
+    in the same queue. Duplicates only use slots that the queue cannot fill; only jobs
+    that support speculation are duplicated, and each at most once.
+
+    """
+    def __init__(self, threshold,
+                 min_completed=DEFAULT_SPECULATION_MIN_COMPLETED):
+        """
+        Parameters
+        ----------
+        threshold : float
+            Multiple of the median execution time after which a job is a
+            straggler.
+        min_completed : int
+            Number of jobs that must complete before the median is trusted.
+
+        Raises
+        ------
+        InvalidParameter
+            Raised if threshold is less than 1.
+
+        """
+        if threshold < 1:
+            raise InvalidParameter(
+                f"speculation threshold must be at least 1: {threshold}")
+        self._threshold = threshold
+        self._min_completed = min_completed
+        self._runtimes = RecentRuntimes()
+        self._speculating = []
+
+    def record_completed_jobs(self, jobs):
+        """Record the execution times of completed jobs."""
+        self._runtimes.record_completed_jobs(jobs)
+
+    @property
+    def num_speculating(self):
+        """Return the number of duplicates that are running."""
+        return len(self._speculating)
+
+    def check(self, queue):
+        """Start duplicates of straggler jobs in the queue's free slots.
+
+        Parameters
+        ----------
+        queue : JobQueue
+
+        """
+        self._speculating = [x for x in self._speculating
+                             if x.is_speculating()]
+        if queue.is_draining or queue.num_unstarted_jobs > 0 or \
+                queue.num_retrying_jobs > 0 or \
+                len(self._runtimes) < self._min_completed:
+            return
+        if queue.resource_admission is not None:
+            # Duplicates would exceed the resources that jobs declare.
+            return
+
+        num_free = queue.max_queue_depth - queue.num_outstanding_jobs - \
+            len(self._speculating)
+        if num_free <= 0:
+            return
+
+        median = self._runtimes.median
+        limit = self._threshold * median
+        stragglers = [
+            x for x in queue.iter_outstanding_jobs()
+            if x.can_speculate() and x.elapsed_s > limit
+        ]
+        stragglers.sort(key=lambda x: x.elapsed_s, reverse=True)
+        for job in stragglers[:num_free]:
+            event = StructuredLogEvent(
+                source=job.name,
+                category=EVENT_CATEGORY_RESOURCE_UTIL,
+                name=EVENT_NAME_SPECULATIVE_JOB_STARTED,
+                message="started a duplicate of a straggler job",
+                elapsed_s=job.elapsed_s,
+                median_exec_time_s=median,
+                threshold=self._threshold,
+            )
+            if queue.speculate(job):
+                log_event(event)
+                self._speculating.append(job)
@@ -4,8 +4,6 @@ import abc
 import logging
 import time
 
-import pandas as pd
-from prettytable import PrettyTable
 import psutil
 from psutil._common import bytes2human
 
@@ -40,11 +38,21 @@ class ResourceMonitor:
         self._update_net_stats(psutil.net_io_counters())
 
     def log_resource_stats(self):
-        """Logs resource stats information as structured job events."""
-        self.log_cpu_stats()
-        self.log_disk_stats()
-        self.log_memory_stats()
-        self.log_network_stats()
+        """Logs resource stats information as structured job events.
+
+        Returns
+        -------
+        dict
+            Stats logged in each event, keyed by cpu, disk, memory, and
+            network.
+
+        """
+        return {
+            "cpu": self.log_cpu_stats(),
+            "disk": self.log_disk_stats(),
+            "memory": self.log_memory_stats(),
+            "network": self.log_network_stats(),
+        }
 
     def _update_disk_stats(self, data):
         for stat in self.DISK_STATS:
@@ -70,6 +78,7 @@ class ResourceMonitor:
                 **cpu_stats,
             )
         )
+        return cpu_stats
 
     @staticmethod
     def _mb_per_sec(num_bytes, elapsed_seconds):
@@ -98,6 +107,7 @@ class ResourceMonitor:
                 **stats,
             )
         )
+        return stats
 
     def log_memory_stats(self):
         """Logs memory resource stats information."""
@@ -111,6 +121,7 @@ class ResourceMonitor:
                 **mem_stats,
             )
         )
+        return mem_stats
 
     def log_network_stats(self):
         """Logs memory resource stats information."""
@@ -133,6 +144,7 @@ class ResourceMonitor:
                 **stats,
             )
         )
+        return stats
 
 
 class StatsViewerBase(abc.ABC):
@@ -191,6 +203,10 @@ class StatsViewerBase(abc.ABC):
         pd.DataFrame
 
         """
+        # pandas and prettytable are only needed for reports. Importing them
+        # here keeps them out of the job runner's startup.
+        import pandas as pd
+
         records = []
         for event in self._events_by_batch[batch]:
             data = {}
@@ -205,6 +221,8 @@ class StatsViewerBase(abc.ABC):
         """Show statistics"""
 
     def _show_stats(self):
+        from prettytable import PrettyTable
+
         for batch, events in self._events_by_batch.items():
             print(batch)
             print("-" * len(batch))
@@ -242,6 +260,8 @@ class StatsViewerBase(abc.ABC):
         stats_to_total : list
 
         """
+        from prettytable import PrettyTable
+
         table = PrettyTable()
         table.field_names = ["source"] + list(stats_to_total)
         for batch, totals in self._stat_sums_by_batch.items():
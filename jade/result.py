@@ -5,13 +5,11 @@ import os
 from time import time
 from datetime import datetime
 
-from prettytable import PrettyTable
-
-from jade.common import RESULTS_FILE
+from jade.common import RESULTS_FILE, RESULTS_DB_FILE
 from jade.exceptions import InvalidParameter, ExecutionError
 from jade.utils.utils import load_data
 
-class Result(namedtuple("Result", "name, return_code, status, exec_time_s, completion_time")):
+class Result(namedtuple("Result", "name, return_code, status, exec_time_s, completion_time, num_attempts")):
     """
     Result class containing data after jobs have finished. `completion_time`
     will be populated when result created and passed in when deserializing
@@ -23,15 +21,19 @@ class Result(namedtuple("Result", "name, return_code, status, exec_time_s, compl
     status : str
     exec_time_s : int
     completion_time : int (default current timestamp)
+    num_attempts : int (default 1)
+        Number of times the job ran; the other fields describe the last
+        attempt.
 
     """
     def __new__(cls, name, return_code, status, exec_time_s,
-                completion_time=None):
+                completion_time=None, num_attempts=1):
         # add default values
         if completion_time is None:
             completion_time = time()
         return super(Result, cls).__new__(cls, name, return_code, status,
-                                          exec_time_s, completion_time)
+                                          exec_time_s, completion_time,
+                                          num_attempts)
 
 def serialize_result(result):
     """Serialize a Result to a dict.
@@ -77,7 +79,8 @@ def deserialize_result(data):
     """
     if "completion_time" in data.keys():
         return Result(data["name"], data["return_code"], data["status"],
-                  data["exec_time_s"], data["completion_time"])
+                  data["exec_time_s"], data["completion_time"],
+                  data.get("num_attempts", 1))
 
     return Result(data["name"], data["return_code"], data["status"],
                 data["exec_time_s"])
@@ -98,13 +101,26 @@ def deserialize_results(data):
 
 
 class ResultsSummary:
-    """Provides summary of all job results."""
+    """Provides summary of all job results.
+
+    Reads the results database if the output directory contains one.
+    Otherwise, loads the results file.
+
+    """
     def __init__(self, output_dir):
         self._output_dir = output_dir
 
         self._results_file = os.path.join(output_dir, RESULTS_FILE)
-        data = self._parse(self._results_file)
-        data["results"] = deserialize_results(data["results"])
+        self._db = None
+        self._results_by_name = None
+        db_file = os.path.join(output_dir, RESULTS_DB_FILE)
+        if os.path.exists(db_file):
+            from jade.results_database import ResultsDatabase
+            self._db = ResultsDatabase(db_file)
+            data = self._db.get_metadata()
+        else:
+            data = self._parse(self._results_file)
+            data["results"] = deserialize_results(data["results"])
         self._results = data
         self._base_directory = data["base_directory"]
 
@@ -129,6 +145,8 @@ class ResultsSummary:
             list of Result objects
 
         """
+        if "results" not in self._results:
+            self._results["results"] = self.list_results()
         return self._results
 
     @staticmethod
@@ -144,11 +162,14 @@ class ResultsSummary:
         -------
         dict
         """
-        for result in self._results["results"]:
-            if job_name == result.name:
-                return result
+        if self._db is not None:
+            return self._db.get_result(job_name)
 
-        return None
+        if self._results_by_name is None:
+            self._results_by_name = {
+                x.name: x for x in self._results["results"]
+            }
+        return self._results_by_name.get(job_name)
 
 
     def get_successful_result(self, job_name):
@@ -177,12 +198,7 @@ class ResultsSummary:
 
     def get_successful_results(self):
         """Return the successful results."""
-        successful_results = []
-        for result in self._results["results"]:
-            if result.return_code == 0 and result.status == "finished":
-                successful_results.append(result)
-
-        return successful_results
+        return list(self._iter_results(only_successful=True))
 
     def get_missing_results(self, expected_jobs):
         """Return the missing results.
@@ -197,21 +213,40 @@ class ResultsSummary:
         list
 
         """
-        missing_results =  []
-        for job in expected_jobs:
-            if self.get_result(job.name) is None:
-                missing_results.append(job)
+        if self._db is not None:
+            return list(self._db.iter_missing(expected_jobs))
 
-        return missing_results
+        return [x for x in expected_jobs if self.get_result(x.name) is None]
 
     def get_failed_results(self):
         """Return the failed results."""
-        failed_results = []
-        for result in self._results["results"]:
-            if result.return_code != 0 or result.status != "finished":
-                failed_results.append(result)
-
-        return failed_results
+        return list(self._iter_results(only_failed=True))
+
+    def _iter_results(self, only_successful=False, only_failed=False):
+        if self._db is not None:
+            return self._db.iter_results(only_successful=only_successful,
+                                         only_failed=only_failed)
+
+        results = self._results["results"]
+        if only_successful:
+            return (x for x in results if _is_successful(x))
+        if only_failed:
+            return (x for x in results if not _is_successful(x))
+        return iter(results)
+
+    def _get_summary(self):
+        if self._db is not None:
+            return self._db.get_summary()
+
+        num_successful = sum(
+            1 for x in self._results["results"] if _is_successful(x)
+        )
+        total = len(self._results["results"])
+        return {
+            "num_successful": num_successful,
+            "num_failed": total - num_successful,
+            "total": total,
+        }
 
     def list_results(self):
         """Return the results.
@@ -221,10 +256,12 @@ class ResultsSummary:
         list
 
         """
-        return self._results["results"][:]
+        return list(self._iter_results())
 
     def show_results(self, only_failed=False, only_successful=False):
         """Show the results in a table."""
+        from prettytable import PrettyTable
+
         if only_successful and only_failed:
             raise InvalidParameter(
                 "only_failed and only_successful are mutually exclusive"
@@ -238,38 +275,27 @@ class ResultsSummary:
         #    git_status = self._results["repository_info"]["status"]
         #    print(f"git status:  {git_status}")
 
-        num_successful = 0
-        num_failed = 0
+        summary = self._get_summary()
         table = PrettyTable()
         table.field_names = ["Job Name", "Return Code", "Status",
                              "Execution Time (s)", "Completion Time"]
-        min_exec = 0
-        max_exec = 0
-        if self._results["results"]:
-            min_exec = self._results["results"][0].exec_time_s
-            max_exec = self._results["results"][0].exec_time_s
-
         exec_times = []
-        for result in self._results["results"]:
-            if result.return_code == 0 and result.status == "finished":
-                num_successful += 1
-            else:
-                num_failed += 1
-            if only_failed and result.return_code == 0:
-                continue
-            if only_successful and result.return_code == 1:
-                continue
-            if result.exec_time_s < min_exec:
-                min_exec = result.exec_time_s
-            if result.exec_time_s > max_exec:
-                max_exec = result.exec_time_s
+        # The filters are applied by the database when there is one.
+        for result in self._iter_results(only_successful=only_successful,
+                                         only_failed=only_failed):
             exec_times.append(result.exec_time_s)
             table.add_row([result.name, result.return_code, result.status,
                            result.exec_time_s, datetime.fromtimestamp(result.completion_time)])
 
-        total = num_successful + num_failed
-        assert total == len(self._results["results"])
-        avg_exec = sum(exec_times) / len(exec_times)
+        num_successful = summary["num_successful"]
+        num_failed = summary["num_failed"]
+        total = summary["total"]
+        if exec_times:
+            avg_exec = sum(exec_times) / len(exec_times)
+            min_exec = min(exec_times)
+            max_exec = max(exec_times)
+        else:
+            avg_exec = min_exec = max_exec = 0
 
         print(table)
         print(f"\nNum successful: {num_successful}")
@@ -278,3 +304,7 @@ class ResultsSummary:
         print("Avg execution time (s): {:.2f}".format(avg_exec))
         print("Min execution time (s): {:.2f}".format(min_exec))
         print("Max execution time (s): {:.2f}\n".format(max_exec))
+
+
+def _is_successful(result):
+    return result.return_code == 0 and result.status == "finished"
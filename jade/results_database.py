@@ -0,0 +1,250 @@
+"""Stores job results in a SQLite database."""
+
+import itertools
+import json
+import logging
+import os
+import sqlite3
+
+from jade.result import Result
+
+
+logger = logging.getLogger(__name__)
+
+# Stay well below SQLite's limit on the number of host parameters.
+MAX_QUERY_PARAMETERS = 500
+
+_SUCCESSFUL = "return_code = 0 AND status = 'finished'"
+_FAILED = "NOT (return_code = 0 AND status = 'finished')"
+
+
+class ResultsDatabase:
+    """Provides indexed queries on job results.
+
+    The database contains a results table with one row per job, indexed by
+    name and status, and a metadata table with the other fields of the
+    results file.
+
+    """
+    def __init__(self, filename):
+        """Open an existing database.
+
+        Parameters
+        ----------
+        filename : str
+
+        Raises
+        ------
+        FileNotFoundError
+            Raised if the file does not exist.
+
+        """
+        if not os.path.exists(filename):
+            raise FileNotFoundError(filename)
+        self._filename = filename
+        self._conn = sqlite3.connect(filename)
+
+    def __del__(self):
+        self.close()
+
+    @classmethod
+    def create(cls, filename, results, metadata):
+        """Create a database, replacing any existing file.
+
+        Parameters
+        ----------
+        filename : str
+        results : iterable
+            Result objects
+        metadata : dict
+            Fields of the results file other than results. Values must be
+            JSON-serializable.
+
+        Returns
+        -------
+        ResultsDatabase
+
+        """
+        tmp_filename = filename + ".tmp"
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+        conn = sqlite3.connect(tmp_filename)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE results (name TEXT PRIMARY KEY, "
+                "return_code INTEGER, status TEXT, exec_time_s REAL, "
+                "completion_time REAL, num_attempts INTEGER DEFAULT 1)"
+            )
+            conn.execute(
+                "CREATE INDEX results_status ON results (status, return_code)"
+            )
+            conn.execute(
+                "CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            with conn:
+                num_duplicates = _insert_results(conn, results)
+                conn.executemany(
+                    "INSERT INTO metadata VALUES (?, ?)",
+                    ((k, json.dumps(v)) for k, v in metadata.items()),
+                )
+        finally:
+            # Closing the last connection checkpoints and removes the WAL.
+            conn.close()
+
+        os.replace(tmp_filename, filename)
+        if num_duplicates:
+            logger.warning(
+                "Results had %s duplicate job names. The database contains "
+                "the last result for each.", num_duplicates
+            )
+        logger.debug("Created results database %s", filename)
+        return cls(filename)
+
+    def close(self):
+        """Close the connection."""
+        if getattr(self, "_conn", None) is not None:
+            self._conn.close()
+            self._conn = None
+
+    @property
+    def filename(self):
+        """Return the database filename."""
+        return self._filename
+
+    def get_metadata(self):
+        """Return the fields of the results file other than results.
+
+        Returns
+        -------
+        dict
+
+        """
+        return {
+            key: json.loads(value)
+            for key, value in self._conn.execute("SELECT * FROM metadata")
+        }
+
+    def get_result(self, name):
+        """Return the result for a job.
+
+        Parameters
+        ----------
+        name : str
+
+        Returns
+        -------
+        Result | None
+
+        """
+        row = self._conn.execute(
+            "SELECT * FROM results WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return None
+        return Result(*row)
+
+    def get_summary(self):
+        """Return the number of successful and failed results.
+
+        Returns
+        -------
+        dict
+
+        """
+        num_successful, total = self._conn.execute(
+            f"SELECT COALESCE(SUM({_SUCCESSFUL}), 0), COUNT(*) FROM results"
+        ).fetchone()
+        return {
+            "num_successful": num_successful,
+            "num_failed": total - num_successful,
+            "total": total,
+        }
+
+    def iter_results(self, only_successful=False, only_failed=False):
+        """Yield results in the order that they were written.
+
+        Parameters
+        ----------
+        only_successful : bool
+        only_failed : bool
+
+        Yields
+        ------
+        Result
+
+        """
+        assert not (only_successful and only_failed)
+        query = "SELECT * FROM results"
+        if only_successful:
+            query += f" WHERE {_SUCCESSFUL}"
+        elif only_failed:
+            query += f" WHERE {_FAILED}"
+        query += " ORDER BY rowid"
+
+        for row in self._conn.execute(query):
+            yield Result(*row)
+
+    def iter_missing(self, jobs):
+        """Yield the jobs that do not have a result.
+
+        Parameters
+        ----------
+        jobs : iterable
+            objects with a name attribute
+
+        Yields
+        ------
+        object
+
+        """
+        jobs = iter(jobs)
+        while True:
+            chunk = list(itertools.islice(jobs, MAX_QUERY_PARAMETERS))
+            if not chunk:
+                break
+            placeholders = ", ".join("?" * len(chunk))
+            found = {
+                x[0] for x in self._conn.execute(
+                    f"SELECT name FROM results WHERE name IN ({placeholders})",
+                    [x.name for x in chunk],
+                )
+            }
+            for job in chunk:
+                if job.name not in found:
+                    yield job
+
+
+def _insert_results(conn, results):
+    """Insert results into the results table. A later result for a job
+    replaces the earlier one, as with a results file.
+
+    Returns
+    -------
+    int
+        number of replaced results
+
+    """
+    num_duplicates = 0
+    for result in results:
+        try:
+            conn.execute(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)", tuple(result)
+            )
+        except sqlite3.IntegrityError:
+            existing = conn.execute(
+                "SELECT * FROM results WHERE name = ?", (result.name,)
+            ).fetchone()
+            if existing is None:
+                raise
+            logger.warning("Duplicate result for job %s: replacing %s with %s",
+                           result.name, Result(*existing), result)
+            conn.execute(
+                "UPDATE results SET return_code = ?, status = ?, "
+                "exec_time_s = ?, completion_time = ?, num_attempts = ? "
+                "WHERE name = ?",
+                tuple(result)[1:] + (result.name,),
+            )
+            num_duplicates += 1
+    return num_duplicates
@@ -13,10 +13,6 @@ import re
 import shutil
 import stat
 import sys
-import yaml
-from dateutil.parser import parse
-
-import toml
 
 from jade.exceptions import InvalidParameter
 from jade.utils.timing_utils import timed_debug
@@ -96,12 +92,16 @@ def make_file_read_only(filename):
 
 
 def _get_module_from_extension(filename, **kwargs):
+    # toml and yaml are imported on demand because most callers only read
+    # JSON and the CLIs should start quickly.
     ext = os.path.splitext(filename)[1].lower()
     if ext == ".json":
         mod = json
     elif ext == ".toml":
+        import toml
         mod = toml
     elif ext in (".yml", ".yaml"):
+        import yaml
         mod = yaml
     elif "mod" in kwargs:
         mod = kwargs["mod"]
@@ -396,6 +396,7 @@ def standardize_timestamp(timestamp: Union[str, datetime]) -> str:
             continue
 
     if not dt:
+        from dateutil.parser import parse
         dt = parse(timestamp)
 
     return dt.strftime(stdfmt)
@@ -488,6 +489,7 @@ def _write_file(data, stream=sys.stdout, fmt=".json", indent=2):
     if fmt == ".json":
         json.dump(data, stream, indent=indent)
     elif fmt == ".toml":
+        import toml
         toml.dump(data, stream)
     else:
         assert False, fmt
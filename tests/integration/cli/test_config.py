@@ -103,3 +103,26 @@ def test_config__filter_show_only(cleanup):
     assert not os.path.exists(CONFIG2)
 
     assert "brazil" in output["stdout"]
+
+
+def test_config__filter_ndjson(cleanup):
+    ret = run_command(f"jade auto-config demo tests/data/demo -c {CONFIG1}")
+    assert ret == 0
+
+    config2 = "test-config2.jsonl"
+    try:
+        ret = run_command(f"jade config filter {CONFIG1} -o {config2} 2 0")
+        assert ret == 0
+        output = {}
+        ret = run_command(f"jade config show {config2}", output=output)
+        assert ret == 0
+        assert "brazil" not in output["stdout"]
+        assert "Num jobs: 2" in output["stdout"]
+
+        ret = run_command(f"jade config filter {config2} -o {CONFIG2}")
+        assert ret == 0
+    finally:
+        os.remove(config2)
+
+    config1 = load_data(CONFIG1)
+    assert load_data(CONFIG2)["jobs"] == [config1["jobs"][2], config1["jobs"][0]]
@@ -0,0 +1,104 @@
+"""Import-time benchmark for the per-job CLI."""
+
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from jade.extensions.generic_command.generic_command_inputs import GenericCommandInputs
+from jade.extensions.generic_command.generic_command_configuration import GenericCommandConfiguration
+from jade.extensions.generic_command.generic_command_parameters import GenericCommandParameters
+
+
+TEST_FILENAME = "test-import-time-inputs.txt"
+CONFIG_FILE = "test-import-time-config.json"
+OUTPUT = "test-import-time-output"
+
+# `jade-internal run` is started once per job, so keep its import time low.
+# The budget is relative to the time to import modules that any CLI needs so
+# that it holds on slow or loaded systems.
+BASELINE_IMPORTS = "import json, logging, click"
+IMPORT_TIME_BUDGET_FACTOR = 6
+HEAVY_MODULES = ("pandas", "numpy", "prettytable", "yaml", "statsmodels",
+                 "matplotlib", "psutil")
+
+
+@pytest.fixture
+def cleanup():
+    yield
+    for path in (TEST_FILENAME, CONFIG_FILE, OUTPUT):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def _parse_import_times(text):
+    """Return (module, cumulative_us, is_top_level) for each import performed
+    after the interpreter's site initialization.
+
+    """
+    imports = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, module = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header
+        # Nested imports are indented by two spaces per level.
+        is_top_level = not module.startswith("  ")
+        name = module.strip()
+        if is_top_level and name == "site":
+            imports.clear()
+            continue
+        imports.append((name, int(cumulative), is_top_level))
+
+    return imports
+
+
+def _run_with_import_times(code):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert proc.returncode == 0, proc.stderr
+    return _parse_import_times(proc.stderr)
+
+
+def _get_top_level_import_times(imports):
+    return [x[:2] for x in imports if x[2]]
+
+
+def test_jade_internal_run__import_time(cleanup):
+    with open(TEST_FILENAME, "w") as f_out:
+        pass
+
+    inputs = GenericCommandInputs(TEST_FILENAME)
+    config = GenericCommandConfiguration(job_inputs=inputs)
+    config.add_job(GenericCommandParameters("echo hello"))
+    config.dump(CONFIG_FILE)
+
+    code = "\n".join((
+        "from jade.cli.jade_internal import cli",
+        "cli(['run', 'generic_command', '--name=1', "
+        f"'--output={OUTPUT}', '--config-file={CONFIG_FILE}'])",
+    ))
+    imports = _run_with_import_times(code)
+    assert imports
+    modules = {x[0].split(".")[0] for x in imports}
+    for name in HEAVY_MODULES:
+        assert name not in modules, f"{name} imported by jade-internal run"
+
+    top_level = _get_top_level_import_times(imports)
+    total = sum(x[1] for x in top_level)
+    baseline = sum(
+        x[1] for x in
+        _get_top_level_import_times(_run_with_import_times(BASELINE_IMPORTS))
+    )
+    budget = baseline * IMPORT_TIME_BUDGET_FACTOR
+    slowest = sorted(top_level, key=lambda x: x[1])[-5:]
+    assert total < budget, \
+        f"import time {total} us exceeds budget {budget} us; slowest: {slowest}"
@@ -0,0 +1,104 @@
+"""Makespan benchmark of the scheduling policies on synthetic DAGs.
+
+Jobs are not run. A discrete-event simulation dispatches them from a
+JobDependencyGraph to a fixed number of workers in the order chosen by each
+policy. Run with ``pytest -s`` to see the report.
+
+"""
+
+import heapq
+import random
+
+import pytest
+
+from jade.jobs.job_dependency_graph import JobDependencyGraph
+from jade.jobs.runtime_history import RuntimeHistory
+from jade.jobs.scheduling_policy import SchedulingPolicyType, \
+    create_scheduling_policy
+
+
+NUM_WORKERS = 8
+NUM_TRIALS = 10
+
+
+class SimulatedJob:
+    def __init__(self, name, blocking_jobs):
+        self.name = name
+        self._blocking_jobs = set(blocking_jobs)
+
+    def get_blocking_jobs(self):
+        return self._blocking_jobs
+
+    def remove_blocking_job(self, name):
+        self._blocking_jobs.remove(name)
+
+
+def _make_chains_dag(rng):
+    """Independent short jobs submitted ahead of a few long chains."""
+    spec = []
+    for i in range(150):
+        spec.append((f"short_{i}", rng.uniform(1, 5), []))
+    for i in range(4):
+        for j in range(15):
+            blocking = [f"chain_{i}_{j - 1}"] if j > 0 else []
+            spec.append((f"chain_{i}_{j}", rng.uniform(5, 10), blocking))
+    return spec
+
+
+def _make_layered_dag(rng):
+    """Random layers whose jobs each depend on up to three earlier jobs."""
+    spec = []
+    names = []
+    for i in range(300):
+        name = f"job_{i}"
+        blocking = rng.sample(names, min(len(names), rng.randint(0, 3))) \
+            if names and rng.random() < 0.6 else []
+        spec.append((name, rng.lognormvariate(1, 1), blocking))
+        names.append(name)
+    rng.shuffle(spec)
+    return spec
+
+
+def _make_jobs(spec):
+    return [SimulatedJob(name, blocking) for name, _, blocking in spec]
+
+
+def _simulate(spec, policy_type, num_workers):
+    runtimes = {name: runtime for name, runtime, _ in spec}
+    history = RuntimeHistory(times_by_name=runtimes)
+    policy = create_scheduling_policy(policy_type, _make_jobs(spec),
+                                      runtime_history=history)
+    graph = JobDependencyGraph(_make_jobs(spec),
+                               priority_func=policy.get_priority)
+    current_time = 0.0
+    running = []
+    while graph.num_unscheduled > 0 or running:
+        while len(running) < num_workers and graph.has_ready_jobs():
+            job = graph.pop_ready()
+            heapq.heappush(running,
+                           (current_time + runtimes[job.name], job.name))
+        current_time, name = heapq.heappop(running)
+        graph.mark_complete(name)
+
+    assert len(graph) == 0
+    return current_time
+
+
+@pytest.mark.parametrize("make_dag", [_make_chains_dag, _make_layered_dag])
+def test_scheduling_policy_makespan(make_dag):
+    rng = random.Random(42)
+    totals = {x: 0.0 for x in SchedulingPolicyType}
+    for _ in range(NUM_TRIALS):
+        spec = make_dag(rng)
+        for policy_type in SchedulingPolicyType:
+            totals[policy_type] += _simulate(spec, policy_type, NUM_WORKERS)
+
+    fifo = totals[SchedulingPolicyType.FIFO]
+    print(f"\n{make_dag.__name__}: mean makespan over {NUM_TRIALS} DAGs "
+          f"with {NUM_WORKERS} workers")
+    for policy_type, total in totals.items():
+        improvement = 100 * (fifo - total) / fifo
+        print(f"  {policy_type.value:<22} {total / NUM_TRIALS:10.1f} "
+              f"({improvement:+.1f}% vs fifo)")
+
+    assert totals[SchedulingPolicyType.CRITICAL_PATH] < fifo
@@ -0,0 +1,510 @@
+"""
+Tests submission of batches as SLURM job arrays and multi-node allocations with
+stand-in SLURM commands.
+"""
+
+import os
+import shutil
+import stat
+import time
+
+import pytest
+
+from jade.common import RUNTIME_ESTIMATES_FILE
+from jade.events import EventsSummary, EVENT_NAME_HPC_SUBMIT, \
+    EVENT_NAME_HPC_JOB_STATE_CHANGE, EVENT_NAME_HPC_BATCH_DURATION, \
+    EVENT_NAME_HPC_ADAPTIVE_DECISION, EVENT_NAME_HPC_ALLOCATION_DRAIN, \
+    EVENT_NAME_HPC_REQUEUE_DRAINED_JOBS, EVENT_NAME_HPC_JOBS_LOST
+from jade.extensions.generic_command.generic_command_configuration import GenericCommandConfiguration
+from jade.jobs.runtime_history import RuntimeHistory
+from jade.jobs.shared_job_queue import SharedJobQueue
+from jade.result import Result, serialize_results
+from jade.utils.subprocess_manager import run_command
+from jade.utils.utils import dump_data, load_data
+
+
+TEST_FILENAME = "test-slurm-submission-inputs.txt"
+CONFIG_FILE = "test-slurm-submission-config.json"
+OUTPUT = "test-slurm-submission-output"
+SUBMIT_JOBS = "jade submit-jobs"
+
+# Runs the script, or each task of an array, in the background and records
+# its PID.
+SBATCH = """#!/bin/bash
+script=$1
+echo "$@" >> {state_dir}/sbatch.log
+job_id=$((100 + $(wc -l < {state_dir}/sbatch.log)))
+num_tasks=$(sed -n 's/^#SBATCH --array=1-\\([0-9]*\\)%.*/\\1/p' $script)
+if [ -z "$num_tasks" ]; then
+    SLURM_JOB_ID=$job_id bash $script > {state_dir}/job_${{job_id}}.log 2>&1 &
+    echo $! > {state_dir}/${{job_id}}.pid
+else
+    for i in $(seq 1 $num_tasks); do
+        SLURM_ARRAY_JOB_ID=$job_id SLURM_ARRAY_TASK_ID=$i bash $script \\
+            > {state_dir}/task_${{job_id}}_$i.log 2>&1 &
+        echo $! > {state_dir}/${{job_id}}_$i.pid
+    done
+fi
+echo "Submitted batch job $job_id"
+"""
+
+# Reports every task that is still running.
+SQUEUE = """#!/bin/bash
+echo "$@" >> {state_dir}/squeue.log
+for f in {state_dir}/*.pid; do
+    [ -e "$f" ] || continue
+    if kill -0 $(cat $f) 2> /dev/null; then
+        echo "$(basename $f .pid) RUNNING"
+    fi
+done
+"""
+
+# Runs one copy of the command per task, as on separate nodes.
+SRUN = """#!/bin/bash
+echo "$@" >> {state_dir}/srun.log
+num_tasks=1
+while [[ $1 == --* ]]; do
+    case $1 in
+        --ntasks=*) num_tasks=${{1#--ntasks=}};;
+    esac
+    shift
+done
+for i in $(seq 0 $((num_tasks - 1))); do
+    SLURM_PROCID=$i "$@" &
+done
+wait
+"""
+
+
+@pytest.fixture
+def fake_slurm(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    state_dir = tmp_path / "state"
+    bin_dir.mkdir()
+    state_dir.mkdir()
+    for name, text in (("sbatch", SBATCH), ("squeue", SQUEUE),
+                       ("srun", SRUN)):
+        path = bin_dir / name
+        path.write_text(text.format(state_dir=state_dir))
+        path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("NREL_CLUSTER", "eagle")
+    monkeypatch.setenv("LOCAL_SCRATCH", str(scratch))
+    monkeypatch.setenv("SLURM_CPUS_ON_NODE", "2")
+    monkeypatch.delenv("FAKE_HPC_CLUSTER", raising=False)
+    yield state_dir
+    for path in (TEST_FILENAME, CONFIG_FILE, OUTPUT):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def test_job_arrays(fake_slurm):
+    num_jobs = 8
+    with open(TEST_FILENAME, "w") as f_out:
+        for i in range(num_jobs):
+            f_out.write(f"echo {i}\n")
+
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.get_job("8").blocked_by.add("1")
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -b 3 -n 2 " \
+        "--job-arrays --no-try-add-blocked-jobs --no-reports"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    results = load_data(os.path.join(OUTPUT, "results.json"))["results"]
+    assert len(results) == num_jobs
+    assert all(x["return_code"] == 0 for x in results)
+
+    # Jobs 1-7 are ready in three batches. Job 8 runs in a second array
+    # after job 1 completes.
+    submissions = (fake_slurm / "sbatch.log").read_text().splitlines()
+    assert len(submissions) == 2
+    with open(os.path.join(OUTPUT, "run_batches_1_3.sh")) as f_in:
+        assert "SLURM_ARRAY_TASK_ID + 0" in f_in.read()
+    with open(os.path.join(OUTPUT, "job_batches_1_3.sh")) as f_in:
+        assert "#SBATCH --array=1-3%2" in f_in.read()
+    for i in range(1, 5):
+        assert os.path.exists(os.path.join(OUTPUT, f"run_jobs_batch_{i}.log"))
+
+    for line in (fake_slurm / "squeue.log").read_text().splitlines():
+        assert "-j" not in line.split()
+
+    events_summary = EventsSummary(OUTPUT, preload=True)
+    submit_events = events_summary.list_events(EVENT_NAME_HPC_SUBMIT)
+    assert [x.data["num_array_tasks"] for x in submit_events] == [3, 1]
+    task_ids = {
+        x.data["job_id"]
+        for x in events_summary.list_events(EVENT_NAME_HPC_JOB_STATE_CHANGE)
+    }
+    assert "101_1" in task_ids
+
+
+def test_status_ttl(fake_slurm):
+    with open(TEST_FILENAME, "w") as f_out:
+        for _ in range(2):
+            f_out.write("sleep 1\n")
+
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -b 1 -n 2 " \
+        "--status-ttl=1 --no-reports"
+    start = time.time()
+    ret = run_command(cmd)
+    duration = time.time() - start
+    assert ret == 0
+
+    # Polls reuse the statuses for one second instead of running squeue
+    # every 0.1 seconds. Each node also runs squeue once.
+    num_squeue = len((fake_slurm / "squeue.log").read_text().splitlines())
+    assert num_squeue <= duration + 4
+
+
+def test_multi_node_allocations(fake_slurm):
+    num_jobs = 7
+    with open(TEST_FILENAME, "w") as f_out:
+        for i in range(num_jobs):
+            f_out.write(f"echo {i}\n")
+
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -b 2 -n 4 " \
+        "--nodes-per-allocation=2 --no-reports"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    results = load_data(os.path.join(OUTPUT, "results.json"))["results"]
+    assert sorted(x["name"] for x in results) == \
+        sorted(str(i) for i in range(1, num_jobs + 1))
+    assert all(x["return_code"] == 0 for x in results)
+
+    # Four batches run in two allocations of two nodes.
+    submissions = (fake_slurm / "sbatch.log").read_text().splitlines()
+    assert len(submissions) == 2
+    with open(os.path.join(OUTPUT, "run_batches_1_2.sh")) as f_in:
+        assert "SLURM_PROCID + 1" in f_in.read()
+    with open(os.path.join(OUTPUT, "job_batches_1_2.sh")) as f_in:
+        text = f_in.read()
+        assert "#SBATCH --nodes=2" in text
+        assert "--ntasks=2 --ntasks-per-node=1" in text
+    for i in range(1, 5):
+        assert os.path.exists(os.path.join(OUTPUT, f"run_jobs_batch_{i}.log"))
+
+    events_summary = EventsSummary(OUTPUT, preload=True)
+    submit_events = events_summary.list_events(EVENT_NAME_HPC_SUBMIT)
+    assert [x.data["num_nodes"] for x in submit_events] == [2, 2]
+    assert sum(x.data["batch_size"] for x in submit_events) == num_jobs
+
+
+@pytest.mark.parametrize("worker_pool", [False, True])
+def test_shared_job_queue(fake_slurm, worker_pool):
+    num_jobs = 9
+    with open(TEST_FILENAME, "w") as f_out:
+        for i in range(num_jobs):
+            f_out.write(f"echo {i}\n")
+
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.get_job("9").blocked_by.add("1")
+    config.get_job("8").blocked_by.add("9")
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -b 3 -n 2 " \
+        "--shared-job-queue --no-reports"
+    if worker_pool:
+        cmd += " --worker-pool"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    results = load_data(os.path.join(OUTPUT, "results.json"))["results"]
+    assert sorted(x["name"] for x in results) == \
+        sorted(str(i) for i in range(1, num_jobs + 1))
+    assert all(x["return_code"] == 0 for x in results)
+
+    # Two nodes pull all jobs from one queue.
+    submissions = (fake_slurm / "sbatch.log").read_text().splitlines()
+    assert len(submissions) == 2
+    with open(os.path.join(OUTPUT, "run_batch_1.sh")) as f_in:
+        assert "--shared-job-queue=" in f_in.read()
+    # Nodes read the jobs that they claim from the shared queue.
+    batch_config = load_data(os.path.join(OUTPUT, "config_batch_1.json"))
+    assert batch_config["job_names"] == []
+    queue = SharedJobQueue(os.path.join(OUTPUT, "shared_job_queue.json"))
+    assert queue.get_summary() == {
+        "num_pending": 0, "num_claimed": 0, "num_completed": num_jobs,
+    }
+    completed = queue.list_completed_jobs()
+    assert sorted(sum(completed.values(), [])) == \
+        sorted(str(i) for i in range(1, num_jobs + 1))
+    completion_times = {x["name"]: x["completion_time"] for x in results}
+    assert completion_times["9"] > completion_times["1"]
+    assert completion_times["8"] > completion_times["9"]
+
+    events_summary = EventsSummary(OUTPUT, preload=True)
+    submit_events = events_summary.list_events(EVENT_NAME_HPC_SUBMIT)
+    assert [x.data["num_nodes"] for x in submit_events] == [2]
+
+
+@pytest.mark.parametrize("num_jobs, batch_size, batch_sizes, durations", [
+    (6, 10, [4, 2], [120.0, 60.0]),
+    # Jobs are packed several batches at a time, so only the last batch is
+    # under-filled.
+    (10, 5, [4, 4, 2], [120.0, 120.0, 60.0]),
+    # The under-filled last batch of the first pack is held back and packed
+    # with the remaining jobs.
+    (60, 5, [4] * 15, [120.0] * 15),
+])
+def test_runtime_history_batch_packing(fake_slurm, tmp_path, num_jobs,
+                                       batch_size, batch_sizes, durations):
+    with open(TEST_FILENAME, "w") as f_out:
+        for i in range(num_jobs):
+            f_out.write(f"echo {i}\n")
+
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.dump(CONFIG_FILE)
+
+    # Each job is recorded as taking one minute; a node runs two at once.
+    history_dir = tmp_path / "history"
+    history_dir.mkdir()
+    results = [Result(x.name, 0, "finished", 60.0, 0)
+               for x in config.iter_jobs()]
+    dump_data(
+        {"base_directory": str(history_dir),
+         "results": serialize_results(results)},
+        str(history_dir / "results.json"),
+    )
+    hpc_config = tmp_path / "hpc_config.toml"
+    hpc_config.write_text(
+        "[hpc]\nallocation = \"test\"\nwalltime = \"2:30\"\n")
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 " \
+        f"-b {batch_size} -n 4 -h {hpc_config} " \
+        f"--runtime-history={history_dir} " \
+        "--cpus-per-node=2 --walltime-safety-margin=0.1 --no-reports"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    results = load_data(os.path.join(OUTPUT, "results.json"))["results"]
+    assert len(results) == num_jobs
+    assert all(x["return_code"] == 0 for x in results)
+
+    # 135 usable seconds fit two jobs on each of two workers.
+    events_summary = EventsSummary(OUTPUT, preload=True)
+    submit_events = events_summary.list_events(EVENT_NAME_HPC_SUBMIT)
+    assert [x.data["batch_size"] for x in submit_events] == batch_sizes
+    assert [x.data["predicted_duration_s"] for x in submit_events] == \
+        durations
+    duration_events = events_summary.list_events(EVENT_NAME_HPC_BATCH_DURATION)
+    assert sorted(x.data["predicted_duration_s"] for x in duration_events) == \
+        sorted(durations)
+    assert all(x.data["actual_duration_s"] < 60 for x in duration_events)
+
+
+def test_critical_path_scheduling(fake_slurm):
+    num_jobs = 6
+    with open(TEST_FILENAME, "w") as f_out:
+        for i in range(num_jobs):
+            f_out.write(f"echo {i}\n")
+
+    # Job 5 heads the longest chain: 5 -> 6.
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.get_job("6").blocked_by.add("5")
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -b 2 -n 1 " \
+        "--scheduling-policy=critical_path --no-try-add-blocked-jobs " \
+        "--no-reports"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    results = load_data(os.path.join(OUTPUT, "results.json"))["results"]
+    assert len(results) == num_jobs
+    assert all(x["return_code"] == 0 for x in results)
+
+    batch_config = os.path.join(OUTPUT, "config_batch_1.json")
+    assert load_data(batch_config)["job_names"] == ["5", "1"]
+    estimates_file = os.path.join(OUTPUT, RUNTIME_ESTIMATES_FILE)
+    estimates = RuntimeHistory.from_file(estimates_file)
+    assert len(estimates) == num_jobs
+    with open(os.path.join(OUTPUT, "run_batch_1.sh")) as f_in:
+        text = f_in.read()
+        assert "--scheduling-policy=critical_path" in text
+        assert f"--runtime-estimates={estimates_file}" in text
+
+
+def test_autotune_concurrency(fake_slurm):
+    num_jobs = 2
+    with open(TEST_FILENAME, "w") as f_out:
+        for i in range(num_jobs):
+            f_out.write(f"echo {i}\n")
+
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -b 2 -n 1 " \
+        "--autotune-concurrency 1 4 --no-reports"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    results = load_data(os.path.join(OUTPUT, "results.json"))["results"]
+    assert len(results) == num_jobs
+    assert all(x["return_code"] == 0 for x in results)
+    with open(os.path.join(OUTPUT, "run_batch_1.sh")) as f_in:
+        assert "--autotune-concurrency 1 4" in f_in.read()
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} " \
+        "--autotune-concurrency 4 1"
+    assert run_command(cmd) != 0
+
+
+def test_adaptive_nodes(fake_slurm):
+    num_jobs = 8
+    with open(TEST_FILENAME, "w") as f_out:
+        for i in range(num_jobs):
+            f_out.write("sleep 0.5\n")
+
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -b 2 -n 1 " \
+        "--adaptive-nodes --max-nodes-limit=2 --no-reports"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    results = load_data(os.path.join(OUTPUT, "results.json"))["results"]
+    assert len(results) == num_jobs
+
+    # Batches start immediately, so the controller adds a second node.
+    events_summary = EventsSummary(OUTPUT, preload=True)
+    decisions = events_summary.list_events(EVENT_NAME_HPC_ADAPTIVE_DECISION)
+    assert decisions
+    assert decisions[0].data["old_max_nodes"] == 1
+    assert decisions[0].data["new_max_nodes"] == 2
+    assert all(x.data["new_max_nodes"] <= 2 for x in decisions)
+
+
+def test_drain_ending_allocation(fake_slurm):
+    # The first allocation stops starting jobs three seconds after it
+    # starts, given the default grace period of 120 seconds. Later
+    # allocations do not end.
+    sbatch = fake_slurm.parent / "bin" / "sbatch"
+    text = sbatch.read_text()
+    sbatch.write_text(text.replace(
+        "job_id=$((100 + $(wc -l < {}/sbatch.log)))".format(fake_slurm),
+        "job_id=$((100 + $(wc -l < {}/sbatch.log)))\n"
+        "[ $job_id -eq 101 ] && "
+        "export SLURM_JOB_END_TIME=$(($(date +%s) + 123))".format(fake_slurm),
+    ))
+    with open(TEST_FILENAME, "w") as f_out:
+        f_out.write("sleep 5\n")
+        for _ in range(3):
+            f_out.write("sleep 2\n")
+
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -b 4 -n 1 " \
+        "-q 2 --no-reports"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    results = load_data(os.path.join(OUTPUT, "results.json"))["results"]
+    assert sorted(x["name"] for x in results) == ["1", "2", "3", "4"]
+    assert all(x["return_code"] == 0 for x in results)
+
+    # Job 2 shows that jobs take two seconds, so jobs 3 and 4 do not start.
+    # Job 1 is terminated before the allocation ends. All three run in a
+    # second batch.
+    submissions = (fake_slurm / "sbatch.log").read_text().splitlines()
+    assert len(submissions) == 2
+    assert not os.path.exists(os.path.join(OUTPUT, "drained_jobs_batch_1.json"))
+    events_summary = EventsSummary(OUTPUT, preload=True)
+    drain_events = events_summary.list_events(EVENT_NAME_HPC_ALLOCATION_DRAIN)
+    assert len(drain_events) == 1
+    assert drain_events[0].data["num_unstarted"] == 2
+    assert drain_events[0].data["num_terminated"] == 1
+    requeue_events = events_summary.list_events(
+        EVENT_NAME_HPC_REQUEUE_DRAINED_JOBS)
+    assert len(requeue_events) == 1
+    submit_events = events_summary.list_events(EVENT_NAME_HPC_SUBMIT)
+    assert [x.data["batch_size"] for x in submit_events] == [4, 3]
+
+
+def _kill_first_allocation(state_dir):
+    """Make the first allocation end after one second."""
+    sbatch = state_dir.parent / "bin" / "sbatch"
+    text = sbatch.read_text()
+    text = text.replace(
+        "job_id=$((100 + $(wc -l < {}/sbatch.log)))".format(state_dir),
+        "job_id=$((100 + $(wc -l < {}/sbatch.log)))\n"
+        "[ $job_id -eq 101 ] && wrapper=\"timeout 1\"".format(state_dir),
+    )
+    sbatch.write_text(text.replace(
+        "SLURM_JOB_ID=$job_id bash", "SLURM_JOB_ID=$job_id $wrapper bash"))
+
+
+@pytest.mark.parametrize("max_retries", [0, 1])
+def test_lost_jobs(fake_slurm, max_retries):
+    _kill_first_allocation(fake_slurm)
+    with open(TEST_FILENAME, "w") as f_out:
+        for _ in range(4):
+            f_out.write("sleep 2\n")
+
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -b 2 -n 1 " \
+        f"-q 2 --max-lost-job-retries={max_retries} --no-reports"
+    ret = run_command(cmd)
+
+    results = load_data(os.path.join(OUTPUT, "results.json"))["results"]
+    events_summary = EventsSummary(OUTPUT, preload=True)
+    lost_events = events_summary.list_events(EVENT_NAME_HPC_JOBS_LOST)
+    assert len(lost_events) == 1
+    assert lost_events[0].data["hpc_job_id"] == "101"
+    submissions = (fake_slurm / "sbatch.log").read_text().splitlines()
+    if max_retries == 0:
+        assert ret != 0
+        assert sorted(x["name"] for x in results) == ["3", "4"]
+        assert lost_events[0].data["abandoned_jobs"] == ["1", "2"]
+        assert len(submissions) == 2
+    else:
+        assert ret == 0
+        assert sorted(x["name"] for x in results) == ["1", "2", "3", "4"]
+        assert lost_events[0].data["retried_jobs"] == ["1", "2"]
+        assert len(submissions) == 3
+
+
+def test_lost_shared_jobs(fake_slurm):
+    _kill_first_allocation(fake_slurm)
+    with open(TEST_FILENAME, "w") as f_out:
+        for _ in range(4):
+            f_out.write("sleep 2\n")
+
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -b 2 -n 2 " \
+        "-q 1 --shared-job-queue --no-reports"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    results = load_data(os.path.join(OUTPUT, "results.json"))["results"]
+    assert sorted(x["name"] for x in results) == ["1", "2", "3", "4"]
+
+    # The second node runs the other three jobs. The job claimed by the
+    # first node is released after both nodes complete and runs on a third.
+    events_summary = EventsSummary(OUTPUT, preload=True)
+    lost_events = events_summary.list_events(EVENT_NAME_HPC_JOBS_LOST)
+    assert len(lost_events) == 1
+    assert lost_events[0].data["node"].endswith("_batch_1")
+    assert len(lost_events[0].data["retried_jobs"]) == 1
+    submissions = (fake_slurm / "sbatch.log").read_text().splitlines()
+    assert len(submissions) == 3
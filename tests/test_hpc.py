@@ -2,11 +2,12 @@
 
 import copy
 import os
+import stat
 
 import pytest
 
 from jade.common import OUTPUT_DIR
-from jade.hpc.common import HpcType
+from jade.hpc.common import HpcType, HpcJobStatus
 from jade.hpc.hpc_manager import HpcManager
 from jade.hpc.slurm_manager import SlurmManager
 from jade.jobs.job_submitter import DEFAULTS
@@ -106,14 +107,44 @@ def test_get_stripe_count(hpc_fixture):
     assert SlurmManager._get_stripe_count(output) == 16
 
 
-def create_hpc_manager(cluster, config):
+SQUEUE = """#!/bin/bash
+echo $@ >> {log_file}
+echo "100 RUNNING"
+echo "101 PENDING"
+"""
+
+
+def test_slurm_status_cache(hpc_fixture, tmp_path, monkeypatch):
+    log_file = tmp_path / "squeue.log"
+    squeue = tmp_path / "squeue"
+    squeue.write_text(SQUEUE.format(log_file=log_file))
+    squeue.chmod(squeue.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    mgr = create_hpc_manager("eagle", hpc_config(), status_ttl=1000)
+    assert mgr.check_status(job_id="100") == HpcJobStatus.RUNNING
+    assert mgr.check_status(job_id="101") == HpcJobStatus.QUEUED
+    assert mgr.check_status(job_id="102") == HpcJobStatus.NONE
+    assert mgr.num_scheduler_commands == 1
+    commands = log_file.read_text().splitlines()
+    assert len(commands) == 1
+    assert "-u" in commands[0]
+    assert "-j" not in commands[0]
+
+    mgr = create_hpc_manager("eagle", hpc_config(), status_ttl=0)
+    for _ in range(3):
+        assert mgr.check_status(job_id="100") == HpcJobStatus.RUNNING
+    assert mgr.num_scheduler_commands == 3
+
+
+def create_hpc_manager(cluster, config, **kwargs):
     os.environ["NREL_CLUSTER"] = cluster
     mgr = None
     try:
         hpc_file = "test-hpc-config.toml"
         dump_data(config, hpc_file)
 
-        mgr = HpcManager(hpc_file, OUTPUT_DIR)
+        mgr = HpcManager(hpc_file, OUTPUT_DIR, **kwargs)
     finally:
         os.remove(hpc_file)
 
@@ -125,3 +156,32 @@ def create_hpc_manager(cluster, config):
         assert False, "unknown cluster={}".format(cluster)
 
     return mgr
+
+
+QSTAT = """#!/bin/bash
+echo "Job ID          Username Queue    Jobname    SessID NDS TSK Memory Time  S Time"
+echo "123.server      user     short    job_1       1234   1   1    --   04:00 R 00:01"
+echo "124.server      user     short    job_2        --    1   1    --   04:00 Q   -- "
+"""
+
+QSUB = """#!/bin/bash
+echo "124.server.example.com"
+"""
+
+
+def test_pbs_status_cache(hpc_fixture, tmp_path, monkeypatch):
+    for name, text in (("qstat", QSTAT), ("qsub", QSUB)):
+        path = tmp_path / name
+        path.write_text(text)
+        path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    config = hpc_config()
+    config["hpc"]["queue"] = "short"
+    mgr = create_hpc_manager("peregrine", config, status_ttl=1000)
+    # qsub reports the full ID but qstat truncates the server name.
+    _, job_id, _ = mgr._intf.submit("submit.sh")
+    assert job_id == "124"
+    assert mgr.check_status(job_id="123") == HpcJobStatus.RUNNING
+    assert mgr.check_status(job_id=job_id) == HpcJobStatus.QUEUED
+    assert mgr.num_scheduler_commands == 1
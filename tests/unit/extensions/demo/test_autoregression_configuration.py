@@ -12,6 +12,7 @@ from jade.exceptions import InvalidParameter
 from jade.extensions.demo.autoregression_configuration import AutoRegressionConfiguration
 from jade.extensions.demo.autoregression_execution import AutoRegressionExecution
 from jade.extensions.demo.autoregression_parameters import AutoRegressionParameters
+from jade.jobs.job_configuration import ConfigSerializeOptions
 
 
 def test_init():
@@ -259,14 +260,19 @@ def test_serialize_jobs():
 
     directory = os.path.join(tempfile.gettempdir(), "jade-unit-test-dir")
     os.makedirs(directory, exist_ok=True)
-    arc.serialize_jobs(directory)
+    store = arc.serialize_jobs(directory)
 
-    serialized_job1 = os.path.join(directory, "a.json")
-    assert os.path.exists(serialized_job1)
+    assert len(store) == 2
+    assert "a" in store
+    assert "b" in store
+    assert store.get_record("b")["country"] == "b"
 
-    serialized_job2 = os.path.join(directory, "b.json")
-    assert os.path.exists(serialized_job2)
+    config = AutoRegressionConfiguration.deserialize(
+        arc.serialize(ConfigSerializeOptions.JOB_NAMES)
+    )
+    assert config.get_job("a").data == "A.csv"
 
+    store.close()
     shutil.rmtree(directory)
 
 
@@ -2,8 +2,11 @@
 Unit tests for auto-regression execution class methods and properties.
 """
 
+import multiprocessing
 import os
 import shutil
+import subprocess
+import sys
 
 import pytest
 
@@ -129,3 +132,106 @@ def test_job_order(generic_command_fixture):
     assert tracker["2"].completion_time > tracker["1"].completion_time
     assert tracker["21"].completion_time > tracker["30"].completion_time
     assert tracker["41"].completion_time > tracker["50"].completion_time
+
+
+def test_run_does_not_import_other_extensions(generic_command_fixture):
+    with open(TEST_FILENAME, "w") as f_out:
+        pass
+
+    inputs = GenericCommandInputs(TEST_FILENAME)
+    config = GenericCommandConfiguration(job_inputs=inputs)
+    config.add_job(GenericCommandParameters("echo hello"))
+    config.dump(CONFIG_FILE)
+
+    # Equivalent to `jade-internal run generic_command ...` but lets the
+    # test inspect the modules loaded by the process.
+    code = "\n".join((
+        "import sys",
+        "from jade.cli.jade_internal import cli",
+        "try:",
+        f"    cli(['run', 'generic_command', '--name=1', '--output={OUTPUT}',"
+        f" '--config-file={CONFIG_FILE}'])",
+        "except SystemExit as exc:",
+        "    assert exc.code == 0, exc.code",
+        "demo = [x for x in sys.modules if x.startswith('jade.extensions.demo')]",
+        "assert not demo, demo",
+        "assert 'statsmodels' not in sys.modules",
+    ))
+    proc = subprocess.run([sys.executable, "-c", code])
+    assert proc.returncode == 0
+    assert os.path.exists(os.path.join(OUTPUT, "1", "run.log"))
+
+
+def test_run_generic_commands__streamed_config(generic_command_fixture):
+    config_file = "test-config.jsonl.gz"
+    num_jobs = 25
+    with open(TEST_FILENAME, "w") as f_out:
+        for i in range(num_jobs):
+            f_out.write(f"echo {i}\n")
+
+    config = GenericCommandConfiguration.auto_config(TEST_FILENAME)
+    config.get_job("2").blocked_by.add("1")
+    try:
+        config.dump(config_file)
+        os.environ["FAKE_HPC_CLUSTER"] = "True"
+        cmd = f"{SUBMIT_JOBS} {config_file} --output={OUTPUT} " \
+            "--per-node-batch-size=10 --max-nodes=2 --poll-interval=.1"
+        ret = run_command(cmd)
+        assert ret == 0
+        assert os.path.exists(os.path.join(OUTPUT, "config.jsonl.gz"))
+    finally:
+        os.remove(config_file)
+
+    results = ResultsSummary(OUTPUT).list_results()
+    assert len(results) == num_jobs
+    tracker = {x.name: x for x in results}
+    assert tracker["2"].completion_time > tracker["1"].completion_time
+
+
+def test_run_generic_commands__resource_requirements(generic_command_fixture):
+    with open(TEST_FILENAME, "w") as f_out:
+        for _ in range(3):
+            f_out.write("sleep 0.3\n")
+
+    # Each job needs the whole node, so they cannot overlap.
+    inputs = GenericCommandInputs(TEST_FILENAME)
+    config = GenericCommandConfiguration(
+        job_inputs=inputs,
+        job_resource_defaults={"num_cpus": multiprocessing.cpu_count()},
+    )
+    for job_param in inputs.iter_jobs():
+        config.add_job(job_param)
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    results = ResultsSummary(OUTPUT).list_results()
+    assert len(results) == 3
+    assert all(x.return_code == 0 for x in results)
+    results.sort(key=lambda x: x.completion_time)
+    for prev, cur in zip(results, results[1:]):
+        assert cur.completion_time - cur.exec_time_s >= \
+            prev.completion_time - 0.05
+
+
+def test_run_generic_commands__limits(generic_command_fixture):
+    with open(TEST_FILENAME, "w") as f_out:
+        f_out.write("sleep 10\n")
+        f_out.write("sleep 0.1\n")
+
+    inputs = GenericCommandInputs(TEST_FILENAME)
+    config = GenericCommandConfiguration(
+        job_inputs=inputs, job_limit_defaults={"timeout_s": 1},
+    )
+    for job_param in inputs.iter_jobs():
+        config.add_job(job_param)
+    config.dump(CONFIG_FILE)
+
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1"
+    run_command(cmd)
+    results = {x.name: x for x in ResultsSummary(OUTPUT).list_results()}
+    assert results["1"].status == "timeout"
+    assert results["1"].exec_time_s < 10
+    assert results["2"].status == "finished"
@@ -1,7 +1,9 @@
 """Test registry."""
 
 import os
+import sys
 import tempfile
+import time
 
 import pytest
 
@@ -12,6 +14,8 @@ from jade.extensions.demo.autoregression_configuration import \
 from jade.extensions.demo.autoregression_execution import \
     AutoRegressionExecution
 import jade.extensions.demo.cli as cli
+from jade.utils.subprocess_manager import run_command
+from jade.utils.utils import dump_data, load_data
 
 
 # Don't change the user's registry.
@@ -104,3 +108,37 @@ def test_registry__show_extensions(capsys, registry_fixture):
     captured = capsys.readouterr()
     for extension in DEFAULT_REGISTRY["extensions"]:
         assert extension["name"] in captured.out
+
+
+def test_registry__cache(registry_fixture):
+    registry = Registry(registry_filename=TEST_FILENAME)
+    registry.reset_defaults()
+    package = "test-package"
+
+    # A change made by another process must be detected by the mtime check.
+    registry2 = Registry(registry_filename=TEST_FILENAME)
+    registry2.add_logger(package)
+    Registry.clear_cache()
+    assert package in Registry(registry_filename=TEST_FILENAME).list_loggers()
+
+    data = load_data(TEST_FILENAME)
+    data["logging"].remove(package)
+    time.sleep(0.01)
+    dump_data(data, TEST_FILENAME)
+    assert package not in Registry(registry_filename=TEST_FILENAME).list_loggers()
+
+
+def test_registry__lazy_import(registry_fixture):
+    Registry(registry_filename=TEST_FILENAME).reset_defaults()
+    code = "\n".join((
+        "import sys",
+        "from jade.extensions.registry import Registry, ExtensionClassType",
+        f"registry = Registry(registry_filename={TEST_FILENAME!r})",
+        "assert registry.is_registered('demo')",
+        "registry.get_extension_class('generic_command', ExtensionClassType.CLI)",
+        "assert 'jade.extensions.demo.cli' not in sys.modules",
+        "registry.get_extension_class('demo', ExtensionClassType.CLI)",
+        "assert 'jade.extensions.demo.cli' in sys.modules",
+    ))
+    ret = run_command(f"{sys.executable} -c \"{code}\"")
+    assert ret == 0
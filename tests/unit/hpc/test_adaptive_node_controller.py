@@ -0,0 +1,73 @@
+"""
+Unit tests for AdaptiveNodeController
+"""
+
+import mock
+import pytest
+
+from jade.exceptions import InvalidParameter
+from jade.hpc.adaptive_node_controller import AdaptiveNodeController
+
+
+WALLTIME = 3600
+
+
+def _create_controller(**kwargs):
+    return AdaptiveNodeController("test", 2, 10, WALLTIME, **kwargs)
+
+
+@mock.patch("jade.hpc.adaptive_node_controller.log_event")
+def test_adaptive_node_controller__raise_concurrency(log_event):
+    controller = _create_controller(max_nodes_limit=3)
+    assert not controller.update(True)
+
+    controller.record_queue_wait(10)
+    # Concurrency is only raised if jobs are waiting for a node.
+    assert not controller.update(False)
+    controller.record_queue_wait(10)
+    assert controller.update(True)
+    assert controller.max_nodes == 3
+    assert controller.per_node_batch_size == 10
+    # A decision requires a new observation.
+    assert not controller.update(True)
+
+    controller.record_queue_wait(10)
+    assert not controller.update(True)
+    assert controller.max_nodes == 3
+    assert log_event.call_count == 1
+    event = log_event.call_args[0][0]
+    assert event.data["old_max_nodes"] == 2
+    assert event.data["new_max_nodes"] == 3
+
+
+@mock.patch("jade.hpc.adaptive_node_controller.log_event")
+def test_adaptive_node_controller__consolidate(log_event):
+    controller = _create_controller(max_batch_size=30)
+    controller.record_run_duration(600)
+    controller.record_queue_wait(500)
+    assert controller.update(False)
+    assert controller.max_nodes == 1
+    assert controller.per_node_batch_size == 20
+
+    controller.record_queue_wait(500)
+    assert controller.update(False)
+    assert controller.max_nodes == 1
+    assert controller.per_node_batch_size == 30
+
+    controller.record_queue_wait(500)
+    assert not controller.update(False)
+    assert controller.num_decisions == 2
+
+    # Fast starts undo the consolidation before adding nodes.
+    for _ in range(5):
+        controller.record_queue_wait(1)
+    assert controller.update(True)
+    assert controller.max_nodes == 2
+    assert controller.per_node_batch_size == 15
+
+
+def test_adaptive_node_controller__invalid():
+    with pytest.raises(InvalidParameter):
+        _create_controller(max_nodes_limit=1)
+    with pytest.raises(InvalidParameter):
+        _create_controller(low_wait_ratio=0.5, high_wait_ratio=0.1)
@@ -0,0 +1,81 @@
+"""
+Unit tests for WalltimeBatchPacker
+"""
+
+import pytest
+
+from jade.exceptions import InvalidParameter
+from jade.extensions.generic_command.generic_command_parameters import GenericCommandParameters
+from jade.hpc.batch_packer import WalltimeBatchPacker
+from jade.hpc.common import get_walltime_seconds
+from jade.jobs.runtime_history import RuntimeHistory
+
+
+def _create_jobs(num_jobs):
+    return [GenericCommandParameters(f"echo {i}", job_id=i)
+            for i in range(1, num_jobs + 1)]
+
+
+def test_batch_packer__lpt():
+    jobs = _create_jobs(6)
+    history = RuntimeHistory(
+        times_by_name={"1": 10, "2": 60, "3": 30, "4": 50, "5": 20, "6": 40})
+    packer = WalltimeBatchPacker(history, 100, 2, safety_margin=0)
+    batches = packer.pack(jobs)
+    # The first batch fills both workers to 90 seconds before the 20-second
+    # job no longer fits; the 10-second job fills it to the walltime.
+    assert len(batches) == 2
+    assert [x.name for x in batches[0].jobs] == ["2", "4", "6", "3", "1"]
+    assert [x.name for x in batches[1].jobs] == ["5"]
+    assert batches[0].predicted_duration_s == 100
+    assert all(x.predicted_duration_s <= 100 for x in batches)
+    assert sorted(x.name for y in batches for x in y.jobs) == \
+        sorted(x.name for x in jobs)
+
+
+def test_batch_packer__safety_margin_and_max_jobs():
+    jobs = _create_jobs(10)
+    history = RuntimeHistory(times_by_name={x.name: 10 for x in jobs})
+    packer = WalltimeBatchPacker(history, 100, 1, safety_margin=0.2)
+    assert packer.capacity_s == 80
+    assert [len(x.jobs) for x in packer.pack(jobs)] == [8, 2]
+
+    packer = WalltimeBatchPacker(history, 100, 4, max_jobs_per_batch=3)
+    assert [len(x.jobs) for x in packer.pack(jobs)] == [3, 3, 3, 1]
+
+
+def test_batch_packer__fallback_runtime():
+    jobs = _create_jobs(4)
+    history = RuntimeHistory(times_by_name={"1": 10, "2": 20, "3": 30})
+    packer = WalltimeBatchPacker(history, 100, 1)
+    assert packer.estimate_runtime(jobs[3]) == 20
+    packer = WalltimeBatchPacker(history, 100, 1, fallback_runtime_s=5)
+    assert packer.estimate_runtime(jobs[3]) == 5
+
+    with pytest.raises(InvalidParameter):
+        WalltimeBatchPacker(RuntimeHistory(), 100, 1)
+
+
+def test_batch_packer__oversized_job():
+    jobs = _create_jobs(2)
+    history = RuntimeHistory(times_by_name={"1": 500, "2": 10})
+    batches = WalltimeBatchPacker(history, 100, 2).pack(jobs)
+    assert [[x.name for x in y.jobs] for y in batches] == [["1"], ["2"]]
+
+
+@pytest.mark.parametrize("walltime, seconds", [
+    ("4:00:00", 4 * 3600),
+    ("30", 30 * 60),
+    ("30:15", 30 * 60 + 15),
+    ("1-2", 26 * 3600),
+    ("1-02:30", 26 * 3600 + 30 * 60),
+    ("1-02:30:05", 26 * 3600 + 30 * 60 + 5),
+    (720, 12 * 3600),
+])
+def test_get_walltime_seconds(walltime, seconds):
+    assert get_walltime_seconds(walltime) == seconds
+
+
+def test_get_walltime_seconds__invalid():
+    with pytest.raises(InvalidParameter):
+        get_walltime_seconds("4:00:00:00")
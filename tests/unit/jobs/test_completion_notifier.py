@@ -0,0 +1,39 @@
+"""
+Unit tests for CompletionNotifier
+"""
+
+import subprocess
+import time
+
+from jade.jobs.completion_notifier import CompletionNotifier, NotificationMode
+
+
+def test_completion_notifier__wait():
+    notifier = CompletionNotifier()
+    try:
+        assert notifier.is_supported
+        pipe = subprocess.Popen(["sleep", "0.2"])
+        notifier.register(pipe.pid)
+        start = time.time()
+        while pipe.poll() is None:
+            notifier.wait(5)
+        assert time.time() - start < 4
+        notifier.unregister(pipe.pid)
+    finally:
+        notifier.close()
+
+    assert notifier.mode == NotificationMode.NONE
+
+
+def test_completion_notifier__timeout():
+    notifier = CompletionNotifier()
+    try:
+        pipe = subprocess.Popen(["sleep", "2"])
+        notifier.register(pipe.pid)
+        start = time.time()
+        assert not notifier.wait(0.1)
+        assert time.time() - start < 1.5
+        pipe.wait()
+        notifier.unregister(pipe.pid)
+    finally:
+        notifier.close()
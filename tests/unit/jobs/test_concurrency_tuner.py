@@ -0,0 +1,122 @@
+"""
+Unit tests for ConcurrencyTuner
+"""
+
+import mock
+import pytest
+
+from jade.exceptions import InvalidParameter
+from jade.jobs.concurrency_tuner import ConcurrencyTuner
+
+
+class FakeQueue:
+    def __init__(self, max_queue_depth, num_outstanding_jobs, num_ready_jobs):
+        self.max_queue_depth = max_queue_depth
+        self.num_outstanding_jobs = num_outstanding_jobs
+        self.num_ready_jobs = num_ready_jobs
+
+
+def _make_stats(cpu_percent=50.0, memory_percent=50.0, iowait=0.0):
+    return {
+        "cpu": {"cpu_percent": cpu_percent, "iowait": iowait},
+        "memory": {"percent": memory_percent},
+    }
+
+
+def _create_tuner(min_depth=2, max_depth=16):
+    tuner = ConcurrencyTuner("test", min_depth, max_depth)
+    # The first sample is only a baseline.
+    tuner.update(FakeQueue(8, 8, 0), _make_stats())
+    return tuner
+
+
+@mock.patch("jade.jobs.concurrency_tuner.log_event")
+def test_concurrency_tuner__first_sample_is_baseline(log_event):
+    tuner = ConcurrencyTuner("test", 2, 16)
+    queue = FakeQueue(8, 8, 10)
+    assert tuner.update(queue, _make_stats(memory_percent=99.0)) == 8
+    assert queue.max_queue_depth == 8
+    assert log_event.call_count == 0
+
+
+@mock.patch("jade.jobs.concurrency_tuner.log_event")
+def test_concurrency_tuner__memory_pressure(log_event):
+    tuner = _create_tuner()
+    queue = FakeQueue(8, 8, 10)
+    assert tuner.update(queue, _make_stats(cpu_percent=10.0,
+                                           memory_percent=95.0)) == 6
+    assert queue.max_queue_depth == 6
+    assert log_event.call_count == 1
+    event = log_event.call_args[0][0]
+    assert event.data["reason"] == "memory_pressure"
+    assert event.data["previous_depth"] == 8
+    assert event.data["new_depth"] == 6
+
+    # The depth never falls below the minimum.
+    for _ in range(5):
+        tuner.update(queue, _make_stats(memory_percent=95.0))
+    assert queue.max_queue_depth == 2
+    # Small depths are still lowered.
+    assert log_event.call_args[0][0].data["previous_depth"] == 3
+
+
+@mock.patch("jade.jobs.concurrency_tuner.log_event")
+def test_concurrency_tuner__io_wait(log_event):
+    tuner = _create_tuner()
+    queue = FakeQueue(8, 8, 10)
+    assert tuner.update(queue, _make_stats(iowait=30.0)) == 6
+    assert log_event.call_args[0][0].data["reason"] == "io_wait"
+
+
+@mock.patch("jade.jobs.concurrency_tuner.log_event")
+def test_concurrency_tuner__cpu_idle(log_event):
+    tuner = _create_tuner(max_depth=11)
+    idle = _make_stats(cpu_percent=20.0)
+
+    # The depth is not raised unless ready jobs wait for room in the queue.
+    queue = FakeQueue(8, 5, 10)
+    assert tuner.update(queue, idle) == 8
+    queue = FakeQueue(8, 8, 0)
+    assert tuner.update(queue, idle) == 8
+    assert log_event.call_count == 0
+
+    queue = FakeQueue(8, 8, 10)
+    assert tuner.update(queue, idle) == 10
+    assert log_event.call_args[0][0].data["reason"] == "cpu_idle"
+    queue.num_outstanding_jobs = 10
+    assert tuner.update(queue, idle) == 11
+    queue.num_outstanding_jobs = 11
+    assert tuner.update(queue, idle) == 11
+    assert log_event.call_count == 2
+
+
+@mock.patch("jade.jobs.concurrency_tuner.log_event")
+def test_concurrency_tuner__cpu_idle_without_memory_headroom(log_event):
+    tuner = _create_tuner()
+    queue = FakeQueue(8, 8, 10)
+    assert tuner.update(queue, _make_stats(cpu_percent=20.0,
+                                           memory_percent=85.0)) == 8
+    assert log_event.call_count == 0
+
+
+@mock.patch("jade.jobs.concurrency_tuner.log_event")
+def test_concurrency_tuner__missing_iowait(log_event):
+    tuner = _create_tuner()
+    queue = FakeQueue(8, 8, 10)
+    stats = _make_stats(cpu_percent=90.0)
+    stats["cpu"].pop("iowait")
+    assert tuner.update(queue, stats) == 8
+
+
+def test_concurrency_tuner__clamp():
+    tuner = ConcurrencyTuner("test", 2, 16)
+    assert tuner.clamp(1) == 2
+    assert tuner.clamp(8) == 8
+    assert tuner.clamp(32) == 16
+
+
+def test_concurrency_tuner__invalid_bounds():
+    with pytest.raises(InvalidParameter):
+        ConcurrencyTuner("test", 0, 4)
+    with pytest.raises(InvalidParameter):
+        ConcurrencyTuner("test", 4, 2)
@@ -3,13 +3,18 @@ Unit tests for dispatchable job class methods
 """
 import os
 import shutil
+import sys
 import tempfile
 import time
 
 import mock
 import pytest
 
+from jade.common import JOBS_OUTPUT_DIR
 from jade.jobs.dispatchable_job import DispatchableJob
+from jade.jobs.job_limits import JobLimits
+from jade.jobs.results_aggregator import ResultsAggregator
+from jade.jobs.retry_policy import RetryPolicy
 
 
 @pytest.fixture
@@ -21,7 +26,9 @@ def dispatchable_job():
     output = os.path.join(tempfile.gettempdir(), "jade-test-dispatchable-job")
     os.makedirs(output, exist_ok=True)
     results_file = os.path.join(output, "results_batch_0.csv")
-    dispatchable_job = DispatchableJob(job, cmd, output, results_file)
+    aggregator = ResultsAggregator(results_file)
+    aggregator.create_file()
+    dispatchable_job = DispatchableJob(job, cmd, output, aggregator)
     yield dispatchable_job
     shutil.rmtree(output)
 
@@ -49,3 +56,202 @@ def test_dispatchable_job__is_complete(dispatchable_job):
     while not dispatchable_job.is_complete():
         time.sleep(0.1)
         continue
+
+    aggregator = dispatchable_job._results_aggregator
+    assert aggregator.num_buffered_results == 1
+    assert not aggregator.get_results()
+    aggregator.flush()
+    assert aggregator.num_buffered_results == 0
+    assert [x.name for x in aggregator.get_results()] == ["Test-Job"]
+
+
+def test_dispatchable_job__terminate(dispatchable_job):
+    """Terminated jobs complete without a result"""
+    dispatchable_job._cli_cmd = "sleep 10"
+    dispatchable_job.run()
+    dispatchable_job.terminate()
+    assert dispatchable_job.is_terminated
+    while not dispatchable_job.is_complete():
+        time.sleep(0.1)
+
+    assert dispatchable_job.exec_time_s < 10
+    assert dispatchable_job._results_aggregator.num_buffered_results == 0
+
+
+def test_dispatchable_job__retry(dispatchable_job):
+    """Failed attempts report a retry delay until the policy is exhausted"""
+    dispatchable_job._cli_cmd = "false"
+    dispatchable_job._retry_policy = RetryPolicy(2, backoff_s=0.5)
+    aggregator = dispatchable_job._results_aggregator
+    delays = []
+    for _ in range(3):
+        dispatchable_job.run()
+        while not dispatchable_job.is_complete():
+            time.sleep(0.1)
+        delays.append(dispatchable_job.get_retry_delay())
+
+    assert delays == [0.5, 1.0, None]
+    assert dispatchable_job.num_attempts == 3
+    aggregator.flush()
+    results = aggregator.get_results()
+    assert len(results) == 1
+    assert results[0].return_code == 1
+    assert results[0].num_attempts == 3
+
+
+@pytest.mark.parametrize("cmd, limits, status", [
+    ("sleep 10", JobLimits(0.3, None, None), "timeout"),
+    (f"{sys.executable} -c 'import signal, time; "
+     "signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(10)'",
+     JobLimits(0.3, None, None), "timeout"),
+    (f"{sys.executable} -c 'import time; x = bytearray(500 * 1024 * 1024); "
+     "time.sleep(10)'",
+     JobLimits(None, 0.2, None), "memory_limit_exceeded"),
+    (f"{sys.executable} -c 'while True: pass'",
+     JobLimits(None, None, 0.5), "cpu_time_limit_exceeded"),
+])
+def test_dispatchable_job__limits(dispatchable_job, cmd, limits, status):
+    """Jobs that exceed a limit are stopped and not retried"""
+    dispatchable_job._cli_cmd = cmd
+    dispatchable_job._limits = limits
+    dispatchable_job._retry_policy = RetryPolicy(2)
+    with mock.patch("jade.jobs.dispatchable_job.TERMINATE_TIMEOUT", 0.5):
+        dispatchable_job.run()
+        while not dispatchable_job.is_complete():
+            time.sleep(0.1)
+
+    assert dispatchable_job.exec_time_s < 5
+    assert dispatchable_job.get_retry_delay() is None
+    aggregator = dispatchable_job._results_aggregator
+    aggregator.flush()
+    results = aggregator.get_results()
+    assert len(results) == 1
+    assert results[0].status == status
+    assert results[0].return_code != 0
+
+
+def _make_speculative_job(tmp_path, cmd, speculative_cmd):
+    job = mock.MagicMock()
+    job.name = "Test-Job"
+    output = tmp_path / "output"
+    speculative_output = tmp_path / "speculative"
+    for path in (output / JOBS_OUTPUT_DIR / job.name,
+                 speculative_output / job.name):
+        path.mkdir(parents=True)
+        (path / "owner.txt").write_text(path.parent.name)
+
+    aggregator = ResultsAggregator(str(output / "results_batch_0.csv"))
+    aggregator.create_file()
+    return DispatchableJob(job, cmd, str(output), aggregator,
+                           speculative_cmd=speculative_cmd,
+                           speculative_output=str(speculative_output))
+
+
+@pytest.mark.parametrize("duplicate_wins", [True, False])
+def test_dispatchable_job__speculate(tmp_path, duplicate_wins):
+    """The first attempt to finish wins and the other's output is removed"""
+    fast, slow = "true", "sleep 10"
+    cmd, speculative_cmd = (slow, fast) if duplicate_wins else (fast, slow)
+    job = _make_speculative_job(tmp_path, cmd, speculative_cmd)
+    assert not job.can_speculate()
+    job.run()
+    assert job.can_speculate()
+    job.speculate()
+    assert job.is_speculating()
+    assert not job.can_speculate()
+    while not job.is_complete():
+        time.sleep(0.1)
+
+    assert not job.is_speculating()
+    assert job.exec_time_s < 10
+    job_dir = tmp_path / "output" / JOBS_OUTPUT_DIR / "Test-Job"
+    expected = "speculative" if duplicate_wins else JOBS_OUTPUT_DIR
+    assert (job_dir / "owner.txt").read_text() == expected
+    assert not (tmp_path / "speculative" / "Test-Job").exists()
+    job._results_aggregator.flush()
+    results = job._results_aggregator.get_results()
+    assert [x.return_code for x in results] == [0]
+
+
+@pytest.mark.parametrize("cmd, speculative_cmd, owner, return_code", [
+    # The first successful attempt wins even if the other exits first.
+    ("false", "sleep 0.3", "speculative", 0),
+    ("sleep 0.3", "false", JOBS_OUTPUT_DIR, 0),
+    # The job fails only if both attempts fail.
+    ("exit 2", "sleep 0.3; exit 3", JOBS_OUTPUT_DIR, 2),
+    ("sleep 0.3; exit 2", "exit 3", JOBS_OUTPUT_DIR, 2),
+])
+def test_dispatchable_job__speculate_failure(tmp_path, cmd, speculative_cmd,
+                                             owner, return_code):
+    """A failed attempt does not complete a speculated job"""
+    job = _make_speculative_job(tmp_path, f"bash -c '{cmd}'",
+                                f"bash -c '{speculative_cmd}'")
+    job.run()
+    assert job.speculate()
+    while not job.is_complete():
+        time.sleep(0.05)
+
+    job_dir = tmp_path / "output" / JOBS_OUTPUT_DIR / "Test-Job"
+    assert (job_dir / "owner.txt").read_text() == owner
+    assert not (tmp_path / "speculative" / "Test-Job").exists()
+    job._results_aggregator.flush()
+    results = job._results_aggregator.get_results()
+    assert [x.return_code for x in results] == [return_code]
+
+
+def test_dispatchable_job__speculate_does_not_block(tmp_path):
+    """A loser that ignores SIGTERM is killed on a later check"""
+    stubborn = f"{sys.executable} -c 'import signal, time; " \
+        "signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(10)'"
+    job = _make_speculative_job(tmp_path, stubborn, "true")
+    with mock.patch("jade.jobs.dispatchable_job.TERMINATE_TIMEOUT", 2):
+        job.run()
+        assert job.speculate()
+        assert not job.speculate()
+        while job.get_pids() != [job.get_pid()]:
+            start = time.time()
+            assert not job.is_complete()
+            # Waiting for the loser would take TERMINATE_TIMEOUT.
+            assert time.time() - start < 1
+            time.sleep(0.05)
+        while not job.is_complete():
+            time.sleep(0.05)
+
+    assert job.exec_time_s < 5
+    assert job.get_pids() == []
+
+
+def test_dispatchable_job__speculate_limits_per_attempt(tmp_path):
+    """Each attempt of a speculated job is checked against the limits on
+    its own"""
+    cmd = f"{sys.executable} -c 'import time; x = b\"1\" * 150 * 1024 ** 2; " \
+        "time.sleep(1.5)'"
+    job = _make_speculative_job(tmp_path, cmd, cmd)
+    job._limits = JobLimits(None, 0.25, None)
+    job.run()
+    assert job.speculate()
+    while not job.is_complete():
+        time.sleep(0.1)
+
+    job._results_aggregator.flush()
+    results = job._results_aggregator.get_results()
+    assert [(x.status, x.return_code) for x in results] == [("finished", 0)]
+
+
+def test_dispatchable_job__speculate_timeout(tmp_path):
+    """The duplicate's timeout starts when it starts; the job continues with
+    it after the original times out"""
+    job = _make_speculative_job(tmp_path, "sleep 10", "bash -c 'sleep 0.8'")
+    job._limits = JobLimits(1.0, None, None)
+    job.run()
+    time.sleep(0.5)
+    assert job.speculate()
+    with mock.patch("jade.jobs.dispatchable_job.TERMINATE_TIMEOUT", 0.5):
+        while not job.is_complete():
+            time.sleep(0.1)
+
+    job_dir = tmp_path / "output" / JOBS_OUTPUT_DIR / "Test-Job"
+    assert (job_dir / "owner.txt").read_text() == "speculative"
+    job._results_aggregator.flush()
+    results = job._results_aggregator.get_results()
+    assert [(x.status, x.return_code) for x in results] == [("finished", 0)]
@@ -49,3 +49,29 @@ def test_job_configuration__check_job_dependencies(job_fixture):
         "--poll-interval=.1 "
     ret = run_command(cmd)
     assert ret != 0
+
+
+def test_job_configuration__check_job_dependencies_cycle(job_fixture):
+    with open(TEST_FILENAME, "w") as f_out:
+        for _ in range(3):
+            f_out.write("echo hello world\n")
+
+    inputs = GenericCommandInputs(TEST_FILENAME)
+    config = GenericCommandConfiguration(job_inputs=inputs)
+    for job_param in inputs.iter_jobs():
+        config.add_job(job_param)
+
+    config.get_job("2").blocked_by.add("1")
+    summary = config.check_job_dependencies()
+    assert summary.depth == 2
+    assert summary.width == 2
+    assert summary.longest_path == ["1", "2"]
+
+    config.get_job("1").blocked_by.add("2")
+    with pytest.raises(InvalidConfiguration) as exc:
+        config.check_job_dependencies()
+    assert "cycle" in str(exc.value)
+
+    config.dump(CONFIG_FILE)
+    ret = run_command(f"jade config dependencies {CONFIG_FILE}")
+    assert ret != 0
@@ -47,13 +47,17 @@ def jade_data():
 @pytest.fixture
 def results_summary(jade_data):
     """Fixture of ResultsSummary instance"""
-    ResultsSummary._parse = mock.MagicMock(return_value=jade_data)
+    with mock.patch.object(ResultsSummary, "_parse",
+                           mock.MagicMock(return_value=jade_data)):
+        yield
 
 @pytest.fixture
 def incomplete_results(jade_data):
     """Fixture of ResultsSummary instance"""
     jade_data["results"] = jade_data["results"][:2]
-    ResultsSummary._parse = mock.MagicMock(return_value=jade_data)
+    with mock.patch.object(ResultsSummary, "_parse",
+                           mock.MagicMock(return_value=jade_data)):
+        yield
 
 @pytest.fixture
 def test_data_dir(test_data_dir):
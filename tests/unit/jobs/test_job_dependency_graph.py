@@ -0,0 +1,169 @@
+"""
+Unit tests for JobDependencyGraph
+"""
+
+import pytest
+
+from jade.exceptions import InvalidConfiguration
+from jade.jobs.job_dependency_graph import JobDependencyGraph, \
+    analyze_job_dependencies, compute_longest_paths
+
+
+class FakeJob:
+    def __init__(self, name, blocking_jobs=None):
+        self.name = name
+        self.blocking_jobs = set() if blocking_jobs is None else blocking_jobs
+
+    def get_blocking_jobs(self):
+        return self.blocking_jobs
+
+    def remove_blocking_job(self, name):
+        self.blocking_jobs.remove(name)
+
+
+def test_job_dependency_graph__ready_order():
+    jobs = [
+        FakeJob("1", {"3"}),
+        FakeJob("2"),
+        FakeJob("3"),
+        FakeJob("4", {"1", "3"}),
+    ]
+    graph = JobDependencyGraph(jobs)
+    assert len(graph) == 4
+    assert graph.num_ready == 2
+    assert graph.num_blocked == 2
+    assert graph.pop_ready().name == "2"
+    assert graph.pop_ready().name == "3"
+    assert not graph.has_ready_jobs()
+    with pytest.raises(IndexError):
+        graph.pop_ready()
+
+    assert [x.name for x in graph.mark_complete("3")] == ["1"]
+    assert jobs[0].blocking_jobs == set()
+    assert jobs[3].blocking_jobs == {"1"}
+    assert graph.pop_ready().name == "1"
+    assert graph.mark_complete("2") == []
+    assert [x.name for x in graph.mark_complete("1")] == ["4"]
+    assert graph.pop_ready().name == "4"
+    assert graph.num_unscheduled == 0
+    graph.mark_complete("4")
+    assert len(graph) == 0
+
+
+def test_job_dependency_graph__blocking_job_already_complete():
+    graph = JobDependencyGraph([FakeJob("1")])
+    graph.pop_ready()
+    graph.mark_complete("1")
+    job = FakeJob("2", {"1"})
+    graph.add_job(job)
+    assert not job.blocking_jobs
+    assert graph.pop_ready() is job
+
+
+def test_job_dependency_graph__schedule_blocked_job():
+    jobs = [FakeJob("1"), FakeJob("2", {"1"})]
+    graph = JobDependencyGraph(jobs)
+    graph.pop_ready()
+    assert list(graph.iter_dependents("1")) == ["2"]
+    assert graph.get_num_blocking_jobs("2") == 1
+    graph.schedule(jobs[1])
+    assert graph.is_scheduled("2")
+    assert graph.num_unscheduled == 0
+
+    # A scheduled job must not become ready again.
+    assert graph.mark_complete("1") == []
+    assert not graph.has_ready_jobs()
+    assert not jobs[1].blocking_jobs
+
+
+def test_job_dependency_graph__unschedule():
+    jobs = [FakeJob("1"), FakeJob("2"), FakeJob("3", {"1"})]
+    graph = JobDependencyGraph(jobs)
+    assert graph.pop_ready().name == "1"
+    graph.schedule(jobs[2])
+    assert graph.num_unscheduled == 1
+    assert [x.name for x in graph.iter_unscheduled_jobs()] == ["2"]
+
+    graph.unschedule("1")
+    graph.unschedule("3")
+    assert graph.num_unscheduled == 3
+    assert graph.num_blocked == 1
+    assert [x.name for x in graph.iter_unscheduled_jobs()] == ["1", "2", "3"]
+    # The job keeps its place in line.
+    assert graph.pop_ready().name == "1"
+    graph.mark_complete("1")
+    assert graph.pop_ready().name == "2"
+    assert graph.pop_ready().name == "3"
+
+
+def test_job_dependency_graph__priority_func():
+    priorities = {"1": 3, "2": 1, "3": 2, "4": 0}
+    jobs = [FakeJob("1"), FakeJob("2"), FakeJob("3"), FakeJob("4", {"1"})]
+    graph = JobDependencyGraph(jobs,
+                               priority_func=lambda x: priorities[x.name])
+    assert graph.pop_ready().name == "2"
+    graph.mark_complete("3")
+    assert graph.num_ready == 1
+    assert graph.pop_ready().name == "1"
+    graph.unschedule("1")
+    assert graph.pop_ready().name == "1"
+    assert [x.name for x in graph.mark_complete("1")] == ["4"]
+    assert graph.pop_ready().name == "4"
+    assert not graph.has_ready_jobs()
+
+
+def test_analyze_job_dependencies():
+    jobs = [
+        FakeJob("1"),
+        FakeJob("2"),
+        FakeJob("3"),
+        FakeJob("4", {"1", "2"}),
+        FakeJob("5", {"4"}),
+        FakeJob("6", {"3"}),
+        FakeJob("7", {"missing"}),
+    ]
+    summary = analyze_job_dependencies(jobs)
+    assert summary.num_jobs == 7
+    assert summary.num_dependencies == 4
+    assert summary.depth == 3
+    assert summary.width == 4
+    assert summary.longest_path[1:] == ["4", "5"]
+    assert summary.longest_path_runtime is None
+
+    runtimes = {"1": 1, "2": 1, "3": 10, "4": 1, "5": 1, "6": 10, "7": 1}
+    summary = analyze_job_dependencies(
+        jobs, runtime_func=lambda x: runtimes[x.name])
+    assert summary.longest_path == ["3", "6"]
+    assert summary.longest_path_runtime == 20
+
+    summary = analyze_job_dependencies([])
+    assert summary.depth == 0
+    assert summary.width == 0
+    assert summary.longest_path == []
+
+
+def test_compute_longest_paths():
+    weights = {"a": 1, "b": 5, "c": 1, "d": 2, "e": 1, "f": 1}
+    successors = {"a": ["c"], "b": ["c"], "c": ["d"], "e": ["f"], "f": ["e"]}
+    lengths, predecessors = compute_longest_paths(weights, successors)
+    assert lengths == {"a": 1, "b": 5, "c": 6, "d": 8}
+    assert predecessors == {"c": "b", "d": "c"}
+
+
+def test_analyze_job_dependencies__cycle():
+    jobs = [
+        FakeJob("1"),
+        FakeJob("2", {"1", "4"}),
+        FakeJob("3", {"2"}),
+        FakeJob("4", {"3"}),
+        FakeJob("5", {"4"}),
+    ]
+    with pytest.raises(InvalidConfiguration) as exc:
+        analyze_job_dependencies(jobs)
+    assert "2 -> 3 -> 4 -> 2" in str(exc.value) or \
+        "3 -> 4 -> 2 -> 3" in str(exc.value) or \
+        "4 -> 2 -> 3 -> 4" in str(exc.value)
+
+    with pytest.raises(InvalidConfiguration) as exc:
+        analyze_job_dependencies([FakeJob("1", {"1"})])
+    assert "1 -> 1" in str(exc.value)
@@ -0,0 +1,35 @@
+"""
+Unit tests for job limits
+"""
+
+import mock
+import pytest
+
+from jade.exceptions import InvalidParameter
+from jade.jobs.job_limits import JobLimits, get_job_limits
+
+
+def test_job_limits__from_dict():
+    assert JobLimits.from_dict(None).is_empty()
+    assert JobLimits.from_dict({"timeout_s": 60}) == JobLimits(60, None, None)
+    with pytest.raises(InvalidParameter):
+        JobLimits.from_dict({"timeout_s": 0})
+    with pytest.raises(InvalidParameter):
+        JobLimits.from_dict({"memory_gb": -1})
+    with pytest.raises(InvalidParameter):
+        JobLimits.from_dict({"rss": 1})
+
+
+def test_get_job_limits():
+    job = mock.MagicMock()
+    job.get_limits.return_value = None
+    assert get_job_limits(job) is None
+    defaults = JobLimits(60, 2.0, None)
+    assert get_job_limits(job, defaults=defaults) == defaults
+
+    job.get_limits.return_value = JobLimits(None, 4.0, 30)
+    assert get_job_limits(job) == JobLimits(None, 4.0, 30)
+    assert get_job_limits(job, defaults=defaults) == JobLimits(60, 4.0, 30)
+
+    job.get_limits.return_value = JobLimits(None, None, None)
+    assert get_job_limits(job) is None
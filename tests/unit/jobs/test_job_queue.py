@@ -4,12 +4,15 @@ Unit tests for JobQueue class
 
 import logging
 import mock
+import subprocess
 import time
 
 import pytest
 
 from jade.jobs.async_job_interface import AsyncJobInterface
+from jade.jobs.dispatchable_job import DispatchableJob
 from jade.jobs.job_queue import JobQueue
+from jade.jobs.resource_admission import JobResources, ResourceAdmission
 
 
 class FakeJob(AsyncJobInterface):
@@ -38,6 +41,37 @@ class FakeJob(AsyncJobInterface):
         self._blocking_jobs.remove(name)
 
 
+class FakeProcessJob(AsyncJobInterface):
+    def __init__(self, name, duration):
+        self._name = name
+        self._duration = duration
+        self._pipe = None
+        self.end_time = None
+
+    def is_complete(self):
+        if self._pipe.poll() is None:
+            return False
+        if self.end_time is None:
+            self.end_time = time.time()
+        return True
+
+    @property
+    def name(self):
+        return self._name
+
+    def get_pid(self):
+        return self._pipe.pid
+
+    def run(self):
+        self._pipe = subprocess.Popen(["sleep", str(self._duration)])
+
+    def get_blocking_jobs(self):
+        return set()
+
+    def remove_blocking_job(self, name):
+        assert False
+
+
 def test_job_queue__is_full():
     duration = 10
     jobs = [FakeJob(str(i), duration) for i in range(4)]
@@ -93,6 +127,122 @@ def test_job_queue__monitor_func():
     assert has_run
 
 
+def test_job_queue__completion_notification():
+    # The poll interval is much longer than the jobs. Each job should start as
+    # soon as its predecessor exits.
+    jobs = [FakeProcessJob(str(i), 0.1) for i in range(5)]
+    has_run = []
+    start = time.time()
+    JobQueue.run_jobs(jobs, 1, poll_interval=10,
+                      monitor_func=lambda: has_run.append(1),
+                      completion_notification=True)
+    assert time.time() - start < 5
+    assert len(has_run) >= 2
+    for job in jobs:
+        assert job.end_time is not None
+
+
+def test_job_queue__speculate_notification(tmp_path):
+    # The duplicate finishes first. The queue must wake up on its exit rather
+    # than on the poll interval.
+    job = DispatchableJob(
+        mock.MagicMock(), "sleep 20", str(tmp_path), mock.MagicMock(),
+        speculative_cmd="sleep 0.1", speculative_output=str(tmp_path))
+    job.job.name = "job"
+
+    def speculate():
+        if job.can_speculate():
+            assert queue.speculate(job)
+
+    queue = JobQueue(1, poll_interval=10, flush_func=speculate,
+                     completion_notification=True)
+    start = time.time()
+    queue.run([job])
+    assert time.time() - start < 5
+    assert not queue.speculate(job)
+    assert job.get_pids() == []
+
+
+def test_job_queue__can_start_func():
+    jobs = [FakeJob(str(i), 0.1) for i in range(5)]
+    completed = []
+
+    def can_start(job):
+        return len(completed) < 2
+
+    queue = JobQueue(1, poll_interval=0.01, can_start_func=can_start,
+                     completion_func=completed.extend)
+    queue.run(jobs)
+    assert queue.is_draining
+    assert completed == ["0", "1"]
+    assert [x.name for x in queue.list_unstarted_jobs()] == ["2", "3", "4"]
+    assert jobs[2].start_time is None
+
+
+def test_job_queue__drain():
+    jobs = [FakeProcessJob(str(i), 0.1) for i in range(4)]
+    queue = JobQueue(2, poll_interval=0.01)
+    for job in jobs:
+        queue.submit(job)
+    queue.drain()
+    queue.submit(FakeProcessJob("4", 0.1))
+    queue.wait()
+    assert [x.end_time is not None for x in jobs] == [True, True, False, False]
+    assert [x.name for x in queue.list_unstarted_jobs()] == ["2", "3", "4"]
+
+
+class FakeRetryJob(FakeJob):
+    def __init__(self, name, duration, num_failures, delay):
+        super().__init__(name, duration)
+        self._num_failures = num_failures
+        self._delay = delay
+        self.num_attempts = 0
+
+    def run(self):
+        super().run()
+        self.num_attempts += 1
+
+    def get_retry_delay(self):
+        if self.num_attempts <= self._num_failures:
+            return self._delay
+        return None
+
+
+def test_job_queue__retry():
+    jobs = [FakeRetryJob("0", 0.05, 2, 0.2), FakeJob("1", 0.1)]
+    completed = []
+    queue = JobQueue(2, poll_interval=0.01, completion_func=completed.extend)
+    queue.run(jobs)
+    assert jobs[0].num_attempts == 3
+    assert completed == ["1", "0"]
+    assert queue.num_retrying_jobs == 0
+    assert jobs[0].start_time - jobs[1].start_time >= 0.4
+
+
+@pytest.mark.parametrize("max_backfill_wait", [300, 0])
+def test_job_queue__resource_admission(max_backfill_wait):
+    jobs = [FakeJob("0", 0.2), FakeJob("1", 0.1), FakeJob("2", 0.05)]
+    requirements = {
+        "0": JobResources(2, 1.0),
+        "1": JobResources(4, 1.0),
+        "2": JobResources(1, 0.5),
+    }
+    admission = ResourceAdmission(4, 2.0, requirements,
+                                  max_backfill_wait=max_backfill_wait)
+    queue = JobQueue(4, poll_interval=0.01, resource_admission=admission)
+    queue.run(jobs)
+    # Job 1 needs the whole node.
+    assert jobs[1].start_time >= jobs[0].end_time
+    if max_backfill_wait:
+        # Job 2 fits next to job 0.
+        assert jobs[2].start_time < jobs[1].start_time
+        assert jobs[1].start_time >= jobs[2].end_time
+    else:
+        assert jobs[2].start_time >= jobs[1].end_time
+    assert admission.free_cpus == 4
+    assert admission.free_memory_gb == 2.0
+
+
 def job_run():
     """Job run"""
     time.sleep(0.5)
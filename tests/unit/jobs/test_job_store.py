@@ -0,0 +1,65 @@
+"""
+Unit tests for JobStore
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from jade.exceptions import InvalidParameter
+from jade.extensions.generic_command.generic_command_parameters import GenericCommandParameters
+from jade.jobs.job_store import JobStore
+
+
+@pytest.fixture
+def store_dir():
+    directory = os.path.join(tempfile.gettempdir(), "jade-test-job-store")
+    yield directory
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+
+
+def _create_jobs(num_jobs):
+    jobs = []
+    for i in range(1, num_jobs + 1):
+        job = GenericCommandParameters(f"echo {i}", job_id=i)
+        if i > 1:
+            job.blocked_by.add(str(i - 1))
+        jobs.append(job)
+    return jobs
+
+
+def test_job_store(store_dir):
+    jobs = _create_jobs(100)
+    store = JobStore.create(store_dir, jobs)
+    assert sorted(os.listdir(store_dir)) == \
+        sorted([JobStore.DATA_FILENAME, JobStore.INDEX_FILENAME])
+    assert len(store) == len(jobs)
+    assert list(store.iter_names()) == [x.name for x in jobs]
+    store.close()
+
+    store = JobStore(store_dir)
+    for job in reversed(jobs):
+        record = store.get_record(job.name)
+        job2 = GenericCommandParameters.deserialize(record)
+        assert job2.command == job.command
+        assert job2.get_blocking_jobs() == job.get_blocking_jobs()
+
+    with pytest.raises(InvalidParameter):
+        store.get_record("invalid")
+    store.close()
+
+
+def test_job_store__empty(store_dir):
+    store = JobStore.create(store_dir, [])
+    assert len(store) == 0
+    store.close()
+    assert JobStore.exists(store_dir)
+
+
+def test_job_store__missing(store_dir):
+    assert not JobStore.exists(store_dir)
+    with pytest.raises(InvalidParameter):
+        JobStore(store_dir)
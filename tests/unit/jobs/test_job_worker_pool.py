@@ -0,0 +1,155 @@
+"""
+Unit tests for running jobs in a pool of worker processes.
+"""
+
+import os
+import shutil
+import time
+
+import pytest
+
+from jade.common import JOBS_OUTPUT_DIR
+from jade.extensions.generic_command.generic_command_inputs import GenericCommandInputs
+from jade.extensions.generic_command.generic_command_configuration import GenericCommandConfiguration
+from jade.extensions.generic_command.generic_command_parameters import GenericCommandParameters
+from jade.jobs.job_worker_pool import JobWorkerPool
+from jade.jobs.pooled_dispatchable_job import PooledDispatchableJob
+from jade.jobs.results_aggregator import ResultsAggregator
+from jade.utils.subprocess_manager import run_command
+from jade.utils.utils import load_data
+
+
+TEST_FILENAME = "test-worker-pool-inputs.txt"
+CONFIG_FILE = "test-worker-pool-config.json"
+OUTPUT = "test-worker-pool-output"
+SUBMIT_JOBS = "jade submit-jobs"
+
+
+@pytest.fixture
+def cleanup():
+    yield
+    for path in (TEST_FILENAME, CONFIG_FILE, OUTPUT):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def _create_config(commands):
+    with open(TEST_FILENAME, "w") as f_out:
+        pass
+
+    inputs = GenericCommandInputs(TEST_FILENAME)
+    config = GenericCommandConfiguration(job_inputs=inputs)
+    for command in commands:
+        config.add_job(GenericCommandParameters(command))
+    config.dump(CONFIG_FILE)
+    return config
+
+
+def _get_return_codes():
+    results = load_data(os.path.join(OUTPUT, "results.json"))["results"]
+    return {x["name"]: x["return_code"] for x in results}
+
+
+def test_worker_pool__recycle(cleanup):
+    commands = ["echo hello"] * 5 + ["false"]
+    _create_config(commands)
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -q 2 " \
+          "--worker-pool --max-jobs-per-worker=2"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    return_codes = _get_return_codes()
+    assert len(return_codes) == len(commands)
+    for i in range(1, 6):
+        assert return_codes[str(i)] == 0
+        run_log = os.path.join(OUTPUT, JOBS_OUTPUT_DIR, str(i), "run.log")
+        assert os.path.exists(run_log)
+    assert return_codes["6"] != 0
+
+
+def test_worker_pool__crash(cleanup):
+    # The second job kills the worker that is running it. The pool must
+    # report the failure and replace the worker for the remaining jobs.
+    commands = [
+        "echo hello",
+        "bash -c 'kill -9 $PPID'",
+        "echo hello",
+        "echo hello",
+    ]
+    _create_config(commands)
+    cmd = f"{SUBMIT_JOBS} {CONFIG_FILE} --output={OUTPUT} -p 0.1 -q 1 " \
+          "--worker-pool"
+    ret = run_command(cmd)
+    assert ret == 0
+
+    return_codes = _get_return_codes()
+    assert len(return_codes) == len(commands)
+    assert return_codes["2"] != 0
+    for name in ("1", "3", "4"):
+        assert return_codes[name] == 0
+
+
+def test_worker_pool__terminate(cleanup):
+    # Terminating a job stops its worker. The next job gets a new worker.
+    config = _create_config(["sleep 20", "echo hello"])
+    os.makedirs(os.path.join(OUTPUT, JOBS_OUTPUT_DIR))
+    aggregator = ResultsAggregator(os.path.join(OUTPUT, "results_batch_0.csv"))
+    aggregator.create_file()
+    pool = JobWorkerPool(CONFIG_FILE, os.path.join(OUTPUT, JOBS_OUTPUT_DIR))
+    try:
+        jobs = [PooledDispatchableJob(x, pool, OUTPUT, aggregator)
+                for x in config.iter_jobs()]
+        jobs[0].run()
+        worker_pid = jobs[0]._worker.pid
+        jobs[0].terminate()
+        start = time.time()
+        while not jobs[0].is_complete():
+            assert time.time() - start < 10
+            time.sleep(0.1)
+        assert jobs[0].is_terminated
+        assert pool.num_workers_recycled == 1
+
+        jobs[1].run()
+        assert jobs[1]._worker.pid != worker_pid
+        while not jobs[1].is_complete():
+            time.sleep(0.1)
+    finally:
+        pool.shutdown()
+
+    aggregator.flush()
+    assert [(x.name, x.return_code) for x in aggregator.get_results()] == \
+        [("2", 0)]
+
+
+def test_worker_pool__job_config_file(cleanup):
+    # Nodes that pull from a shared queue serialize each chunk of claimed
+    # jobs to a config file that the pool's config file does not cover.
+    config = _create_config(["echo hello", "echo again"])
+    claimed_job = GenericCommandParameters("echo claimed", job_id=3)
+    job_config_file = config.serialize_jobs_for_execution(
+        os.path.join(OUTPUT, "claimed_0"), [claimed_job])
+    os.makedirs(os.path.join(OUTPUT, JOBS_OUTPUT_DIR))
+    aggregator = ResultsAggregator(os.path.join(OUTPUT, "results_batch_0.csv"))
+    aggregator.create_file()
+    pool = JobWorkerPool(CONFIG_FILE, os.path.join(OUTPUT, JOBS_OUTPUT_DIR))
+    first, second = config.iter_jobs()
+    try:
+        jobs = [
+            PooledDispatchableJob(first, pool, OUTPUT, aggregator),
+            PooledDispatchableJob(claimed_job, pool, OUTPUT, aggregator,
+                                  config_file=job_config_file),
+            PooledDispatchableJob(second, pool, OUTPUT, aggregator),
+        ]
+        for job in jobs:
+            job.run()
+            while not job.is_complete():
+                time.sleep(0.1)
+    finally:
+        pool.shutdown()
+
+    assert pool.num_workers_started == 1
+    aggregator.flush()
+    assert [(x.name, x.return_code) for x in aggregator.get_results()] == \
+        [("1", 0), ("3", 0), ("2", 0)]
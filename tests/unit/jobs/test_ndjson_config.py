@@ -0,0 +1,102 @@
+"""
+Unit tests for line-delimited JSON configurations
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from jade.extensions.generic_command.generic_command_configuration import GenericCommandConfiguration
+from jade.extensions.generic_command.generic_command_parameters import GenericCommandParameters
+from jade.exceptions import InvalidParameter
+from jade.jobs.job_configuration_factory import create_config_from_file
+from jade.jobs.ndjson_config import is_ndjson_config, read_header, \
+    count_job_records
+
+
+@pytest.fixture
+def tmp_dir():
+    directory = tempfile.mkdtemp()
+    yield directory
+    shutil.rmtree(directory)
+
+
+def _create_config(directory, num_jobs):
+    inputs_file = os.path.join(directory, "inputs.txt")
+    with open(inputs_file, "w") as f_out:
+        for i in range(num_jobs):
+            f_out.write(f"echo {i}\n")
+
+    return GenericCommandConfiguration.auto_config(inputs_file)
+
+
+def test_is_ndjson_config():
+    assert is_ndjson_config("config.jsonl")
+    assert is_ndjson_config("config.ndjson")
+    assert is_ndjson_config("config.jsonl.gz")
+    assert not is_ndjson_config("config.json")
+    assert not is_ndjson_config("config.json.gz")
+
+
+@pytest.mark.parametrize("basename", ["config.jsonl", "config.jsonl.gz"])
+def test_ndjson_config__lazy_load(tmp_dir, basename):
+    filename = os.path.join(tmp_dir, basename)
+    config = _create_config(tmp_dir, 10)
+    config.dump(filename)
+    if basename.endswith(".gz"):
+        with gzip.open(filename, "rt") as f_in:
+            assert len(f_in.readlines()) == 11
+    assert read_header(filename)["extension"] == "generic_command"
+    assert "jobs" not in read_header(filename)
+
+    config2 = create_config_from_file(filename)
+    # Jobs are read from the file on demand, not stored in memory.
+    assert config2._jobs.get_num_jobs() == 0
+    assert config2.get_num_jobs() == 10
+    assert [x.command for x in config2.iter_jobs()] == \
+        [x.command for x in config.iter_jobs()]
+    assert config2.get_job("5").command == "echo 4"
+    # Lookups use an index of the file built on the first one.
+    assert len(config2._jobs_file_index) == 10
+    assert config2.get_job("10").command == "echo 9"
+    with pytest.raises(InvalidParameter):
+        config2.get_job("11")
+
+
+def test_ndjson_config__append(tmp_dir):
+    filename = os.path.join(tmp_dir, "config.jsonl.gz")
+    config = _create_config(tmp_dir, 3)
+    config.dump(filename)
+
+    config2 = create_config_from_file(filename)
+    new_jobs = [GenericCommandParameters("echo new", job_id=i)
+                for i in (4, 5)]
+    assert config2.append_jobs(filename, new_jobs) == 2
+    assert count_job_records(filename) == 5
+    assert config2.get_num_jobs() == 5
+    assert config2.get_job("1").command == "echo 0"
+    config2.append_jobs(filename, [GenericCommandParameters("echo 6", job_id=6)])
+    assert config2.get_job("6").command == "echo 6"
+    assert create_config_from_file(filename).get_job("5").command == "echo new"
+
+
+def test_ndjson_config__convert(tmp_dir):
+    filename = os.path.join(tmp_dir, "config.jsonl")
+    json_file = os.path.join(tmp_dir, "config.json")
+    config = _create_config(tmp_dir, 3)
+    config.dump(filename)
+
+    # Rewriting the file that the jobs are streamed from must be safe.
+    config2 = create_config_from_file(filename)
+    config2.dump(filename)
+    config2.dump(json_file)
+    config3 = create_config_from_file(json_file)
+    assert config3.get_num_jobs() == 3
+
+    config3.remove_job(config3.get_job("1"))
+    config2.remove_job(config2.get_job("1"))
+    assert config2.get_num_jobs() == 2
+    assert [x.name for x in config2.iter_jobs()] == ["2", "3"]
@@ -0,0 +1,31 @@
+"""
+Unit tests for process tree functions
+"""
+
+import os
+import subprocess
+
+from jade.jobs.process_tree import get_process_tree, get_process_tree_usage
+
+
+def test_get_process_tree_usage():
+    processes = get_process_tree(os.getpid())
+    assert processes[0].pid == os.getpid()
+    memory_gb, cpu_time_s = get_process_tree_usage(processes)
+    assert memory_gb > 0
+    assert cpu_time_s > 0
+    assert get_process_tree(2 ** 22 + 1) == []
+
+
+def test_get_process_tree__snapshot():
+    pipe = subprocess.Popen(["sleep", "10"])
+    try:
+        pids = [x.pid for x in get_process_tree(os.getpid(), max_age_s=0)]
+        assert pids[0] == os.getpid()
+        assert pipe.pid in pids
+        assert {x.pid for x in get_process_tree(os.getpid())} == \
+            {x.pid for x in get_process_tree(os.getpid(), max_age_s=60)}
+    finally:
+        pipe.kill()
+        pipe.wait()
+    assert get_process_tree(2 ** 22 + 1, max_age_s=60) == []
@@ -0,0 +1,106 @@
+"""
+Unit tests for ResourceAdmission
+"""
+
+import pytest
+
+from jade.exceptions import InvalidParameter
+from jade.extensions.generic_command.generic_command_parameters import \
+    GenericCommandParameters
+from jade.jobs.resource_admission import JobResources, ResourceAdmission, \
+    create_resource_admission, get_resource_requirements
+
+
+class FakeJob:
+    def __init__(self, name):
+        self.name = name
+
+
+def test_resource_admission():
+    requirements = {
+        "big": JobResources(4, 8.0),
+        "large_memory": JobResources(1, 6.0),
+        "too_big": JobResources(16, 64.0),
+    }
+    admission = ResourceAdmission(8, 16.0, requirements)
+    assert admission.get_requirements(FakeJob("too_big")) == \
+        JobResources(8, 16.0)
+    assert admission.get_requirements(FakeJob("small")) == JobResources(1, 0)
+
+    assert admission.try_start(FakeJob("big"), True)
+    assert admission.try_start(FakeJob("large_memory"), True)
+    assert admission.free_cpus == 3
+    assert admission.free_memory_gb == 2.0
+    # Memory is exhausted before CPUs.
+    assert not admission.try_start(FakeJob("big"), True)
+    assert admission.can_backfill()
+    assert admission.try_start(FakeJob("small"), False)
+
+    admission.release(FakeJob("big"))
+    admission.release(FakeJob("large_memory"))
+    admission.release(FakeJob("small"))
+    assert admission.free_cpus == 8
+    assert admission.try_start(FakeJob("too_big"), True)
+    assert admission.is_full()
+
+
+def test_resource_admission__backfill_wait():
+    admission = ResourceAdmission(2, 4.0, {"big": JobResources(2, 0)},
+                                  max_backfill_wait=0)
+    assert admission.try_start(FakeJob("small"), True)
+    assert not admission.try_start(FakeJob("big"), True)
+    assert not admission.can_backfill()
+    admission.release(FakeJob("small"))
+    assert admission.try_start(FakeJob("big"), True)
+    assert admission.can_backfill()
+
+
+def test_create_resource_admission():
+    jobs = [
+        GenericCommandParameters("ls", job_id=1),
+        GenericCommandParameters("ls", job_id=2, num_cpus=4),
+        GenericCommandParameters("ls", job_id=3, memory_gb=0.5),
+    ]
+    assert create_resource_admission(jobs[:1], 8, 16.0) is None
+
+    admission = create_resource_admission(jobs, 8, 16.0)
+    assert admission.get_requirements(jobs[0]) == JobResources(1, 0)
+    assert admission.get_requirements(jobs[1]) == JobResources(4, 0)
+    assert admission.get_requirements(jobs[2]) == JobResources(1, 0.5)
+
+    admission = create_resource_admission(
+        jobs, 8, 16.0, defaults=JobResources.from_dict({"memory_gb": 2.0}))
+    assert admission.get_requirements(jobs[0]) == JobResources(1, 2.0)
+    assert admission.get_requirements(jobs[1]) == JobResources(4, 2.0)
+    assert admission.get_requirements(jobs[2]) == JobResources(1, 0.5)
+
+
+def test_resource_admission__add_requirements():
+    # A node that pulls from a shared queue learns the requirements of the
+    # jobs that it claims.
+    jobs = [
+        GenericCommandParameters("ls", job_id=1),
+        GenericCommandParameters("ls", job_id=2, num_cpus=4),
+        GenericCommandParameters("ls", job_id=3, num_cpus=16),
+    ]
+    assert get_resource_requirements(jobs[:1]) == {}
+    admission = create_resource_admission(jobs[1:2], 8, 16.0)
+    admission.add_requirements(get_resource_requirements(jobs[2:]))
+    assert admission.get_requirements(jobs[1]) == JobResources(4, 0)
+    assert admission.get_requirements(jobs[2]) == JobResources(8, 0)
+
+    # A job that started before the queue admitted jobs by resources was
+    # not counted.
+    admission.release(FakeJob("started_before"))
+    assert admission.free_cpus == 8
+
+
+def test_job_resources__from_dict():
+    assert JobResources.from_dict(None) == JobResources(None, None)
+    assert JobResources.from_dict({"num_cpus": 2}) == JobResources(2, None)
+    with pytest.raises(InvalidParameter):
+        JobResources.from_dict({"num_cpus": 0})
+    with pytest.raises(InvalidParameter):
+        JobResources.from_dict({"memory_gb": -1})
+    with pytest.raises(InvalidParameter):
+        JobResources.from_dict({"gpus": 1})
@@ -76,3 +76,66 @@ def test_results_aggregator(cleanup):
 
     summary.delete_files()
     assert not [x for x in os.listdir(results_dir) if x.endswith(".csv")]
+
+
+def test_results_aggregator__buffered(cleanup):
+    results_dir = os.path.join(OUTPUT, RESULTS_DIR)
+    os.makedirs(results_dir)
+    aggregator = ResultsAggregator(
+        get_results_temp_filename(OUTPUT, 1), flush_interval=1000
+    )
+    aggregator.create_file()
+    summary = ResultsAggregatorSummary(results_dir)
+
+    results = [create_result(i) for i in range(10)]
+    for result in results[:5]:
+        aggregator.add_result(result)
+    aggregator.flush_if_due()
+    assert aggregator.num_buffered_results == 5
+    assert not summary.update_completed_jobs()
+
+    aggregator.flush()
+    assert sorted(summary.update_completed_jobs()) == \
+        sorted(x.name for x in results[:5])
+    for result in results[5:]:
+        aggregator.add_result(result)
+    aggregator.flush()
+    assert sorted(summary.update_completed_jobs()) == \
+        sorted(x.name for x in results[5:])
+    assert not summary.update_completed_jobs()
+    assert len(summary.completed_jobs) == 10
+
+    # Completion markers from older versions are still detected.
+    with open(os.path.join(results_dir, "legacy"), "w"):
+        pass
+    assert summary.update_completed_jobs() == ["legacy"]
+
+    final_results = summary.get_results()
+    final_results.sort(key=lambda x: int(x.name))
+    assert final_results == results
+    summary.delete_files()
+    assert not os.listdir(results_dir)
+
+
+def test_results_aggregator_summary__tail_completion_log(cleanup):
+    results_dir = os.path.join(OUTPUT, RESULTS_DIR)
+    os.makedirs(results_dir)
+    aggregator = ResultsAggregator(get_results_temp_filename(OUTPUT, 1))
+    aggregator.create_file()
+    completion_log = ResultsAggregator.get_completion_log_filename(
+        aggregator._filename
+    )
+    summary = ResultsAggregatorSummary(results_dir)
+    assert not summary.update_completed_jobs()
+
+    with open(completion_log, "a") as f_out:
+        f_out.write("1\n2\n3")
+    assert summary.update_completed_jobs() == ["1", "2"]
+    assert summary._completion_log_offsets[completion_log] == 4
+
+    # The rest of a partial line is picked up on the next read.
+    with open(completion_log, "a") as f_out:
+        f_out.write("0\n")
+    assert summary.update_completed_jobs() == ["30"]
+    assert not summary.update_completed_jobs()
+    assert summary.completed_jobs == {"1", "2", "30"}
@@ -0,0 +1,45 @@
+"""
+Unit tests for RetryPolicy
+"""
+
+import pytest
+
+from jade.exceptions import InvalidParameter
+from jade.jobs.retry_policy import RetryPolicy
+
+
+def test_retry_policy__should_retry():
+    policy = RetryPolicy(2)
+    assert not policy.should_retry(0, 1)
+    assert policy.should_retry(1, 1)
+    assert policy.should_retry(1, 2)
+    assert not policy.should_retry(1, 3)
+
+    policy = RetryPolicy(2, return_codes=[3])
+    assert policy.should_retry(3, 1)
+    assert not policy.should_retry(1, 1)
+
+
+def test_retry_policy__backoff():
+    policy = RetryPolicy(3, backoff_s=1.5, backoff_factor=2)
+    assert [policy.get_backoff(x) for x in (1, 2, 3)] == [1.5, 3.0, 6.0]
+
+
+def test_retry_policy__cli_options():
+    assert RetryPolicy.from_cli_options(0, 1.0, None) is None
+    policy = RetryPolicy.from_cli_options(2, 0.5, "3,1")
+    assert policy.max_retries == 2
+    assert policy.get_cli_options() == \
+        "--max-retries=2 --retry-backoff=0.5 --retry-return-codes=1,3"
+
+    with pytest.raises(InvalidParameter):
+        RetryPolicy.from_cli_options(2, 0.5, "a")
+
+
+def test_retry_policy__invalid():
+    with pytest.raises(InvalidParameter):
+        RetryPolicy(-1)
+    with pytest.raises(InvalidParameter):
+        RetryPolicy(1, backoff_factor=0.5)
+    with pytest.raises(InvalidParameter):
+        RetryPolicy(1, return_codes=[0])
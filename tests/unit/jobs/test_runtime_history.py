@@ -0,0 +1,110 @@
+"""
+Unit tests for RuntimeHistory
+"""
+
+from collections import namedtuple
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from jade.common import CONFIG_FILE, RESULTS_FILE
+from jade.exceptions import InvalidParameter
+from jade.extensions.generic_command.generic_command_configuration import GenericCommandConfiguration
+from jade.extensions.generic_command.generic_command_parameters import GenericCommandParameters
+from jade.jobs.runtime_history import RecentRuntimes, RuntimeHistory
+from jade.result import Result, serialize_results
+from jade.utils.utils import dump_data
+
+
+@pytest.fixture
+def output_dir():
+    directory = os.path.join(tempfile.gettempdir(), "jade-test-runtime-history")
+    os.makedirs(directory, exist_ok=True)
+    yield directory
+    shutil.rmtree(directory)
+
+
+def _create_previous_run(output_dir):
+    inputs_file = os.path.join(output_dir, "commands.txt")
+    with open(inputs_file, "w") as f_out:
+        for i in range(1, 4):
+            f_out.write(f"sleep {i}\n")
+    config = GenericCommandConfiguration.auto_config(inputs_file)
+    config.dump(os.path.join(output_dir, CONFIG_FILE))
+
+    results = [
+        Result("1", 0, "finished", 10.0, 0),
+        Result("2", 0, "finished", 20.0, 0),
+        Result("3", 1, "finished", 30.0, 0),
+    ]
+    data = {
+        "base_directory": output_dir,
+        "results": serialize_results(results),
+        "jade_version": 0.1,
+        "timestamp": "2019-09-02 15:00:00",
+    }
+    dump_data(data, os.path.join(output_dir, RESULTS_FILE))
+
+
+def test_runtime_history(output_dir):
+    _create_previous_run(output_dir)
+    history = RuntimeHistory.from_output_directory(output_dir)
+    # Failed jobs are not used.
+    assert len(history) == 2
+    assert history.median_runtime == 15.0
+
+    assert history.get_runtime(GenericCommandParameters("x", job_id=1)) == 10
+    # Renumbered jobs are matched by their parameters.
+    job = GenericCommandParameters("sleep 2", job_id=7, blocked_by=[1])
+    assert history.get_runtime(job) == 20
+    job = GenericCommandParameters("sleep 3", job_id=8)
+    assert history.get_runtime(job) is None
+
+
+def test_runtime_history__file(output_dir):
+    _create_previous_run(output_dir)
+    history = RuntimeHistory.from_output_directory(output_dir)
+    filename = os.path.join(output_dir, "history.json")
+    history.to_file(filename)
+    history2 = RuntimeHistory.from_file(filename)
+    assert len(history2) == 2
+    assert history2.median_runtime == 15.0
+    job = GenericCommandParameters("sleep 2", job_id=7)
+    assert history2.get_runtime(job) == 20
+    with pytest.raises(InvalidParameter):
+        RuntimeHistory.from_file(filename + ".missing")
+
+
+def test_runtime_history__no_config(output_dir):
+    _create_previous_run(output_dir)
+    os.remove(os.path.join(output_dir, CONFIG_FILE))
+    history = RuntimeHistory.from_output_directory(output_dir)
+    job = GenericCommandParameters("sleep 2", job_id=7)
+    assert history.get_runtime(job) is None
+
+
+def test_runtime_history__no_results(output_dir):
+    with pytest.raises(InvalidParameter):
+        RuntimeHistory.from_output_directory(output_dir)
+    assert RuntimeHistory().median_runtime is None
+
+
+FakeJob = namedtuple("FakeJob", "exec_time_s, is_terminated")
+
+
+def test_recent_runtimes():
+    runtimes = RecentRuntimes(window_size=3)
+    assert runtimes.median is None
+    runtimes.record_completed_jobs([
+        FakeJob(1.0, False), FakeJob(100.0, True), FakeJob(None, False),
+    ])
+    assert len(runtimes) == 1
+    assert runtimes.median == 1.0
+    runtimes.record_completed_jobs([FakeJob(x, False) for x in (2.0, 9.0)])
+    assert runtimes.median == 2.0
+    # The oldest runtime leaves the window.
+    runtimes.record_completed_jobs([FakeJob(10.0, False)])
+    assert len(runtimes) == 3
+    assert runtimes.median == 9.0
@@ -0,0 +1,87 @@
+"""
+Unit tests for scheduling policies
+"""
+
+from jade.jobs.job_dependency_graph import JobDependencyGraph
+from jade.jobs.runtime_history import RuntimeHistory
+from jade.jobs.scheduling_policy import SchedulingPolicyType, \
+    CriticalPathPolicy, FifoPolicy, LongestRuntimeFirstPolicy, \
+    create_scheduling_policy
+
+
+class FakeJob:
+    def __init__(self, name, blocking_jobs=None):
+        self.name = name
+        self.blocking_jobs = set() if blocking_jobs is None else blocking_jobs
+
+    def get_blocking_jobs(self):
+        return self.blocking_jobs
+
+    def remove_blocking_job(self, name):
+        self.blocking_jobs.remove(name)
+
+
+RUNTIMES = {"a": 1, "b": 5, "c": 2, "d": 3, "e": 1}
+
+
+def _make_jobs():
+    # a -> c -> d, b, e
+    return [
+        FakeJob("a"),
+        FakeJob("b"),
+        FakeJob("c", {"a"}),
+        FakeJob("d", {"c"}),
+        FakeJob("e"),
+    ]
+
+
+def _pop_all_ready(graph):
+    names = []
+    while graph.has_ready_jobs():
+        names.append(graph.pop_ready().name)
+    return names
+
+
+def test_fifo_policy():
+    graph = JobDependencyGraph(_make_jobs(),
+                               priority_func=FifoPolicy().get_priority)
+    assert _pop_all_ready(graph) == ["a", "b", "e"]
+
+
+def test_longest_runtime_first_policy():
+    policy = LongestRuntimeFirstPolicy(_make_jobs(), lambda x: RUNTIMES[x.name])
+    graph = JobDependencyGraph(_make_jobs(), priority_func=policy.get_priority)
+    assert _pop_all_ready(graph) == ["b", "a", "e"]
+
+
+def test_critical_path_policy():
+    policy = CriticalPathPolicy(_make_jobs(), lambda x: RUNTIMES[x.name])
+    assert policy.critical_path_length == 6
+    assert [policy.get_priority(x) for x in _make_jobs()] == \
+        [-6, -5, -5, -3, -1]
+    graph = JobDependencyGraph(_make_jobs(), priority_func=policy.get_priority)
+    assert _pop_all_ready(graph) == ["a", "b", "e"]
+
+
+def test_critical_path_policy__cycle():
+    jobs = [FakeJob("a", {"b"}), FakeJob("b", {"a"}), FakeJob("c")]
+    policy = CriticalPathPolicy(jobs, lambda x: 2)
+    assert [policy.get_priority(x) for x in jobs] == [-2, -2, -2]
+
+
+def test_create_scheduling_policy():
+    history = RuntimeHistory(times_by_name={"a": 1, "b": 5, "c": 2})
+    policy = create_scheduling_policy(
+        SchedulingPolicyType.LONGEST_RUNTIME_FIRST, _make_jobs(),
+        runtime_history=history,
+    )
+    # d and e have no history and are expected to run for the median.
+    assert [policy.get_priority(x) for x in _make_jobs()] == \
+        [-1, -5, -2, -2, -2]
+
+    policy = create_scheduling_policy(SchedulingPolicyType.CRITICAL_PATH,
+                                      _make_jobs())
+    assert policy.critical_path_length == 3
+
+    policy = create_scheduling_policy(SchedulingPolicyType.FIFO, _make_jobs())
+    assert isinstance(policy, FifoPolicy)
@@ -0,0 +1,236 @@
+"""
+Unit tests for SharedJobQueue
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+from filelock import Timeout
+
+from jade.exceptions import InvalidParameter
+from jade.extensions.generic_command.generic_command_parameters import GenericCommandParameters
+from jade.jobs.shared_job_queue import SharedJobQueue
+
+
+NUM_JOBS = 20
+
+
+@pytest.fixture
+def queue_dir():
+    directory = os.path.join(tempfile.gettempdir(), "jade-test-shared-queue")
+    os.makedirs(directory, exist_ok=True)
+    yield directory
+    shutil.rmtree(directory)
+
+
+def _create_jobs():
+    jobs = []
+    for i in range(1, NUM_JOBS + 1):
+        job = GenericCommandParameters(f"echo {i}", job_id=i)
+        if i > NUM_JOBS // 2:
+            job.blocked_by.add(str(i - NUM_JOBS // 2))
+        jobs.append(job)
+    return jobs
+
+
+def _run_node(filename, owner, duration):
+    """Simulate one node that pulls jobs until the queue is empty."""
+    queue = SharedJobQueue(filename)
+    runs = []
+    while True:
+        names, num_pending = queue.claim(2, owner)
+        for name in names:
+            start = time.time()
+            time.sleep(duration)
+            runs.append((name, start, time.time()))
+        queue.complete(names, owner)
+        if not names:
+            if num_pending == 0:
+                break
+            time.sleep(0.01)
+    return owner, runs
+
+
+def test_shared_job_queue__claim(queue_dir):
+    filename = os.path.join(queue_dir, "queue.json")
+    queue = SharedJobQueue.create(filename, _create_jobs())
+    names, num_pending = queue.claim(NUM_JOBS, "node1")
+    # Only the unblocked jobs can be claimed.
+    assert names == [str(i) for i in range(1, NUM_JOBS // 2 + 1)]
+    assert num_pending == NUM_JOBS // 2
+    assert queue.list_claimed_jobs()["1"] == "node1"
+
+    queue.complete(["1", "2"], "node1")
+    names, num_pending = queue.claim(NUM_JOBS, "node2")
+    assert names == ["11", "12"]
+    assert queue.get_summary() == {
+        "num_pending": NUM_JOBS // 2 - 2,
+        "num_claimed": NUM_JOBS // 2,
+        "num_completed": 2,
+    }
+
+
+def test_shared_job_queue__get_job_records(queue_dir):
+    # Nodes read the jobs that they claim from the queue.
+    filename = os.path.join(queue_dir, "queue.json")
+    jobs = _create_jobs()
+    queue = SharedJobQueue.create(filename, jobs)
+    names, _ = queue.claim(2, "node1")
+    assert queue.get_job_records(names) == [x.serialize() for x in jobs[:2]]
+    # Records can be read by an instance that did not claim the jobs.
+    other = SharedJobQueue(filename)
+    assert other.get_job_records(["12"]) == [jobs[11].serialize()]
+
+
+def test_shared_job_queue__missing_blocking_job(queue_dir):
+    # A blocking job that is not in the queue has already completed.
+    filename = os.path.join(queue_dir, "queue.json")
+    jobs = _create_jobs()[NUM_JOBS // 2:]
+    queue = SharedJobQueue.create(filename, jobs)
+    names, _ = queue.claim(NUM_JOBS, "node1")
+    assert len(names) == NUM_JOBS // 2
+
+
+def test_shared_job_queue__invalid_file(queue_dir):
+    with pytest.raises(InvalidParameter):
+        SharedJobQueue(os.path.join(queue_dir, "invalid.json"))
+
+
+def test_shared_job_queue__multiple_nodes(queue_dir):
+    filename = os.path.join(queue_dir, "queue.json")
+    SharedJobQueue.create(filename, _create_jobs())
+    durations = {"fast": 0.01, "slow": 0.2, "slower": 0.3}
+    with multiprocessing.Pool(len(durations)) as pool:
+        node_runs = dict(pool.starmap(
+            _run_node,
+            [(filename, owner, x) for owner, x in durations.items()],
+        ))
+
+    runs = {}
+    for owner in node_runs:
+        for name, start, end in node_runs[owner]:
+            assert name not in runs
+            runs[name] = (start, end)
+    assert sorted(runs, key=int) == [str(i) for i in range(1, NUM_JOBS + 1)]
+
+    for i in range(NUM_JOBS // 2 + 1, NUM_JOBS + 1):
+        blocking_job = str(i - NUM_JOBS // 2)
+        assert runs[str(i)][0] >= runs[blocking_job][1]
+
+    # The fast node pulls more work instead of waiting for its peers.
+    assert len(node_runs["fast"]) > len(node_runs["slower"])
+    queue = SharedJobQueue(filename)
+    assert queue.get_summary()["num_completed"] == NUM_JOBS
+    completed = queue.list_completed_jobs()
+    assert sorted(completed) == sorted(durations)
+    for owner, names in completed.items():
+        assert sorted(names) == sorted(x[0] for x in node_runs[owner])
+
+
+def test_shared_job_queue__release(queue_dir):
+    filename = os.path.join(queue_dir, "queue.json")
+    queue = SharedJobQueue.create(filename, _create_jobs())
+    names, _ = queue.claim(3, "node1")
+    queue.complete(names[:1], "node1")
+    queue.release(names[1:])
+    assert queue.get_summary() == {
+        "num_pending": NUM_JOBS - 1, "num_claimed": 0, "num_completed": 1,
+    }
+    # Released jobs are claimed next.
+    assert queue.claim(2, "node2")[0] == names[1:]
+
+
+def test_shared_job_queue__completions_are_not_rewritten(queue_dir):
+    filename = os.path.join(queue_dir, "queue.json")
+    queue = SharedJobQueue.create(filename, _create_jobs())
+    names, _ = queue.claim(2, "node1")
+    mtime = os.path.getmtime(filename)
+    queue.complete(names, "node1")
+    # Completions are appended to the owner's records without the lock.
+    assert os.path.getmtime(filename) == mtime
+    assert not os.path.exists(filename + ".lock")
+    assert queue.list_completed_jobs() == {"node1": names}
+
+    # The next operation applies them.
+    assert queue.get_summary()["num_completed"] == 2
+    assert not queue.list_claimed_jobs()
+    # A partial record is applied once its newline is written.
+    completions_dir = SharedJobQueue.get_completions_directory(filename)
+    with open(os.path.join(completions_dir, "node2.txt"), "w") as f_out:
+        f_out.write("2")
+    assert queue.get_summary()["num_completed"] == 2
+
+    # Jobs blocked by the completed jobs are claimed after the jobs that
+    # were ready before them.
+    names, _ = queue.claim(NUM_JOBS, "node2")
+    assert names == [str(i) for i in range(3, NUM_JOBS // 2 + 1)] + \
+        ["11", "12"]
+
+
+def test_shared_job_queue__claims_do_not_grow_state(queue_dir):
+    # The queue file holds counters and a cursor, not the jobs.
+    filename = os.path.join(queue_dir, "queue.json")
+    queue = SharedJobQueue.create(filename, _create_jobs())
+    size = os.path.getsize(filename)
+    other = SharedJobQueue(filename)
+    while True:
+        names, num_pending = queue.claim(3, "node1")
+        # Another instance completes jobs that it did not claim.
+        other.complete(names, "node2")
+        assert os.path.getsize(filename) <= size + 100
+        if not names and num_pending == 0:
+            break
+    assert queue.get_summary() == {
+        "num_pending": 0, "num_claimed": 0, "num_completed": NUM_JOBS,
+    }
+
+
+def test_shared_job_queue__stale_lock(queue_dir):
+    filename = os.path.join(queue_dir, "queue.json")
+    queue = SharedJobQueue.create(filename, _create_jobs(), timeout=5,
+                                  stale_lock_timeout=1)
+    # A node died while it held the lock.
+    lock_file = filename + ".lock"
+    with open(lock_file, "w"):
+        pass
+    old = time.time() - 10
+    os.utime(lock_file, (old, old))
+    names, _ = queue.claim(1, "node1")
+    assert names == ["1"]
+
+
+def test_shared_job_queue__lock_timeout(queue_dir):
+    filename = os.path.join(queue_dir, "queue.json")
+    queue = SharedJobQueue.create(filename, _create_jobs(), timeout=0.5,
+                                  stale_lock_timeout=60)
+    with open(filename + ".lock", "w"):
+        pass
+    with pytest.raises(Timeout):
+        queue.claim(1, "node1")
+
+
+def _hold_lock(filename, duration):
+    queue = SharedJobQueue(filename, stale_lock_timeout=0.4)
+    queue._do_action_under_lock(
+        lambda *args: (time.sleep(duration), False))
+
+
+def test_shared_job_queue__live_lock_is_not_broken(queue_dir):
+    filename = os.path.join(queue_dir, "queue.json")
+    SharedJobQueue.create(filename, _create_jobs())
+    holder = multiprocessing.Process(target=_hold_lock, args=(filename, 2))
+    holder.start()
+    try:
+        while not os.path.exists(filename + ".lock"):
+            time.sleep(0.01)
+        # The holder outlives stale_lock_timeout but refreshes its lock.
+        queue = SharedJobQueue(filename, timeout=1, stale_lock_timeout=0.4)
+        with pytest.raises(Timeout):
+            queue.claim(1, "node1")
+    finally:
+        holder.join()
+    assert queue.claim(1, "node1")[0] == ["1"]
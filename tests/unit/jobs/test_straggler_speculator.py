@@ -0,0 +1,138 @@
+"""
+Unit tests for StragglerSpeculator
+"""
+
+import time
+
+import pytest
+
+from jade.exceptions import InvalidParameter
+from jade.jobs.async_job_interface import AsyncJobInterface
+from jade.jobs.job_queue import JobQueue
+from jade.jobs.straggler_speculator import StragglerSpeculator
+
+
+class FakeSpeculativeJob(AsyncJobInterface):
+    def __init__(self, name, duration, speculative_duration=None):
+        self._name = name
+        self._duration = duration
+        self._speculative_duration = speculative_duration
+        self.start_time = None
+        self.end_time = None
+        self.speculative_end_time = None
+        self.exec_time_s = None
+        self.is_terminated = False
+
+    def is_complete(self):
+        now = time.time()
+        end_time = self.end_time
+        if self.speculative_end_time is not None:
+            end_time = min(end_time, self.speculative_end_time)
+        if now > end_time:
+            self.exec_time_s = now - self.start_time
+            self.speculative_end_time = None
+            return True
+        return False
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def elapsed_s(self):
+        return time.time() - self.start_time
+
+    def run(self):
+        self.start_time = time.time()
+        self.end_time = self.start_time + self._duration
+
+    def can_speculate(self):
+        return self._speculative_duration is not None and \
+            self.speculative_end_time is None
+
+    def is_speculating(self):
+        return self.speculative_end_time is not None
+
+    def speculate(self):
+        self.speculative_end_time = time.time() + self._speculative_duration
+        return True
+
+    def get_blocking_jobs(self):
+        return set()
+
+    def remove_blocking_job(self, name):
+        assert False
+
+
+class FakeJob(AsyncJobInterface):
+    """Uses the interface's defaults for speculation."""
+    def __init__(self, name):
+        self._name = name
+
+    def is_complete(self):
+        return True
+
+    @property
+    def name(self):
+        return self._name
+
+    def run(self):
+        pass
+
+    def get_blocking_jobs(self):
+        return set()
+
+    def remove_blocking_job(self, name):
+        assert False
+
+
+def _run(jobs, speculator, queue_depth):
+    def on_completion(names):
+        speculator.record_completed_jobs(x for x in jobs if x.name in names)
+
+    queue = JobQueue(
+        queue_depth,
+        poll_interval=0.01,
+        flush_func=lambda: speculator.check(queue),
+        completion_func=on_completion,
+    )
+    start = time.time()
+    queue.run(jobs)
+    return time.time() - start
+
+
+def test_straggler_speculator():
+    jobs = [FakeSpeculativeJob(str(i), 0.05, 0.05) for i in range(3)]
+    straggler = FakeSpeculativeJob("straggler", 10, 0.1)
+    speculator = StragglerSpeculator(2, min_completed=3)
+    duration = _run(jobs + [straggler], speculator, 4)
+    assert duration < 5
+    assert all(x.start_time is not None for x in jobs)
+    assert speculator.num_speculating == 0
+
+
+def test_straggler_speculator__not_speculative():
+    jobs = [FakeSpeculativeJob(str(i), 0.05, 0.05) for i in range(3)]
+    straggler = FakeSpeculativeJob("straggler", 0.5)
+    speculator = StragglerSpeculator(2, min_completed=3)
+    assert _run(jobs + [straggler], speculator, 4) >= 0.5
+
+
+def test_straggler_speculator__no_free_slots():
+    jobs = [FakeSpeculativeJob(str(i), 0.05, 0.05) for i in range(3)]
+    straggler = FakeSpeculativeJob("straggler", 0.5, 0.05)
+    speculator = StragglerSpeculator(2, min_completed=3)
+    # The straggler starts with the last peer and occupies the only slot.
+    assert _run(jobs + [straggler], speculator, 1) >= 0.5
+
+
+def test_async_job_interface__speculate():
+    job = FakeJob("job")
+    assert not job.can_speculate()
+    assert not job.speculate()
+    assert not job.is_speculating()
+
+
+def test_straggler_speculator__invalid_threshold():
+    with pytest.raises(InvalidParameter):
+        StragglerSpeculator(0.5)
@@ -24,7 +24,9 @@ def test_resource_stats():
         found_mem = 0
         found_net = 0
         for i in range(count):
-            resource_monitor.log_resource_stats()
+            stats = resource_monitor.log_resource_stats()
+            assert "cpu_percent" in stats["cpu"]
+            assert "percent" in stats["memory"]
 
         summary = EventsSummary(tmpdir)
         assert len(summary.list_events(EVENT_NAME_CPU_STATS)) == count
@@ -23,21 +23,24 @@ def jade_data():
                 "return_code": 0,
                 "status": "finished",
                 "exec_time_s": 10,
-                "completion_time": 15555555555
+                "completion_time": 15555555555,
+                "num_attempts": 1,
             },
             {
                 "name": "deployment__result__2",
                 "return_code": 1,
                 "status": "unfinished",
                 "exec_time_s": 20,
-                "completion_time": 15555555555
+                "completion_time": 15555555555,
+                "num_attempts": 1,
             },
             {
                 "name": "deployment__result__3",
                 "return_code": 0,
                 "status": "finished",
                 "exec_time_s": 30,
-                "completion_time": 15555555555
+                "completion_time": 15555555555,
+                "num_attempts": 1,
             },
         ],
         "jade_version": 0.1,
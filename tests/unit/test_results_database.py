@@ -0,0 +1,101 @@
+"""
+Unit tests for the SQLite results database
+"""
+
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import pytest
+
+from jade.common import RESULTS_DB_FILE
+from jade.result import Result, ResultsSummary
+from jade.results_database import ResultsDatabase, MAX_QUERY_PARAMETERS
+
+
+Job = namedtuple("Job", "name")
+
+
+@pytest.fixture
+def output_dir():
+    directory = tempfile.mkdtemp()
+    yield directory
+    shutil.rmtree(directory)
+
+
+def _create_results(num_results):
+    results = []
+    for i in range(num_results):
+        if i % 3 == 0:
+            results.append(Result(f"job{i}", 1, "finished", float(i), 15555555555))
+        else:
+            results.append(Result(f"job{i}", 0, "finished", float(i), 15555555555))
+    return results
+
+
+def _create_db(output_dir, results):
+    metadata = {
+        "base_directory": "/jade/results/base/directory/",
+        "jade_version": 0.1,
+        "timestamp": "2019-09-02 15:00:00",
+    }
+    filename = os.path.join(output_dir, RESULTS_DB_FILE)
+    return ResultsDatabase.create(filename, results, metadata)
+
+
+def test_results_database(output_dir):
+    results = _create_results(10)
+    db = _create_db(output_dir, results)
+    assert db.get_metadata()["jade_version"] == 0.1
+    assert db.get_result("job4") == results[4]
+    assert db.get_result("job100") is None
+    assert list(db.iter_results()) == results
+    assert list(db.iter_results(only_failed=True)) == \
+        [x for x in results if x.return_code != 0]
+    assert list(db.iter_results(only_successful=True)) == \
+        [x for x in results if x.return_code == 0]
+    assert db.get_summary() == {"num_successful": 6, "num_failed": 4, "total": 10}
+    db.close()
+    assert not os.path.exists(db.filename + "-wal")
+
+
+def test_results_database__missing(output_dir):
+    num_results = MAX_QUERY_PARAMETERS * 2 + 1
+    results = _create_results(num_results)
+    db = _create_db(output_dir, results[::2])
+    jobs = [Job(x.name) for x in results]
+    assert list(db.iter_missing(jobs)) == jobs[1::2]
+    db.close()
+
+
+def test_results_database__duplicates(output_dir, caplog):
+    results = _create_results(3)
+    retried = results[1]._replace(return_code=0, num_attempts=2)
+    db = _create_db(output_dir, results + [retried])
+    assert db.get_result(retried.name) == retried
+    assert list(db.iter_results()) == [results[0], retried, results[2]]
+    assert db.get_summary()["total"] == 3
+    assert "Duplicate result for job job1" in caplog.text
+    db.close()
+
+
+def test_results_summary__database(output_dir, capsys):
+    results = _create_results(10)
+    _create_db(output_dir, results).close()
+
+    summary = ResultsSummary(output_dir)
+    assert summary.base_directory == "/jade/results/base/directory/"
+    assert summary.list_results() == results
+    assert summary.results["results"] == results
+    assert summary.get_result("job2") == results[2]
+    assert summary.get_successful_result("job2") == results[2]
+    assert len(summary.get_failed_results()) == 4
+    assert len(summary.get_successful_results()) == 6
+    assert summary.get_missing_results([Job("job1"), Job("job11")]) == [Job("job11")]
+
+    summary.show_results(only_failed=True)
+    captured = capsys.readouterr()
+    assert "job3 " in captured.out
+    assert "job2 " not in captured.out
+    assert "Total: 10" in captured.out